@@ -0,0 +1 @@
+"""Local HTTP/JSON API for scripting generations."""
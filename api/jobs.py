@@ -0,0 +1,399 @@
+"""Queue of API generation jobs, run one at a time on a background thread.
+
+Jobs are rendered by the same code the Qt workers use
+(:func:`workers.image.generate_image` and :func:`workers.video.generate_video`),
+on a single generation thread so concurrent requests never compete for the
+GPU. Status changes and progress are pushed to listeners, which the HTTP
+server forwards to its event streams without ever blocking that thread.
+"""
+
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from utils import metrics, profiling, tracing
+from utils.model_profiles import get_profile
+from workers.params import ImageParams, VideoParams
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL = (DONE, FAILED, CANCELLED)
+
+# Defaults for fields a request leaves out, matching the GUI
+_IMAGE_DEFAULTS = {"width": 512, "height": 512}
+_VIDEO_DEFAULTS = {"width": 480, "height": 480, "frames": 16, "steps": 50}
+
+Params = Union[ImageParams, VideoParams]
+
+
+def build_params(kind: str, data: Dict[str, Any]) -> Params:
+    """Build the parameters of a ``kind`` job from request JSON.
+
+    Missing image steps and guidance come from the model profile. Output
+    locations are chosen by the server and cannot be set.
+
+    Raises:
+        ValueError: For an unknown kind or field, or values of the wrong type
+    """
+    if kind == "image":
+        cls, values = ImageParams, dict(_IMAGE_DEFAULTS)
+    elif kind == "video":
+        cls, values = VideoParams, dict(_VIDEO_DEFAULTS)
+    else:
+        raise ValueError(f"Unknown job kind {kind!r}; use 'image' or 'video'")
+    if not isinstance(data, dict):
+        raise ValueError("'params' must be an object")
+    known = {f.name for f in fields(cls)} - {"output_path"}
+    unknown = sorted(set(data) - known)
+    if unknown:
+        raise ValueError(f"Unknown {kind} parameter(s): {', '.join(unknown)}")
+    values.update(data)
+    if kind == "image":
+        profile = get_profile(values.get("profile"))
+        values.setdefault("steps", profile.default_steps)
+        values.setdefault("guidance", profile.default_guidance)
+        values["loras"] = [tuple(lora) for lora in values.get("loras") or []]
+    params = cls(**values)
+    for f in fields(cls):
+        value = getattr(params, f.name)
+        if f.type in (int, float) and (
+            not isinstance(value, (int, float)) or isinstance(value, bool)
+        ):
+            raise ValueError(f"'{f.name}' must be a number")
+    return params
+
+
+@dataclass
+class Job:
+    """One generation request and its progress."""
+
+    id: str
+    kind: str
+    prompt: str
+    neg_prompt: str
+    params: Params
+    status: str = QUEUED
+    progress: int = 0
+    error: Optional[str] = None
+    # Where the runner writes the result, chosen by the manager
+    output_path: Optional[str] = None
+    # Set to ``output_path`` once the job is done
+    result_path: Optional[str] = None
+    # Chrome trace of the job's stages, when tracing is enabled
+    trace_path: Optional[str] = None
+    # Denoising steps to capture with torch.profiler (0: none)
+    profile_steps: int = 0
+    # Top-ops summary written by the profiler
+    profile_path: Optional[str] = None
+    # Guidance mode an image job ran with (see utils.model_profiles)
+    guidance: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON representation served by the API."""
+        params = asdict(self.params)
+        params.pop("output_path", None)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "prompt": self.prompt,
+            "neg_prompt": self.neg_prompt,
+            "params": params,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "result": f"/jobs/{self.id}/result" if self.status == DONE else None,
+            "trace": f"/jobs/{self.id}/trace" if self.trace_path else None,
+            "profile": f"/jobs/{self.id}/profile" if self.profile_path else None,
+            "guidance": self.guidance,
+        }
+
+
+# Renders a job and returns the result path, or None if it was cancelled
+Runner = Callable[[Job, Callable[[int], None], Callable[[], bool]], Optional[str]]
+# Receives every job update: ("status" | "progress", job)
+Listener = Callable[[str, Job], None]
+
+
+def run_image_job(job: Job, progress, should_stop) -> Optional[str]:
+    """Render an image job and save it as PNG."""
+    from workers.image import image_guidance
+
+    params = job.params
+    job.guidance = image_guidance(params, job.neg_prompt).describe()
+    if params.out_of_process:
+        from PIL import Image
+
+        if job.profile_steps:
+            logger.warning("Profiling needs in-process generation; skipped")
+
+        from workers.generation_process import GenerationProcess
+
+        result = GenerationProcess.instance().generate(
+            job.prompt,
+            job.neg_prompt,
+            asdict(params),
+            progress=progress,
+            should_stop=should_stop,
+        )
+        if result is None:
+            return None
+        data, width, height = result
+        image = Image.frombytes("RGBA", (width, height), bytes(data))
+    else:
+        from workers.image import generate_image
+
+        request = None
+        if job.profile_steps:
+            request = profiling.ProfileRequest(
+                os.path.splitext(job.output_path)[0], steps=job.profile_steps
+            )
+        with profiling.capture(request) as profiler:
+            image = generate_image(
+                job.prompt, job.neg_prompt, params, progress, should_stop
+            )
+        if profiler is not None and profiler.outputs:
+            job.profile_path = profiler.outputs[-1]
+        if image is None:
+            return None
+    image.save(job.output_path)
+    return job.output_path
+
+
+def run_video_job(job: Job, progress, should_stop) -> Optional[str]:
+    """Render a video job with the in-process Wan2.2 pipeline."""
+    from utils.model_manager import ModelManager
+    from workers.video import generate_video, is_diffusers_layout
+
+    model_path = ModelManager.get_wan_model_path()
+    if not is_diffusers_layout(model_path):
+        raise FileNotFoundError(
+            f"No diffusers Wan2.2 model found at {model_path}; "
+            "run 'python setup_models.py'"
+        )
+    return generate_video(
+        job.prompt, job.neg_prompt, job.params, model_path, progress, should_stop
+    )
+
+
+DEFAULT_RUNNERS: Dict[str, Runner] = {"image": run_image_job, "video": run_video_job}
+
+
+class JobManager:
+    """Accept jobs from any thread and render them on one generation thread."""
+
+    def __init__(
+        self,
+        output_dir: str,
+        runners: Optional[Dict[str, Runner]] = None,
+        max_finished: int = 100,
+    ) -> None:
+        """Create the manager; call :meth:`start` to begin rendering.
+
+        Parameters:
+            output_dir: Directory results are written to.
+            runners: Renderer per job kind; defaults to :data:`DEFAULT_RUNNERS`.
+            max_finished: Finished jobs kept for status queries; older ones
+                are forgotten (their files stay on disk).
+        """
+        self.output_dir = output_dir
+        self.runners = dict(runners or DEFAULT_RUNNERS)
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._listeners: List[Listener] = []
+        self._counter = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the generation thread."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop, name="api-generation", daemon=True
+            )
+            self._thread.start()
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Cancel the running job and stop the generation thread."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status in (QUEUED, RUNNING):
+                    job.cancel_event.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add_listener(self, listener: Listener) -> None:
+        """Call ``listener`` on every status change and progress update.
+
+        Listeners run on the thread that caused the update, usually the
+        generation thread, and must return quickly.
+        """
+        self._listeners.append(listener)
+
+    def submit(
+        self,
+        kind: str,
+        prompt: str,
+        neg_prompt: str,
+        params: Params,
+        profile_steps: int = 0,
+    ) -> Job:
+        """Queue a job and return it.
+
+        ``profile_steps`` denoising steps of an image job are captured with
+        ``torch.profiler`` (see :mod:`utils.profiling`).
+        """
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        if profile_steps and kind != "image":
+            raise ValueError("Only image jobs can be profiled")
+        job_id = f"{next(self._counter):04d}-{uuid.uuid4().hex[:8]}"
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        suffix = ".mp4" if kind == "video" else ".png"
+        path = os.path.join(self.output_dir, f"{kind}_{stamp}_{job_id}{suffix}")
+        if isinstance(params, VideoParams):
+            params = replace(params, output_path=path)
+        job = Job(
+            job_id,
+            kind,
+            prompt,
+            neg_prompt,
+            params,
+            output_path=path,
+            profile_steps=profile_steps,
+        )
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+        self._queue.put(job)
+        metrics.QUEUE_DEPTH.inc()
+        logger.info(f"Queued {kind} job {job_id}")
+        self._notify("status", job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job called ``job_id``, if it is still known."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Return all known jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; finished jobs are left as they are."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in TERMINAL:
+                return job
+            job.cancel_event.set()
+            queued = job.status == QUEUED
+            if queued:
+                job.status = CANCELLED
+                job.finished = time.time()
+        if queued:
+            self._notify("status", job)
+        return job
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.status in TERMINAL]
+        for job in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
+
+    def _notify(self, event: str, job: Job) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(event, job)
+            except Exception:
+                logger.exception("Job listener failed")
+
+    def _set_status(self, job: Job, status: str, **changes: Any) -> None:
+        with self._lock:
+            job.status = status
+            for name, value in changes.items():
+                setattr(job, name, value)
+            if status in TERMINAL:
+                job.finished = time.time()
+                self._prune()
+        self._notify("status", job)
+
+    def _loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            metrics.QUEUE_DEPTH.inc(-1)
+            with self._lock:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.started = time.time()
+            metrics.QUEUE_WAIT_SECONDS.observe(job.started - job.created, kind=job.kind)
+            self._notify("status", job)
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        def progress(pct: int) -> None:
+            if pct != job.progress and not job.cancel_event.is_set():
+                job.progress = pct
+                self._notify("progress", job)
+
+        trace = tracing.start_trace(
+            job.kind, os.path.splitext(job.output_path)[0] + ".trace.json"
+        )
+        try:
+            try:
+                # The child process's memory is not visible from here
+                in_process = not getattr(job.params, "out_of_process", False)
+                with metrics.track_job(
+                    job.kind, memory=in_process
+                ) as record, tracing.span(f"{job.kind}_job", id=job.id):
+                    path = self.runners[job.kind](
+                        job, progress, job.cancel_event.is_set
+                    )
+                    if path is None or job.cancel_event.is_set():
+                        record.status = CANCELLED
+            finally:
+                # Written before the final status so clients can fetch it
+                job.trace_path = tracing.stop_trace(trace)
+        except Exception as e:
+            from utils.errors import parse_error
+
+            msg = parse_error(e)
+            logger.exception(f"API job {job.id} failed: {msg}")
+            self._set_status(job, FAILED, error=msg)
+        else:
+            if path is None or job.cancel_event.is_set():
+                self._set_status(job, CANCELLED)
+            else:
+                self._set_status(job, DONE, progress=100, result_path=path)
+        finally:
+            try:
+                import torch
+
+                torch.cuda.empty_cache()
+            except (ImportError, AttributeError, RuntimeError):
+                pass
@@ -0,0 +1,394 @@
+"""Local HTTP/JSON API over the generation engine, built on asyncio streams.
+
+Endpoints (all JSON unless noted)::
+
+    GET    /health               server status and job count
+    GET    /metrics              Prometheus text format (:mod:`utils.metrics`)
+    GET    /jobs                 all known jobs
+    POST   /jobs                 {"kind": "image"|"video", "prompt": "...",
+                                  "neg_prompt": "...", "params": {...}}
+    GET    /jobs/<id>            one job
+    DELETE /jobs/<id>            cancel a queued or running job
+    GET    /jobs/<id>/events     server-sent events: "status" and "progress"
+    GET    /jobs/<id>/result     the PNG or MP4 once the job is done
+    GET    /jobs/<id>/trace      Chrome trace of the job (``--trace``)
+    GET    /jobs/<id>/profile    top torch.profiler operators of the job
+
+``params`` takes the fields of :class:`~workers.params.ImageParams` or
+:class:`~workers.params.VideoParams`; ``"profile": N`` captures N denoising
+steps of an image job with ``torch.profiler``. Jobs run one at a time on the
+:class:`~api.jobs.JobManager` thread while the event loop serves any number
+of clients; updates cross from that thread with ``call_soon_threadsafe`` and
+are fanned out to per-client queues. Each connection carries one request.
+
+Run with ``python -m api.server`` (binds to 127.0.0.1:8765 by default).
+"""
+
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+from typing import Any, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from utils import metrics
+
+from .jobs import TERMINAL, Job, JobManager, build_params
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+# Seconds a client may take to send its request
+REQUEST_TIMEOUT = 30
+# Seconds between keep-alive comments on idle event streams
+HEARTBEAT = 15
+_CHUNK = 1 << 16
+
+_REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+}
+
+
+class HTTPError(Exception):
+    """An error response with a status code and message."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class ApiServer:
+    """Serve a :class:`JobManager` over HTTP on the running event loop."""
+
+    def __init__(
+        self, manager: JobManager, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+    ) -> None:
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Event stream queues per job id
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        manager.add_listener(self._on_job_update)
+
+    async def start(self) -> None:
+        """Start listening; ``self.port`` is updated when 0 was requested."""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"API listening on http://{self.host}:{self.port}")
+
+    async def serve_forever(self) -> None:
+        """Start (if needed) and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting connections."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # ---- Updates from the generation thread ----
+
+    def _on_job_update(self, event: str, job: Job) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        if event == "progress":
+            data = {"id": job.id, "progress": job.progress}
+        else:
+            data = job.to_dict()
+        loop.call_soon_threadsafe(self._publish, job.id, event, data)
+
+    def _publish(self, job_id: str, event: str, data: Dict[str, Any]) -> None:
+        for subscriber in self._subscribers.get(job_id, ()):
+            subscriber.put_nowait((event, data))
+
+    # ---- HTTP ----
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            try:
+                request = await asyncio.wait_for(
+                    self._read_request(reader), REQUEST_TIMEOUT
+                )
+                if request is None:
+                    return
+                await self._dispatch(writer, *request)
+            except HTTPError as e:
+                await self._send_json(writer, e.status, {"error": str(e)})
+            except asyncio.TimeoutError:
+                return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception("API request failed")
+        finally:
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length") from None
+        if length > MAX_BODY:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method.upper(), urlsplit(target).path, headers, body
+
+    async def _dispatch(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: bytes,
+    ) -> None:
+        parts = [part for part in path.split("/") if part]
+        if parts == ["health"] and method == "GET":
+            await self._send_json(
+                writer, 200, {"status": "ok", "jobs": len(self.manager.jobs())}
+            )
+        elif parts == ["metrics"] and method == "GET":
+            body = metrics.registry.to_prometheus().encode()
+            writer.write(
+                (
+                    "HTTP/1.1 200 OK\r\n"
+                    "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode()
+                + body
+            )
+            await writer.drain()
+        elif parts == ["jobs"] and method == "GET":
+            await self._send_json(
+                writer, 200, {"jobs": [job.to_dict() for job in self.manager.jobs()]}
+            )
+        elif parts == ["jobs"] and method == "POST":
+            job = self._submit(headers, body)
+            await self._send_json(
+                writer, 202, job.to_dict(), {"Location": f"/jobs/{job.id}"}
+            )
+        elif len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.manager.get(parts[1])
+            if job is None:
+                raise HTTPError(404, f"No job {parts[1]!r}")
+            action = parts[2] if len(parts) == 3 else None
+            if action is None and method == "GET":
+                await self._send_json(writer, 200, job.to_dict())
+            elif action is None and method == "DELETE":
+                await self._send_json(
+                    writer, 200, self.manager.cancel(job.id).to_dict()
+                )
+            elif action == "events" and method == "GET":
+                await self._stream_events(writer, job)
+            elif action == "result" and method == "GET":
+                await self._send_result(writer, job)
+            elif action == "trace" and method == "GET":
+                if not job.trace_path:
+                    raise HTTPError(404, f"Job {job.id} has no trace")
+                await self._send_file(writer, job.trace_path)
+            elif action == "profile" and method == "GET":
+                if not job.profile_path:
+                    raise HTTPError(404, f"Job {job.id} has no profile")
+                await self._send_file(writer, job.profile_path)
+            elif action in (None, "events", "result", "trace", "profile"):
+                raise HTTPError(405, f"{method} is not allowed on {path}")
+            else:
+                raise HTTPError(404, f"Unknown path {path}")
+        elif parts in (["health"], ["metrics"], ["jobs"]):
+            raise HTTPError(405, f"{method} is not allowed on {path}")
+        else:
+            raise HTTPError(404, f"Unknown path {path}")
+
+    def _submit(self, headers: Dict[str, str], body: bytes) -> Job:
+        # Browsers cannot send JSON cross-origin without a preflight
+        if not headers.get("content-type", "").startswith("application/json"):
+            raise HTTPError(415, "Send the job as application/json")
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            prompt = request.get("prompt", "")
+            neg_prompt = request.get("neg_prompt", "")
+            if not isinstance(prompt, str) or not isinstance(neg_prompt, str):
+                raise ValueError("'prompt' and 'neg_prompt' must be strings")
+            kind = request.get("kind", "image")
+            params = build_params(kind, request.get("params") or {})
+            profile_steps = request.get("profile") or 0
+            if (
+                not isinstance(profile_steps, int)
+                or isinstance(profile_steps, bool)
+                or profile_steps < 0
+            ):
+                raise ValueError("'profile' must be a number of steps")
+            return self.manager.submit(
+                kind, prompt, neg_prompt, params, profile_steps=profile_steps
+            )
+        except (ValueError, TypeError) as e:
+            raise HTTPError(400, str(e)) from None
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, job: Job) -> None:
+        subscriber: asyncio.Queue = asyncio.Queue()
+        # Subscribe before the snapshot so no update falls in between
+        self._subscribers.setdefault(job.id, set()).add(subscriber)
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            writer.write(_sse("status", job.to_dict()))
+            await writer.drain()
+            status = job.status
+            while status not in TERMINAL:
+                try:
+                    event, data = await asyncio.wait_for(subscriber.get(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                else:
+                    writer.write(_sse(event, data))
+                    if event == "status":
+                        status = data["status"]
+                await writer.drain()
+        finally:
+            subscribers = self._subscribers.get(job.id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[job.id]
+
+    async def _send_result(self, writer: asyncio.StreamWriter, job: Job) -> None:
+        if job.status != "done" or not job.result_path:
+            raise HTTPError(409, f"Job {job.id} is {job.status}")
+        await self._send_file(writer, job.result_path)
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: str) -> None:
+        if not os.path.isfile(path):
+            raise HTTPError(404, f"{os.path.basename(path)} was deleted")
+        size = os.path.getsize(path)
+        content_type = mimetypes.guess_type(path)[0]
+        name = os.path.basename(path)
+        writer.write(
+            (
+                "HTTP/1.1 200 OK\r\n"
+                f"Content-Type: {content_type or 'application/octet-stream'}\r\n"
+                f"Content-Length: {size}\r\n"
+                f'Content-Disposition: attachment; filename="{name}"\r\n'
+                "Connection: close\r\n\r\n"
+            ).encode()
+        )
+        loop = asyncio.get_running_loop()
+        with open(path, "rb") as fh:
+            while True:
+                # Disk reads happen off the event loop
+                chunk = await loop.run_in_executor(None, fh.read, _CHUNK)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+    async def _send_json(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Dict[str, Any],
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        body = json.dumps(payload).encode()
+        head = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        head += [f"{name}: {value}" for name, value in (extra_headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+
+async def serve(manager: JobManager, host: str, port: int) -> None:
+    """Run the API until cancelled."""
+    server = ApiServer(manager, host, port)
+    manager.start()
+    try:
+        await server.serve_forever()
+    finally:
+        manager.shutdown(timeout=5)
+
+
+def main():
+    """Run the API server from the command line."""
+    import argparse
+
+    from utils.logging_config import setup_logging
+    from utils.settings_manager import SettingsManager
+
+    parser = argparse.ArgumentParser(description="Serve the generation API")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--output-dir", help="Where results are written")
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Write a Chrome trace next to each result",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    settings = SettingsManager()
+    metrics.configure(settings.get("metrics/path") or metrics.default_path())
+    if args.trace:
+        from utils import tracing
+
+        tracing.configure(True)
+    if args.host not in ("127.0.0.1", "localhost", "::1"):
+        logger.warning(f"Binding to {args.host}: anyone who can reach it can run jobs")
+    output_dir = args.output_dir or settings.get_output_dir()
+    try:
+        asyncio.run(serve(JobManager(output_dir), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
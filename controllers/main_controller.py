@@ -1,13 +1,30 @@
+import glob
+import itertools
+import os
 import sys
+import time
+from dataclasses import replace
+from typing import Optional
 import torch
 from PyQt5.QtWidgets import QApplication, QMainWindow
-from PyQt5.QtGui import QPixmap, QImage, QCloseEvent
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QCloseEvent
 
 from ui.main_window import Ui_MainWindow
+from utils import metrics, profiling, tracing
+from utils.compilation import bucket_dimensions
+from utils.lora_manager import parse_lora_spec
+from utils.model_profiles import PROFILES, ModelProfile, get_profile
+from utils.schedulers import get_scheduler, schedulers_for
 from utils.settings_manager import SettingsManager
-from workers.image_and_video_workers import ImageWorker, VideoWorker
+from workers.generation_process import GenerationProcess
+from workers.image_and_video_workers import (
+    ImageWorker,
+    SweepWorker,
+    TiledImageWorker,
+    VideoWorker,
+)
 from workers.params import ImageParams, VideoParams
+from workers.sweep import expand_sweep, parse_sweep_spec
 
 
 class MainController:
@@ -23,10 +40,20 @@ class MainController:
         self.settings = SettingsManager()
         self.image_worker = None
         self.video_worker = None
+        self.sweep_worker = None
+        self.tiled_worker = None
+        # Tells apart image results saved within the same second
+        self._image_numbers = itertools.count(1)
+        self.metrics_server = None
+        self._start_metrics()
 
         # Populate devices and bind actions
         self._populate_device_list()
+        self._populate_profile_list()
+        self._populate_scheduler_list(self.settings.get("scheduler"))
         self._bind_signals()
+        # Earlier results, listed off the GUI thread
+        self.ui.gallery.scan_directory(self.settings.get_output_dir())
 
         # Show window; event loop is started via run()
         self.window.show()
@@ -50,31 +77,97 @@ class MainController:
         if last in devices:
             self.ui.device_combo.setCurrentText(last)
 
+    def _populate_profile_list(self) -> None:
+        """Fill the model profile combo box and restore the last used profile."""
+        combo = self.ui.profile_combo
+        combo.clear()
+        for profile in PROFILES:
+            combo.addItem(profile.label, profile.name)
+        index = combo.findData(get_profile(self.settings.get("profile")).name)
+        combo.setCurrentIndex(max(index, 0))
+        self._apply_profile_defaults()
+
+    def _populate_scheduler_list(self, name: Optional[str]) -> None:
+        """List the schedulers that fit the selected profile's model family.
+
+        Parameters:
+            name: Scheduler to select; the model default if it does not fit.
+        """
+        family = get_profile(self.ui.profile_combo.currentData()).scheduler_family
+        combo = self.ui.scheduler_combo
+        # Refilling the list is not a choice of scheduler
+        blocked = combo.blockSignals(True)
+        combo.clear()
+        for spec in schedulers_for(family):
+            combo.addItem(f"{spec.label} ({spec.min_steps}+ steps)", spec.name)
+        index = combo.findData(get_scheduler(name).name)
+        combo.setCurrentIndex(max(index, 0))
+        combo.blockSignals(blocked)
+
     def _bind_signals(self) -> None:
         """Connect UI buttons to start image or video generation."""
         # Image generation
         self.ui.gen_button.clicked.connect(self.start_image_generation)
+        self.ui.scheduler_combo.currentIndexChanged.connect(self._on_scheduler_changed)
+        self.ui.profile_combo.currentIndexChanged.connect(self._on_profile_changed)
+        self.ui.profile_button.clicked.connect(self.request_profile)
+        self.ui.stats_button.clicked.connect(self.show_stats)
+        self.ui.gallery.item_selected.connect(self._on_gallery_selected)
+        # Parameter sweep
+        self.ui.sweep_button.clicked.connect(self.start_sweep)
         # Video generation
         self.ui.video_button.clicked.connect(self.start_video_generation)
 
-    def start_image_generation(self) -> None:
-        """Collect UI prompts and parameters and launch image generation."""
-        prompt = self.ui.prompt_edit.toPlainText().strip()
-        neg = self.ui.neg_prompt_edit.toPlainText().strip()
-        params = ImageParams(
-            width=self.ui.width_spin.value(),
-            height=self.ui.height_spin.value(),
+    def _collect_image_params(self) -> ImageParams:
+        """Build :class:`ImageParams` from the image tab controls."""
+        width, height = self.ui.width_spin.value(), self.ui.height_spin.value()
+        compile_models = self.ui.compile_checkbox.isChecked()
+        if compile_models:
+            # Every new size triggers a recompile; keep to the 64-px grid
+            width, height = bucket_dimensions(width, height)
+        return ImageParams(
+            width=width,
+            height=height,
             steps=self.ui.steps_spin.value(),
             guidance=self.ui.guidance_spin.value(),
-            model_path=self.settings.get_model_path("flux"),
+            model_path=self.settings.get_model_path(
+                self.ui.profile_combo.currentData()
+            ),
+            profile=self.ui.profile_combo.currentData(),
             device=self.ui.device_combo.currentText(),
             quantized=self.ui.quant_checkbox.isChecked(),
+            out_of_process=self.ui.process_checkbox.isChecked(),
+            scheduler=self.ui.scheduler_combo.currentData(),
+            loras=parse_lora_spec(self.ui.lora_edit.text()),
+            fuse_lora=self.ui.fuse_lora_checkbox.isChecked(),
+            compile=compile_models,
+            hires_scale=self.ui.hires_combo.currentData() or 1.0,
         )
-        # Persist chosen device
+
+    def start_image_generation(self) -> None:
+        """Collect UI prompts and parameters and launch image generation."""
+        prompt = self.ui.prompt_edit.toPlainText().strip()
+        neg = self.ui.neg_prompt_edit.toPlainText().strip()
+        try:
+            params = self._collect_image_params()
+        except ValueError as e:
+            self._handle_error(str(e))
+            return
+        # Persist chosen device, model profile and scheduler
         self.settings.set("device", params.device)
+        self.settings.set("profile", params.profile)
+        self.settings.set("scheduler", params.scheduler)
+        if self.ui.tiled_checkbox.isChecked():
+            self.start_tiled_generation(prompt, neg, params)
+            return
+        self._configure_tracing()
 
-        # Start worker
-        self.image_worker = ImageWorker(prompt, neg, params)
+        # Start worker; it saves the result so the gallery can reload it
+        output_path = os.path.join(
+            self.settings.get_output_dir(),
+            time.strftime("image_%Y%m%d_%H%M%S") + f"_{next(self._image_numbers)}.png",
+        )
+        self.image_worker = ImageWorker(prompt, neg, params, output_path=output_path)
         self.image_worker.progress.connect(self.ui.image_progress.setValue)
         self.image_worker.result.connect(self._on_image_result)
         self.image_worker.error.connect(self._handle_error)
@@ -82,21 +175,220 @@ class MainController:
 
         self.ui.status_bar.showMessage("Generating image...")
 
+    def start_tiled_generation(
+        self, prompt: str, neg: str, params: ImageParams
+    ) -> None:
+        """Render the canvas size in tiles to a memory-mapped file on disk.
+
+        Parameters:
+            prompt: Text prompt for the model.
+            neg: Negative prompt.
+            params: Image tab parameters; the canvas size replaces the image size.
+        """
+        params = replace(
+            params,
+            width=self.ui.canvas_width_spin.value(),
+            height=self.ui.canvas_height_spin.value(),
+            hires_scale=1.0,
+        )
+        out_path = os.path.join(
+            self.settings.get_output_dir(),
+            time.strftime("tiled_%Y%m%d_%H%M%S.npy"),
+        )
+        self.tiled_worker = TiledImageWorker(prompt, neg, params, out_path)
+        self.tiled_worker.progress.connect(self.ui.image_progress.setValue)
+        self.tiled_worker.finished.connect(self._on_tiled_finished)
+        self.tiled_worker.error.connect(self._handle_error)
+        self.tiled_worker.start()
+
+        self.ui.status_bar.showMessage(
+            f"Generating {params.width}x{params.height} tiled image..."
+        )
+
+    def _on_tiled_finished(self, path: str) -> None:
+        """Show the tiled result in the region-reading viewer.
+
+        Parameters:
+            path: Filesystem path of the ``.npy`` image.
+        """
+        self.ui.image_display.hide()
+        self.ui.tiled_view.show()
+        self.ui.tiled_view.open_image(path)
+        self.ui.status_bar.showMessage(f"Tiled image saved to {path}")
+
+    def request_profile(self) -> None:
+        """Capture operator-level detail of the next image job's steps."""
+        request = profiling.ProfileRequest(
+            os.path.join(
+                self.settings.get_output_dir(),
+                time.strftime("profile_%Y%m%d_%H%M%S"),
+            )
+        )
+        profiling.request_profile(request)
+        self.ui.status_bar.showMessage(
+            f"The next image job will be profiled for {request.steps} steps"
+        )
+
+    def _start_metrics(self) -> None:
+        """Load saved metrics and, if enabled, serve them to Prometheus.
+
+        The ``metrics/path`` setting picks the metrics file (by default next
+        to the settings file). The localhost endpoint only starts when the
+        ``metrics/port`` setting names a port (for example
+        ``metrics.DEFAULT_PORT``); otherwise the API server's ``/metrics`` is
+        the only one.
+        """
+        metrics.configure(self.settings.get("metrics/path") or metrics.default_path())
+        port = int(self.settings.get("metrics/port") or 0)
+        if not port:
+            return
+        try:
+            self.metrics_server = metrics.serve(port)
+        except OSError as e:
+            # Usually another instance already serves the port
+            self.ui.status_bar.showMessage(f"Metrics endpoint not started: {e}")
+
+    def show_stats(self) -> None:
+        """Open the aggregated metrics dialog."""
+        from ui.stats_dialog import StatsDialog
+
+        endpoint = None
+        if self.metrics_server is not None:
+            host, port = self.metrics_server.server_address[:2]
+            endpoint = f"http://{host}:{port}/metrics"
+        StatsDialog(endpoint, self.window).exec_()
+
+    def _configure_tracing(self) -> None:
+        """Apply the trace checkbox to the next job's worker."""
+        tracing.configure(
+            self.ui.trace_checkbox.isChecked(),
+            os.path.join(self.settings.get_output_dir(), "traces"),
+        )
+
+    def _apply_profile_defaults(self) -> ModelProfile:
+        """Load the selected profile's step and guidance defaults into the UI."""
+        profile = get_profile(self.ui.profile_combo.currentData())
+        self.ui.steps_spin.setValue(profile.default_steps)
+        self.ui.guidance_spin.setValue(profile.default_guidance)
+        self.ui.guidance_spin.setEnabled(profile.uses_guidance)
+        self.ui.neg_prompt_edit.setEnabled(profile.negative_prompt)
+        return profile
+
+    def _on_profile_changed(self, index: int) -> None:
+        """Switch the image controls to the newly selected model profile.
+
+        Parameters:
+            index: Index of the selected profile in the combo box.
+        """
+        profile = self._apply_profile_defaults()
+        self._populate_scheduler_list(self.ui.scheduler_combo.currentData())
+        self.ui.status_bar.showMessage(
+            f"{profile.label}: {profile.default_steps} steps by default"
+        )
+
+    def _on_scheduler_changed(self, index: int) -> None:
+        """Raise the step count to the chosen scheduler's recommended minimum.
+
+        Parameters:
+            index: Index of the selected scheduler in the combo box.
+        """
+        spec = get_scheduler(self.ui.scheduler_combo.currentData())
+        if self.ui.steps_spin.value() < spec.min_steps:
+            self.ui.steps_spin.setValue(spec.min_steps)
+        hint = " (needs few-step distilled weights)" if spec.few_step else ""
+        self.ui.status_bar.showMessage(
+            f"{spec.label}: {spec.min_steps} steps recommended{hint}"
+        )
+
     def _on_image_result(self, qimg: QImage) -> None:
         """Display the generated image in the UI.
 
         Parameters:
             qimg: Image produced by the worker.
         """
-        pixmap = QPixmap.fromImage(qimg)
-        self.ui.image_display.setPixmap(
-            pixmap.scaled(
-                self.ui.image_display.size(),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation,
-            )
+        worker = self.image_worker
+        trace = worker.trace if worker else None
+        path = worker.saved_path if worker else None
+        # The gallery lists saved files only, so no full image is held there
+        if path is not None:
+            self.ui.gallery.add_result(path)
+        self._show_image(qimg, trace, path)
+        message = "Image generation complete"
+        if path is not None:
+            message += f"; saved to {path}"
+        elif worker and worker.output_path:
+            message += "; could not be saved"
+        if worker and worker.guidance:
+            message += f" (guidance: {worker.guidance})"
+        if trace is not None and trace.save():
+            message += f"; trace saved to {trace.path}"
+        if worker and worker.profile_outputs:
+            message += f"; profile saved to {worker.profile_outputs[-1]}"
+        self.ui.status_bar.showMessage(message)
+
+    def _show_image(self, qimg: QImage, trace=None, key=None) -> None:
+        """Show ``qimg`` in the image viewer, which scales it off this thread.
+
+        Parameters:
+            qimg: Image to show.
+            trace: Job trace that records the display stage, if any.
+            key: Gallery key (file path) of the image, so reselecting it hits
+                the cache.
+        """
+        self.ui.tiled_view.hide()
+        self.ui.image_display.show()
+        with tracing.bind(trace), tracing.span("display"):
+            self.ui.image_display.set_image(qimg, key)
+
+    def _on_gallery_selected(self, item) -> None:
+        """Show the result picked in the gallery.
+
+        Parameters:
+            item: :class:`ui.gallery.GalleryItem` of an image file.
+        """
+        self.ui.tiled_view.hide()
+        self.ui.image_display.show()
+        # Decoded by the viewer's thread pool rather than here
+        self.ui.image_display.open_file(item.path)
+
+    def start_sweep(self) -> None:
+        """Expand the sweep spec over the current image parameters and run it."""
+        prompt = self.ui.prompt_edit.toPlainText().strip()
+        neg = self.ui.neg_prompt_edit.toPlainText().strip()
+        try:
+            axes = parse_sweep_spec(self.ui.sweep_edit.text())
+            cells = expand_sweep(self._collect_image_params(), axes)
+        except ValueError as e:
+            self._handle_error(f"Invalid sweep: {e}")
+            return
+
+        out_dir = os.path.join(
+            self.settings.get_output_dir(),
+            time.strftime("sweep_%Y%m%d_%H%M%S"),
         )
-        self.ui.status_bar.showMessage("Image generation complete")
+        self.sweep_worker = SweepWorker(prompt, neg, cells, out_dir)
+        self.sweep_worker.progress.connect(self.ui.image_progress.setValue)
+        self.sweep_worker.finished.connect(self._on_sweep_finished)
+        self.sweep_worker.error.connect(self._handle_error)
+        self.sweep_worker.start()
+
+        self.ui.status_bar.showMessage(f"Running sweep of {len(cells)} images...")
+
+    def _on_sweep_finished(self, path: str) -> None:
+        """Show the sweep contact sheet.
+
+        Parameters:
+            path: Filesystem path of the contact sheet image.
+        """
+        self.ui.tiled_view.hide()
+        self.ui.image_display.show()
+        # Decoded by the viewer's thread pool rather than here
+        self.ui.image_display.open_file(path)
+        sweep_dir = os.path.dirname(path)
+        # Cells and the contact sheet, contact sheet first
+        cells = sorted(glob.glob(os.path.join(glob.escape(sweep_dir), "cell_*.png")))
+        self.ui.gallery.add_files([path] + cells)
+        self.ui.status_bar.showMessage(f"Sweep saved to {sweep_dir}")
 
     def start_video_generation(self) -> None:
         """Collect UI prompts and parameters and launch video generation."""
@@ -110,8 +402,14 @@ class MainController:
             offload=self.ui.offload_checkbox.isChecked(),
             t5_cpu=self.ui.t5_cpu_checkbox.isChecked(),
             precision=self.ui.precision_combo.currentText(),
+            interpolation=self.ui.interpolation_combo.currentData() or 1,
+            output_path=os.path.join(
+                self.settings.get_output_dir(),
+                time.strftime("video_%Y%m%d_%H%M%S.mp4"),
+            ),
         )
 
+        self._configure_tracing()
         self.video_worker = VideoWorker(prompt, neg, params)
         self.video_worker.progress.connect(self.ui.video_progress.setValue)
         self.video_worker.finished.connect(self._on_video_finished)
@@ -130,10 +428,21 @@ class MainController:
 
     def closeEvent(self, event: QCloseEvent) -> None:
         """Stop running workers when the window is closed."""
-        for worker in (self.image_worker, self.video_worker):
+        for worker in (
+            self.image_worker,
+            self.video_worker,
+            self.sweep_worker,
+            self.tiled_worker,
+        ):
             if worker and worker.isRunning():
                 worker.stop()
                 worker.wait()
+        GenerationProcess.shutdown_instance()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+        metrics.save()
+        self.settings.flush()
         event.accept()
 
     def _handle_error(self, msg: str) -> None:
@@ -0,0 +1 @@
+"""Render farm: a coordinator sharding jobs across agents on the network."""
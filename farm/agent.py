@@ -0,0 +1,276 @@
+"""Farm agent that renders jobs handed out by a coordinator.
+
+The agent renders with the same runners as the HTTP API
+(:data:`api.jobs.DEFAULT_RUNNERS`, which go through ``ModelManager``), one
+job at a time, and streams each result file back before asking for more
+work. A background thread sends heartbeats with the current progress so the
+coordinator can tell a slow job from a dead machine.
+
+Run with ``python -m farm.agent --coordinator <host>:8766``; add
+``--stand-in`` to try a farm without model weights.
+"""
+
+import hashlib
+import logging
+import os
+import socket
+import tempfile
+import threading
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+from api.jobs import DEFAULT_RUNNERS, Job, Runner, build_params
+from workers.params import VideoParams
+
+from .protocol import (
+    CHUNK_SIZE,
+    DEFAULT_PORT,
+    HEARTBEAT_INTERVAL,
+    ProtocolError,
+    encode,
+    read_message_sync,
+)
+
+logger = logging.getLogger(__name__)
+
+# Side of the images written by the stand-in pipeline
+STAND_IN_SIZE = 64
+
+
+def stand_in_runner(job: Job, progress, should_stop) -> Optional[str]:
+    """Tiny stand-in for the model pipelines, for testing a farm.
+
+    Steps through ``params.steps`` and writes a small PNG whose colour is
+    derived from the prompt and seed.
+    """
+    from PIL import Image
+
+    steps = max(1, getattr(job.params, "steps", 1))
+    for step in range(steps):
+        if should_stop():
+            return None
+        progress(int((step + 1) / steps * 100))
+    digest = hashlib.sha256(
+        f"{job.prompt}|{getattr(job.params, 'seed', None)}".encode()
+    ).digest()
+    Image.new("RGB", (STAND_IN_SIZE, STAND_IN_SIZE), tuple(digest[:3])).save(
+        job.output_path, format="PNG"
+    )
+    return job.output_path
+
+
+class Agent:
+    """Connect to a coordinator and render jobs until told to stop."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_PORT,
+        name: Optional[str] = None,
+        runners: Optional[Dict[str, Runner]] = None,
+        work_dir: Optional[str] = None,
+        token: Optional[str] = None,
+        heartbeat: Optional[float] = None,
+    ) -> None:
+        """Create the agent; call :meth:`run` to start working.
+
+        Parameters:
+            host: Coordinator address.
+            port: Coordinator port.
+            name: Name reported to the coordinator; the host name by default.
+            runners: Renderer per job kind; defaults to
+                :data:`api.jobs.DEFAULT_RUNNERS`. Only these kinds are taken.
+            work_dir: Scratch directory for results before upload.
+            token: Shared secret the coordinator was started with.
+            heartbeat: Seconds between heartbeats; by default the
+                coordinator's choice.
+        """
+        self.host = host
+        self.port = port
+        self.name = name or socket.gethostname()
+        self.runners = dict(runners or DEFAULT_RUNNERS)
+        self.work_dir = work_dir or tempfile.gettempdir()
+        self.token = token
+        self.heartbeat = heartbeat
+        self.completed = 0
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._job: Optional[Job] = None
+        self._progress = 0
+
+    def stop(self) -> None:
+        """Cancel the current job and disconnect."""
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def run(self) -> None:
+        """Work until the coordinator shuts down or :meth:`stop` is called.
+
+        Raises:
+            ConnectionError: If the coordinator rejects the agent
+        """
+        self._sock = socket.create_connection((self.host, self.port))
+        stream = self._sock.makefile("rb")
+        beat = None
+        try:
+            self._send(
+                {
+                    "type": "hello",
+                    "agent": self.name,
+                    "kinds": list(self.runners),
+                    "token": self.token,
+                }
+            )
+            welcome, _ = read_message_sync(stream)
+            if welcome is None or welcome["type"] != "welcome":
+                error = (welcome or {}).get("error", "connection closed")
+                raise ConnectionError(f"Coordinator refused agent: {error}")
+            self.name = welcome["agent"]
+            interval = self.heartbeat or welcome.get("heartbeat", HEARTBEAT_INTERVAL)
+            beat = threading.Thread(
+                target=self._beat, args=(interval,), name="farm-heartbeat", daemon=True
+            )
+            beat.start()
+            logger.info(f"Farm agent {self.name} connected to {self.host}:{self.port}")
+            while not self._stop.is_set():
+                self._send({"type": "request"})
+                message, _ = read_message_sync(stream)
+                if message is None or message["type"] == "shutdown":
+                    break
+                if message["type"] != "job":
+                    raise ProtocolError(f"Unexpected message {message['type']!r}")
+                self._work(message["job"])
+        except OSError:
+            if not self._stop.is_set():
+                raise
+        finally:
+            self._stop.set()
+            stream.close()
+            self._sock.close()
+            if beat is not None:
+                beat.join()
+            logger.info(f"Farm agent {self.name} stopped after {self.completed} job(s)")
+
+    def _send(self, message: Dict[str, Any], payload: bytes = b"") -> None:
+        with self._send_lock:
+            self._sock.sendall(encode(message, payload))
+
+    def _beat(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            job = self._job
+            try:
+                self._send(
+                    {
+                        "type": "heartbeat",
+                        "job": job.id if job is not None else None,
+                        "progress": self._progress,
+                    }
+                )
+            except OSError:
+                # The coordinator is gone; abandon the current job
+                self.stop()
+                break
+
+    def _work(self, spec: Dict[str, Any]) -> None:
+        job_id = spec["id"]
+        suffix = ".mp4" if spec["kind"] == "video" else ".png"
+        path = os.path.join(self.work_dir, f"farm_{self.name}_{job_id}{suffix}")
+        try:
+            params = build_params(spec["kind"], spec["params"])
+            if isinstance(params, VideoParams):
+                params = replace(params, output_path=path)
+            job = Job(
+                job_id,
+                spec["kind"],
+                spec["prompt"],
+                spec["neg_prompt"],
+                params,
+                output_path=path,
+            )
+            self._progress = 0
+            self._job = job
+            result = self.runners[job.kind](job, self._set_progress, self._stop.is_set)
+        except Exception as e:
+            from utils.errors import parse_error
+
+            logger.exception(f"Farm job {job_id} failed")
+            self._send({"type": "failed", "job": job_id, "error": parse_error(e)})
+            return
+        finally:
+            self._job = None
+        if result is None:
+            self._send({"type": "failed", "job": job_id, "error": "Cancelled"})
+            return
+        try:
+            self._upload(job_id, result)
+        finally:
+            os.remove(result)
+        self.completed += 1
+
+    def _set_progress(self, pct: int) -> None:
+        self._progress = pct
+
+    def _upload(self, job_id: str, path: str) -> None:
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._send({"type": "chunk", "job": job_id}, chunk)
+        self._send({"type": "result", "job": job_id})
+
+
+def main():
+    """Run a farm agent from the command line."""
+    import argparse
+
+    from utils.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Render jobs for a farm")
+    parser.add_argument(
+        "--coordinator", default=f"127.0.0.1:{DEFAULT_PORT}", help="host:port"
+    )
+    parser.add_argument("--name", help="Agent name (default: host name)")
+    parser.add_argument(
+        "--kinds", default="image,video", help="Job kinds to take, comma separated"
+    )
+    parser.add_argument("--work-dir", help="Scratch directory for results")
+    parser.add_argument(
+        "--token", default=os.environ.get("FARM_TOKEN"), help="Shared secret"
+    )
+    parser.add_argument(
+        "--stand-in",
+        action="store_true",
+        help="Render placeholder images instead of loading models",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    host, _, port = args.coordinator.rpartition(":")
+    kinds: List[str] = [kind for kind in args.kinds.split(",") if kind]
+    if args.stand_in:
+        runners: Dict[str, Runner] = {"image": stand_in_runner}
+    else:
+        runners = {kind: DEFAULT_RUNNERS[kind] for kind in kinds}
+    agent = Agent(
+        host or "127.0.0.1",
+        int(port),
+        name=args.name,
+        runners=runners,
+        work_dir=args.work_dir,
+        token=args.token,
+    )
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+
+
+if __name__ == "__main__":
+    main()
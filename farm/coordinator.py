@@ -0,0 +1,445 @@
+"""Coordinator that shards generation jobs across farm agents.
+
+Jobs are dealt round-robin into one queue per connected agent. An agent
+takes work from the front of its own queue and, once that is empty, steals
+from the back of the longest queue of another agent, so fast machines
+absorb the slack of slow ones. Agents that stop sending heartbeats or drop
+their connection are removed and their running and queued jobs go back to
+the pool; a job is failed after ``max_attempts`` tries. Results are streamed
+back over the agent connection into ``output_dir`` as ``<job id>.png`` or
+``<job id>.mp4``.
+
+Run with ``python -m farm.coordinator jobs.json --output-dir out`` where
+``jobs.json`` is a list of ``{"kind", "prompt", "neg_prompt", "params"}``
+objects (``params`` as in the HTTP API), then start agents with
+``python -m farm.agent --coordinator <host>:8766``.
+"""
+
+import asyncio
+import hmac
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+from api.jobs import DONE, FAILED, QUEUED, RUNNING, TERMINAL, build_params
+
+from .protocol import DEFAULT_PORT, ProtocolError, encode, read_message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+# Seconds without a message before an agent is considered dead
+HEARTBEAT_TIMEOUT = 10.0
+# Seconds a new connection may take to introduce itself
+HELLO_TIMEOUT = 10.0
+
+
+@dataclass
+class FarmJob:
+    """One job of the farm and where it is running."""
+
+    id: str
+    kind: str
+    prompt: str
+    neg_prompt: str
+    params: Dict[str, Any]
+    status: str = QUEUED
+    agent: Optional[str] = None
+    attempts: int = 0
+    progress: int = 0
+    error: Optional[str] = None
+    result_path: Optional[str] = None
+
+    def spec(self) -> Dict[str, Any]:
+        """Return the job as sent to agents."""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "prompt": self.prompt,
+            "neg_prompt": self.neg_prompt,
+            "params": self.params,
+        }
+
+
+@dataclass
+class _Agent:
+    name: str
+    kinds: List[str]
+    writer: asyncio.StreamWriter
+    last_seen: float = field(default_factory=time.monotonic)
+    # Jobs dealt to this agent; the owner pops the front, thieves the back
+    shard: Deque[FarmJob] = field(default_factory=deque)
+    running: Optional[FarmJob] = None
+    waiting: bool = False
+    # Result file being received
+    part: Optional[Any] = None
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(encode(message))
+
+
+class Coordinator:
+    """Shard jobs across agents and collect their results.
+
+    All methods must be called from the event loop the coordinator was
+    started on.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        token: Optional[str] = None,
+        heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+        max_attempts: int = 3,
+    ) -> None:
+        self.output_dir = output_dir
+        self.host = host
+        self.port = port
+        self.token = token
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self._jobs: Dict[str, FarmJob] = {}
+        self._agents: Dict[str, _Agent] = {}
+        # Jobs not dealt to any agent
+        self._pending: Deque[FarmJob] = deque()
+        self._counter = itertools.count(1)
+        self._deal = itertools.count()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._reaper: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._handlers: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Start listening; ``self.port`` is updated when 0 was requested."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._changed = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._reaper = asyncio.ensure_future(self._reap())
+        logger.info(f"Farm coordinator listening on {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        """Tell agents to shut down and stop listening."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for agent in list(self._agents.values()):
+            agent.send({"type": "shutdown"})
+            self._drop(agent, "coordinator closing")
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # Connections end once their sockets are closed
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    def submit(self, specs: Iterable[Dict[str, Any]]) -> List[FarmJob]:
+        """Queue jobs given as ``{"kind", "prompt", "neg_prompt", "params"}``.
+
+        Raises:
+            ValueError: If any job is invalid; nothing is queued then
+        """
+        jobs = []
+        for spec in specs:
+            kind = spec.get("kind", "image")
+            params = spec.get("params") or {}
+            # Reject bad jobs here rather than on every agent
+            build_params(kind, params)
+            jobs.append(
+                FarmJob(
+                    f"{next(self._counter):05d}",
+                    kind,
+                    spec.get("prompt", ""),
+                    spec.get("neg_prompt", ""),
+                    params,
+                )
+            )
+        for job in jobs:
+            self._jobs[job.id] = job
+            agents = [a for a in self._agents.values() if job.kind in a.kinds]
+            if agents:
+                agents[next(self._deal) % len(agents)].shard.append(job)
+            else:
+                self._pending.append(job)
+        logger.info(f"Queued {len(jobs)} farm job(s) for {len(self._agents)} agent(s)")
+        self._dispatch_waiting()
+        return jobs
+
+    def jobs(self) -> List[FarmJob]:
+        """Return all jobs in submission order."""
+        return list(self._jobs.values())
+
+    def agents(self) -> List[str]:
+        """Return the names of connected agents."""
+        return list(self._agents)
+
+    async def wait(self) -> List[FarmJob]:
+        """Wait until every submitted job is done or failed."""
+        while any(job.status not in TERMINAL for job in self._jobs.values()):
+            self._changed.clear()
+            await self._changed.wait()
+        return self.jobs()
+
+    # ---- Scheduling ----
+
+    @staticmethod
+    def _take(
+        jobs: Deque[FarmJob], agent: _Agent, from_back: bool = False
+    ) -> Optional[FarmJob]:
+        for job in reversed(jobs) if from_back else jobs:
+            if job.kind in agent.kinds:
+                jobs.remove(job)
+                return job
+        return None
+
+    def _next_job(self, agent: _Agent) -> Optional[FarmJob]:
+        job = self._take(agent.shard, agent) or self._take(self._pending, agent)
+        if job is not None:
+            return job
+        victims = sorted(
+            (other for other in self._agents.values() if other is not agent),
+            key=lambda other: len(other.shard),
+            reverse=True,
+        )
+        for victim in victims:
+            job = self._take(victim.shard, agent, from_back=True)
+            if job is not None:
+                logger.debug(f"{agent.name} stole job {job.id} from {victim.name}")
+                return job
+        return None
+
+    def _assign(self, agent: _Agent) -> bool:
+        job = self._next_job(agent)
+        if job is None:
+            agent.waiting = True
+            return False
+        agent.waiting = False
+        agent.running = job
+        job.status = RUNNING
+        job.agent = agent.name
+        job.attempts += 1
+        job.progress = 0
+        agent.send({"type": "job", "job": job.spec()})
+        return True
+
+    def _dispatch_waiting(self) -> None:
+        for agent in list(self._agents.values()):
+            if agent.waiting:
+                self._assign(agent)
+
+    def _requeue(self, job: FarmJob, error: str) -> None:
+        job.agent = None
+        if job.attempts >= self.max_attempts:
+            job.status = FAILED
+            job.error = error
+            logger.error(f"Farm job {job.id} failed: {error}")
+        else:
+            job.status = QUEUED
+            self._pending.appendleft(job)
+        self._changed.set()
+
+    def _drop(self, agent: _Agent, reason: str) -> None:
+        if self._agents.get(agent.name) is not agent:
+            return
+        del self._agents[agent.name]
+        logger.warning(f"Dropping farm agent {agent.name}: {reason}")
+        self._discard_part(agent)
+        agent.writer.close()
+        if agent.running is not None:
+            self._requeue(agent.running, f"Agent {agent.name} lost: {reason}")
+            agent.running = None
+        self._pending.extend(agent.shard)
+        agent.shard.clear()
+        self._dispatch_waiting()
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_timeout / 4)
+            deadline = time.monotonic() - self.heartbeat_timeout
+            for agent in list(self._agents.values()):
+                if agent.last_seen < deadline:
+                    self._drop(agent, "missed heartbeats")
+
+    # ---- Results ----
+
+    def _result_path(self, job: FarmJob) -> str:
+        suffix = ".mp4" if job.kind == "video" else ".png"
+        return os.path.join(self.output_dir, f"{job.id}{suffix}")
+
+    def _discard_part(self, agent: _Agent) -> None:
+        if agent.part is not None:
+            agent.part.close()
+            try:
+                os.remove(agent.part.name)
+            except OSError:
+                pass
+            agent.part = None
+
+    async def _receive_chunk(self, agent: _Agent, data: bytes) -> None:
+        if agent.part is None:
+            path = self._result_path(agent.running) + ".part"
+            agent.part = open(path, "wb")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, agent.part.write, data)
+
+    def _finish(self, agent: _Agent) -> None:
+        job = agent.running
+        path = self._result_path(job)
+        if agent.part is None:
+            raise ProtocolError(f"Job {job.id} finished without a result")
+        agent.part.close()
+        os.replace(agent.part.name, path)
+        agent.part = None
+        agent.running = None
+        job.status = DONE
+        job.progress = 100
+        job.result_path = path
+        logger.info(f"Farm job {job.id} done on {agent.name}")
+        self._changed.set()
+
+    # ---- Connections ----
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        agent = None
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            hello, _ = await asyncio.wait_for(read_message(reader), HELLO_TIMEOUT)
+            agent = self._register(hello, writer)
+            if agent is None:
+                return
+            while True:
+                message, payload = await read_message(reader)
+                if message is None:
+                    break
+                agent.last_seen = time.monotonic()
+                if self._agents.get(agent.name) is not agent:
+                    break
+                await self._on_message(agent, message, payload)
+        except (ProtocolError, asyncio.TimeoutError) as e:
+            logger.warning(f"Bad farm connection: {e or 'timed out'}")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if agent is not None:
+                self._drop(agent, "disconnected")
+            writer.close()
+            self._handlers.discard(task)
+
+    def _register(
+        self, hello: Optional[Dict[str, Any]], writer: asyncio.StreamWriter
+    ) -> Optional[_Agent]:
+        if hello is None or hello.get("type") != "hello":
+            raise ProtocolError("Expected hello")
+        token = str(hello.get("token") or "")
+        if self.token is not None and not hmac.compare_digest(token, self.token):
+            writer.write(encode({"type": "error", "error": "Invalid token"}))
+            return None
+        base = str(hello.get("agent") or "agent")
+        name = base
+        for n in itertools.count(2):
+            if name not in self._agents:
+                break
+            name = f"{base}-{n}"
+        kinds = [str(kind) for kind in hello.get("kinds") or ("image", "video")]
+        agent = _Agent(name, kinds, writer)
+        self._agents[name] = agent
+        agent.send(
+            {
+                "type": "welcome",
+                "agent": name,
+                "heartbeat": self.heartbeat_timeout / 4,
+            }
+        )
+        logger.info(
+            f"Farm agent {name} joined from {writer.get_extra_info('peername')}"
+        )
+        return agent
+
+    async def _on_message(
+        self, agent: _Agent, message: Dict[str, Any], payload: bytes
+    ) -> None:
+        kind = message["type"]
+        job = agent.running
+        if kind in ("chunk", "result", "failed") and (
+            job is None or message.get("job") != job.id
+        ):
+            raise ProtocolError(f"{kind} for a job {agent.name} is not running")
+        if kind == "heartbeat":
+            progress = message.get("progress")
+            if job is not None and isinstance(progress, int):
+                job.progress = progress
+        elif kind == "request":
+            if job is None:
+                self._assign(agent)
+        elif kind == "chunk":
+            await self._receive_chunk(agent, payload)
+        elif kind == "result":
+            self._finish(agent)
+        elif kind == "failed":
+            self._discard_part(agent)
+            agent.running = None
+            self._requeue(job, str(message.get("error") or "Unknown error"))
+            self._dispatch_waiting()
+        else:
+            raise ProtocolError(f"Unknown message type {kind!r}")
+
+
+async def run_jobs(
+    specs: List[Dict[str, Any]],
+    output_dir: str,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    token: Optional[str] = None,
+) -> List[FarmJob]:
+    """Serve ``specs`` to agents until all of them finish."""
+    coordinator = Coordinator(output_dir, host, port, token)
+    await coordinator.start()
+    coordinator.submit(specs)
+    try:
+        return await coordinator.wait()
+    finally:
+        await coordinator.close()
+
+
+def main():
+    """Run a job list on the farm from the command line."""
+    import argparse
+
+    from utils.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Coordinate a render farm")
+    parser.add_argument("jobs", help="JSON file with a list of jobs")
+    parser.add_argument("--output-dir", default="farm_output")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--token", default=os.environ.get("FARM_TOKEN"), help="Shared agent secret"
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    with open(args.jobs, encoding="utf-8") as fh:
+        specs = json.load(fh)
+    if args.host not in ("127.0.0.1", "localhost", "::1") and not args.token:
+        logger.warning(f"Binding to {args.host} without --token")
+    jobs = asyncio.run(
+        run_jobs(specs, args.output_dir, args.host, args.port, args.token)
+    )
+    for job in jobs:
+        outcome = job.result_path or job.error
+        print(f"{job.id}\t{job.status}\t{job.agent or '-'}\t{outcome}")
+    if any(job.status != DONE for job in jobs):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Wire format shared by the farm coordinator and its agents.
+
+Every message is one line of JSON. A message with a ``size`` field is
+followed by exactly that many raw bytes, which is how result files are
+streamed back in chunks without base64.
+
+Agent to coordinator::
+
+    {"type": "hello", "agent": name, "kinds": [...], "token": ...}
+    {"type": "request"}                       ready for the next job
+    {"type": "heartbeat", "job": id|null, "progress": pct}
+    {"type": "chunk", "job": id, "size": n}   followed by n result bytes
+    {"type": "result", "job": id}             the result is complete
+    {"type": "failed", "job": id, "error": msg}
+
+Coordinator to agent::
+
+    {"type": "welcome", "agent": name, "heartbeat": seconds}
+    {"type": "job", "job": {"id", "kind", "prompt", "neg_prompt", "params"}}
+    {"type": "error", "error": msg}           sent before closing
+    {"type": "shutdown"}
+"""
+
+import asyncio
+import json
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+DEFAULT_PORT = 8766
+# Seconds between agent heartbeats
+HEARTBEAT_INTERVAL = 2.0
+# Bytes per streamed result chunk, and the most a message may carry
+CHUNK_SIZE = 1 << 20
+MAX_PAYLOAD = 16 << 20
+
+Message = Dict[str, Any]
+
+
+class ProtocolError(Exception):
+    """Raised when a peer sends something that is not a valid message."""
+
+
+def encode(message: Message, payload: bytes = b"") -> bytes:
+    """Frame ``message`` and its optional payload for sending."""
+    if payload:
+        message = {**message, "size": len(payload)}
+    return json.dumps(message).encode() + b"\n" + payload
+
+
+def _decode(line: bytes) -> Tuple[Message, int]:
+    try:
+        message = json.loads(line)
+    except ValueError:
+        raise ProtocolError("Message is not JSON") from None
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise ProtocolError("Message has no type")
+    size = message.get("size", 0)
+    if not isinstance(size, int) or not 0 <= size <= MAX_PAYLOAD:
+        raise ProtocolError(f"Invalid payload size {size!r}")
+    return message, size
+
+
+async def read_message(
+    reader: asyncio.StreamReader,
+) -> Tuple[Optional[Message], bytes]:
+    """Read one message from an asyncio stream; ``(None, b"")`` at EOF."""
+    line = await reader.readline()
+    if not line:
+        return None, b""
+    message, size = _decode(line)
+    payload = await reader.readexactly(size) if size else b""
+    return message, payload
+
+
+def read_message_sync(stream: BinaryIO) -> Tuple[Optional[Message], bytes]:
+    """Blocking :func:`read_message` for a socket file."""
+    line = stream.readline()
+    if not line:
+        return None, b""
+    message, size = _decode(line)
+    payload = stream.read(size) if size else b""
+    if len(payload) != size:
+        return None, b""
+    return message, payload
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Compare eager and ``torch.compile`` image generation latency.
+
+The eager pipeline renders once to warm up and once to measure. The pipeline
+is then reloaded with compilation enabled: its first run includes tracing
+and kernel compilation (or loading the kernels from the on-disk cache), and
+the following runs show the steady-state speed. Run it twice to see how
+much of the compile overhead the cache removes; ``--cold`` empties the
+cache first.
+
+Example:
+    python scripts/compile_benchmark.py --model-path Models/FluxSchnell \\
+        --profile flux-schnell --steps 4 --runs 3
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Benchmark settings must not leak into the user's settings file
+os.environ.setdefault(
+    "FLUXWAN_SETTINGS_FILE", os.path.join(tempfile.mkdtemp(), "settings.toml")
+)
+
+import torch  # noqa: E402
+
+from utils.compilation import DEFAULT_CACHE_DIR, bucket_dimensions  # noqa: E402
+from utils.model_manager import ModelManager  # noqa: E402
+from utils.settings_manager import SettingsManager  # noqa: E402
+
+
+def render(args, compile_models: bool) -> float:
+    params = {
+        "model_path": args.model_path,
+        "profile": args.profile,
+        "device": args.device,
+        "compile": compile_models,
+    }
+    pipe = ModelManager.get_flux_pipeline(params)
+    width, height = bucket_dimensions(args.size, args.size)
+    start = time.perf_counter()
+    pipe(
+        prompt=args.prompt,
+        width=width,
+        height=height,
+        num_inference_steps=args.steps,
+        generator=torch.Generator(device="cpu").manual_seed(0),
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", required=True, help="Model directory")
+    parser.add_argument("--profile", default="flux", help="Model profile name")
+    parser.add_argument("--device", default="cpu", help="Device to run on")
+    parser.add_argument("--prompt", default="a lighthouse at dusk, oil painting")
+    parser.add_argument("--size", type=int, default=512, help="Image width/height")
+    parser.add_argument("--steps", type=int, default=4, help="Denoising steps")
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Measured runs after the first"
+    )
+    parser.add_argument("--mode", default="default", help="torch.compile mode")
+    parser.add_argument(
+        "--cache-dir", default=DEFAULT_CACHE_DIR, help="Compiled kernel cache"
+    )
+    parser.add_argument(
+        "--cold", action="store_true", help="Empty the kernel cache first"
+    )
+    args = parser.parse_args()
+
+    settings = SettingsManager()
+    settings.set("compile/cache_dir", args.cache_dir)
+    settings.set("compile/mode", args.mode)
+    if args.cold:
+        shutil.rmtree(args.cache_dir, ignore_errors=True)
+
+    render(args, compile_models=False)
+    eager = statistics.median(
+        render(args, compile_models=False) for _ in range(args.runs)
+    )
+    print(f"eager:          {eager:.2f}s per image")
+
+    ModelManager.clear_cache()
+    first = render(args, compile_models=True)
+    compiled = statistics.median(
+        render(args, compile_models=True) for _ in range(args.runs)
+    )
+    print(f"compiled first: {first:.2f}s (overhead {first - compiled:.2f}s)")
+    print(f"compiled:       {compiled:.2f}s per image ({eager / compiled:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Measure per-step CPU latency of the image pipeline under several settings.
+
+Each combination of precision, intra-op thread count and channels-last
+layout renders one image through ``ModelManager.get_flux_pipeline`` and
+records the time of every denoising step. The first step of each run is
+reported separately as warm-up.
+
+Example:
+    python scripts/cpu_benchmark.py --model-path Models/FluxSchnell \\
+        --profile flux-schnell --steps 4 --threads 8,16,32 --csv cpu.csv
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Benchmark settings must not leak into the user's settings file
+os.environ.setdefault(
+    "FLUXWAN_SETTINGS_FILE", os.path.join(tempfile.mkdtemp(), "settings.toml")
+)
+
+import torch  # noqa: E402
+
+from utils.cpu_performance import detect_cpu_features  # noqa: E402
+from utils.model_manager import ModelManager  # noqa: E402
+from utils.settings_manager import SettingsManager  # noqa: E402
+
+
+def run_once(args, precision: str, threads: int, channels_last: bool) -> dict:
+    settings = SettingsManager()
+    settings.set("cpu/precision", precision)
+    settings.set("cpu/threads", threads)
+    settings.set("cpu/channels_last", channels_last)
+    params = {
+        "model_path": args.model_path,
+        "profile": args.profile,
+        "device": "cpu",
+    }
+    pipe = ModelManager.get_flux_pipeline(params)
+
+    stamps = [time.perf_counter()]
+
+    def _on_step_end(_pipe, step, timestep, callback_kwargs):
+        stamps.append(time.perf_counter())
+        return callback_kwargs
+
+    pipe(
+        prompt=args.prompt,
+        width=args.size,
+        height=args.size,
+        num_inference_steps=args.steps,
+        generator=torch.Generator(device="cpu").manual_seed(0),
+        callback_on_step_end=_on_step_end,
+    )
+    end = time.perf_counter()
+    steps = [b - a for a, b in zip(stamps, stamps[1:])]
+    steady = steps[1:] or steps
+    return {
+        "precision": precision,
+        "threads": threads,
+        "channels_last": channels_last,
+        "first_step_s": round(steps[0], 4),
+        "median_step_s": round(statistics.median(steady), 4),
+        "mean_step_s": round(statistics.mean(steady), 4),
+        "decode_s": round(end - stamps[-1], 4),
+        "total_s": round(end - stamps[0], 4),
+    }
+
+
+def main() -> None:
+    features = detect_cpu_features()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", required=True, help="Model directory")
+    parser.add_argument("--profile", default="flux", help="Model profile name")
+    parser.add_argument("--prompt", default="a lighthouse at dusk, oil painting")
+    parser.add_argument("--size", type=int, default=512, help="Image width/height")
+    parser.add_argument("--steps", type=int, default=4, help="Denoising steps")
+    parser.add_argument(
+        "--precisions",
+        default="fp32,bf16" if features.fast_bf16 else "fp32",
+        help="Comma-separated precisions to try",
+    )
+    parser.add_argument(
+        "--threads",
+        default=f"{features.physical_cores},{features.logical_cores}",
+        help="Comma-separated intra-op thread counts to try",
+    )
+    parser.add_argument(
+        "--channels-last",
+        default="on,off",
+        help="Comma-separated channels-last settings to try (on/off)",
+    )
+    parser.add_argument("--csv", help="Also write the results to this CSV file")
+    args = parser.parse_args()
+
+    print(f"CPU: {features.summary()}")
+    rows = []
+    grid = itertools.product(
+        args.precisions.split(","),
+        sorted({int(t) for t in args.threads.split(",")}),
+        [value.strip() == "on" for value in args.channels_last.split(",")],
+    )
+    for precision, threads, channels_last in grid:
+        # Precision and layout are fixed at load time
+        ModelManager.clear_cache()
+        row = run_once(args, precision, threads, channels_last)
+        rows.append(row)
+        print(
+            f"{precision:>5} threads={threads:<3} channels_last={channels_last!s:<5} "
+            f"first={row['first_step_s']:.3f}s median={row['median_step_s']:.3f}s "
+            f"decode={row['decode_s']:.3f}s"
+        )
+
+    if args.csv and rows:
+        with open(args.csv, "w", newline="") as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Compare native Wan2.2 frames against interpolated keyframes.
+
+Renders the same prompt twice: once with every frame diffused, and once with
+``1/factor`` of the frames diffused and the rest synthesised by
+``utils.frame_interpolation``. Diffusion and decode/interpolate/encode time
+are reported separately. Wan generates ``4n + 1`` frames, so the default of
+65 frames at 4x diffuses 17 keyframes.
+
+Example:
+    python scripts/interpolation_benchmark.py --frames 65 --factor 4 --steps 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Benchmark settings must not leak into the user's settings file
+os.environ.setdefault(
+    "FLUXWAN_SETTINGS_FILE", os.path.join(tempfile.mkdtemp(), "settings.toml")
+)
+
+from utils.frame_interpolation import (  # noqa: E402
+    interpolate_frames,
+    interpolated_count,
+)
+from utils.model_manager import ModelManager  # noqa: E402
+from workers.params import VideoParams  # noqa: E402
+from workers.video import (  # noqa: E402
+    decode_frames,
+    render_video,
+    save_video,
+    wan_dimensions,
+    wan_keyframes,
+)
+
+
+def run(pipe, args, frames: int, factor: int, out: Path) -> dict:
+    params = VideoParams(
+        width=args.size,
+        height=args.size,
+        frames=frames,
+        steps=args.steps,
+        fps=args.fps,
+    )
+    start = time.perf_counter()
+    latents = render_video(pipe, args.prompt, "", params, seed=0)
+    diffused = time.perf_counter()
+    save_video(
+        interpolate_frames(decode_frames(pipe, latents), factor, args.method),
+        str(out),
+        args.fps,
+    )
+    end = time.perf_counter()
+    keyframes = wan_dimensions(params)[2]
+    return {
+        "diffused_frames": keyframes,
+        "output_frames": interpolated_count(keyframes, factor),
+        "diffusion_s": diffused - start,
+        "post_s": end - diffused,
+        "total_s": end - start,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", help="Wan2.2 diffusers model directory")
+    parser.add_argument("--device", help="Device to run on (default: settings)")
+    parser.add_argument("--precision", default="bf16", help="Transformer precision")
+    parser.add_argument("--prompt", default="a paper boat drifting down a stream")
+    parser.add_argument("--size", type=int, default=480, help="Video width/height")
+    parser.add_argument("--frames", type=int, default=65, help="Output frame count")
+    parser.add_argument("--factor", type=int, default=4, help="Interpolation factor")
+    parser.add_argument("--method", default="flow", help="flow or blend")
+    parser.add_argument("--steps", type=int, default=20, help="Denoising steps")
+    parser.add_argument("--fps", type=int, default=24, help="Output frame rate")
+    parser.add_argument("--out-dir", default=".", help="Where to write both videos")
+    args = parser.parse_args()
+
+    params = {"precision": args.precision}
+    if args.model_path:
+        params["model_path"] = args.model_path
+    if args.device:
+        params["device"] = args.device
+    pipe = ModelManager.get_wan_pipeline(params)
+
+    # Warm up kernels and caches so neither run pays first-call costs
+    warmup = VideoParams(width=args.size, height=args.size, frames=5, steps=1)
+    render_video(pipe, args.prompt, "", warmup, seed=0)
+
+    out_dir = Path(args.out_dir)
+    native = run(pipe, args, args.frames, 1, out_dir / "native.mp4")
+    keyframes = wan_keyframes(args.frames, args.factor)
+    interpolated = run(
+        pipe, args, keyframes, args.factor, out_dir / f"interpolated_x{args.factor}.mp4"
+    )
+
+    for name, row in (("native", native), (f"x{args.factor}", interpolated)):
+        print(
+            f"{name:>8}: {row['diffused_frames']:>3} diffused -> "
+            f"{row['output_frames']:>3} frames  diffusion={row['diffusion_s']:.1f}s "
+            f"post={row['post_s']:.1f}s total={row['total_s']:.1f}s"
+        )
+    print(f"speedup: {native['total_s'] / interpolated['total_s']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
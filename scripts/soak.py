@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Soak test: run many image jobs through the real controller and worker.
+
+A tiny stand-in pipeline replaces Flux inside :class:`ModelManager`, so the
+run exercises ``MainController.start_image_generation``, ``ImageWorker``,
+the execution-plan handling in ``ModelManager.get_flux_pipeline`` and the
+QImage/QPixmap display path without any model weights. Memory is sampled
+between jobs and the script exits non-zero on sustained growth.
+
+Example:
+    QT_QPA_PLATFORM=offscreen python scripts/soak.py --jobs 500
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import weakref
+from dataclasses import asdict
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Keep the soak run away from the user's real settings
+os.environ.setdefault(
+    "FLUXWAN_SETTINGS_FILE", os.path.join(tempfile.mkdtemp(), "settings.toml")
+)
+
+from PIL import Image  # noqa: E402
+
+from utils.leak_detector import LeakDetector  # noqa: E402
+from utils.model_manager import ModelManager  # noqa: E402
+
+logger = logging.getLogger("soak")
+
+
+class TinyPipeline:
+    """Stand-in for a diffusers pipeline that renders a flat colour."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.vae = None
+
+    def to(self, device):
+        return self
+
+    def __call__(self, width, height, num_inference_steps, **kwargs):
+        self.calls += 1
+        callback = kwargs.get("callback_on_step_end")
+        for step in range(num_inference_steps):
+            if callback:
+                callback(self, step, None, {})
+        colour = (self.calls * 7 % 256, 64, 128)
+        return SimpleNamespace(images=[Image.new("RGB", (width, height), colour)])
+
+
+def install_pipeline(params: dict) -> weakref.ref:
+    """Put a fresh stand-in pipeline into the ModelManager cache."""
+    pipe = TinyPipeline()
+    profile, model_path = ModelManager._resolve_source(params)
+    ModelManager._flux_pipe = pipe
+    ModelManager._flux_source = (profile.name, model_path)
+    ModelManager._flux_device = params["device"]
+    ModelManager._flux_plan = None
+    return weakref.ref(pipe)
+
+
+def run(args) -> int:
+    from controllers.main_controller import MainController
+    from ui import gallery
+    from utils.settings_manager import SettingsManager
+
+    # The bounded caches only stop growing once they are full. Size the
+    # thumbnail cache so it fills well within the warm-up; at the default 64 MB
+    # it would take thousands of results
+    gallery.CACHE_BYTES = args.warmup // 2 * 4 * gallery.THUMB_SIZE**2
+    # Every result is saved as a PNG; keep them out of the working directory
+    settings = SettingsManager()
+    settings.set_output_dir(tempfile.mkdtemp(prefix="soak_"))
+    settings.flush()
+
+    controller = MainController()
+    ui = controller.ui
+    ui.prompt_edit.setPlainText("soak test")
+    ui.width_spin.setValue(args.size)
+    ui.height_spin.setValue(args.size)
+    ui.steps_spin.setValue(args.steps)
+    params = asdict(controller._collect_image_params())
+    install_pipeline(params)
+
+    detector = LeakDetector(warmup=args.warmup)
+    detector.start()
+    errors = []
+    # Record worker errors instead of showing a message box
+    controller._handle_error = errors.append
+    try:
+        for i in range(args.jobs):
+            controller.start_image_generation()
+            controller.image_worker.wait()
+            # Deliver the queued progress/result signals to the GUI thread
+            controller.app.processEvents()
+
+            if args.clear_cache_every and (i + 1) % args.clear_cache_every == 0:
+                old = weakref.ref(ModelManager._flux_pipe)
+                ModelManager.clear_cache()
+                gc.collect()
+                if old() is not None:
+                    errors.append(
+                        f"Pipeline still referenced after clear_cache (job {i})"
+                    )
+                install_pipeline(params)
+
+            if i % args.sample_every == 0 or i == args.jobs - 1:
+                sample = detector.sample(i)
+                logger.info(
+                    f"job {i}: rss={sample.rss / 2**20:.1f}MiB "
+                    f"traced={sample.traced / 2**20:.2f}MiB objects={sample.objects}"
+                )
+        report = detector.analyze()
+    finally:
+        detector.stop()
+        controller.window.close()
+
+    print(report.summary())
+    if args.report:
+        Path(args.report).write_text(
+            json.dumps(
+                {
+                    "samples": [asdict(s) for s in detector.samples],
+                    "slopes": report.slopes,
+                    "leaking": report.leaking,
+                    "errors": errors,
+                },
+                indent=2,
+            )
+        )
+    if errors:
+        print(f"{len(errors)} job errors, first: {errors[0]}")
+    return 1 if report.leaking or errors else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=300, help="Number of jobs")
+    parser.add_argument("--size", type=int, default=256, help="Image width/height")
+    parser.add_argument("--steps", type=int, default=4, help="Steps per job")
+    parser.add_argument("--warmup", type=int, default=30, help="Jobs to ignore")
+    parser.add_argument(
+        "--sample-every", type=int, default=5, help="Jobs between memory samples"
+    )
+    parser.add_argument(
+        "--clear-cache-every",
+        type=int,
+        default=0,
+        help="Call ModelManager.clear_cache every N jobs and check it frees the pipe",
+    )
+    parser.add_argument("--report", help="Write samples and results as JSON here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -96,16 +96,38 @@ def cleanup_singletons():
 
     ModelManager._flux_pipe = None
     ModelManager._flux_device = None
+    ModelManager._flux_source = None
+    ModelManager._flux_plan = None
+    ModelManager._flux_scheduler = None
+    ModelManager._flux_base_scheduler = None
     ModelManager._settings_manager = None
     ModelManager._model_downloader = None
+    ModelManager._components = {}
+    ModelManager._flux_lora = None
+    ModelManager._flux_compiled = False
+    ModelManager._wan_pipe = None
+    ModelManager._wan_source = None
+    # Some test modules replace ModelManager with a stub without the cache
+    lora_cache = getattr(ModelManager, "_lora_cache", None)
+    if lora_cache is not None:
+        lora_cache.clear()
 
     yield
 
     # Clean up after test
     ModelManager._flux_pipe = None
     ModelManager._flux_device = None
+    ModelManager._flux_source = None
+    ModelManager._flux_plan = None
+    ModelManager._flux_scheduler = None
+    ModelManager._flux_base_scheduler = None
     ModelManager._settings_manager = None
     ModelManager._model_downloader = None
+    ModelManager._components = {}
+    ModelManager._flux_lora = None
+    ModelManager._flux_compiled = False
+    ModelManager._wan_pipe = None
+    ModelManager._wan_source = None
 
 
 @pytest.fixture
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import pathlib
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from api.jobs import JobManager, build_params  # noqa: E402
+from api.server import ApiServer  # noqa: E402
+from utils import tracing  # noqa: E402
+from workers.params import ImageParams, VideoParams  # noqa: E402
+
+
+def fake_image(job, progress, should_stop):
+    for pct in (25, 50, 100):
+        progress(pct)
+    with open(job.output_path, "wb") as fh:
+        fh.write(b"png-bytes")
+    return job.output_path
+
+
+def make_blocking(started):
+    def run(job, progress, should_stop):
+        started.set()
+        while not should_stop():
+            threading.Event().wait(0.01)
+        return None
+
+    return run
+
+
+async def request(port, method, path, body=None, content_type="application/json"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = b"" if body is None else json.dumps(body).encode()
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+    if body is not None:
+        head += f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+    writer.write(head.encode() + b"\r\n" + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, head.decode(), payload
+
+
+def sse_events(payload):
+    events = []
+    for block in payload.decode().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def run_server(tmp_path, runners, scenario):
+    manager = JobManager(str(tmp_path), runners)
+
+    async def main():
+        server = ApiServer(manager, port=0)
+        await server.start()
+        manager.start()
+        try:
+            return await asyncio.wait_for(scenario(server.port, manager), 10)
+        finally:
+            await server.close()
+
+    try:
+        return asyncio.run(main())
+    finally:
+        manager.shutdown(timeout=5)
+
+
+def test_build_params_defaults_and_validation():
+    image = build_params("image", {"seed": 7})
+    assert isinstance(image, ImageParams)
+    assert (image.width, image.height, image.seed) == (512, 512, 7)
+    assert image.steps > 0
+
+    video = build_params("video", {"frames": 32})
+    assert isinstance(video, VideoParams)
+    assert (video.width, video.frames, video.steps) == (480, 32, 50)
+
+    with pytest.raises(ValueError):
+        build_params("audio", {})
+    with pytest.raises(ValueError):
+        build_params("video", {"output_path": "/etc/passwd"})
+    with pytest.raises(ValueError):
+        build_params("image", {"width": "wide"})
+
+
+def test_job_streams_progress_and_serves_result(tmp_path):
+    async def scenario(port, manager):
+        status, head, payload = await request(
+            port, "POST", "/jobs", {"prompt": "a cat", "params": {"seed": 1}}
+        )
+        assert status == 202
+        job = json.loads(payload)
+        assert f"Location: /jobs/{job['id']}" in head
+
+        _, _, stream = await request(port, "GET", f"/jobs/{job['id']}/events")
+        events = sse_events(stream)
+        assert events[-1][0] == "status"
+        assert events[-1][1]["status"] == "done"
+        assert events[-1][1]["result"] == f"/jobs/{job['id']}/result"
+
+        status, head, body = await request(port, "GET", f"/jobs/{job['id']}/result")
+        assert status == 200
+        assert "Content-Type: image/png" in head
+        assert body == b"png-bytes"
+
+        status, _, payload = await request(port, "GET", "/jobs")
+        assert [j["id"] for j in json.loads(payload)["jobs"]] == [job["id"]]
+
+    run_server(tmp_path, {"image": fake_image}, scenario)
+
+
+def test_cancel_running_job(tmp_path):
+    started = threading.Event()
+
+    async def scenario(port, manager):
+        _, _, payload = await request(port, "POST", "/jobs", {"prompt": "slow"})
+        job_id = json.loads(payload)["id"]
+        loop = asyncio.get_running_loop()
+        assert await loop.run_in_executor(None, started.wait, 5)
+
+        status, _, _ = await request(port, "GET", f"/jobs/{job_id}/result")
+        assert status == 409
+        events = asyncio.ensure_future(request(port, "GET", f"/jobs/{job_id}/events"))
+        status, _, _ = await request(port, "DELETE", f"/jobs/{job_id}")
+        assert status == 200
+        _, _, stream = await events
+        assert sse_events(stream)[-1][1]["status"] == "cancelled"
+
+    run_server(tmp_path, {"image": make_blocking(started)}, scenario)
+
+
+def test_rejects_bad_requests(tmp_path):
+    async def scenario(port, manager):
+        status, _, payload = await request(
+            port, "POST", "/jobs", {"kind": "image", "params": {"bogus": 1}}
+        )
+        assert status == 400
+        assert "bogus" in json.loads(payload)["error"]
+        status, _, _ = await request(
+            port, "POST", "/jobs", {"prompt": "x"}, content_type="text/plain"
+        )
+        assert status == 415
+        status, _, _ = await request(
+            port, "POST", "/jobs", {"kind": "video", "profile": 2}
+        )
+        assert status == 400
+        status, _, _ = await request(port, "POST", "/jobs", {"profile": "all"})
+        assert status == 400
+        status, _, _ = await request(port, "GET", "/jobs/missing")
+        assert status == 404
+        status, _, _ = await request(port, "PUT", "/jobs")
+        assert status == 405
+        assert manager.jobs() == []
+
+    run_server(tmp_path, {"image": fake_image}, scenario)
+
+
+def test_job_trace_is_served(tmp_path):
+    tracing.configure(True)
+
+    async def scenario(port, manager):
+        _, _, payload = await request(port, "POST", "/jobs", {"prompt": "a cat"})
+        job_id = json.loads(payload)["id"]
+        await request(port, "GET", f"/jobs/{job_id}/events")
+        _, _, payload = await request(port, "GET", f"/jobs/{job_id}")
+        assert json.loads(payload)["trace"] == f"/jobs/{job_id}/trace"
+        status, _, body = await request(port, "GET", f"/jobs/{job_id}/trace")
+        assert status == 200
+        events = json.loads(body)["traceEvents"]
+        assert "image_job" in [event["name"] for event in events]
+
+    try:
+        run_server(tmp_path, {"image": fake_image}, scenario)
+    finally:
+        tracing.configure(False)
+
+
+def test_metrics_endpoint_counts_jobs(tmp_path):
+    from utils import metrics
+
+    async def scenario(port, manager):
+        before = metrics.JOBS.value(kind="image", status="done")
+        _, _, payload = await request(port, "POST", "/jobs", {"prompt": "a cat"})
+        job_id = json.loads(payload)["id"]
+        await request(port, "GET", f"/jobs/{job_id}/events")
+
+        status, head, body = await request(port, "GET", "/metrics")
+        assert status == 200
+        assert "Content-Type: text/plain" in head
+        text = body.decode()
+        assert "# TYPE fluxwan_job_duration_seconds histogram" in text
+        assert 'fluxwan_queue_wait_seconds_count{kind="image"}' in text
+        assert metrics.JOBS.value(kind="image", status="done") == before + 1
+
+    run_server(tmp_path, {"image": fake_image}, scenario)
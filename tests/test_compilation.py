@@ -0,0 +1,81 @@
+import os
+import pathlib
+import sys
+import types
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import compilation  # noqa: E402
+
+
+def test_bucket_dimensions_snaps_to_grid():
+    assert compilation.bucket_dimensions(512, 768) == (512, 768)
+    assert compilation.bucket_dimensions(500, 700) == (512, 704)
+    assert compilation.bucket_dimensions(10, 1000) == (64, 1024)
+
+
+class FakeModule:
+    def __init__(self):
+        self.compiled = None
+
+    def compile(self, **kwargs):
+        self.compiled = kwargs
+
+
+def install_fake_torch(monkeypatch, module_compile=True):
+    torch = types.ModuleType("torch")
+    torch.nn = types.SimpleNamespace(Module=FakeModule if module_compile else object)
+    dynamo = types.ModuleType("torch._dynamo")
+    dynamo.config = types.SimpleNamespace(cache_size_limit=8)
+    inductor = types.ModuleType("torch._inductor")
+    inductor_config = types.ModuleType("torch._inductor.config")
+    inductor_config.fx_graph_cache = False
+    inductor.config = inductor_config
+    torch._dynamo = dynamo
+    torch._inductor = inductor
+    for name, module in (
+        ("torch", torch),
+        ("torch._dynamo", dynamo),
+        ("torch._inductor", inductor),
+        ("torch._inductor.config", inductor_config),
+    ):
+        monkeypatch.setitem(sys.modules, name, module)
+    for var in (
+        "TORCHINDUCTOR_CACHE_DIR",
+        "TORCHINDUCTOR_FX_GRAPH_CACHE",
+        "TORCHINDUCTOR_AUTOGRAD_CACHE",
+    ):
+        monkeypatch.delenv(var, raising=False)
+    return torch
+
+
+def test_compile_pipeline_compiles_denoiser_and_decoder(monkeypatch, tmp_path):
+    torch = install_fake_torch(monkeypatch)
+    pipe = types.SimpleNamespace(
+        transformer=FakeModule(), vae=types.SimpleNamespace(decoder=FakeModule())
+    )
+    cache = tmp_path / "compile"
+
+    assert compilation.compile_pipeline(pipe, str(cache), mode="max-autotune")
+    expected = {"mode": "max-autotune", "dynamic": False}
+    assert pipe.transformer.compiled == expected
+    assert pipe.vae.decoder.compiled == expected
+    assert cache.is_dir()
+    assert os.environ["TORCHINDUCTOR_CACHE_DIR"] == str(cache)
+    assert torch._inductor.config.fx_graph_cache is True
+    assert torch._dynamo.config.cache_size_limit == compilation.RECOMPILE_LIMIT
+
+
+def test_compile_pipeline_falls_back_to_unet(monkeypatch, tmp_path):
+    install_fake_torch(monkeypatch)
+    pipe = types.SimpleNamespace(unet=FakeModule())
+    assert compilation.compile_pipeline(pipe, str(tmp_path))
+    assert pipe.unet.compiled["dynamic"] is False
+
+
+def test_compile_pipeline_requires_module_compile(monkeypatch, tmp_path):
+    install_fake_torch(monkeypatch, module_compile=False)
+    pipe = types.SimpleNamespace(transformer=FakeModule())
+    assert not compilation.compile_pipeline(pipe, str(tmp_path / "c"))
+    assert pipe.transformer.compiled is None
+    assert not (tmp_path / "c").exists()
@@ -0,0 +1,79 @@
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import cpu_performance  # noqa: E402
+
+CPUINFO = """\
+processor\t: 0
+physical id\t: 0
+core id\t\t: 0
+flags\t\t: fpu sse2 avx2 avx512f avx512_bf16 amx_bf16 amx_tile
+
+processor\t: 1
+physical id\t: 0
+core id\t\t: 0
+flags\t\t: fpu sse2 avx2 avx512f avx512_bf16 amx_bf16 amx_tile
+
+processor\t: 2
+physical id\t: 0
+core id\t\t: 1
+flags\t\t: fpu sse2 avx2 avx512f avx512_bf16 amx_bf16 amx_tile
+
+processor\t: 3
+physical id\t: 0
+core id\t\t: 1
+flags\t\t: fpu sse2 avx2 avx512f avx512_bf16 amx_bf16 amx_tile
+"""
+
+
+class DummySettings:
+    def __init__(self, **values):
+        self.store = {f"cpu/{k}": v for k, v in values.items()}
+
+    def get(self, key, default=None):
+        return self.store.get(key, default)
+
+
+def test_parse_cpuinfo_counts_physical_cores_and_flags():
+    features = cpu_performance.parse_cpuinfo(CPUINFO, logical_cores=4)
+    assert (features.physical_cores, features.logical_cores) == (2, 4)
+    assert features.amx_bf16 and features.fast_bf16
+    assert "AMX-BF16" in features.summary()
+
+
+def test_auto_precision_follows_isa():
+    amx = cpu_performance.parse_cpuinfo(CPUINFO, 4)
+    plain = cpu_performance.CpuFeatures(frozenset({"avx2"}), 8, 16)
+    assert cpu_performance.cpu_settings(DummySettings(), amx).precision == "bfloat16"
+    assert cpu_performance.cpu_settings(DummySettings(), plain).precision == "float32"
+    forced = cpu_performance.cpu_settings(DummySettings(precision="fp32"), amx)
+    assert forced.precision == "float32"
+
+
+def test_threads_default_to_physical_cores_minus_reserve():
+    features = cpu_performance.CpuFeatures(frozenset(), 16, 32)
+    settings = cpu_performance.cpu_settings(DummySettings(), features)
+    assert (settings.threads, settings.interop_threads) == (15, 1)
+    settings = cpu_performance.cpu_settings(
+        DummySettings(threads="24", reserve_cores=0, channels_last="false"), features
+    )
+    assert (settings.threads, settings.reserve_cores) == (24, 0)
+    assert not settings.channels_last
+
+
+def test_pin_current_thread_skips_reserved_cpus(monkeypatch):
+    pinned = []
+    monkeypatch.setattr(cpu_performance, "_available_cpus", lambda: (0, 1, 2, 3))
+    monkeypatch.setattr(
+        cpu_performance.os,
+        "sched_setaffinity",
+        lambda pid, cpus: pinned.append(tuple(cpus)),
+        raising=False,
+    )
+    assert cpu_performance.pin_current_thread(1)
+    # Repeated calls use the process-wide set, not the already narrowed one
+    assert cpu_performance.pin_current_thread(1)
+    assert pinned == [(1, 2, 3), (1, 2, 3)]
+    assert not cpu_performance.pin_current_thread(4)
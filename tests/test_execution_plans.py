@@ -0,0 +1,122 @@
+import importlib
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+execution_plans = importlib.import_module("utils.execution_plans")
+
+
+class DummyOOM(RuntimeError):
+    pass
+
+
+class DummySettings:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key, default=None):
+        return self.store.get(key, default)
+
+    def set(self, key, value):
+        self.store[key] = value
+
+
+@pytest.fixture(autouse=True)
+def plan_memory(monkeypatch):
+    monkeypatch.setattr(execution_plans.PlanMemory, "_plans", {})
+    monkeypatch.setattr(
+        execution_plans.PlanMemory, "_settings_manager", DummySettings()
+    )
+    # Whichever torch another test module installed, nothing is really freed
+    monkeypatch.setattr(execution_plans, "free_memory", lambda: None)
+
+
+def _fails_until(plan_name):
+    attempts = []
+
+    def run(plan):
+        attempts.append(plan.name)
+        if plan.name != plan_name:
+            raise DummyOOM("CUDA out of memory. Tried to allocate 2.00 GiB")
+        return "image"
+
+    return run, attempts
+
+
+def test_retries_down_the_ladder_and_remembers_plan():
+    run, attempts = _fails_until("sequential_offload")
+    key = execution_plans.PlanMemory.key("flux", "/models/flux", 1024, 1024)
+    assert execution_plans.run_with_oom_recovery(run, key) == "image"
+    assert attempts == [
+        "default",
+        "smaller_batch",
+        "vae_tiling",
+        "sequential_offload",
+    ]
+    settings = execution_plans.PlanMemory._settings_manager
+    assert settings.store == {f"execution_plans/{key}": "sequential_offload"}
+
+    # The next job of the same shape starts on the plan that worked
+    attempts.clear()
+    execution_plans.PlanMemory._plans = {}
+    execution_plans.run_with_oom_recovery(run, key)
+    assert attempts == ["sequential_offload"]
+
+    # Other resolutions are unaffected
+    attempts.clear()
+    other = execution_plans.PlanMemory.key("flux", "/models/flux", 512, 512)
+    execution_plans.run_with_oom_recovery(
+        run, other, skip=lambda p: p.name == "smaller_batch"
+    )
+    assert attempts == ["default", "vae_tiling", "sequential_offload"]
+
+
+def test_keys_differ_by_profile_and_weights():
+    key = execution_plans.PlanMemory.key
+    assert key("flux", None, 512, 512) != key("sd15", None, 512, 512)
+    assert key("flux", None, 512, 512) != key("flux", "/models/flux", 512, 512)
+    assert key("flux", None, 512, 512) == key("flux", "", 512, 512)
+
+
+def test_cpu_fallback_is_not_persisted():
+    run, attempts = _fails_until("cpu")
+    execution_plans.run_with_oom_recovery(run, "k")
+    assert attempts[-1] == "cpu"
+    assert execution_plans.PlanMemory._settings_manager.store == {}
+
+    # Later jobs this session stay on the CPU, but a restart tries the GPU again
+    attempts.clear()
+    execution_plans.run_with_oom_recovery(run, "k")
+    assert attempts == ["cpu"]
+    execution_plans.PlanMemory._plans = {}
+    assert execution_plans.PlanMemory.get("k").name == "default"
+
+
+def test_memory_is_freed_between_attempts(monkeypatch):
+    freed = []
+    monkeypatch.setattr(execution_plans, "free_memory", lambda: freed.append(1))
+    run, _ = _fails_until("vae_tiling")
+    execution_plans.run_with_oom_recovery(run, "k")
+    assert len(freed) == 2
+
+
+def test_last_oom_is_raised_when_cpu_fails_too():
+    run, attempts = _fails_until("never")
+    with pytest.raises(DummyOOM):
+        execution_plans.run_with_oom_recovery(run, "k")
+    assert attempts[-1] == "cpu"
+
+
+def test_other_errors_are_not_retried():
+    attempts = []
+
+    def run(plan):
+        attempts.append(plan.name)
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        execution_plans.run_with_oom_recovery(run, "k")
+    assert attempts == ["default"]
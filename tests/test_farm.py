@@ -0,0 +1,154 @@
+import asyncio
+import pathlib
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from farm.agent import Agent, stand_in_runner  # noqa: E402
+from farm.coordinator import Coordinator  # noqa: E402
+
+
+def bytes_runner(delay):
+    def run(job, progress, should_stop):
+        time.sleep(delay)
+        progress(100)
+        with open(job.output_path, "wb") as fh:
+            fh.write(job.prompt.encode() * 1000)
+        return job.output_path
+
+    return run
+
+
+def hanging_runner(job, progress, should_stop):
+    while not should_stop():
+        time.sleep(0.01)
+    return None
+
+
+def failing_runner(job, progress, should_stop):
+    raise RuntimeError("boom")
+
+
+async def run_farm(tmp_path, agents, specs, timeout=0.5, late_agents=()):
+    coordinator = Coordinator(str(tmp_path / "out"), port=0, heartbeat_timeout=timeout)
+    await coordinator.start()
+    threads = []
+
+    def launch(agent):
+        agent.port = coordinator.port
+        agent.work_dir = str(tmp_path)
+        thread = threading.Thread(target=agent.run, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        for agent in agents:
+            launch(agent)
+        while len(coordinator.agents()) < len(agents):
+            await asyncio.sleep(0.01)
+        coordinator.submit(specs)
+        for agent in late_agents:
+            launch(agent)
+        return await asyncio.wait_for(coordinator.wait(), 20)
+    finally:
+        for agent in list(agents) + list(late_agents):
+            agent.stop()
+        await coordinator.close()
+        for thread in threads:
+            thread.join(5)
+
+
+def specs(count):
+    return [{"prompt": f"p{i}", "params": {"seed": i}} for i in range(count)]
+
+
+def test_jobs_are_sharded_and_stolen(tmp_path):
+    slow = Agent("127.0.0.1", name="slow", runners={"image": bytes_runner(0.2)})
+    fast = Agent("127.0.0.1", name="fast", runners={"image": bytes_runner(0.01)})
+    late = Agent("127.0.0.1", name="late", runners={"image": bytes_runner(0.01)})
+    jobs = asyncio.run(run_farm(tmp_path, [slow, fast], specs(12), late_agents=[late]))
+
+    assert [job.status for job in jobs] == ["done"] * 12
+    for i, job in enumerate(jobs):
+        assert pathlib.Path(job.result_path).read_bytes() == f"p{i}".encode() * 1000
+    by_agent = {
+        name: sum(job.agent == name for job in jobs)
+        for name in ("slow", "fast", "late")
+    }
+    # Half of the jobs were dealt to the slow agent; the others took most
+    assert by_agent["fast"] + by_agent["late"] > by_agent["slow"]
+    assert by_agent["late"] > 0
+    assert not list((tmp_path / "out").glob("*.part"))
+
+
+def test_jobs_of_dead_agent_are_requeued(tmp_path):
+    # Never heartbeats while its job hangs, so the coordinator drops it
+    dead = Agent(
+        "127.0.0.1", name="dead", runners={"image": hanging_runner}, heartbeat=60
+    )
+    alive = Agent("127.0.0.1", name="alive", runners={"image": bytes_runner(0.01)})
+    jobs = asyncio.run(run_farm(tmp_path, [dead, alive], specs(4), timeout=0.4))
+
+    assert [job.status for job in jobs] == ["done"] * 4
+    assert {job.agent for job in jobs} == {"alive"}
+    assert max(job.attempts for job in jobs) == 2
+
+
+def test_failing_job_gives_up_after_max_attempts(tmp_path, monkeypatch):
+    errors = types.ModuleType("utils.errors")
+    errors.parse_error = lambda exc: f"Runtime error: {exc}"
+    monkeypatch.setitem(sys.modules, "utils.errors", errors)
+    agents = [
+        Agent("127.0.0.1", name=f"a{i}", runners={"image": failing_runner})
+        for i in range(2)
+    ]
+    jobs = asyncio.run(run_farm(tmp_path, agents, specs(1)))
+
+    assert jobs[0].status == "failed"
+    assert jobs[0].attempts == 3
+    assert "boom" in jobs[0].error
+
+
+def test_stand_in_pipeline_and_token(tmp_path):
+    pytest.importorskip("PIL")
+
+    async def scenario():
+        coordinator = Coordinator(str(tmp_path / "out"), port=0, token="secret")
+        await coordinator.start()
+        loop = asyncio.get_running_loop()
+        intruder = Agent("127.0.0.1", coordinator.port, token="wrong")
+        with pytest.raises(ConnectionError):
+            await loop.run_in_executor(None, intruder.run)
+        agents = [
+            Agent(
+                "127.0.0.1",
+                coordinator.port,
+                name="node",
+                runners={"image": stand_in_runner},
+                work_dir=str(tmp_path),
+                token="secret",
+            )
+            for _ in range(2)
+        ]
+        threads = [threading.Thread(target=a.run, daemon=True) for a in agents]
+        for thread in threads:
+            thread.start()
+        coordinator.submit(specs(3))
+        try:
+            return await asyncio.wait_for(coordinator.wait(), 20)
+        finally:
+            await coordinator.close()
+            for thread in threads:
+                thread.join(5)
+
+    jobs = asyncio.run(scenario())
+    from PIL import Image
+
+    assert [job.status for job in jobs] == ["done"] * 3
+    assert Image.open(jobs[0].result_path).size == (64, 64)
+    assert {job.agent for job in jobs} <= {"node", "node-2"}
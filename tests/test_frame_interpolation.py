@@ -0,0 +1,83 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import frame_interpolation  # noqa: E402
+
+
+def test_keyframe_and_output_counts():
+    assert frame_interpolation.keyframe_count(65, 4) == 17
+    assert frame_interpolation.keyframe_count(64, 4) == 17
+    assert frame_interpolation.keyframe_count(16, 1) == 16
+    assert frame_interpolation.interpolated_count(17, 4) == 65
+    assert frame_interpolation.interpolated_count(0, 4) == 0
+
+
+def test_interpolate_frames_streams_pairs(monkeypatch):
+    calls = []
+
+    def fake_interpolator(method):
+        def interpolate(a, b, times):
+            calls.append((a, b, times))
+            return [f"{a}{b}@{t}" for t in times]
+
+        return interpolate
+
+    monkeypatch.setattr(frame_interpolation, "get_interpolator", fake_interpolator)
+    seen = []
+
+    def keyframes():
+        for name in "abc":
+            seen.append(name)
+            yield name
+
+    stream = frame_interpolation.interpolate_frames(keyframes(), 4)
+    assert next(stream) == "a"
+    assert seen == ["a"]
+    assert list(stream) == [
+        "ab@0.25",
+        "ab@0.5",
+        "ab@0.75",
+        "b",
+        "bc@0.25",
+        "bc@0.5",
+        "bc@0.75",
+        "c",
+    ]
+    assert len(calls) == 2
+
+
+def test_factor_one_passes_frames_through():
+    assert list(frame_interpolation.interpolate_frames(iter([1, 2]), 1)) == [1, 2]
+
+
+def test_unknown_method_rejected():
+    with pytest.raises(ValueError, match="Unknown interpolation method"):
+        frame_interpolation.get_interpolator("rife")
+
+
+def test_blend_is_linear():
+    np = pytest.importorskip("numpy")
+    a = np.zeros((2, 2, 3), dtype=np.uint8)
+    b = np.full((2, 2, 3), 200, dtype=np.uint8)
+    mid, late = frame_interpolation.get_interpolator("blend")(a, b, [0.5, 0.75])
+    assert mid.dtype == np.uint8
+    assert (mid == 100).all() and (late == 150).all()
+
+
+def test_flow_tracks_moving_square():
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("cv2")
+
+    def square(x):
+        frame = np.zeros((64, 64, 3), dtype=np.uint8)
+        frame[24:40, x : x + 16] = 255
+        return frame
+
+    (mid,) = frame_interpolation.get_interpolator("flow")(square(16), square(24), [0.5])
+    # The square sits halfway instead of fading in at both positions
+    columns = np.where(mid[32, :, 0] > 127)[0]
+    assert abs(columns.min() - 20) <= 2 and abs(columns.max() - 35) <= 2
@@ -0,0 +1,139 @@
+import os
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from PyQt5.QtCore import Qt  # noqa: E402
+from PyQt5.QtGui import QColor, QImage  # noqa: E402
+
+from ui import gallery  # noqa: E402
+
+
+def make_image(width=64, height=32):
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(QColor(200, 40, 40))
+    return image
+
+
+def save_image(path, mtime=1_000):
+    make_image().save(str(path))
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def wait_for(condition, app, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+def test_find_images_lists_newest_first_within_depth(tmp_path):
+    old = save_image(tmp_path / "old.png", 1_000)
+    (tmp_path / "sweep").mkdir()
+    new = save_image(tmp_path / "sweep" / "cell.jpg", 3_000)
+    (tmp_path / "sweep" / "deeper").mkdir()
+    save_image(tmp_path / "sweep" / "deeper" / "skipped.png", 4_000)
+    (tmp_path / ".hidden").mkdir()
+    save_image(tmp_path / ".hidden" / "skipped.png", 5_000)
+    (tmp_path / "notes.txt").write_text("not an image")
+
+    assert gallery.find_images(str(tmp_path)) == [new, old]
+    assert gallery.find_images(str(tmp_path / "missing")) == []
+
+
+def test_loader_keeps_only_the_newest_pending_requests(qapp, monkeypatch):
+    monkeypatch.setattr(gallery, "MAX_PENDING", 3)
+    loader = gallery.ThumbnailLoader()
+    # Pretend every worker is busy so requests stay queued
+    loader._workers = loader._pool.maxThreadCount()
+    for key in range(5):
+        loader.request(key, f"{key}.png")
+    assert list(loader._pending) == [2, 3, 4]
+
+    # A request made again moves to the front of the queue
+    loader.request(2, "2.png")
+    assert loader._next() == (2, "2.png")
+    assert loader._next() == (4, "4.png")
+    # Requests being decoded are not queued twice
+    loader.request(4, "4.png")
+    assert list(loader._pending) == [3]
+
+
+def test_loader_decodes_thumbnails_of_files(qapp, tmp_path):
+    loader = gallery.ThumbnailLoader()
+    loaded = {}
+    loader.loaded.connect(lambda key, image: loaded.__setitem__(key, image))
+    loader.request("file", save_image(tmp_path / "a.png"))
+    loader.request("broken", str(tmp_path / "missing.png"))
+
+    assert wait_for(lambda: len(loaded) == 2, qapp)
+    # Fitted to the thumbnail size with the aspect ratio kept
+    thumb = loaded["file"]
+    assert (thumb.width(), thumb.height()) == (
+        gallery.THUMB_SIZE,
+        gallery.THUMB_SIZE // 2,
+    )
+    assert loaded["broken"].isNull()
+
+
+def test_model_orders_results_newest_first(qapp):
+    model = gallery.GalleryModel()
+    model.add_files(["b.png", "a.png"])
+    model.add_files(["out/c.png", "a.png"])
+    # Scan results go below everything added meanwhile
+    model._on_scanned("out", ["old.png", "b.png"])
+
+    labels = [model.item(row).label for row in range(model.rowCount())]
+    assert labels == ["c.png", "b.png", "a.png", "old.png"]
+    item = model.data(model.index(0), model.ItemRole)
+    assert (item.key, item.path) == ("out/c.png", "out/c.png")
+
+
+def test_thumbnail_cache_evicts_least_recently_used(qapp, monkeypatch):
+    thumb = make_image(32, 32)
+    monkeypatch.setattr(gallery, "CACHE_BYTES", 2 * thumb.sizeInBytes())
+    model = gallery.GalleryModel()
+    requested = []
+    monkeypatch.setattr(
+        model.loader, "request", lambda key, source: requested.append(key)
+    )
+    model.add_files(["a.png", "b.png", "c.png"])
+
+    for key in ("a.png", "b.png"):
+        model._on_thumbnail(key, thumb)
+    # Delivering a thumbnail again replaces it rather than counting it twice
+    model._on_thumbnail("a.png", thumb)
+    assert model._thumb_bytes == 2 * thumb.sizeInBytes()
+
+    # Showing b makes a the least recently used entry
+    model.data(model.index(1), Qt.DecorationRole)
+    model._on_thumbnail("c.png", thumb)
+    assert list(model._thumbs) == ["b.png", "c.png"]
+    assert model._thumb_bytes == 2 * thumb.sizeInBytes()
+
+    # An evicted thumbnail is requested again and shown as a placeholder
+    assert model.data(model.index(0), Qt.DecorationRole) is model._placeholder
+    assert requested == ["a.png"]
+    # Results no longer in the model are ignored
+    model._on_thumbnail("gone.png", thumb)
+    assert "gone.png" not in model._thumbs
+
+
+def test_new_results_become_current_without_being_reselected(qapp, tmp_path):
+    view = gallery.GalleryView()
+    picked = []
+    view.item_selected.connect(picked.append)
+    view.add_files([save_image(tmp_path / "old.png")])
+    path = save_image(tmp_path / "new.png")
+
+    view.add_result(path)
+    assert view.currentIndex().row() == 0
+    assert view.results.item(0).path == path
+    assert picked == []
+    # Picking a result emits it for the viewer to load from disk
+    view.setCurrentIndex(view.results.index(1))
+    assert [item.label for item in picked] == ["old.png"]
@@ -0,0 +1,108 @@
+import importlib
+import os
+import pathlib
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+generation_process = importlib.import_module("workers.generation_process")
+
+# Resolved inside the child process, which imports this module by name
+FACTORY = f"{pathlib.Path(__file__).stem}:fake_pipeline"
+
+
+class FakeImage:
+    mode = "RGBA"
+
+    def __init__(self, width, height, value):
+        self.width = width
+        self.height = height
+        self.value = value
+
+    def tobytes(self, *args):
+        return bytes([self.value]) * (self.width * self.height * 4)
+
+
+class FakePipe:
+    loads = 0
+    plan = None
+
+    def __call__(self, prompt, width, height, num_inference_steps, **kwargs):
+        if prompt == "crash":
+            os._exit(3)
+        if prompt == "fail":
+            raise ValueError("bad prompt")
+        if prompt == "oom" and self.plan == "default":
+            raise RuntimeError("CUDA out of memory")
+        callback = kwargs["callback_on_step_end"]
+        for step in range(num_inference_steps):
+            callback(self, step, None, {})
+        # Report how many times the pipeline was created in this process
+        return types.SimpleNamespace(images=[FakeImage(width, height, FakePipe.loads)])
+
+
+_pipe = None
+
+
+def fake_pipeline(params):
+    global _pipe
+    if _pipe is None:
+        FakePipe.loads += 1
+        _pipe = FakePipe()
+    _pipe.plan = params["execution_plan"]
+    return _pipe
+
+
+def _params(width=4, height=2, steps=2):
+    return {"width": width, "height": height, "steps": steps, "guidance": 1.0}
+
+
+@pytest.fixture
+def proc(monkeypatch, tmp_path):
+    # The child remembers execution plans in its settings
+    monkeypatch.setenv("FLUXWAN_SETTINGS_FILE", str(tmp_path / "settings.toml"))
+    client = generation_process.GenerationProcess(FACTORY)
+    yield client
+    client.shutdown()
+
+
+def test_result_comes_back_through_shared_memory(proc):
+    progress = []
+    data, width, height = proc.generate("p", "", _params(), progress.append)
+    assert (width, height) == (4, 2)
+    assert data == bytes([1]) * 32
+    assert progress == [0, 50, 100]
+
+    # The cached pipeline survives between jobs, even with a larger buffer
+    data, width, height = proc.generate("p", "", _params(width=8, height=8))
+    assert data == bytes([1]) * 256
+
+
+def test_errors_are_reported_without_killing_the_child(proc):
+    with pytest.raises(RuntimeError, match="ValueError: bad prompt"):
+        proc.generate("fail", "", _params())
+    pid = proc._proc.pid
+    assert proc.generate("p", "", _params()) is not None
+    assert proc._proc.pid == pid
+
+
+def test_child_restarts_after_crash(proc):
+    proc.generate("p", "", _params())
+    with pytest.raises(generation_process.GenerationCrashed, match="code 3"):
+        proc.generate("crash", "", _params())
+    assert proc.is_alive()
+    data, _, _ = proc.generate("p", "", _params())
+    # A fresh child had to create its pipeline again
+    assert data == bytes([1]) * 32
+
+
+def test_should_stop_cancels_job(proc):
+    assert proc.generate("p", "", _params(steps=50), should_stop=lambda: True) is None
+
+
+def test_out_of_memory_is_retried_on_a_cheaper_plan(proc):
+    data, _, _ = proc.generate("oom", "", _params())
+    assert data == bytes([1]) * 32
@@ -0,0 +1,133 @@
+import pathlib
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from workers import hires  # noqa: E402
+from workers.params import ImageParams  # noqa: E402
+
+try:
+    # Imported up front so the PIL stubs of other test modules do not apply
+    from PIL import Image, ImageChops, ImageDraw  # noqa: F401
+except ImportError:
+    Image = None
+
+needs_pil = pytest.mark.skipif(Image is None, reason="Pillow is not installed")
+
+
+def test_hires_size_snaps_to_multiple_of_16():
+    assert hires.hires_size(1024, 1024, 2.0) == (2048, 2048)
+    assert hires.hires_size(832, 1216, 1.5) == (1248, 1824)
+
+
+def test_plan_tiles_cover_image_with_overlap():
+    tiles = hires.plan_tiles(2048, 1536, 1024, 128)
+    assert tiles[0] == (0, 0, 1024, 1024)
+    assert tiles[-1] == (1024, 512, 2048, 1536)
+    xs = sorted({box[0] for box in tiles})
+    assert xs == [0, 512, 1024]
+    assert all(b - a <= 1024 - 128 for a, b in zip(xs, xs[1:]))
+    assert hires.plan_tiles(512, 512, 1024, 128) == [(0, 0, 512, 512)]
+    with pytest.raises(ValueError):
+        hires.plan_tiles(2048, 2048, 128, 128)
+
+
+def test_tile_overlaps_are_those_of_the_snapped_plan():
+    tiles = hires.plan_tiles(2048, 1536, 1024, 128)
+    # Evenly spread tiles overlap by far more than the requested 128 pixels
+    assert hires.tile_overlaps(tiles) == [
+        (0, 0),
+        (512, 0),
+        (512, 0),
+        (0, 512),
+        (512, 512),
+        (512, 512),
+    ]
+    tiles = hires.plan_tiles(1000, 256, 256, 32)
+    for previous, tile, (overlap, _) in zip(
+        tiles, tiles[1:], hires.tile_overlaps(tiles)[1:]
+    ):
+        assert overlap == previous[2] - tile[0] > 0
+
+
+@needs_pil
+def test_feather_mask_ramps_over_the_whole_overlap():
+    mask = hires.feather_mask((512, 0, 1536, 1024), (512, 0))
+    assert mask.getpixel((0, 10)) < 1
+    assert 100 < mask.getpixel((256, 10)) < 156
+    assert mask.getpixel((511, 10)) > 253
+    assert mask.getpixel((512, 10)) == 255
+
+
+@needs_pil
+def test_feather_mask_fades_in_towards_placed_tiles():
+    first = hires.feather_mask((0, 0, 64, 64), (0, 0))
+    assert first.getextrema() == (255, 255)
+    inner = hires.feather_mask((48, 48, 112, 112), (16, 16))
+    assert inner.getpixel((0, 40)) < 16
+    assert inner.getpixel((15, 40)) > 240
+    assert inner.getpixel((40, 40)) == 255
+    assert inner.getpixel((0, 0)) < inner.getpixel((0, 40))
+
+
+class FakePipe:
+    def __init__(self, color):
+        self.color = color
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        # img2img only runs the tail of the schedule
+        steps = int(kwargs["num_inference_steps"] * kwargs.get("strength", 1.0))
+        for step in range(steps):
+            kwargs["callback_on_step_end"](self, step, None, {})
+        size = (kwargs["width"], kwargs["height"])
+        return types.SimpleNamespace(images=[Image.new("RGB", size, self.color)])
+
+
+@needs_pil
+def test_hires_fix_refines_each_tile(monkeypatch):
+    base, refiner = FakePipe((10, 10, 10)), FakePipe((200, 0, 0))
+    monkeypatch.setattr(hires, "refine_pipeline", lambda pipe: refiner)
+    params = ImageParams(
+        width=256,
+        height=192,
+        steps=10,
+        guidance=3.5,
+        hires_scale=2.0,
+        hires_tile=256,
+        hires_overlap=32,
+    )
+    progress = []
+    image = hires.hires_fix(base, "a cat", "", params, progress=progress.append)
+
+    assert image.size == (512, 384)
+    assert base.calls[0]["width"] == 256
+    assert len(refiner.calls) == len(hires.plan_tiles(512, 384, 256, 32))
+    assert {(c["width"], c["height"]) for c in refiner.calls} == {(256, 256)}
+    assert all(c["strength"] == 0.35 for c in refiner.calls)
+    assert image.getpixel((300, 300)) == (200, 0, 0)
+    assert progress[-1] == 100 and progress == sorted(progress)
+
+
+@needs_pil
+def test_hires_fix_stops_between_tiles(monkeypatch):
+    refiner = FakePipe((0, 0, 0))
+    monkeypatch.setattr(hires, "refine_pipeline", lambda pipe: refiner)
+    params = ImageParams(
+        width=256, height=256, steps=4, guidance=3.5, hires_scale=2.0, hires_tile=256
+    )
+    stop = []
+    result = hires.hires_fix(
+        FakePipe((0, 0, 0)),
+        "a cat",
+        "",
+        params,
+        progress=lambda pct: stop.append(pct > 50),
+        should_stop=lambda: any(stop),
+    )
+    assert result is None
+    assert len(refiner.calls) < len(hires.plan_tiles(512, 512, 256, 128))
@@ -0,0 +1,170 @@
+import pathlib
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from PyQt5.QtCore import QPoint  # noqa: E402
+from PyQt5.QtGui import QColor, QImage  # noqa: E402
+
+from ui import image_viewer  # noqa: E402
+from ui.image_viewer import ImageViewer, build_levels  # noqa: E402
+
+
+def make_image(width, height):
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(QColor(40, 120, 200))
+    return image
+
+
+@pytest.fixture
+def make_viewer(qapp):
+    viewers = []
+
+    def make(image=None, size=(200, 200)):
+        viewer = ImageViewer()
+        viewer.setMinimumHeight(0)
+        viewer.resize(*size)
+        if image is not None:
+            viewer.set_image(image, "shown")
+        viewers.append(viewer)
+        return viewer
+
+    yield make
+    # A pool destroyed with tasks still running blocks on them
+    for viewer in viewers:
+        viewer._pool.waitForDone()
+
+
+def settle(viewer, app):
+    viewer._pool.waitForDone()
+    app.processEvents()
+
+
+def wheel(viewer, steps, x=100, y=100):
+    event = types.SimpleNamespace(
+        pos=lambda: QPoint(x, y), angleDelta=lambda: QPoint(0, 120 * steps)
+    )
+    for _ in range(abs(steps)):
+        viewer.wheelEvent(event)
+
+
+def test_build_levels_halves_down_to_the_minimum_size():
+    levels = build_levels(make_image(1000, 600))
+    assert [(level.width(), level.height()) for level in levels] == [
+        (1000, 600),
+        (500, 300),
+        (250, 150),
+    ]
+    assert all(level.format() == QImage.Format_ARGB32_Premultiplied for level in levels)
+    assert len(build_levels(make_image(100, 200))) == 1
+
+
+@pytest.mark.parametrize(
+    "zoom, level", [(2.0, 0), (1.0, 0), (0.6, 0), (0.5, 1), (0.3, 1), (0.2, 2)]
+)
+def test_level_is_the_smallest_with_enough_detail(make_viewer, zoom, level):
+    viewer = make_viewer()
+    viewer._levels = build_levels(make_image(2048, 2048))
+    viewer.zoom = zoom
+    assert viewer._level() == level
+
+
+def test_level_is_limited_to_the_levels_built(make_viewer):
+    viewer = make_viewer()
+    viewer._levels = build_levels(make_image(2048, 2048))
+    viewer.zoom = 0.01
+    assert viewer._level() == len(viewer._levels) - 1 == 3
+    # Only the original until the levels arrive
+    viewer._levels = viewer._levels[:1]
+    assert viewer._level() == 0
+
+
+def test_wheel_zoom_is_clamped(make_viewer):
+    viewer = make_viewer(make_image(400, 400))
+    assert viewer.fitting and viewer.zoom == 0.5
+
+    wheel(viewer, -5)
+    assert viewer.zoom == 0.5 and not viewer.fitting
+    wheel(viewer, 30)
+    assert viewer.zoom == ImageViewer.MAX_ZOOM
+
+    # A small image fitted above 1x can still be zoomed out to native size
+    viewer.set_image(make_image(50, 50), "small")
+    assert viewer.zoom == 4.0
+    wheel(viewer, -10)
+    assert viewer.zoom == 1.0
+
+
+def test_wheel_zoom_keeps_the_point_under_the_cursor(make_viewer):
+    viewer = make_viewer(make_image(400, 400))
+    before = viewer.offset + QPoint(30, 60) / viewer.zoom
+    wheel(viewer, 1, 30, 60)
+    assert viewer.zoom == 0.625
+    after = viewer.offset + QPoint(30, 60) / viewer.zoom
+    assert (after.x(), after.y()) == pytest.approx((before.x(), before.y()))
+
+
+def test_cache_evicts_least_recently_shown_levels(make_viewer, monkeypatch):
+    levels = [make_image(64, 64)]
+    size = levels[0].sizeInBytes()
+    monkeypatch.setattr(image_viewer, "CACHE_BYTES", 2 * size)
+    viewer = make_viewer()
+
+    for key in ("a", "b"):
+        viewer._on_levels_ready(key, levels)
+    # Levels built again replace the entry rather than counting it twice
+    viewer._on_levels_ready("a", levels)
+    assert viewer._cache_bytes == 2 * size
+
+    # Showing b makes a the least recently shown entry
+    assert viewer._show_cached("b") and viewer.key == "b"
+    viewer._on_levels_ready("c", levels)
+    assert list(viewer._cache) == ["b", "c"]
+    assert viewer._cache_bytes == 2 * size
+
+    # The newest entry is kept even if it alone exceeds the budget
+    viewer._on_levels_ready("large", [make_image(128, 128)])
+    assert list(viewer._cache) == ["large"]
+    assert not viewer._show_cached("a")
+
+
+def test_cache_keeps_a_bounded_number_of_results(make_viewer, monkeypatch):
+    monkeypatch.setattr(image_viewer, "CACHE_ENTRIES", 3)
+    viewer = make_viewer()
+    for key in range(5):
+        viewer._on_levels_ready(key, [make_image(8, 8)])
+    assert list(viewer._cache) == [2, 3, 4]
+    assert viewer._cache_bytes == 3 * make_image(8, 8).sizeInBytes()
+
+
+def test_open_file_on_an_unreadable_path_shows_nothing(qapp, make_viewer, tmp_path):
+    viewer = make_viewer(make_image(400, 400))
+    settle(viewer, qapp)
+    path = tmp_path / "broken.png"
+    path.write_bytes(b"not an image")
+
+    viewer.open_file(str(path))
+    settle(viewer, qapp)
+    assert viewer.key == str(path)
+    assert viewer.image_size is None
+    assert str(path) not in viewer._cache
+    # Painting and zooming without an image are no-ops
+    viewer.grab()
+    wheel(viewer, 1)
+    assert viewer.fitting
+
+
+def test_open_file_decodes_and_caches_the_levels(qapp, make_viewer, tmp_path):
+    path = str(tmp_path / "result.png")
+    make_image(600, 300).save(path)
+    viewer = make_viewer()
+
+    viewer.open_file(path)
+    assert viewer.image_size is None
+    settle(viewer, qapp)
+    assert viewer.image_size.width() == 600
+    assert len(viewer._levels) == 3 and path in viewer._cache
+    assert viewer.zoom == pytest.approx(200 / 600)
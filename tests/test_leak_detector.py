@@ -0,0 +1,65 @@
+import pytest
+
+from utils.leak_detector import LeakDetector
+
+
+def _feed(detector, values, metric="rss"):
+    for i, value in enumerate(values):
+        sample = {"rss": 100_000_000, "traced": 1_000_000, "objects": 50_000}
+        sample[metric] = value
+        detector.record(i, **sample)
+
+
+def test_flat_run_is_not_leaking():
+    detector = LeakDetector(warmup=5, trace=False)
+    _feed(detector, [100_000_000 + (i % 3) * 4096 for i in range(60)])
+    report = detector.analyze()
+    assert report.leaking == []
+    assert "No sustained memory growth" in report.summary()
+
+
+def test_steady_growth_is_reported():
+    detector = LeakDetector(warmup=5, trace=False)
+    _feed(detector, [100_000_000 + i * 1_000_000 for i in range(60)])
+    with pytest.raises(AssertionError, match="rss"):
+        detector.assert_no_leaks()
+
+
+def test_growth_during_warmup_is_ignored():
+    detector = LeakDetector(warmup=20, trace=False)
+    _feed(detector, [i * 10_000_000 if i < 20 else 200_000_000 for i in range(60)])
+    assert detector.analyze().leaking == []
+
+
+def test_single_spike_is_not_a_leak():
+    detector = LeakDetector(warmup=0, trace=False)
+    values = [50_000] * 60
+    values[58] = 60_000
+    _feed(detector, values, metric="objects")
+    assert detector.analyze().leaking == []
+
+
+def test_custom_limits_override_defaults():
+    detector = LeakDetector(warmup=0, limits={"objects": 100}, trace=False)
+    _feed(detector, [50_000 + i * 20 for i in range(30)], metric="objects")
+    assert detector.analyze().leaking == []
+    assert detector.limits["rss"] == LeakDetector.DEFAULT_LIMITS["rss"]
+
+
+class Hoarded:
+    pass
+
+
+def test_sample_reports_object_growth():
+    detector = LeakDetector(warmup=0, trace=True)
+    detector.start()
+    try:
+        hoard = []
+        for i in range(4):
+            hoard.extend(Hoarded() for _ in range(1000))
+            detector.sample(i)
+        report = detector.analyze()
+    finally:
+        detector.stop()
+    assert any(line.startswith("Hoarded:") for line in report.top_object_types)
+    assert report.top_allocations
@@ -0,0 +1,137 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import lora_manager  # noqa: E402
+
+
+class FakeTensor:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+class FakeLoraPipe:
+    """Records the diffusers LoRA API calls made on it."""
+
+    def __init__(self):
+        self.calls = []
+
+    def load_lora_weights(self, state, adapter_name):
+        state.pop(next(iter(state)))  # diffusers may rename keys in place
+        self.calls.append(("load", adapter_name))
+
+    def set_adapters(self, names, adapter_weights):
+        self.calls.append(("set", tuple(names), tuple(adapter_weights)))
+
+    def delete_adapters(self, name):
+        self.calls.append(("delete", name))
+
+    def fuse_lora(self, adapter_names):
+        self.calls.append(("fuse", tuple(adapter_names)))
+
+    def unfuse_lora(self):
+        self.calls.append(("unfuse",))
+
+    def enable_lora(self):
+        self.calls.append(("enable",))
+
+    def disable_lora(self):
+        self.calls.append(("disable",))
+
+
+@pytest.fixture
+def lora_dir(tmp_path):
+    for name in ("ink", "film", "clay"):
+        (tmp_path / f"{name}.safetensors").write_bytes(b"x")
+    return tmp_path
+
+
+def _counting_loader(reads, size=100):
+    def load(path):
+        reads.append(pathlib.Path(path).stem)
+        return {"a": FakeTensor(size), "b": FakeTensor(size)}
+
+    return load
+
+
+def test_parse_lora_spec():
+    assert lora_manager.parse_lora_spec(" ink:0.5, film ,") == [
+        ("ink", 0.5),
+        ("film", 1.0),
+    ]
+    with pytest.raises(ValueError, match="Invalid LoRA weight"):
+        lora_manager.parse_lora_spec("ink:strong")
+
+
+def test_weights_cache_reuses_and_evicts_by_size(lora_dir):
+    reads = []
+    cache = lora_manager.LoraWeightsCache(max_bytes=400, loader=_counting_loader(reads))
+    first = cache.get(lora_dir / "ink.safetensors")
+    assert cache.get(lora_dir / "ink.safetensors") is first
+    cache.get(lora_dir / "film.safetensors")
+    cache.get(lora_dir / "clay.safetensors")  # 600 bytes > 400: evicts ink
+    cache.get(lora_dir / "ink.safetensors")
+    assert reads == ["ink", "film", "clay", "ink"]
+
+
+def test_switching_adapters_reuses_loaded_weights(lora_dir):
+    reads = []
+    cache = lora_manager.LoraWeightsCache(loader=_counting_loader(reads))
+    pipe = FakeLoraPipe()
+    adapters = lora_manager.LoraAdapters(pipe, cache)
+
+    adapters.apply([("ink", 0.8)], str(lora_dir))
+    adapters.apply([("ink", 0.8)], str(lora_dir))  # unchanged: no calls
+    adapters.apply([("ink", 0.5), ("film", 1.0)], str(lora_dir))
+    adapters.apply([], str(lora_dir))
+    adapters.apply([("ink", 1.0)], str(lora_dir))
+
+    assert pipe.calls == [
+        ("load", "ink"),
+        ("enable",),
+        ("set", ("ink",), (0.8,)),
+        ("load", "film"),
+        ("set", ("ink", "film"), (0.5, 1.0)),
+        ("disable",),
+        ("enable",),
+        ("set", ("ink",), (1.0,)),
+    ]
+    assert reads == ["ink", "film"]
+    # The cached state dict survives diffusers mutating its copy
+    assert len(cache.get(lora_dir / "ink.safetensors")) == 2
+
+
+def test_fuse_until_combination_changes(lora_dir):
+    cache = lora_manager.LoraWeightsCache(loader=_counting_loader([]))
+    pipe = FakeLoraPipe()
+    adapters = lora_manager.LoraAdapters(pipe, cache)
+
+    adapters.apply([("ink", 1.0)], str(lora_dir), fuse=True)
+    adapters.apply([("ink", 1.0)], str(lora_dir), fuse=True)
+    adapters.apply([("film", 1.0)], str(lora_dir), fuse=True)
+    adapters.apply([("film", 1.0)], str(lora_dir), fuse=False)
+
+    kinds = [call for call in pipe.calls if call[0] in ("fuse", "unfuse")]
+    assert kinds == [("fuse", ("ink",)), ("unfuse",), ("fuse", ("film",)), ("unfuse",)]
+
+
+def test_old_adapters_deleted_beyond_limit(lora_dir, monkeypatch):
+    monkeypatch.setattr(lora_manager.LoraAdapters, "MAX_LOADED", 2)
+    cache = lora_manager.LoraWeightsCache(loader=_counting_loader([]))
+    pipe = FakeLoraPipe()
+    adapters = lora_manager.LoraAdapters(pipe, cache)
+    for name in ("ink", "film", "clay"):
+        adapters.apply([(name, 1.0)], str(lora_dir))
+    assert ("delete", "ink") in pipe.calls
+
+
+def test_missing_adapter_raises_file_not_found(lora_dir):
+    adapters = lora_manager.LoraAdapters(
+        FakeLoraPipe(), lora_manager.LoraWeightsCache(loader=_counting_loader([]))
+    )
+    with pytest.raises(FileNotFoundError):
+        adapters.apply([("missing", 1.0)], str(lora_dir))
+    assert lora_manager.list_loras(str(lora_dir)) == ["clay", "film", "ink"]
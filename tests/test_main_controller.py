@@ -1,9 +1,12 @@
 import importlib
+import os
 import pathlib
 import sys
 import types
 import builtins
 
+import pytest
+
 # ---- Stub PyQt5 modules with QTest ----
 
 
@@ -62,13 +65,38 @@ class QPushButton:
 class QComboBox:
     def __init__(self):
         self.items = []
+        self.data = []
         self.current = None
+        self.blocked = False
+        self.currentIndexChanged = DummySignal()
+
+    def blockSignals(self, blocked):
+        previous, self.blocked = self.blocked, blocked
+        return previous
 
     def clear(self):
         self.items = []
+        self.data = []
 
     def addItems(self, items):
         self.items.extend(items)
+        self.data.extend([None] * len(items))
+
+    def addItem(self, text, data=None):
+        self.items.append(text)
+        self.data.append(data)
+
+    def findData(self, data):
+        return self.data.index(data) if data in self.data else -1
+
+    def setCurrentIndex(self, index):
+        self.current = self.items[index]
+        if not self.blocked:
+            self.currentIndexChanged.emit(index)
+
+    def currentData(self):
+        text = self.currentText()
+        return self.data[self.items.index(text)] if text in self.items else None
 
     def setCurrentText(self, text):
         self.current = text
@@ -83,6 +111,10 @@ class QTextEdit:
     def __init__(self):
         self.text = ""
         self.history = []
+        self.enabled = True
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
 
     def toPlainText(self):
         return self.text
@@ -91,6 +123,17 @@ class QTextEdit:
         self.history.append(self.text)
 
 
+class QLineEdit:
+    def __init__(self, text=""):
+        self._text = text
+
+    def text(self):
+        return self._text
+
+    def setText(self, text):
+        self._text = text
+
+
 class QSpinBox:
     def __init__(self, value=0):
         self._value = value
@@ -98,6 +141,12 @@ class QSpinBox:
     def value(self):
         return self._value
 
+    def setValue(self, value):
+        self._value = value
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+
 
 class QCheckBox:
     def __init__(self, checked=False):
@@ -116,7 +165,14 @@ class QProgressBar:
 
 
 class QLabel:
-    pass
+    def __init__(self):
+        self.visible = True
+
+    def show(self):
+        self.visible = True
+
+    def hide(self):
+        self.visible = False
 
 
 class QTest:
@@ -161,6 +217,7 @@ qtwidgets.QPushButton = QPushButton
 qtwidgets.QComboBox = QComboBox
 qtwidgets.QTextEdit = QTextEdit
 qtwidgets.QSpinBox = QSpinBox
+qtwidgets.QLineEdit = QLineEdit
 qtwidgets.QCheckBox = QCheckBox
 qtwidgets.QProgressBar = QProgressBar
 qtwidgets.QLabel = QLabel
@@ -217,6 +274,45 @@ sys.modules["diffusers"] = types.ModuleType("diffusers")
 # ---- Stub ui.main_window ----
 
 
+class DummyTiledView(QLabel):
+    def __init__(self):
+        super().__init__()
+        self.path = None
+
+    def open_image(self, path):
+        self.path = path
+
+
+class DummyImageViewer(QLabel):
+    def __init__(self):
+        super().__init__()
+        self.image = None
+        self.path = None
+
+    def set_image(self, image, key=None):
+        self.image = image
+        self.key = key
+
+    def open_file(self, path):
+        self.path = path
+
+
+class DummyGallery:
+    def __init__(self):
+        self.item_selected = DummySignal()
+        self.items = []
+        self.scanned = []
+
+    def add_result(self, path):
+        self.add_files([path])
+
+    def add_files(self, paths):
+        self.items[:0] = [types.SimpleNamespace(key=p, label=p, path=p) for p in paths]
+
+    def scan_directory(self, directory):
+        self.scanned.append(directory)
+
+
 class DummyUI:
     def setupUi(self, window):
         self.prompt_edit = QTextEdit()
@@ -225,11 +321,30 @@ class DummyUI:
         self.height_spin = QSpinBox(512)
         self.steps_spin = QSpinBox(10)
         self.guidance_spin = QSpinBox(7)
+        self.scheduler_combo = QComboBox()
+        self.profile_combo = QComboBox()
         self.device_combo = QComboBox()
         self.quant_checkbox = QCheckBox(False)
+        self.process_checkbox = QCheckBox(False)
+        self.sweep_edit = QLineEdit()
+        self.lora_edit = QLineEdit()
+        self.fuse_lora_checkbox = QCheckBox(False)
+        self.compile_checkbox = QCheckBox(False)
+        self.trace_checkbox = QCheckBox(False)
+        self.hires_combo = QComboBox()
+        self.hires_combo.addItem("Off", 1.0)
+        self.hires_combo.addItem("2x", 2.0)
+        self.sweep_button = QPushButton()
+        self.profile_button = QPushButton()
+        self.stats_button = QPushButton()
         self.gen_button = QPushButton()
         self.image_progress = QProgressBar()
-        self.image_display = QLabel()
+        self.image_display = DummyImageViewer()
+        self.tiled_checkbox = QCheckBox(False)
+        self.canvas_width_spin = QSpinBox(8192)
+        self.canvas_height_spin = QSpinBox(4096)
+        self.tiled_view = DummyTiledView()
+        self.gallery = DummyGallery()
         self.status_bar = window.statusBar()
 
         self.video_prompt_edit = QTextEdit()
@@ -242,6 +357,9 @@ class DummyUI:
         self.t5_cpu_checkbox = QCheckBox(False)
         self.precision_combo = QComboBox()
         self.precision_combo.addItems(["fp16"])
+        self.interpolation_combo = QComboBox()
+        self.interpolation_combo.addItem("Off", 1)
+        self.interpolation_combo.addItem("4x", 4)
         self.video_button = QPushButton()
         self.video_progress = QProgressBar()
 
@@ -254,12 +372,17 @@ sys.modules["ui.main_window"] = ui_module
 
 
 class DummyImageWorker:
-    def __init__(self, prompt, neg_prompt, params, parent=None):
+    def __init__(self, prompt, neg_prompt, params, parent=None, output_path=None):
         self.prompt = prompt
         self.neg_prompt = neg_prompt
         self.params = params
+        self.output_path = output_path
+        self.saved_path = None
         self.started = False
         self._running = True
+        self.trace = None
+        self.profile_outputs = []
+        self.guidance = None
         self.progress = DummySignal()
         self.result = DummySignal()
         self.error = DummySignal()
@@ -376,9 +499,39 @@ class DummyVideoWorker:
         pass
 
 
+class DummySweepWorker:
+    def __init__(self, prompt, neg_prompt, cells, out_dir, max_batch=4, parent=None):
+        self.prompt = prompt
+        self.cells = cells
+        self.out_dir = out_dir
+        self.started = False
+        self.progress = DummySignal()
+        self.finished = DummySignal()
+        self.error = DummySignal()
+
+    def start(self):
+        self.started = True
+
+
+class DummyTiledImageWorker:
+    def __init__(self, prompt, neg_prompt, params, out_path, parent=None):
+        self.prompt = prompt
+        self.params = params
+        self.out_path = out_path
+        self.started = False
+        self.progress = DummySignal()
+        self.finished = DummySignal()
+        self.error = DummySignal()
+
+    def start(self):
+        self.started = True
+
+
 workers_module = types.ModuleType("workers.image_and_video_workers")
 workers_module.ImageWorker = DummyImageWorker
 workers_module.VideoWorker = DummyVideoWorker
+workers_module.SweepWorker = DummySweepWorker
+workers_module.TiledImageWorker = DummyTiledImageWorker
 sys.modules["workers.image_and_video_workers"] = workers_module
 
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
@@ -388,8 +541,11 @@ sys.modules.pop("diffusers", None)
 
 
 class DummySettings:
+    # Set per test by the ``metrics_file`` fixture
+    defaults = {}
+
     def __init__(self):
-        self.store = {}
+        self.store = dict(self.defaults)
 
     def get(self, key, default=None):
         return self.store.get(key, default)
@@ -400,10 +556,38 @@ class DummySettings:
     def get_model_path(self, key, default=""):
         return default
 
+    def get_output_dir(self, default="."):
+        return self.store.get("output_dir", default)
+
 
 main_controller.SettingsManager = DummySettings
 
 
+@pytest.fixture(autouse=True)
+def metrics_file(tmp_path, monkeypatch):
+    """Keep controllers away from the user's metrics file and endpoint."""
+    path = tmp_path / "metrics.json"
+    monkeypatch.setattr(DummySettings, "defaults", {"metrics/path": str(path)})
+    monkeypatch.setattr(main_controller.metrics, "_path", None)
+    return path
+
+
+def test_metrics_file_comes_from_settings(metrics_file):
+    main_controller.MainController()
+    assert main_controller.metrics._path == str(metrics_file)
+
+
+def test_metrics_endpoint_is_opt_in(metrics_file, monkeypatch):
+    served = []
+    monkeypatch.setattr(main_controller.metrics, "serve", served.append)
+    assert main_controller.MainController().metrics_server is None
+    assert served == []
+
+    monkeypatch.setitem(DummySettings.defaults, "metrics/port", 9500)
+    main_controller.MainController()
+    assert served == [9500]
+
+
 def test_device_list_populated():
     controller = main_controller.MainController()
     assert controller.ui.device_combo.items == ["cpu", "cuda:0"]
@@ -422,3 +606,202 @@ def test_workers_start_and_prompt_history():
     assert controller.video_worker.started
     assert controller.ui.prompt_edit.history == ["hello"]
     assert controller.ui.video_prompt_edit.history == ["world"]
+
+
+def test_sweep_expands_grid_and_starts_worker():
+    controller = main_controller.MainController()
+    controller.ui.prompt_edit.text = "hello"
+    controller.ui.sweep_edit.setText("steps=4:8:2; seed=1,2")
+    QTest.mouseClick(controller.ui.sweep_button, Qt.LeftButton)
+    worker = controller.sweep_worker
+    assert isinstance(worker, DummySweepWorker)
+    assert worker.started
+    assert [(c.params.steps, c.seed) for c in worker.cells] == [
+        (4, 1),
+        (4, 2),
+        (6, 1),
+        (6, 2),
+        (8, 1),
+        (8, 2),
+    ]
+
+
+def test_invalid_sweep_reports_error():
+    controller = main_controller.MainController()
+    controller.ui.sweep_edit.setText("sampler=euler")
+    QTest.mouseClick(controller.ui.sweep_button, Qt.LeftButton)
+    assert controller.sweep_worker is None
+    assert controller.ui.status_bar.messages[-1].startswith("Invalid sweep")
+
+
+def test_scheduler_selection_raises_steps_to_the_recommended_minimum():
+    controller = main_controller.MainController()
+    combo = controller.ui.scheduler_combo
+    steps = controller.ui.steps_spin
+    assert combo.currentData() == "default"
+    # Flux runs flow-matching samplers only
+    assert combo.findData("dpmpp_2m_karras") == -1
+    combo.setCurrentIndex(combo.findData("flow_euler_karras"))
+    assert steps.value() == 28
+    assert "14 steps recommended" in controller.ui.status_bar.messages[-1]
+    steps.setValue(8)
+    combo.setCurrentIndex(combo.findData("flow_euler"))
+    assert steps.value() == 20
+
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    assert controller.image_worker.params.scheduler == "flow_euler"
+    assert controller.settings.store["scheduler"] == "flow_euler"
+
+
+def test_scheduler_list_follows_the_profile_family():
+    controller = main_controller.MainController()
+    ui = controller.ui
+    ui.profile_combo.setCurrentIndex(ui.profile_combo.findData("sd15"))
+    combo = ui.scheduler_combo
+    assert combo.findData("flow_euler") == -1
+    combo.setCurrentIndex(combo.findData("dpmpp_2m_karras"))
+    assert combo.currentData() == "dpmpp_2m_karras"
+
+    # A scheduler the new family cannot run falls back to the model default
+    ui.profile_combo.setCurrentIndex(ui.profile_combo.findData("flux"))
+    assert combo.currentData() == "default"
+    assert combo.findData("dpmpp_2m_karras") == -1
+
+
+def test_profile_selection_applies_defaults():
+    controller = main_controller.MainController()
+    ui = controller.ui
+    assert ui.profile_combo.currentData() == "flux"
+    assert ui.steps_spin.value() == 28
+    assert not ui.neg_prompt_edit.enabled
+
+    ui.profile_combo.setCurrentIndex(ui.profile_combo.findData("flux-schnell"))
+    assert ui.steps_spin.value() == 4
+    assert ui.guidance_spin.value() == 0.0
+    assert not ui.guidance_spin.enabled
+
+    QTest.mouseClick(ui.gen_button, Qt.LeftButton)
+    params = controller.image_worker.params
+    assert (params.profile, params.steps) == ("flux-schnell", 4)
+    assert controller.settings.store["profile"] == "flux-schnell"
+
+
+def test_lora_spec_passed_to_worker():
+    controller = main_controller.MainController()
+    controller.ui.lora_edit.setText("ink:0.7, film")
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    assert controller.image_worker.params.loras == [("ink", 0.7), ("film", 1.0)]
+
+    controller.image_worker = None
+    controller.ui.lora_edit.setText("ink:heavy")
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    assert controller.image_worker is None
+    assert "Invalid LoRA weight" in controller.ui.status_bar.messages[-1]
+
+
+def test_compile_snaps_size_to_grid():
+    controller = main_controller.MainController()
+    controller.ui.width_spin.setValue(500)
+    controller.ui.height_spin.setValue(700)
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    params = controller.image_worker.params
+    assert (params.width, params.height, params.compile) == (500, 700, False)
+
+    controller.image_worker = None
+    controller.ui.compile_checkbox = QCheckBox(True)
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    params = controller.image_worker.params
+    assert (params.width, params.height, params.compile) == (512, 704, True)
+
+
+def test_video_interpolation_factor_passed_to_worker():
+    controller = main_controller.MainController()
+    controller.ui.frames_spin.setValue(65)
+    controller.ui.interpolation_combo.setCurrentIndex(1)
+    QTest.mouseClick(controller.ui.video_button, Qt.LeftButton)
+    params = controller.video_worker.params
+    assert (params.frames, params.interpolation) == (65, 4)
+
+
+def test_hires_scale_passed_to_worker():
+    controller = main_controller.MainController()
+    controller.ui.hires_combo.setCurrentIndex(1)
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    params = controller.image_worker.params
+    assert (params.width, params.hires_scale) == (512, 2.0)
+
+
+def test_tiled_canvas_starts_tiled_worker():
+    controller = main_controller.MainController()
+    controller.ui.tiled_checkbox = QCheckBox(True)
+    controller.ui.hires_combo.setCurrentIndex(1)
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    assert controller.image_worker is None
+    worker = controller.tiled_worker
+    assert isinstance(worker, DummyTiledImageWorker)
+    assert worker.started
+    assert (worker.params.width, worker.params.height) == (8192, 4096)
+    assert worker.params.hires_scale == 1.0
+    assert worker.out_path.endswith(".npy")
+
+    worker.finished.emit(worker.out_path)
+    assert controller.ui.tiled_view.path == worker.out_path
+    assert controller.ui.tiled_view.visible
+    assert not controller.ui.image_display.visible
+
+
+def test_results_are_handed_to_the_viewer():
+    controller = main_controller.MainController()
+    image = QImage()
+    controller._on_image_result(image)
+    assert controller.ui.image_display.image is image
+    assert controller.ui.status_bar.messages[-1] == "Image generation complete"
+
+    controller.ui.tiled_view.show()
+    controller._on_sweep_finished("sweep/contact_sheet.png")
+    assert controller.ui.image_display.path == "sweep/contact_sheet.png"
+    assert controller.ui.image_display.visible
+    assert not controller.ui.tiled_view.visible
+
+
+def test_gallery_collects_results_and_shows_selection():
+    controller = main_controller.MainController()
+    gallery = controller.ui.gallery
+    assert gallery.scanned == [controller.settings.get_output_dir()]
+
+    controller.ui.prompt_edit.text = "hello"
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    worker = controller.image_worker
+    assert os.path.dirname(worker.output_path) == controller.settings.get_output_dir()
+    assert worker.output_path.endswith("_1.png")
+
+    # Results the worker saved are listed by path, not held in memory
+    worker.saved_path = worker.output_path
+    image = QImage()
+    controller._on_image_result(image)
+    result = gallery.items[0]
+    assert result.path == worker.output_path
+    assert controller.ui.image_display.image is image
+    assert controller.ui.image_display.key == result.path
+    assert controller.ui.status_bar.messages[-1].endswith(
+        f"saved to {worker.output_path}"
+    )
+
+    controller._on_sweep_finished("sweep/contact_sheet.png")
+    assert gallery.items[0].path == "sweep/contact_sheet.png"
+
+    controller.ui.tiled_view.show()
+    gallery.item_selected.emit(result)
+    assert controller.ui.image_display.path == result.path
+    assert not controller.ui.tiled_view.visible
+
+
+def test_unsaved_result_is_shown_but_not_listed():
+    controller = main_controller.MainController()
+    controller.ui.prompt_edit.text = "hello"
+    QTest.mouseClick(controller.ui.gen_button, Qt.LeftButton)
+    image = QImage()
+    controller._on_image_result(image)
+    assert controller.ui.gallery.items == []
+    assert controller.ui.image_display.image is image
+    assert controller.ui.status_bar.messages[-1].endswith("could not be saved")
@@ -0,0 +1,122 @@
+import math
+import pathlib
+import random
+import sys
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import metrics  # noqa: E402
+from utils.metrics import HdrHistogram, MetricsRegistry  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.registry.reset()
+    yield
+    metrics.configure(None)
+    metrics.registry.reset()
+
+
+def test_histogram_quantiles_have_bounded_error():
+    rng = random.Random(0)
+    values = sorted(rng.lognormvariate(0, 2) for _ in range(20000))
+    hist = HdrHistogram()
+    for value in values:
+        hist.record(value)
+
+    assert hist.count == len(values)
+    assert hist.sum == pytest.approx(sum(values))
+    assert hist.max == values[-1]
+    for q in (0.5, 0.9, 0.99):
+        exact = values[math.ceil(q * len(values)) - 1]
+        assert hist.quantile(q) == pytest.approx(exact, rel=1 / 32)
+    # Six orders of magnitude in a few hundred buckets
+    assert len(hist.counts) < 600
+    assert HdrHistogram().quantile(0.5) is None
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    jobs = registry.counter("jobs_total", "Jobs", ("kind",))
+    depth = registry.gauge("depth", "Queue depth")
+    latency = registry.histogram("latency_seconds", "Latency", ("kind",))
+    jobs.inc(kind='say "hi"')
+    depth.set(3)
+    for value in (0.02, 0.2, 2.0):
+        latency.observe(value, kind="image")
+    assert registry.counter("jobs_total", "Jobs", ("kind",)) is jobs
+    with pytest.raises(ValueError):
+        jobs.inc(kind="image", extra="x")
+    with pytest.raises(ValueError):
+        registry.gauge("jobs_total", "Jobs")
+
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE jobs_total counter" in lines
+    assert 'jobs_total{kind="say \\"hi\\""} 1.0' in lines
+    assert "depth 3.0" in lines
+    assert 'latency_seconds_bucket{kind="image",le="0.025"} 1' in lines
+    assert 'latency_seconds_bucket{kind="image",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{kind="image",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{kind="image"} 3' in lines
+    median = 'latency_seconds_quantiles{kind="image",quantile="0.5"} '
+    (line,) = [line for line in lines if line.startswith(median)]
+    assert float(line[len(median) :]) == pytest.approx(0.2, rel=1 / 64)
+
+
+def test_counters_and_histograms_persist(tmp_path):
+    path = tmp_path / "metrics.json"
+    metrics.configure(str(path))
+    metrics.cache_lookup("flux_pipeline", hit=False)
+    metrics.cache_lookup("flux_pipeline", hit=True)
+    metrics.cache_lookup("flux_pipeline", hit=True)
+    metrics.MODEL_LOAD_SECONDS.observe(12.5, model="flux")
+    metrics.QUEUE_DEPTH.set(4)
+    metrics.save()
+
+    metrics.registry.reset()
+    metrics.QUEUE_DEPTH.set(0)
+    assert metrics.hit_rate("flux_pipeline") is None
+    metrics.configure(str(path))
+    assert metrics.hit_rate("flux_pipeline") == pytest.approx(2 / 3)
+    assert metrics.MODEL_LOAD_SECONDS.get(model="flux").quantile(0.5) == 12.5
+    # Gauges describe the running process and are not restored
+    assert metrics.QUEUE_DEPTH.value() == 0
+
+
+def test_track_job_records_outcomes():
+    with metrics.track_job("image") as job:
+        pass
+    with metrics.track_job("image") as job:
+        job.status = "cancelled"
+    with pytest.raises(RuntimeError):
+        with metrics.track_job("image"):
+            raise RuntimeError("boom")
+
+    for status in ("done", "cancelled", "failed"):
+        assert metrics.JOBS.value(kind="image", status=status) == 1
+    assert metrics.JOB_SECONDS.get(kind="image").count == 1
+    assert metrics.JOBS_IN_PROGRESS.value(kind="image") == 0
+
+    timer = metrics.StepTimer("image")
+    for _ in range(4):
+        timer.step()
+    # The first callback only starts the clock
+    assert metrics.STEP_SECONDS.get(kind="image").count == 3
+
+
+def test_serve_exposes_metrics_on_localhost():
+    metrics.JOBS.inc(kind="video", status="done")
+    server = metrics.serve(port=0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+            text = resp.read().decode()
+        assert 'fluxwan_jobs_total{kind="video",status="done"} 1.0' in text
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
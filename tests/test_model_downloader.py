@@ -0,0 +1,175 @@
+import hashlib
+import importlib
+import json
+import os
+import pathlib
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+
+class HfHubHTTPError(Exception):
+    pass
+
+
+@pytest.fixture
+def model_downloader(monkeypatch):
+    """Import the downloader against a stubbed, offline huggingface_hub."""
+    hf_hub = types.ModuleType("huggingface_hub")
+    hf_hub.hf_hub_download = lambda **kwargs: None
+    hf_hub.login = lambda token: None
+    hf_hub.snapshot_download = lambda **kwargs: None
+    hf_utils = types.ModuleType("huggingface_hub.utils")
+    hf_utils.HfHubHTTPError = HfHubHTTPError
+    monkeypatch.setitem(sys.modules, "huggingface_hub", hf_hub)
+    monkeypatch.setitem(sys.modules, "huggingface_hub.utils", hf_utils)
+    monkeypatch.delitem(sys.modules, "utils.model_downloader", raising=False)
+    module = importlib.import_module("utils.model_downloader")
+    yield module
+    # Drop the module bound to the stubs; the next import gets the real hub
+    sys.modules.pop("utils.model_downloader", None)
+
+
+def _make_flux(model_downloader, tmp_path):
+    downloader = model_downloader.ModelDownloader(str(tmp_path))
+    model_dir = downloader.get_model_dir("flux")
+    (model_dir / "text_encoder").mkdir(parents=True)
+    (model_dir / "flux1-dev.safetensors").write_bytes(b"weights")
+    (model_dir / "text_encoder" / "model.safetensors").write_bytes(b"clip")
+    return downloader, model_dir
+
+
+def test_write_manifest_records_sizes_and_hashes(model_downloader, tmp_path):
+    downloader, model_dir = _make_flux(model_downloader, tmp_path)
+    (model_dir / ".cache").mkdir()
+    (model_dir / ".cache" / "lock").write_text("x")
+    downloader.write_manifest("flux", with_hashes=True)
+    manifest = json.loads((model_dir / model_downloader.MANIFEST_NAME).read_text())
+    assert set(manifest["files"]) == {
+        "flux1-dev.safetensors",
+        "text_encoder/model.safetensors",
+    }
+    assert manifest["files"]["flux1-dev.safetensors"]["size"] == len(b"weights")
+    assert "sha256" in manifest["files"]["text_encoder/model.safetensors"]
+
+
+def test_check_model_exists_uses_manifest_and_cache(
+    model_downloader, tmp_path, monkeypatch
+):
+    downloader, model_dir = _make_flux(model_downloader, tmp_path)
+    downloader.write_manifest("flux")
+    assert downloader.check_model_exists("flux")
+
+    # A second check with unchanged directories must not re-verify files
+    calls = []
+    monkeypatch.setattr(
+        downloader, "verify_model", lambda *a, **kw: calls.append(a) or []
+    )
+    assert downloader.check_model_exists("flux")
+    assert calls == []
+
+
+def test_missing_file_detected_after_manifest(model_downloader, tmp_path):
+    downloader, model_dir = _make_flux(model_downloader, tmp_path)
+    downloader.write_manifest("flux")
+    assert downloader.check_model_exists("flux")
+    (model_dir / "text_encoder" / "model.safetensors").unlink()
+    assert not downloader.check_model_exists("flux")
+    assert downloader.verify_model("flux") == [
+        "Missing file: text_encoder/model.safetensors"
+    ]
+
+
+def test_verify_model_detects_truncation_and_corruption(model_downloader, tmp_path):
+    downloader, model_dir = _make_flux(model_downloader, tmp_path)
+    downloader.write_manifest("flux", with_hashes=True)
+    (model_dir / "flux1-dev.safetensors").write_bytes(b"weigh")
+    (model_dir / "text_encoder" / "model.safetensors").write_bytes(b"CLIP")
+    problems = downloader.verify_model("flux", check_hashes=True)
+    assert problems == [
+        "Size mismatch for flux1-dev.safetensors: expected 7, got 5",
+        "Checksum mismatch for text_encoder/model.safetensors",
+    ]
+
+
+def test_legacy_install_without_manifest_still_detected(model_downloader, tmp_path):
+    downloader, _ = _make_flux(model_downloader, tmp_path)
+    assert downloader.check_model_exists("flux")
+    assert not downloader.check_model_exists("wan2.2")
+
+
+def test_dedupe_and_collect_garbage(model_downloader, tmp_path):
+    downloader, model_dir = _make_flux(model_downloader, tmp_path)
+    downloader.write_manifest("flux", with_hashes=True)
+    downloader.dedupe_model("flux")
+    assert downloader.check_model_exists("flux")
+
+    # A blob nobody references any more is collected
+    (model_dir / "flux1-dev.safetensors").unlink()
+    downloader.write_manifest("flux", with_hashes=True)
+    removed = downloader.collect_garbage()
+    assert len(removed) == 1
+    assert (model_dir / "text_encoder" / "model.safetensors").read_bytes() == b"clip"
+
+
+def test_dedupe_rehashes_files_changed_since_the_manifest(model_downloader, tmp_path):
+    downloader, model_dir = _make_flux(model_downloader, tmp_path)
+    downloader.dedupe_model("flux")
+
+    # A re-download of the same size replaces the linked file
+    weights = model_dir / "flux1-dev.safetensors"
+    weights.unlink()
+    weights.write_bytes(b"WEIGHTS")
+    st = weights.stat()
+    os.utime(weights, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    downloader.dedupe_model("flux")
+
+    assert weights.read_bytes() == b"WEIGHTS"
+    manifest = downloader.load_manifest("flux")
+    assert (
+        manifest["files"]["flux1-dev.safetensors"]["sha256"]
+        == hashlib.sha256(b"WEIGHTS").hexdigest()
+    )
+
+
+def test_manifest_is_parsed_again_only_when_it_changes(
+    model_downloader, tmp_path, monkeypatch
+):
+    downloader, model_dir = _make_flux(model_downloader, tmp_path)
+    downloader.write_manifest("flux")
+    parsed = []
+    real_loads = json.loads
+    monkeypatch.setattr(
+        model_downloader.json,
+        "loads",
+        lambda text: parsed.append(text) or real_loads(text),
+    )
+    for _ in range(3):
+        assert downloader.check_model_exists("flux")
+    assert parsed == []
+
+    manifest_path = model_dir / model_downloader.MANIFEST_NAME
+    manifest = real_loads(manifest_path.read_text())
+    manifest["files"]["extra.bin"] = {"size": 1}
+    manifest_path.write_text(json.dumps(manifest))
+    assert "extra.bin" in downloader.load_manifest("flux")["files"]
+    downloader.load_manifest("flux")
+    assert len(parsed) == 1
+
+
+def test_download_all_skips_optional_profiles_not_installed(
+    model_downloader, tmp_path, monkeypatch
+):
+    downloader = model_downloader.ModelDownloader(str(tmp_path))
+    requested = []
+    monkeypatch.setattr(
+        downloader,
+        "download_model",
+        lambda name, force=False: requested.append(name) or True,
+    )
+    assert downloader.MODELS_CONFIG["flux-schnell"]["repo_id"].endswith("schnell")
+    downloader.download_all_models()
+    assert requested == ["flux", "wan2.2"]
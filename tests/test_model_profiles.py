@@ -0,0 +1,92 @@
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils.model_profiles import PROFILES, get_profile, guidance_plan  # noqa: E402
+
+
+def test_unknown_profile_falls_back_to_flux_dev():
+    assert get_profile(None).name == "flux"
+    assert get_profile("missing").name == "flux"
+    assert len({profile.local_dir for profile in PROFILES}) == len(PROFILES)
+
+
+def test_schnell_drops_guidance_and_negative_prompt():
+    kwargs = guidance_plan(get_profile("flux-schnell"), "blurry", 7.0, 4).kwargs
+    assert kwargs == {"guidance_scale": 0.0, "max_sequence_length": 256}
+    assert get_profile("flux-schnell").default_steps == 4
+
+
+def test_stable_diffusion_uses_cfg_with_negative_prompt():
+    profile = get_profile("sd15")
+    assert profile.uses_cfg
+    assert guidance_plan(profile, "blurry", 7.5, 20).kwargs == {
+        "guidance_scale": 7.5,
+        "negative_prompt": "blurry",
+    }
+    assert guidance_plan(profile, "", 7.5, 20).kwargs["negative_prompt"] is None
+
+
+def test_guidance_modes_skip_needless_unconditional_passes():
+    flux = guidance_plan(get_profile("flux"), "blurry", 3.5, 28)
+    assert (flux.mode, flux.passes()) == ("distilled", 28)
+    assert "negative_prompt" not in flux.kwargs
+    assert guidance_plan(get_profile("flux-schnell"), "", 7.0, 4).mode == "none"
+
+    sd = get_profile("sd15")
+    full = guidance_plan(sd, "blurry", 7.5, 20)
+    assert (full.mode, full.passes(), full.negative_prompt) == ("cfg", 40, True)
+    low = guidance_plan(sd, "blurry", 1.0, 20)
+    assert (low.mode, low.passes()) == ("cfg-skipped", 20)
+    assert low.kwargs == {"guidance_scale": 1.0}
+    assert guidance_plan(sd, "", 7.5, 20, cfg_fraction=0).mode == "cfg-skipped"
+
+
+def test_partial_cfg_drops_the_unconditional_half_after_the_window():
+    class Embeds:
+        def __init__(self, halves):
+            self.halves = halves
+
+        def chunk(self, n):
+            return [Embeds(1), Embeds(1)]
+
+    class Pipe:
+        _guidance_scale = 7.5
+
+    plan = guidance_plan(get_profile("sd15"), "", 7.5, 10, cfg_fraction=0.4)
+    assert plan.describe() == "partial-cfg (4 of 10 steps)"
+    assert plan.passes() == 14
+    assert plan.tensor_inputs == {
+        "callback_on_step_end_tensor_inputs": ["prompt_embeds"]
+    }
+    seen = []
+    callback = plan.step_end(lambda pipe, step, t, kwargs: seen.append(step) or kwargs)
+    pipe = Pipe()
+    kwargs = {"prompt_embeds": Embeds(2)}
+    for step in range(10):
+        kwargs = callback(pipe, step, None, kwargs)
+        assert pipe._guidance_scale == (7.5 if step < 3 else 0.0)
+    assert kwargs["prompt_embeds"].halves == 1
+    assert seen == list(range(10))
+
+
+def test_download_config_matches_downloader_format():
+    config = get_profile("flux").download_config()
+    assert config["repo_id"] == "black-forest-labs/FLUX.1-dev"
+    assert "flux1-dev.safetensors" in config["files"]
+    assert config["requires_auth"] and not config["optional"]
+
+
+def test_weights_file_skips_the_autoencoder(tmp_path):
+    schnell = get_profile("flux-schnell")
+    assert schnell.weights in schnell.files
+    for name in ("ae.safetensors", "flux1-schnell.safetensors"):
+        (tmp_path / name).write_bytes(b"")
+    assert schnell.weights_file(tmp_path) == tmp_path / "flux1-schnell.safetensors"
+
+    # A custom folder holding one checkpoint under another name
+    (tmp_path / "flux1-schnell.safetensors").rename(tmp_path / "custom.safetensors")
+    assert schnell.weights_file(tmp_path) == tmp_path / "custom.safetensors"
+    (tmp_path / "other.safetensors").write_bytes(b"")
+    assert schnell.weights_file(tmp_path) is None
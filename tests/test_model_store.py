@@ -0,0 +1,55 @@
+import hashlib
+import importlib
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+model_store = importlib.import_module("utils.model_store")
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+
+def test_ingest_deduplicates_shared_files(tmp_path):
+    store = model_store.ModelStore(tmp_path)
+    flux = {
+        "text_encoder/model.safetensors": _write(
+            tmp_path / "Flux" / "text_encoder" / "model.safetensors", b"clip-l"
+        )
+    }
+    sd = {
+        "text_encoder/model.safetensors": _write(
+            tmp_path / "SD" / "text_encoder" / "model.safetensors", b"clip-l"
+        )
+    }
+
+    assert store.ingest(tmp_path / "Flux", flux) == 0
+    assert store.ingest(tmp_path / "SD", sd) == len(b"clip-l")
+
+    a = tmp_path / "Flux" / "text_encoder" / "model.safetensors"
+    b = tmp_path / "SD" / "text_encoder" / "model.safetensors"
+    assert a.read_bytes() == b.read_bytes() == b"clip-l"
+    digest = flux["text_encoder/model.safetensors"]["sha256"]
+    assert store.digest_for(a) == store.digest_for(b) == digest
+    assert len(list(store.blobs_dir.iterdir())) == 1
+
+    # Ingesting again is a no-op
+    assert store.ingest(tmp_path / "SD", sd) == 0
+
+
+def test_collect_garbage_removes_unreferenced_blobs(tmp_path):
+    store = model_store.ModelStore(tmp_path)
+    keep = {"a.bin": _write(tmp_path / "M" / "a.bin", b"keep")}
+    drop = {"b.bin": _write(tmp_path / "M" / "b.bin", b"drop")}
+    store.ingest(tmp_path / "M", {**keep, **drop})
+
+    referenced = [keep["a.bin"]["sha256"]]
+    assert store.collect_garbage(referenced, dry_run=True) == [drop["b.bin"]["sha256"]]
+    assert store.blob_path(drop["b.bin"]["sha256"]).exists()
+    store.collect_garbage(referenced)
+    assert not store.blob_path(drop["b.bin"]["sha256"]).exists()
+    assert store.blob_path(keep["a.bin"]["sha256"]).exists()
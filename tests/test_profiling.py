@@ -0,0 +1,42 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import profiling  # noqa: E402
+
+
+def test_request_is_taken_once(tmp_path):
+    request = profiling.ProfileRequest(str(tmp_path / "job"), steps=2)
+    profiling.request_profile(request)
+    assert profiling.take_request() == request
+    assert profiling.take_request() is None
+
+
+def test_capture_without_request_is_a_no_op():
+    with profiling.capture(None) as profiler:
+        profiling.step()
+    assert profiler is None
+
+
+def test_capture_records_a_window_of_steps(tmp_path):
+    torch = pytest.importorskip("torch")
+    if not hasattr(torch, "profiler"):
+        pytest.skip("torch.profiler is unavailable")
+    prefix = str(tmp_path / "out" / "image")
+    request = profiling.ProfileRequest(prefix, steps=2, skip=1)
+    x = torch.randn(64, 64)
+    with profiling.capture(request) as profiler:
+        for _ in range(5):
+            x = torch.mm(x, x).tanh()
+            profiling.step()
+
+    assert profiler.outputs == [f"{prefix}.profile.json", f"{prefix}.ops.txt"]
+    summary = pathlib.Path(prefix + ".ops.txt").read_text()
+    assert "self CPU time" in summary
+    assert "aten::mm" in summary
+    assert pathlib.Path(prefix + ".profile.json").stat().st_size > 0
+    # Outside the block nothing is profiled any more
+    profiling.step()
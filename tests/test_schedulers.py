@@ -0,0 +1,92 @@
+import pathlib
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import schedulers  # noqa: E402
+
+
+class FakeScheduler:
+    def __init__(self, **config):
+        self.config = config
+
+    @classmethod
+    def from_config(cls, config, **overrides):
+        return cls(**{**config, **overrides})
+
+
+class FlowMatchEulerDiscreteScheduler(FakeScheduler):
+    pass
+
+
+class DPMSolverMultistepScheduler(FakeScheduler):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fake_diffusers(monkeypatch):
+    module = types.ModuleType("diffusers")
+    module.FlowMatchEulerDiscreteScheduler = FlowMatchEulerDiscreteScheduler
+    module.DPMSolverMultistepScheduler = DPMSolverMultistepScheduler
+    monkeypatch.setitem(sys.modules, "diffusers", module)
+
+
+def test_unknown_name_falls_back_to_default():
+    assert schedulers.get_scheduler(None).name == "default"
+    assert schedulers.get_scheduler("no-such-sampler").name == "default"
+    assert all(spec.min_steps > 0 for spec in schedulers.SCHEDULERS)
+
+
+def test_schedulers_for_lists_the_family_and_the_model_default():
+    from utils.model_profiles import get_profile
+
+    flow = schedulers.schedulers_for(get_profile("flux").scheduler_family)
+    assert flow[0].name == "default"
+    assert {spec.family for spec in flow[1:]} == {schedulers.FLOW}
+    epsilon = schedulers.schedulers_for(get_profile("sd15").scheduler_family)
+    assert "unipc" in [spec.name for spec in epsilon]
+    assert len(flow) + len(epsilon) == len(schedulers.SCHEDULERS) + 1
+
+
+def test_swaps_scheduler_from_base_config_and_restores_default():
+    base = FlowMatchEulerDiscreteScheduler(shift=3.0, use_dynamic_shifting=True)
+    pipe = types.SimpleNamespace(scheduler=base)
+
+    spec = schedulers.get_scheduler("flow_euler_karras")
+    schedulers.apply_scheduler(pipe, base, spec)
+    assert isinstance(pipe.scheduler, FlowMatchEulerDiscreteScheduler)
+    assert pipe.scheduler is not base
+    assert pipe.scheduler.config == {
+        "shift": 3.0,
+        "use_dynamic_shifting": True,
+        "use_karras_sigmas": True,
+    }
+
+    schedulers.apply_scheduler(pipe, base, schedulers.get_scheduler("default"))
+    assert pipe.scheduler is base
+
+
+def test_rejects_scheduler_from_other_model_family():
+    base = FlowMatchEulerDiscreteScheduler()
+    pipe = types.SimpleNamespace(scheduler=base)
+    with pytest.raises(ValueError, match="does not work with"):
+        schedulers.apply_scheduler(pipe, base, schedulers.get_scheduler("dpmpp_2m"))
+    assert pipe.scheduler is base
+
+
+def test_reports_scheduler_missing_from_diffusers():
+    base = FlowMatchEulerDiscreteScheduler()
+    pipe = types.SimpleNamespace(scheduler=base)
+    with pytest.raises(ValueError, match="newer diffusers"):
+        schedulers.apply_scheduler(pipe, base, schedulers.get_scheduler("flow_lcm"))
+
+
+def test_epsilon_models_accept_dpm_solver():
+    base = FakeScheduler(prediction_type="epsilon")
+    pipe = types.SimpleNamespace(scheduler=base)
+    schedulers.apply_scheduler(pipe, base, schedulers.get_scheduler("dpmpp_2m"))
+    assert isinstance(pipe.scheduler, DPMSolverMultistepScheduler)
+    assert pipe.scheduler.config["algorithm_type"] == "dpmsolver++"
@@ -1,8 +1,12 @@
 import importlib
+import os
 import pathlib
 import sys
+import tempfile
 import types
 
+import pytest
+
 
 # Stub QSettings with in-memory dictionary
 class FakeQSettings:
@@ -15,6 +19,9 @@ class FakeQSettings:
     def setValue(self, key, value):
         self.store[key] = value
 
+    def allKeys(self):
+        return list(self.store)
+
 
 pyqt5 = types.ModuleType("PyQt5")
 qtcore = types.ModuleType("PyQt5.QtCore")
@@ -22,8 +29,12 @@ qtcore.QSettings = FakeQSettings
 sys.modules["PyQt5"] = pyqt5
 sys.modules["PyQt5.QtCore"] = qtcore
 
+# Keep the shared settings file out of the user's config directory
+os.environ["FLUXWAN_SETTINGS_FILE"] = os.path.join(tempfile.mkdtemp(), "settings.toml")
+
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
 
+settings_backends = importlib.import_module("utils.settings_backends")
 settings_manager = importlib.reload(importlib.import_module("utils.settings_manager"))
 
 
@@ -41,3 +52,73 @@ def test_model_device_and_output_dir():
     assert sm.get_device() == "cuda"
     sm.set_output_dir("/tmp")
     assert sm.get_output_dir() == "/tmp"
+
+
+def test_writes_are_coalesced_until_flush(tmp_path):
+    backend = settings_backends.TomlFileBackend(tmp_path / "settings.toml")
+    sm = settings_manager.SettingsManager(backend, flush_delay=60)
+    sm.set_device("cuda:0")
+    sm.set_model_path("flux", "/models/flux")
+    assert sm.get_device() == "cuda:0"
+    assert not backend.exists()
+    sm.flush()
+    assert backend.load() == {"device": "cuda:0", "models/flux": "/models/flux"}
+
+
+def test_second_manager_sees_other_writers(tmp_path):
+    path = tmp_path / "settings.toml"
+    gui = settings_manager.SettingsManager(
+        settings_backends.TomlFileBackend(path), flush_delay=0
+    )
+    headless = settings_manager.SettingsManager(
+        settings_backends.TomlFileBackend(path), flush_delay=0
+    )
+    assert headless.get_output_dir() == "."
+    gui.set_output_dir("/renders")
+    gui.set_model_path("flux", 'C:\\models\\"flux"')
+    headless.reload()
+    assert headless.get_output_dir() == "/renders"
+    assert headless.get_model_path("flux") == 'C:\\models\\"flux"'
+
+
+def test_env_overrides_and_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv("FLUXWAN_DEVICE", "cuda:1")
+    monkeypatch.setenv("FLUXWAN_MODELS__WAN", "/env/wan")
+    backend = settings_backends.TomlFileBackend(tmp_path / "settings.toml")
+    sm = settings_manager.SettingsManager(backend, flush_delay=0)
+    sm.set_device("cpu")
+    sm.set_model_path("flux", "/models/flux")
+    assert sm.get_device() == "cuda:1"
+    assert backend.load()["device"] == "cpu"
+    snapshot = sm.snapshot()
+    assert snapshot.device == "cuda:1"
+    assert snapshot.models == {"flux": "/models/flux", "wan": "/env/wan"}
+
+
+def test_unstorable_values_are_rejected(tmp_path):
+    backend = settings_backends.TomlFileBackend(tmp_path / "settings.toml")
+    sm = settings_manager.SettingsManager(backend, flush_delay=60)
+    with pytest.raises(TypeError):
+        sm.set("window/geometry", object())
+    sm.set("device", "cuda")
+    sm.flush()
+    assert backend.load() == {"device": "cuda"}
+
+
+def test_flush_drops_values_the_backend_rejects(tmp_path, caplog):
+    class PickyBackend(settings_backends.TomlFileBackend):
+        def save(self, changes):
+            if "bad" in changes:
+                raise TypeError("Cannot store this")
+            return super().save(changes)
+
+    backend = PickyBackend(tmp_path / "settings.toml")
+    sm = settings_manager.SettingsManager(backend, flush_delay=60)
+    sm.set("bad", "value")
+    sm.set("device", "cuda")
+    sm.flush()
+    assert backend.load() == {"device": "cuda"}
+    assert sm.get("bad") is None
+    assert "Dropping setting bad" in caplog.text
+    # Nothing is left queued to fail again
+    assert sm._store._pending == {}
@@ -0,0 +1,179 @@
+import csv
+import importlib
+import pathlib
+import sys
+import types
+
+import pytest
+
+
+# ---- Stub torch generators ----
+class FakeGenerator:
+    def __init__(self, device="cpu"):
+        self.seed = None
+
+    def manual_seed(self, seed):
+        self.seed = seed
+        return self
+
+
+@pytest.fixture(autouse=True)
+def fake_torch(monkeypatch):
+    monkeypatch.setitem(
+        sys.modules, "torch", types.SimpleNamespace(Generator=FakeGenerator)
+    )
+
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from workers.params import ImageParams  # noqa: E402
+
+sweep = importlib.import_module("workers.sweep")
+
+
+class FakeImage:
+    def __init__(self, seed):
+        self.seed = seed
+
+    def save(self, path):
+        pathlib.Path(path).write_text(str(self.seed))
+
+
+class FakeFluxPipe:
+    """Records calls; accepts pre-encoded prompts like FluxPipeline."""
+
+    def __init__(self, max_batch=None):
+        self.calls = []
+        self.encode_calls = []
+        # Larger batches raise an out-of-memory error
+        self.max_batch = max_batch
+
+    def encode_prompt(
+        self, prompt, prompt_2, num_images_per_prompt=1, max_sequence_length=512
+    ):
+        self.encode_calls.append(num_images_per_prompt)
+        return ("embeds", num_images_per_prompt), "pooled", "ids"
+
+    def __call__(
+        self,
+        prompt=None,
+        prompt_embeds=None,
+        pooled_prompt_embeds=None,
+        width=None,
+        height=None,
+        num_inference_steps=None,
+        guidance_scale=None,
+        generator=None,
+        callback_on_step_end=None,
+    ):
+        if self.max_batch and len(generator) > self.max_batch:
+            raise MemoryError("CUDA out of memory")
+        self.calls.append((num_inference_steps, guidance_scale, len(generator)))
+        for step in range(num_inference_steps):
+            callback_on_step_end(self, step, None, {})
+        return types.SimpleNamespace(images=[FakeImage(g.seed) for g in generator])
+
+
+def _base():
+    return ImageParams(width=64, height=64, steps=4, guidance=3.5)
+
+
+def test_parse_sweep_spec_ranges_and_lists():
+    axes = sweep.parse_sweep_spec("steps=10:30:10; guidance=3,4.5; seed=0:2")
+    assert axes == {"steps": [10, 20, 30], "guidance": [3.0, 4.5], "seed": [0, 1, 2]}
+
+
+@pytest.mark.parametrize("spec", ["sampler=euler", "steps=", "steps=5:1:0"])
+def test_parse_sweep_spec_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        sweep.parse_sweep_spec(spec)
+
+
+def test_expand_and_batch_by_seed():
+    cells = sweep.expand_sweep(_base(), {"steps": [2, 4], "seed": [0, 1, 2]})
+    assert [(c.params.steps, c.seed) for c in cells] == [
+        (2, 0),
+        (2, 1),
+        (2, 2),
+        (4, 0),
+        (4, 1),
+        (4, 2),
+    ]
+    batches = sweep.plan_batches(cells, max_batch=2)
+    assert [[c.index for c in b] for b in batches] == [[0, 1], [2], [3, 4], [5]]
+
+
+def test_run_sweep_reuses_prompt_embeddings(tmp_path):
+    pipe = FakeFluxPipe()
+    axes = {"steps": [2, 3], "guidance": [1.0, 2.0], "seed": [7, 8]}
+    cells = sweep.expand_sweep(_base(), axes)
+    progress = []
+    rendered = sweep.run_sweep(pipe, "a cat", "", cells, progress=progress.append)
+
+    # 8 images in 4 batched calls with a single prompt encoding
+    assert len(rendered) == 8
+    assert len(pipe.calls) == 4
+    assert pipe.encode_calls == [2]
+    assert [c.image.seed for c in rendered] == [7, 8] * 4
+    assert progress[-1] == 100
+
+    sweep.save_images(rendered, tmp_path)
+    sweep.write_timings_csv(rendered, tmp_path / "timings.csv")
+    with open(tmp_path / "timings.csv") as fh:
+        rows = list(csv.DictReader(fh))
+    assert len(rows) == 8
+    assert rows[0]["seed"] == "7" and rows[0]["batch_size"] == "2"
+    assert (tmp_path / "cell_0007.png").read_text() == "8"
+
+
+def test_run_sweep_stops_between_batches():
+    pipe = FakeFluxPipe()
+    cells = sweep.expand_sweep(_base(), {"steps": [1, 2, 3]})
+    rendered = sweep.run_sweep(
+        pipe, "p", "", cells, should_stop=lambda: len(pipe.calls) >= 1
+    )
+    assert [c.index for c in rendered] == [0]
+
+
+def test_run_sweep_splits_batches_that_run_out_of_memory(monkeypatch):
+    monkeypatch.setitem(
+        sys.modules,
+        "torch",
+        types.SimpleNamespace(
+            Generator=FakeGenerator,
+            cuda=types.SimpleNamespace(
+                OutOfMemoryError=MemoryError, empty_cache=lambda: None
+            ),
+        ),
+    )
+    execution_plans = importlib.import_module("utils.execution_plans")
+    settings = types.SimpleNamespace(get=lambda key, default=None: None)
+    settings.set = lambda key, value: None
+    monkeypatch.setattr(execution_plans.PlanMemory, "_plans", {})
+    monkeypatch.setattr(execution_plans.PlanMemory, "_settings_manager", settings)
+
+    pipe = FakeFluxPipe(max_batch=2)
+    plans = []
+    cells = sweep.expand_sweep(_base(), {"seed": [0, 1, 2, 3]})
+    rendered = sweep.run_sweep(
+        None,
+        "p",
+        "",
+        cells,
+        max_batch=4,
+        pipeline_for=lambda plan: plans.append(plan.name) or pipe,
+    )
+    assert plans == ["default", "smaller_batch"]
+    assert [call[2] for call in pipe.calls] == [2, 2]
+    assert [c.image.seed for c in rendered] == [0, 1, 2, 3]
+    assert {c.batch_size for c in rendered} == {2}
+
+
+def test_contact_sheet_layout(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    pytest.importorskip("PIL.ImageDraw")
+    cells = sweep.expand_sweep(_base(), {"steps": [1, 2], "seed": [0, 1, 2]})
+    for cell in cells:
+        cell.image = Image.new("RGB", (64, 64), "red")
+    sweep.write_contact_sheet(cells, tmp_path / "sheet.png", cell_size=32)
+    with Image.open(tmp_path / "sheet.png") as sheet:
+        assert sheet.size == (180 + 3 * 32, 20 + 2 * 32)
@@ -0,0 +1,141 @@
+import pathlib
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from workers import tiled  # noqa: E402
+from workers.params import ImageParams  # noqa: E402
+
+try:
+    import torch
+
+    if not hasattr(torch, "randn"):
+        # Replaced by the stubs of another test module
+        torch = None
+except ImportError:
+    torch = None
+
+needs_torch = pytest.mark.skipif(torch is None, reason="PyTorch is not installed")
+
+
+def test_canvas_size_rounds_down_to_multiple_of_16():
+    assert tiled.canvas_size(8200, 4100) == (8192, 4096)
+    assert tiled.canvas_size(8, 4096) == (16, 4096)
+
+
+def test_latent_tiles_overlap_in_latent_space():
+    tiles = tiled.latent_tiles(2048, 1024, 1024, 256)
+    assert tiles == [(0, 0, 128, 128), (64, 0, 192, 128), (128, 0, 256, 128)]
+    with pytest.raises(ValueError):
+        tiled.latent_tiles(2048, 1024, 1000, 256)
+
+
+def test_decode_tiles_cover_canvas_once_with_context():
+    pairs = tiled.decode_tiles(2048, 1536, 1024)
+    boxes = [box for box, _ in pairs]
+    assert boxes == [
+        (0, 0, 128, 128),
+        (128, 0, 256, 128),
+        (0, 128, 128, 192),
+        (128, 128, 256, 192),
+    ]
+    assert pairs[0][1] == (0, 0, 136, 136)
+    assert pairs[3][1] == (120, 120, 256, 192)
+
+
+class FakeScheduler:
+    init_noise_sigma = 0.0
+
+    def set_timesteps(self, steps, device=None):
+        self.timesteps = torch.arange(steps, 0, -1)
+
+    def scale_model_input(self, sample, timestep):
+        return sample
+
+    def step(self, model_output, timestep, sample, return_dict=True):
+        return (sample - model_output,)
+
+
+class FakeUNet:
+    dtype = torch.float32 if torch else None
+    config = types.SimpleNamespace(in_channels=4)
+
+    def __init__(self):
+        self.shapes = []
+
+    def __call__(self, sample, timestep, encoder_hidden_states, return_dict):
+        self.shapes.append(tuple(sample.shape))
+        return (torch.full_like(sample, -0.25),)
+
+
+class FakeVAE:
+    dtype = torch.float32 if torch else None
+    config = types.SimpleNamespace(scaling_factor=1.0, shift_factor=None)
+
+    def __init__(self):
+        self.shapes = []
+
+    def decode(self, z, return_dict=True):
+        self.shapes.append(tuple(z.shape))
+        pixels = z[:, :3].repeat_interleave(8, dim=2).repeat_interleave(8, dim=3)
+        return (pixels,)
+
+
+class FakeSDPipe:
+    _execution_device = "cpu"
+
+    def __init__(self):
+        self.scheduler = FakeScheduler()
+        self.unet = FakeUNet()
+        self.vae = FakeVAE()
+
+    def encode_prompt(self, prompt, device, count, cfg, negative_prompt=None):
+        embeds = torch.zeros(1, 77, 8)
+        return embeds, embeds if cfg else None
+
+
+def sd_params(**kwargs):
+    return ImageParams(
+        width=2048,
+        height=1024,
+        steps=2,
+        guidance=7.0,
+        profile="sd15",
+        seed=0,
+        **kwargs,
+    )
+
+
+@needs_torch
+def test_generate_tiled_averages_overlaps_and_streams_tiles(tmp_path):
+    np = pytest.importorskip("numpy")
+    pipe = FakeSDPipe()
+    progress = []
+    path = str(tmp_path / "canvas.npy")
+    assert (
+        tiled.generate_tiled(pipe, "p", "", sd_params(), path, progress=progress.append)
+        == path
+    )
+
+    # Three 1024 px tiles per step, each with the negative prompt batched in
+    assert pipe.unet.shapes == [(2, 4, 128, 128)] * 6
+    assert len(pipe.vae.shapes) == 2
+    assert progress[-1] == 100
+    image = np.load(path)
+    assert image.shape == (1024, 2048, 3)
+    # Two steps of -0.25 averaged over every overlap: 0.5 -> 191 everywhere
+    assert (image == 191).all()
+    assert (tmp_path / "canvas.x4.npy").is_file()
+
+
+@needs_torch
+def test_generate_tiled_stop_leaves_no_file(tmp_path):
+    path = tmp_path / "canvas.npy"
+    result = tiled.generate_tiled(
+        FakeSDPipe(), "p", "", sd_params(), str(path), should_stop=lambda: True
+    )
+    assert result is None
+    assert not path.exists()
@@ -0,0 +1,66 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import tiled_image  # noqa: E402
+
+np = pytest.importorskip("numpy")
+
+
+def make_image(tmp_path, width, height):
+    path = str(tmp_path / "canvas.npy")
+    pixels = np.random.default_rng(0).integers(
+        0, 256, (height, width, 3), dtype=np.uint8
+    )
+    image = tiled_image.create_image(path, width, height)
+    image[:] = pixels
+    image.flush()
+    del image
+    return path, pixels
+
+
+def test_overviews_shrink_until_small(tmp_path):
+    path, pixels = make_image(tmp_path, 4000, 1200)
+    written = tiled_image.build_overviews(path)
+    assert [p.name for p in written] == ["canvas.x4.npy"]
+    overview = np.load(written[0])
+    assert overview.shape == (300, 1000, 3)
+    expected = (pixels[:4, :4].reshape(16, 3).sum(axis=0) + 8) // 16
+    assert (overview[0, 0] == expected).all()
+
+
+def test_read_picks_coarsest_level_with_enough_detail(tmp_path):
+    path, pixels = make_image(tmp_path, 4000, 1200)
+    tiled_image.build_overviews(path)
+    image = tiled_image.TiledImage(path)
+    assert [factor for factor, _ in image.levels] == [1, 4]
+    assert (image.width, image.height) == (4000, 1200)
+
+    region = image.read((100, 200, 500, 400))
+    assert (region == pixels[200:400, 100:500]).all()
+    assert image.read((0, 0, 4000, 1200), step=2).shape == (600, 2000, 3)
+    # Step 8 reads every second pixel of the x4 overview
+    assert image.read((0, 0, 4000, 1200), step=8).shape == (150, 500, 3)
+
+
+def test_visible_region_clips_to_image():
+    box, step = tiled_image.visible_region((8000, 4000), (800, 600), 0.1, (0, 0))
+    assert box == (0, 0, 8000, 4000)
+    assert step == 10
+    box, step = tiled_image.visible_region((8000, 4000), (800, 600), 2.0, (7800, -100))
+    assert box == (7800, 0, 8000, 200)
+    assert step == 1
+
+
+def test_export_tiff_writes_tiled_copy(tmp_path):
+    tifffile = pytest.importorskip("tifffile")
+    path, pixels = make_image(tmp_path, 700, 300)
+    out = tiled_image.export_tiff(path, str(tmp_path / "canvas.tif"), tile=256)
+    with tifffile.TiffFile(out) as tif:
+        page = tif.pages[0]
+        assert page.is_tiled
+        assert (page.tilewidth, page.tilelength) == (256, 256)
+        assert (page.asarray() == pixels).all()
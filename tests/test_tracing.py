@@ -0,0 +1,118 @@
+import json
+import pathlib
+import sys
+import threading
+import types
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import tracing  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def reset_tracing():
+    yield
+    tracing.configure(False)
+    tracing._local.trace = None
+
+
+def test_disabled_tracing_is_a_no_op():
+    assert tracing.start_trace("image") is None
+    assert tracing.span("stage") is tracing.span("other")
+    with tracing.span("stage"):
+        pass
+    tracing.record("phase", 0, 1)
+    assert tracing.current() is None
+
+
+def test_spans_export_as_chrome_trace(tmp_path):
+    tracing.configure(True, str(tmp_path))
+    trace = tracing.start_trace("image")
+    with tracing.span("job"):
+        with tracing.span("load", cached=True):
+            pass
+    start = tracing.clock()
+    tracing.record("script_startup", start, start + 5, cat="subprocess")
+
+    def display():
+        with tracing.bind(trace), tracing.span("QPixmap.scaled"):
+            pass
+        with tracing.span("unbound"):
+            pass
+
+    thread = threading.Thread(target=display, name="gui")
+    thread.start()
+    thread.join()
+    path = tracing.stop_trace(trace)
+
+    assert tracing.current() is None
+    assert pathlib.Path(path).parent == tmp_path
+    data = json.loads(pathlib.Path(path).read_text())
+    spans = {e["name"]: e for e in data["traceEvents"] if e["ph"] == "X"}
+    assert set(spans) == {"job", "load", "script_startup", "QPixmap.scaled"}
+    assert spans["load"]["args"] == {"cached": True}
+    job, load = spans["job"], spans["load"]
+    assert job["ts"] <= load["ts"]
+    assert load["ts"] + load["dur"] <= job["ts"] + job["dur"]
+    assert spans["script_startup"]["dur"] == pytest.approx(5)
+    assert spans["QPixmap.scaled"]["tid"] != job["tid"]
+    names = {
+        e["args"]["name"] for e in data["traceEvents"] if e["name"] == "thread_name"
+    }
+    assert "gui" in names
+
+
+@pytest.mark.parametrize(
+    "cuda", [None, types.SimpleNamespace(), types.SimpleNamespace(is_available=bool)]
+)
+def test_sync_device_tolerates_torch_without_cuda(monkeypatch, cuda):
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(cuda=cuda))
+    tracing._sync_device()
+
+
+def test_instrument_pipeline_records_stages_and_restores(monkeypatch):
+    # Whatever torch other tests installed, there is no GPU to wait for
+    monkeypatch.setitem(
+        sys.modules,
+        "torch",
+        types.SimpleNamespace(cuda=types.SimpleNamespace(is_available=lambda: False)),
+    )
+    encode = lambda prompt: "embeds"  # noqa: E731
+    pipe = types.SimpleNamespace(
+        encode_prompt=encode,
+        vae=types.SimpleNamespace(decode=lambda latents: "pixels"),
+    )
+
+    def run():
+        pipe.encode_prompt("a cat")
+        for i in range(3):
+            steps.step(i)
+        pipe.vae.decode(None)
+
+    tracing.configure(True)
+    trace = tracing.start_trace("image")
+    with tracing.instrument_pipeline(pipe) as steps:
+        run()
+    tracing.stop_trace(trace)
+
+    names = [e["name"] for e in trace.events()]
+    assert names == ["text_encode"] + ["denoise_step"] * 3 + ["vae_decode"]
+    assert [e["args"]["step"] for e in trace.events()[1:4]] == [0, 1, 2]
+    assert pipe.encode_prompt is encode
+    assert pipe.vae.decode(None) == "pixels"
+    assert not trace.events()[-1].get("args")
+
+
+def test_traced_decorator_records_calls():
+    @tracing.traced("load")
+    def load(x):
+        return x * 2
+
+    assert load(2) == 4
+    tracing.configure(True)
+    trace = tracing.start_trace("image")
+    assert load(3) == 6
+    tracing.stop_trace(trace)
+    assert [e["name"] for e in trace.events()] == ["load"]
@@ -0,0 +1,91 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils import video_encoder  # noqa: E402
+
+# Stands in for ffmpeg: counts the bytes on stdin and writes the count and
+# the arguments to the output file (the last argument)
+FAKE_FFMPEG = """#!{python}
+import sys
+data = sys.stdin.buffer.read()
+if "--fail" in sys.argv:
+    sys.stderr.write("Unknown encoder")
+    sys.exit(1)
+with open(sys.argv[-1], "w") as fh:
+    fh.write(str(len(data)) + "\\n" + " ".join(sys.argv[1:-1]))
+"""
+
+
+class Frame:
+    def __init__(self, width, height, value=0):
+        self.shape = (height, width, 3)
+        self._data = bytes([value]) * (width * height * 3)
+
+    def tobytes(self):
+        return self._data
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    exe = tmp_path / "ffmpeg"
+    exe.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    exe.chmod(0o755)
+    monkeypatch.setattr(video_encoder, "find_ffmpeg", lambda: str(exe))
+    return exe
+
+
+def test_ffmpeg_command_options():
+    settings = video_encoder.EncoderSettings(codec="libx265", crf=23)
+    cmd = video_encoder.ffmpeg_command("ffmpeg", "out.mp4", 64, 48, 24, settings)
+    assert cmd[cmd.index("-s") + 1] == "64x48"
+    assert cmd[cmd.index("-r") + 1] == "24"
+    assert cmd[cmd.index("-c:v") + 1] == "libx265"
+    assert cmd[cmd.index("-crf") + 1] == "23"
+    assert "-vf" not in cmd
+    assert cmd[-1] == "out.mp4"
+
+    odd = video_encoder.ffmpeg_command(
+        "ffmpeg", "out.mp4", 63, 48, 24, video_encoder.EncoderSettings()
+    )
+    assert "-vf" in odd
+
+
+def test_encode_frames_streams_every_frame(fake_ffmpeg, tmp_path):
+    produced = []
+
+    def frames():
+        for i in range(5):
+            produced.append(i)
+            yield Frame(4, 2, value=i)
+
+    out = tmp_path / "clip.mp4"
+    assert video_encoder.encode_frames(frames(), str(out), fps=12) == 5
+    size, args = out.read_text().splitlines()
+    assert int(size) == 5 * 4 * 2 * 3
+    assert "-crf 18" in args and "-pix_fmt yuv420p" in args
+    assert produced == list(range(5))
+
+
+def test_encode_frames_without_frames_writes_nothing(fake_ffmpeg, tmp_path):
+    out = tmp_path / "clip.mp4"
+    assert video_encoder.encode_frames(iter(()), str(out), fps=12) == 0
+    assert not out.exists()
+
+
+def test_writer_rejects_wrong_frame_size(fake_ffmpeg, tmp_path):
+    out = tmp_path / "clip.mp4"
+    with pytest.raises(ValueError, match="expected 4x2 RGB"):
+        video_encoder.encode_frames([Frame(4, 2), Frame(2, 2)], str(out), fps=12)
+    assert not out.exists()
+
+
+def test_writer_reports_ffmpeg_errors(fake_ffmpeg, tmp_path):
+    settings = video_encoder.EncoderSettings(codec="--fail")
+    with pytest.raises(RuntimeError, match="Unknown encoder"):
+        video_encoder.encode_frames(
+            [Frame(2, 2)], str(tmp_path / "clip.mp4"), fps=12, settings=settings
+        )
@@ -33,6 +33,11 @@ class QImage:
         self.height = height
         self.fmt = fmt
 
+    def save(self, path):
+        with open(path, "wb") as fh:
+            fh.write(b"png")
+        return True
+
 
 pyqt5 = types.ModuleType("PyQt5")
 qtcore = types.ModuleType("PyQt5.QtCore")
@@ -58,6 +63,7 @@ def empty_cache():
 empty_cache.called = False  # type: ignore[attr-defined]
 
 fake_torch = types.SimpleNamespace(
+    device=str,
     float16="float16",
     float32="float32",
     cuda=types.SimpleNamespace(
@@ -93,11 +99,13 @@ sys.modules.setdefault("PIL.Image", image_mod)
 # ---- Stub utils.model_manager ----
 class FakePipeline:
     def __call__(self, **kwargs):
-        callback = kwargs.get("callback")
+        # FluxPipeline has no legacy ``callback``/``callback_steps`` arguments
+        assert "callback" not in kwargs and "callback_steps" not in kwargs
+        callback = kwargs.get("callback_on_step_end")
         steps = kwargs.get("num_inference_steps", 0)
         for i in range(steps):
             if callback:
-                callback(i, None, None)
+                callback(self, i, None, {})
         return types.SimpleNamespace(images=[DummyImage()])
 
 
@@ -110,9 +118,26 @@ sys.modules["utils.model_manager"] = fake_model_manager
 
 # ---- Import workers module ----
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+# Another test module may have replaced the workers with stand-ins
+sys.modules.pop("workers.image_and_video_workers", None)
 from workers.params import ImageParams, VideoParams
 
 workers = importlib.import_module("workers.image_and_video_workers")
+execution_plans = importlib.import_module("utils.execution_plans")
+
+
+class DummySettings:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key, default=None):
+        return self.store.get(key, default)
+
+    def set(self, key, value):
+        self.store[key] = value
+
+
+execution_plans.PlanMemory._settings_manager = DummySettings()
 
 
 # ---- Tests for ImageWorker ----
@@ -130,6 +155,19 @@ def test_image_worker_emits_progress_and_result():
     assert empty_cache.called
 
 
+def test_image_worker_saves_the_result(tmp_path):
+    params = ImageParams(width=1, height=1, steps=1, guidance=1)
+    path = str(tmp_path / "out" / "image.png")
+    worker = workers.ImageWorker("prompt", "", params, output_path=path)
+    worker.progress = DummySignal()
+    worker.result = DummySignal()
+    worker.error = DummySignal()
+    workers.ImageWorker.run(worker)
+    assert worker.error.emitted == []
+    assert len(worker.result.emitted) == 1
+    assert os.path.exists(path) and worker.saved_path == path
+
+
 def test_image_worker_passes_quantized_flag():
     captured_params = {}
     fake_model_manager.ModelManager.get_flux_pipeline = (
@@ -162,75 +200,204 @@ def test_image_worker_emits_error_on_failure():
     assert worker.error.emitted and "Runtime error" in worker.error.emitted[0]
 
 
+def test_image_worker_recovers_from_injected_oom():
+    plans = []
+
+    class OomPipeline(FakePipeline):
+        def __init__(self, plan):
+            self.plan = plan
+
+        def __call__(self, **kwargs):
+            if self.plan != "sequential_offload":
+                raise DummyOOM("CUDA out of memory")
+            return super().__call__(**kwargs)
+
+    def get_pipeline(params):
+        plans.append(params["execution_plan"])
+        return OomPipeline(params["execution_plan"])
+
+    fake_model_manager.ModelManager.get_flux_pipeline = get_pipeline
+    execution_plans.PlanMemory._plans = {}
+    params = ImageParams(width=8, height=8, steps=1, guidance=1, model_path="m")
+    worker = workers.ImageWorker("prompt", "", params)
+    worker.progress = DummySignal()
+    worker.result = DummySignal()
+    worker.error = DummySignal()
+    workers.ImageWorker.run(worker)
+    assert plans == ["default", "vae_tiling", "sequential_offload"]
+    assert len(worker.result.emitted) == 1
+    assert worker.error.emitted == []
+
+    # The next job at this resolution starts on the plan that worked
+    plans.clear()
+    workers.ImageWorker.run(worker)
+    assert plans == ["sequential_offload"]
+
+
 # ---- Tests for VideoWorker ----
-def test_video_worker_builds_command_and_emits_progress(tmp_path):
-    captured_cmd = []
+class FakeWanPipeline:
+    _execution_device = "cpu"
 
-    def fake_popen(cmd, stdout, stderr, text):
-        captured_cmd.append(cmd)
+    def __init__(self):
+        self.calls = []
+        self.text_encoder = types.SimpleNamespace(
+            parameters=lambda: iter([types.SimpleNamespace(device="cpu")])
+        )
 
-        class Proc:
-            returncode = 0
-            stdout = ["Progress: 10%\n", "Progress: 100%\n"]
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        self._interrupt = False
+        callback = kwargs["callback_on_step_end"]
+        for i in range(kwargs["num_inference_steps"]):
+            if self._interrupt:
+                continue
+            callback(self, i, None, {})
+        return types.SimpleNamespace(frames=f"latents({kwargs['num_frames']})")
 
-            def __enter__(self):
-                return self
 
-            def __exit__(self, *args):
-                return False
+def install_wan(tmp_path, pipe, diffusers_layout=True):
+    if diffusers_layout:
+        (tmp_path / "model_index.json").write_text("{}")
+    requested = []
 
-            def kill(self):
-                pass
+    def get_wan_pipeline(params):
+        requested.append(params)
+        return pipe
 
-        return Proc()
+    fake_model_manager.ModelManager.get_wan_model_path = lambda: str(tmp_path)
+    fake_model_manager.ModelManager.get_wan_pipeline = get_wan_pipeline
+    return requested
 
-    subprocess = importlib.import_module("subprocess")
-    subprocess.Popen = fake_popen
 
-    params = VideoParams(
-        width=1,
-        height=1,
-        frames=1,
-        steps=1,
-        offload=True,
-        t5_cpu=True,
-        precision="fp16",
-    )
-    worker = workers.VideoWorker("hello", "", params)
+def make_video_worker(params, prompt="hello"):
+    worker = workers.VideoWorker(prompt, "", params)
     worker.progress = DummySignal()
     worker.finished = DummySignal()
     worker.error = DummySignal()
+    return worker
+
+
+def test_video_worker_runs_diffusers_pipeline(tmp_path, monkeypatch):
+    video = importlib.import_module("workers.video")
+    saved = []
+    monkeypatch.setattr(
+        video, "decode_frames", lambda pipe, latents: iter(["decoded", latents])
+    )
+    monkeypatch.setattr(
+        video,
+        "save_video",
+        lambda frames, path, fps, settings: saved.append(
+            (list(frames), path, fps, settings.crf)
+        ),
+    )
+    pipe = FakeWanPipeline()
+    requested = install_wan(tmp_path, pipe)
+    out = tmp_path / "clip.mp4"
+    params = VideoParams(
+        width=500,
+        height=480,
+        frames=16,
+        steps=4,
+        t5_cpu=True,
+        precision="bfloat16",
+        output_path=str(out),
+        crf=23,
+    )
+    worker = make_video_worker(params)
     workers.VideoWorker.run(worker)
-    cmd = captured_cmd[0]
-    assert cmd[0] == "wan2.2"
-    assert "--offload" in cmd
-    assert "--t5_cpu" in cmd
-    assert worker.progress.emitted == [10, 100]
-    assert worker.finished.emitted == [os.path.abspath("output.mp4")]
+
+    assert worker.error.emitted == []
+    assert requested[0]["t5_cpu"] and requested[0]["precision"] == "bfloat16"
+    assert requested[0]["model_path"] == str(tmp_path)
+    call = pipe.calls[0]
+    assert (call["width"], call["height"], call["num_frames"]) == (480, 480, 13)
+    assert call["prompt"] == "hello"
+    assert worker.progress.emitted == [0, 25, 50, 75, 100]
+    assert call["output_type"] == "latent"
+    assert saved == [(["decoded", "latents(13)"], str(out), 24, 23)]
+    assert worker.finished.emitted == [str(out)]
+
+
+def test_video_worker_interpolates_keyframes(tmp_path, monkeypatch):
+    video = importlib.import_module("workers.video")
+    interpolation = importlib.import_module("utils.frame_interpolation")
+    saved = []
+    monkeypatch.setattr(video, "decode_frames", lambda pipe, latents: iter("ab"))
+    monkeypatch.setattr(
+        interpolation,
+        "get_interpolator",
+        lambda method: lambda a, b, times: [f"{a}{b}@{t}" for t in times],
+    )
+    monkeypatch.setattr(
+        video,
+        "save_video",
+        lambda frames, path, fps, settings: saved.append(list(frames)),
+    )
+    pipe = FakeWanPipeline()
+    install_wan(tmp_path, pipe)
+    params = VideoParams(width=256, height=256, frames=65, steps=2, interpolation=4)
+    worker = make_video_worker(params)
+    workers.VideoWorker.run(worker)
+
     assert worker.error.emitted == []
+    assert pipe.calls[0]["num_frames"] == 17
+    assert saved == [["a", "ab@0.25", "ab@0.5", "ab@0.75", "b"]]
+
+
+def test_video_worker_rounds_keyframes_up_to_wan_frame_counts(tmp_path, monkeypatch):
+    video = importlib.import_module("workers.video")
+    interpolation = importlib.import_module("utils.frame_interpolation")
+    saved = []
+    monkeypatch.setattr(video, "decode_frames", lambda pipe, latents: iter("abc"))
+    monkeypatch.setattr(
+        interpolation,
+        "get_interpolator",
+        lambda method: lambda a, b, times: [f"{a}{b}@{t}" for t in times],
+    )
+    monkeypatch.setattr(
+        video,
+        "save_video",
+        lambda frames, path, fps, settings: saved.append(list(frames)),
+    )
+    pipe = FakeWanPipeline()
+    install_wan(tmp_path, pipe)
+    # 3 keyframes would do, but Wan would render only 1 of them
+    params = VideoParams(width=256, height=256, frames=6, steps=2, interpolation=4)
+    worker = make_video_worker(params)
+    workers.VideoWorker.run(worker)
 
+    assert worker.error.emitted == []
+    assert pipe.calls[0]["num_frames"] == 5
+    assert video.wan_keyframes(20, 4) == 9
+    assert saved == [["a", "ab@0.25", "ab@0.5", "ab@0.75", "b", "bc@0.25"]]
 
-def test_image_worker_stop_prevents_progress():
-    fake_model_manager.ModelManager.get_flux_pipeline = lambda params: FakePipeline()
-    params = ImageParams(width=1, height=1, steps=2, guidance=1)
-    worker = workers.ImageWorker("prompt", "", params)
-    worker.progress = DummySignal()
-    worker.result = DummySignal()
-    worker.error = DummySignal()
+
+def test_video_worker_stop_interrupts_pipeline(tmp_path, monkeypatch):
+    video = importlib.import_module("workers.video")
+    saved = []
+    monkeypatch.setattr(video, "save_video", lambda *args: saved.append(args))
+    install_wan(tmp_path, FakeWanPipeline())
+    params = VideoParams(width=256, height=256, frames=5, steps=4)
+    worker = make_video_worker(params)
 
     def on_progress(value):
-        if value >= 0:
+        if value > 0:
             worker.stop()
 
     worker.progress.connect(on_progress)
-    workers.ImageWorker.run(worker)
-    assert worker.progress.emitted == [0, 50]
-    assert worker.result.emitted == []
+    workers.VideoWorker.run(worker)
+    assert worker.progress.emitted == [0, 25]
+    assert saved == []
+    assert worker.finished.emitted == []
     assert worker.error.emitted == []
 
 
-def test_video_worker_stop_prevents_progress():
-    def fake_popen(cmd, stdout, stderr, text):
+def test_video_worker_falls_back_to_inference_script(tmp_path):
+    captured = []
+
+    def fake_popen(cmd, stdout, stderr, text, cwd):
+        captured.append((cmd, cwd))
+
         class Proc:
             returncode = 0
             stdout = ["Progress: 10%\n", "Progress: 100%\n"]
@@ -248,26 +415,44 @@ def test_video_worker_stop_prevents_progress():
 
     subprocess = importlib.import_module("subprocess")
     subprocess.Popen = fake_popen
+    install_wan(tmp_path, None, diffusers_layout=False)
+    (tmp_path / "generate.py").write_text("")
 
     params = VideoParams(
         width=1,
         height=1,
         frames=1,
         steps=1,
-        offload=False,
-        t5_cpu=False,
+        offload=True,
+        t5_cpu=True,
         precision="fp16",
     )
-    worker = workers.VideoWorker("p", "", params)
+    worker = make_video_worker(params)
+    workers.VideoWorker.run(worker)
+    cmd, cwd = captured[0]
+    assert cmd[1] == str(tmp_path / "generate.py")
+    assert cwd == str(tmp_path)
+    assert "--offload_model" in cmd
+    assert "--t5_cpu" in cmd
+    assert worker.progress.emitted == [10, 100]
+    assert worker.finished.emitted == [os.path.abspath("output.mp4")]
+    assert worker.error.emitted == []
+
+
+def test_image_worker_stop_prevents_progress():
+    fake_model_manager.ModelManager.get_flux_pipeline = lambda params: FakePipeline()
+    params = ImageParams(width=1, height=1, steps=2, guidance=1)
+    worker = workers.ImageWorker("prompt", "", params)
     worker.progress = DummySignal()
-    worker.finished = DummySignal()
+    worker.result = DummySignal()
     worker.error = DummySignal()
 
     def on_progress(value):
-        worker.stop()
+        if value >= 0:
+            worker.stop()
 
     worker.progress.connect(on_progress)
-    workers.VideoWorker.run(worker)
-    assert worker.progress.emitted == [10]
-    assert worker.finished.emitted == []
+    workers.ImageWorker.run(worker)
+    assert worker.progress.emitted == [0, 50]
+    assert worker.result.emitted == []
     assert worker.error.emitted == []
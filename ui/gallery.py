@@ -0,0 +1,312 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, List, Sequence, Set
+
+from PyQt5.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QObject,
+    QRunnable,
+    QSize,
+    Qt,
+    QThreadPool,
+    pyqtSignal,
+)
+from PyQt5.QtGui import QColor, QImage, QImageReader, QPixmap
+from PyQt5.QtWidgets import QListView
+
+# Longest side of a thumbnail in pixels
+THUMB_SIZE = 128
+# Host memory kept for decoded thumbnails
+CACHE_BYTES = 64 << 20
+# Queued thumbnail requests; older ones (scrolled past) are dropped
+MAX_PENDING = 256
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+
+def find_images(directory: str, max_depth: int = 1) -> List[str]:
+    """Return image files under ``directory``, newest first.
+
+    Only ``max_depth`` levels of subdirectories are searched (sweep folders
+    sit directly in the output directory); hidden ones are skipped.
+    """
+    found = []
+    stack = [(directory, 0)]
+    while stack:
+        path, depth = stack.pop()
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir() and depth < max_depth:
+                    stack.append((entry.path, depth + 1))
+                elif entry.name.lower().endswith(IMAGE_SUFFIXES):
+                    found.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+    return [path for _, path in sorted(found, reverse=True)]
+
+
+@dataclass
+class GalleryItem:
+    """One result image file.
+
+    Results of this session are saved before they are listed, so no item
+    holds a full image in memory; the viewer loads it when selected.
+    """
+
+    key: Hashable
+    label: str
+    path: str
+
+
+def _decode_thumbnail(path: str) -> QImage:
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid():
+        # Formats such as JPEG decode directly at the reduced size
+        reader.setScaledSize(size.scaled(THUMB_SIZE, THUMB_SIZE, Qt.KeepAspectRatio))
+    return reader.read()
+
+
+class ThumbnailLoader(QObject):
+    """Decode thumbnails on a thread pool, most recently requested first.
+
+    Views request the thumbnails of the rows they paint, so while scrolling
+    the newest requests are the visible ones; requests beyond
+    :data:`MAX_PENDING` are dropped oldest first and simply made again if
+    their rows come back into view.
+    """
+
+    # key, thumbnail (a null QImage if the file could not be read)
+    loaded = pyqtSignal(object, object)
+
+    def __init__(self, parent=None, threads: int = 2) -> None:
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(threads)
+        # key -> path, newest last
+        self._pending: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._in_flight: Set[Hashable] = set()
+        self._workers = 0
+        self._lock = threading.Lock()
+
+    def request(self, key: Hashable, path: str) -> None:
+        """Queue the thumbnail of the image file at ``path`` for ``key``."""
+        with self._lock:
+            if key in self._in_flight:
+                return
+            self._pending[key] = path
+            self._pending.move_to_end(key)
+            while len(self._pending) > MAX_PENDING:
+                self._pending.popitem(last=False)
+            start = self._workers < self._pool.maxThreadCount()
+            if start:
+                self._workers += 1
+        if start:
+            self._pool.start(_ThumbnailTask(self))
+
+    def clear(self) -> None:
+        """Forget queued requests."""
+        with self._lock:
+            self._pending.clear()
+
+    def _next(self):
+        """Return the newest pending request, or ``None`` to stop a worker."""
+        with self._lock:
+            if not self._pending:
+                self._workers -= 1
+                return None
+            key, path = self._pending.popitem(last=True)
+            self._in_flight.add(key)
+            return key, path
+
+    def _done(self, key: Hashable, image: QImage) -> None:
+        with self._lock:
+            self._in_flight.discard(key)
+        self.loaded.emit(key, image)
+
+
+class _ThumbnailTask(QRunnable):
+    def __init__(self, loader: ThumbnailLoader) -> None:
+        super().__init__()
+        self.loader = loader
+
+    def run(self) -> None:
+        while True:
+            request = self.loader._next()
+            if request is None:
+                return
+            key, path = request
+            self.loader._done(key, _decode_thumbnail(path))
+
+
+class _ScanTask(QRunnable):
+    def __init__(self, directory: str, signal) -> None:
+        super().__init__()
+        self.directory = directory
+        self.signal = signal
+
+    def run(self) -> None:
+        self.signal.emit(self.directory, find_images(self.directory))
+
+
+class GalleryModel(QAbstractListModel):
+    """Results, newest first, with thumbnails decoded only when shown.
+
+    ``data()`` is asked only for the rows a view paints; a thumbnail not yet
+    in the bounded LRU is requested from the :class:`ThumbnailLoader` and a
+    placeholder returned until it arrives.
+    """
+
+    ItemRole = Qt.UserRole + 1
+    # directory, image paths found in it
+    scanned = pyqtSignal(str, object)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._items: List[GalleryItem] = []
+        self._keys: Set[Hashable] = set()
+        # key -> (QPixmap, bytes), least recently used first
+        self._thumbs: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._thumb_bytes = 0
+        # In-session items still holding their full image, oldest first
+        self._placeholder = QPixmap(THUMB_SIZE, THUMB_SIZE)
+        self._placeholder.fill(QColor(48, 48, 48))
+        self.loader = ThumbnailLoader(self)
+        self.loader.loaded.connect(self._on_thumbnail)
+        self.scanned.connect(self._on_scanned)
+        self._scan_pool = QThreadPool(self)
+        self._scan_pool.setMaxThreadCount(1)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._items)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._items):
+            return None
+        item = self._items[index.row()]
+        if role == Qt.DecorationRole:
+            return self._thumbnail(item)
+        if role == Qt.DisplayRole:
+            return item.label
+        if role == Qt.ToolTipRole:
+            return item.path or item.label
+        if role == self.ItemRole:
+            return item
+        return None
+
+    def item(self, row: int) -> GalleryItem:
+        """Return the item shown in ``row``."""
+        return self._items[row]
+
+    def _thumbnail(self, item: GalleryItem) -> QPixmap:
+        entry = self._thumbs.get(item.key)
+        if entry is not None:
+            self._thumbs.move_to_end(item.key)
+            return entry[0]
+        self.loader.request(item.key, item.path)
+        return self._placeholder
+
+    def _on_thumbnail(self, key: Hashable, image: QImage) -> None:
+        if image.isNull() or key not in self._keys:
+            return
+        pixmap = QPixmap.fromImage(image)
+        size = image.sizeInBytes()
+        old = self._thumbs.pop(key, None)
+        if old is not None:
+            self._thumb_bytes -= old[1]
+        self._thumbs[key] = (pixmap, size)
+        self._thumb_bytes += size
+        while self._thumb_bytes > CACHE_BYTES and len(self._thumbs) > 1:
+            _, (_, evicted) = self._thumbs.popitem(last=False)
+            self._thumb_bytes -= evicted
+        for row, item in enumerate(self._items):
+            if item.key == key:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+                break
+
+    def add_files(self, paths: Sequence[str], top: bool = True) -> None:
+        """Add image files not shown yet, at the top or the bottom."""
+        items = [
+            GalleryItem(path, os.path.basename(path), path=path)
+            for path in dict.fromkeys(paths)
+            if path not in self._keys
+        ]
+        if items:
+            self._insert(items, 0 if top else len(self._items))
+
+    def _insert(self, items: List[GalleryItem], row: int) -> None:
+        self.beginInsertRows(QModelIndex(), row, row + len(items) - 1)
+        self._items[row:row] = items
+        self._keys.update(item.key for item in items)
+        self.endInsertRows()
+
+    def scan_directory(self, directory: str) -> None:
+        """List the images in ``directory`` off the GUI thread and add them."""
+        self._scan_pool.start(_ScanTask(directory, self.scanned))
+
+    def _on_scanned(self, directory: str, paths: List[str]) -> None:
+        # Earlier files go below anything added during the scan
+        self.add_files(paths, top=False)
+
+
+class GalleryView(QListView):
+    """Horizontal strip of result thumbnails.
+
+    Uniform item sizes let the view lay out thousands of rows without
+    asking for their data, and only the visible ones are painted.
+    """
+
+    # Emitted with the GalleryItem the user picked
+    item_selected = pyqtSignal(object)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.results = GalleryModel(self)
+        # Set while the controller picks an item it is already showing
+        self._quiet = False
+        self.setModel(self.results)
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setIconSize(QSize(THUMB_SIZE, THUMB_SIZE))
+        self.setGridSize(QSize(THUMB_SIZE + 16, THUMB_SIZE + 28))
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setFixedHeight(THUMB_SIZE + 48)
+        self.selectionModel().currentChanged.connect(self._on_current_changed)
+
+    def add_result(self, path: str) -> None:
+        """Add a saved result and mark it current without re-emitting it."""
+        self.results.add_files([path])
+        self._quiet = True
+        try:
+            self.setCurrentIndex(self.results.index(0))
+        finally:
+            self._quiet = False
+        self.scrollToTop()
+
+    def add_files(self, paths: Sequence[str]) -> None:
+        """Add image files at the front of the strip."""
+        self.results.add_files(paths)
+        self.scrollToTop()
+
+    def scan_directory(self, directory: str) -> None:
+        """Add the images already in ``directory`` once listed."""
+        self.results.scan_directory(directory)
+
+    def _on_current_changed(self, current: QModelIndex, previous) -> None:
+        if current.isValid() and not self._quiet:
+            self.item_selected.emit(self.results.item(current.row()))
@@ -0,0 +1,350 @@
+import itertools
+import math
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+from PyQt5.QtCore import (
+    QObject,
+    QPointF,
+    QRectF,
+    QRunnable,
+    QSize,
+    Qt,
+    QThreadPool,
+    QTimer,
+    pyqtSignal,
+)
+from PyQt5.QtGui import QColor, QImage, QImageReader, QPainter
+from PyQt5.QtWidgets import QWidget
+
+from utils.tiled_image import visible_region
+
+# Mip levels are halved until the longest side is at most this many pixels
+MIN_LEVEL_SIZE = 256
+# Host memory kept for the mip levels of recent results, and at most this
+# many results; reselecting an older one decodes its file again
+CACHE_BYTES = 512 << 20
+CACHE_ENTRIES = 8
+# Milliseconds without resizing before the fitted image is rescaled
+FIT_DELAY_MS = 80
+
+
+def build_levels(image: QImage) -> List[QImage]:
+    """Return ``image`` and its successive half-size smooth downscales.
+
+    Levels are converted to premultiplied ARGB, the format the raster paint
+    engine draws without a per-frame conversion.
+    """
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    levels = [image]
+    while max(image.width(), image.height()) > MIN_LEVEL_SIZE:
+        image = image.scaled(
+            max(1, image.width() // 2),
+            max(1, image.height() // 2),
+            Qt.IgnoreAspectRatio,
+            Qt.SmoothTransformation,
+        )
+        levels.append(image)
+    return levels
+
+
+class _Signals(QObject):
+    # key, list of QImage levels (or None if the file could not be read)
+    levels_ready = pyqtSignal(object, object)
+    # key, target size, scaled QImage
+    fitted = pyqtSignal(object, object, object)
+
+
+class _LevelsTask(QRunnable):
+    """Build the mip levels of an image, reading it from disk if given a path."""
+
+    def __init__(self, key: Hashable, source, signals: _Signals) -> None:
+        super().__init__()
+        self.key = key
+        self.source = source
+        self.signals = signals
+
+    def run(self) -> None:
+        image = self.source
+        if isinstance(image, str):
+            image = QImageReader(image).read()
+        levels = None if image.isNull() else build_levels(image)
+        self.signals.levels_ready.emit(self.key, levels)
+
+
+class _FitTask(QRunnable):
+    """Smoothly scale one level to the exact on-screen size."""
+
+    def __init__(
+        self, key: Hashable, level: QImage, size: QSize, signals: _Signals
+    ) -> None:
+        super().__init__()
+        self.key = key
+        self.level = level
+        self.size = size
+        self.signals = signals
+
+    def run(self) -> None:
+        scaled = self.level.scaled(
+            self.size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation
+        )
+        self.signals.fitted.emit(self.key, self.size, scaled)
+
+
+class ImageViewer(QWidget):
+    """Zoom-and-pan view of generated images that never scales on the GUI thread.
+
+    Mip levels (each half the size of the previous) are built on a thread
+    pool, and a repaint draws only the visible part of the level closest
+    above the current zoom, so zooming and panning cost a viewport-sized
+    draw. When the image is fitted to the widget, a smooth exact-size copy
+    is scaled in the background after resizing settles; until it arrives the
+    nearest level is drawn instead. The levels of recent results stay cached,
+    so showing one again is instant.
+
+    Scroll to zoom around the cursor, drag to pan and double-click to switch
+    between fitting the widget and native resolution.
+    """
+
+    MAX_ZOOM = 8.0
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.zoom = 1.0
+        # Image coordinate shown at the widget's top-left corner
+        self.offset = QPointF(0, 0)
+        # Whether the zoom follows the widget size
+        self.fitting = True
+        self.key: Optional[Hashable] = None
+        # Full resolution first; only the original until the levels are built
+        self._levels: List[QImage] = []
+        # Smooth copy at the exact fitted size, once scaled
+        self._fitted: Optional[QImage] = None
+        # key -> (levels, bytes), least recently shown first
+        self._cache: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._cache_bytes = 0
+        self._counter = itertools.count()
+        self._drag_start = None
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._signals = _Signals()
+        self._signals.levels_ready.connect(self._on_levels_ready)
+        self._signals.fitted.connect(self._on_fitted)
+        self._fit_timer = QTimer(self)
+        self._fit_timer.setSingleShot(True)
+        self._fit_timer.timeout.connect(self._request_fitted)
+        self.setMinimumHeight(300)
+
+    # ---- Showing images ----
+
+    def set_image(self, image: QImage, key: Optional[Hashable] = None) -> None:
+        """Show ``image`` fitted to the widget.
+
+        Parameters:
+            image: The result at native resolution; it is not copied.
+            key: Identifies the image in the cache; a new one by default.
+        """
+        if key is None:
+            key = ("image", next(self._counter))
+        if not self._show_cached(key):
+            self._show(key, [image])
+            self._pool.start(_LevelsTask(key, image, self._signals))
+
+    def open_file(self, path: str) -> None:
+        """Show the image file at ``path``, decoding it off the GUI thread."""
+        if not self._show_cached(path):
+            self._show(path, [])
+            self._pool.start(_LevelsTask(path, path, self._signals))
+
+    def _show_cached(self, key: Hashable) -> bool:
+        entry = self._cache.get(key)
+        if entry is None:
+            return False
+        self._cache.move_to_end(key)
+        self._show(key, entry[0])
+        return True
+
+    def _show(self, key: Hashable, levels: List[QImage]) -> None:
+        self.key = key
+        self._levels = levels
+        self._fitted = None
+        self.fit()
+
+    def _on_levels_ready(self, key: Hashable, levels: Optional[List[QImage]]) -> None:
+        if levels is None:
+            return
+        size = sum(level.sizeInBytes() for level in levels)
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._cache_bytes -= old[1]
+        self._cache[key] = (levels, size)
+        self._cache_bytes += size
+        # The newest entry is always kept
+        while len(self._cache) > 1 and (
+            self._cache_bytes > CACHE_BYTES or len(self._cache) > CACHE_ENTRIES
+        ):
+            _, (_, evicted) = self._cache.popitem(last=False)
+            self._cache_bytes -= evicted
+        if key == self.key:
+            first = not self._levels
+            self._levels = levels
+            if first:
+                self.fit()
+            else:
+                self._schedule_fitted()
+                self.update()
+
+    # ---- Zoom ----
+
+    @property
+    def image_size(self) -> Optional[QSize]:
+        """Full-resolution size of the shown image."""
+        return self._levels[0].size() if self._levels else None
+
+    def _fit_zoom(self) -> float:
+        size = self.image_size
+        return min(
+            self.MAX_ZOOM,
+            max(1, self.width()) / size.width(),
+            max(1, self.height()) / size.height(),
+        )
+
+    def fit(self) -> None:
+        """Zoom until the whole image fills the widget, centred."""
+        self.fitting = True
+        if self.image_size is None:
+            self.update()
+            return
+        self._set_zoom(self._fit_zoom())
+        size = self.image_size
+        self.offset = QPointF(
+            -(self.width() / self.zoom - size.width()) / 2,
+            -(self.height() / self.zoom - size.height()) / 2,
+        )
+        self._schedule_fitted()
+        self.update()
+
+    def actual_size(self) -> None:
+        """Show the image at native resolution, keeping the centre in place."""
+        if self.image_size is None:
+            return
+        centre = self.offset + QPointF(self.width(), self.height()) / 2 / self.zoom
+        self.fitting = False
+        self._set_zoom(1.0)
+        self.offset = centre - QPointF(self.width(), self.height()) / 2
+        self.update()
+
+    def _set_zoom(self, zoom: float) -> None:
+        if zoom != self.zoom:
+            self.zoom = zoom
+            self._fitted = None
+
+    def _level(self) -> int:
+        """Index of the smallest built level with at least the on-screen detail."""
+        if self.zoom >= 1:
+            return 0
+        return min(len(self._levels) - 1, int(math.log2(1 / self.zoom)))
+
+    def _target_size(self) -> QSize:
+        size = self.image_size
+        return QSize(
+            max(1, round(size.width() * self.zoom)),
+            max(1, round(size.height() * self.zoom)),
+        )
+
+    def _schedule_fitted(self) -> None:
+        # Magnified views are drawn pixel for pixel and need no scaled copy
+        if self.fitting and self.zoom < 1 and len(self._levels) > 1:
+            self._fit_timer.start(FIT_DELAY_MS)
+
+    def _request_fitted(self) -> None:
+        if not self.fitting or self.image_size is None or self.zoom >= 1:
+            return
+        size = self._target_size()
+        level = self._levels[self._level()]
+        self._pool.start(_FitTask(self.key, level, size, self._signals))
+
+    def _on_fitted(self, key: Hashable, size: QSize, image: QImage) -> None:
+        if key == self.key and self.fitting and size == self._target_size():
+            self._fitted = image
+            self.update()
+
+    # ---- Qt events ----
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(32, 32, 32))
+        size = self.image_size
+        if size is None:
+            return
+        if self.fitting and self._fitted is not None:
+            painter.drawImage(-self.offset * self.zoom, self._fitted)
+            return
+        box, _ = visible_region(
+            (size.width(), size.height()),
+            (self.width(), self.height()),
+            self.zoom,
+            (self.offset.x(), self.offset.y()),
+        )
+        left, top, right, bottom = box
+        if right <= left or bottom <= top:
+            return
+        level = self._levels[self._level()]
+        scale = level.width() / size.width()
+        source = QRectF(
+            left * scale,
+            top * scale,
+            (right - left) * scale,
+            (bottom - top) * scale,
+        )
+        target = QRectF(
+            (left - self.offset.x()) * self.zoom,
+            (top - self.offset.y()) * self.zoom,
+            (right - left) * self.zoom,
+            (bottom - top) * self.zoom,
+        )
+        # Filtering a full-resolution original would stall the GUI thread;
+        # within a built level the scale factor stays between 1 and 2
+        smooth = self.zoom < 1 and len(self._levels) > 1
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, smooth)
+        painter.drawImage(target, level, source)
+
+    def resizeEvent(self, event) -> None:
+        if self.fitting:
+            self.fit()
+        super().resizeEvent(event)
+
+    def wheelEvent(self, event) -> None:
+        if self.image_size is None:
+            return
+        cursor = QPointF(event.pos())
+        anchor = self.offset + cursor / self.zoom
+        factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+        self.fitting = False
+        self._set_zoom(
+            max(min(self._fit_zoom(), 1.0), min(self.MAX_ZOOM, self.zoom * factor))
+        )
+        # Keep the image point under the cursor in place
+        self.offset = anchor - cursor / self.zoom
+        self.update()
+
+    def mouseDoubleClickEvent(self, event) -> None:
+        if self.fitting:
+            self.actual_size()
+        else:
+            self.fit()
+
+    def mousePressEvent(self, event) -> None:
+        if event.button() == Qt.LeftButton:
+            self._drag_start = (event.pos(), QPointF(self.offset))
+
+    def mouseMoveEvent(self, event) -> None:
+        if self._drag_start is None:
+            return
+        start, offset = self._drag_start
+        self.fitting = False
+        self.offset = offset - QPointF(event.pos() - start) / self.zoom
+        self.update()
+
+    def mouseReleaseEvent(self, event) -> None:
+        self._drag_start = None
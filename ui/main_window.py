@@ -3,8 +3,10 @@ from PyQt5.QtWidgets import (
     QWidget,
     QTabWidget,
     QTextEdit,
+    QLineEdit,
     QLabel,
     QSpinBox,
+    QDoubleSpinBox,
     QHBoxLayout,
     QVBoxLayout,
     QCheckBox,
@@ -14,6 +16,10 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5 import QtCore
 
+from ui.gallery import GalleryView
+from ui.image_viewer import ImageViewer
+from ui.tiled_view import TiledImageView
+
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -61,11 +67,15 @@ class Ui_MainWindow(object):
         self.steps_label = QLabel("Steps:")
         self.steps_spin = QSpinBox()
         self.steps_spin.setRange(1, 150)
-        self.steps_spin.setValue(50)
+        self.steps_spin.setValue(28)
         self.guidance_label = QLabel("Guidance:")
-        self.guidance_spin = QSpinBox()
-        self.guidance_spin.setRange(1, 30)
-        self.guidance_spin.setValue(7)
+        self.guidance_spin = QDoubleSpinBox()
+        self.guidance_spin.setRange(0, 30)
+        self.guidance_spin.setSingleStep(0.5)
+        self.guidance_spin.setDecimals(1)
+        self.guidance_spin.setValue(3.5)
+        self.scheduler_label = QLabel("Scheduler:")
+        self.scheduler_combo = QComboBox()
         params_layout.addWidget(self.width_label)
         params_layout.addWidget(self.width_spin)
         params_layout.addWidget(self.height_label)
@@ -74,20 +84,81 @@ class Ui_MainWindow(object):
         params_layout.addWidget(self.steps_spin)
         params_layout.addWidget(self.guidance_label)
         params_layout.addWidget(self.guidance_spin)
+        params_layout.addWidget(self.scheduler_label)
+        params_layout.addWidget(self.scheduler_combo)
         # Options layout
         options_layout = QHBoxLayout()
+        self.profile_combo = QComboBox()
+        options_layout.addWidget(QLabel("Model:"))
+        options_layout.addWidget(self.profile_combo)
         self.quant_checkbox = QCheckBox("Use quantized weights (nf4)")
+        self.process_checkbox = QCheckBox("Run in separate process")
         self.device_combo = QComboBox()
         self.device_combo.addItems(["cpu"])
         options_layout.addWidget(self.quant_checkbox)
+        options_layout.addWidget(self.process_checkbox)
         options_layout.addWidget(QLabel("Device:"))
         options_layout.addWidget(self.device_combo)
+        self.compile_checkbox = QCheckBox("Compile (faster after warm-up)")
+        options_layout.addWidget(self.compile_checkbox)
+        # Writes a Chrome trace per image or video job to <output>/traces
+        self.trace_checkbox = QCheckBox("Trace jobs")
+        options_layout.addWidget(self.trace_checkbox)
+        # torch.profiler capture of a few denoising steps of the next job
+        self.profile_button = QPushButton("Profile next job")
+        options_layout.addWidget(self.profile_button)
+        # Latency percentiles, cache hit rates and peak memory across runs
+        self.stats_button = QPushButton("Stats")
+        options_layout.addWidget(self.stats_button)
+        # Hires fix: render at width x height, then upscale and refine in tiles
+        self.hires_combo = QComboBox()
+        self.hires_combo.addItem("Off", 1.0)
+        self.hires_combo.addItem("1.5x", 1.5)
+        self.hires_combo.addItem("2x", 2.0)
+        options_layout.addWidget(QLabel("Hires fix:"))
+        options_layout.addWidget(self.hires_combo)
+        # Tiled canvas: generate far beyond 1024 px, streamed to disk
+        canvas_layout = QHBoxLayout()
+        self.tiled_checkbox = QCheckBox("Tiled canvas")
+        self.canvas_width_spin = QSpinBox()
+        self.canvas_width_spin.setRange(1024, 65536)
+        self.canvas_width_spin.setSingleStep(1024)
+        self.canvas_width_spin.setValue(4096)
+        self.canvas_height_spin = QSpinBox()
+        self.canvas_height_spin.setRange(1024, 65536)
+        self.canvas_height_spin.setSingleStep(1024)
+        self.canvas_height_spin.setValue(4096)
+        canvas_layout.addWidget(self.tiled_checkbox)
+        canvas_layout.addWidget(QLabel("Canvas width:"))
+        canvas_layout.addWidget(self.canvas_width_spin)
+        canvas_layout.addWidget(QLabel("Canvas height:"))
+        canvas_layout.addWidget(self.canvas_height_spin)
+        # LoRA controls
+        lora_layout = QHBoxLayout()
+        self.lora_edit = QLineEdit()
+        self.lora_edit.setPlaceholderText("style:0.8, detail:0.5")
+        self.fuse_lora_checkbox = QCheckBox("Fuse LoRA")
+        lora_layout.addWidget(QLabel("LoRA:"))
+        lora_layout.addWidget(self.lora_edit)
+        lora_layout.addWidget(self.fuse_lora_checkbox)
+        # Sweep controls
+        sweep_layout = QHBoxLayout()
+        self.sweep_edit = QLineEdit()
+        self.sweep_edit.setPlaceholderText("steps=10:50:10; guidance=3,5,7; seed=0:3")
+        self.sweep_button = QPushButton("Run Sweep")
+        sweep_layout.addWidget(QLabel("Sweep:"))
+        sweep_layout.addWidget(self.sweep_edit)
+        sweep_layout.addWidget(self.sweep_button)
         # Generate controls
         self.gen_button = QPushButton("Generate Image")
         self.image_progress = QProgressBar()
-        self.image_display = QLabel()
-        self.image_display.setAlignment(QtCore.Qt.AlignCenter)
-        self.image_display.setMinimumHeight(300)
+        # Zoom and pan at native resolution; scaling runs off the GUI thread
+        self.image_display = ImageViewer()
+        # Large tiled results are shown here instead of in image_display
+        self.tiled_view = TiledImageView()
+        self.tiled_view.hide()
+        # Thumbnails of this session's and earlier results; picks one to show
+        self.gallery = GalleryView()
         # Assemble image tab
         image_layout.addWidget(self.prompt_label)
         image_layout.addWidget(self.prompt_edit)
@@ -95,9 +166,14 @@ class Ui_MainWindow(object):
         image_layout.addWidget(self.neg_prompt_edit)
         image_layout.addLayout(params_layout)
         image_layout.addLayout(options_layout)
+        image_layout.addLayout(canvas_layout)
+        image_layout.addLayout(lora_layout)
+        image_layout.addLayout(sweep_layout)
         image_layout.addWidget(self.gen_button)
         image_layout.addWidget(self.image_progress)
         image_layout.addWidget(self.image_display)
+        image_layout.addWidget(self.tiled_view)
+        image_layout.addWidget(self.gallery)
 
         # Build Video tab UI
         video_layout = QVBoxLayout(self.video_tab)
@@ -147,6 +223,13 @@ class Ui_MainWindow(object):
         video_options_layout.addWidget(self.t5_cpu_checkbox)
         video_options_layout.addWidget(QLabel("Precision:"))
         video_options_layout.addWidget(self.precision_combo)
+        # Frame interpolation factor; only 1/factor of the frames are diffused
+        self.interpolation_combo = QComboBox()
+        self.interpolation_combo.addItem("Off", 1)
+        self.interpolation_combo.addItem("2x", 2)
+        self.interpolation_combo.addItem("4x", 4)
+        video_options_layout.addWidget(QLabel("Interpolate:"))
+        video_options_layout.addWidget(self.interpolation_combo)
         # Generate controls
         self.video_button = QPushButton("Generate Video")
         self.video_progress = QProgressBar()
@@ -0,0 +1,111 @@
+from typing import List, Optional
+
+from PyQt5.QtWidgets import (
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from utils import metrics
+
+COLUMNS = ["Metric", "Labels", "Count", "Mean", "p50", "p95", "p99", "Max"]
+
+
+def _format(value: Optional[float], name: str) -> str:
+    """Format a histogram value by the unit suffix of the metric ``name``."""
+    if value is None:
+        return ""
+    if name.endswith("_seconds"):
+        return f"{value * 1000:.0f} ms" if value < 1 else f"{value:.2f} s"
+    if name.endswith("_bytes"):
+        return f"{value / (1 << 30):.2f} GiB"
+    return f"{value:g}"
+
+
+class StatsDialog(QDialog):
+    """Table of the aggregated metrics in :data:`utils.metrics.registry`.
+
+    Histograms show their count, mean and percentiles; counters and gauges
+    their value. Cache lookups are summarised as hit rates.
+    """
+
+    def __init__(self, endpoint: Optional[str] = None, parent=None) -> None:
+        """Build the dialog.
+
+        Parameters:
+            endpoint: URL of the Prometheus endpoint, shown when serving.
+            parent: Optional parent widget.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Performance statistics")
+        self.resize(820, 420)
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.refresh_button = QPushButton("Refresh")
+        self.reset_button = QPushButton("Reset")
+        self.close_button = QPushButton("Close")
+        self.refresh_button.clicked.connect(self.refresh)
+        self.reset_button.clicked.connect(self.reset)
+        self.close_button.clicked.connect(self.accept)
+
+        buttons = QHBoxLayout()
+        if endpoint:
+            buttons.addWidget(QLabel(f"Prometheus: {endpoint}"))
+        buttons.addStretch()
+        buttons.addWidget(self.refresh_button)
+        buttons.addWidget(self.reset_button)
+        buttons.addWidget(self.close_button)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        self.refresh()
+
+    def _rows(self) -> List[List[str]]:
+        rows = []
+        for metric in metrics.registry.metrics():
+            for labels, value in metric.series():
+                label_text = ", ".join(f"{k}={v}" for k, v in labels.items())
+                if isinstance(metric, metrics.Histogram):
+                    rows.append(
+                        [metric.help, label_text, str(value.count)]
+                        + [
+                            _format(v, metric.name)
+                            for v in (
+                                value.mean(),
+                                value.quantile(0.5),
+                                value.quantile(0.95),
+                                value.quantile(0.99),
+                                value.max,
+                            )
+                        ]
+                    )
+                elif metric is not metrics.CACHE_REQUESTS:
+                    rows.append([metric.help, label_text, f"{value:g}"])
+        caches = sorted(
+            {labels["cache"] for labels, _ in metrics.CACHE_REQUESTS.series()}
+        )
+        for cache in caches:
+            rate = metrics.hit_rate(cache)
+            if rate is not None:
+                rows.append(["Cache hit rate", f"cache={cache}", f"{rate:.0%}"])
+        return rows
+
+    def refresh(self) -> None:
+        """Reload the table from the registry."""
+        rows = self._rows()
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, text in enumerate(row):
+                self.table.setItem(r, c, QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+
+    def reset(self) -> None:
+        """Clear all metrics, including the saved history."""
+        metrics.registry.reset()
+        metrics.save()
+        self.refresh()
@@ -0,0 +1,95 @@
+import numpy as np
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter
+from PyQt5.QtWidgets import QWidget
+
+from utils.tiled_image import TiledImage, visible_region
+
+
+class TiledImageView(QWidget):
+    """Pan-and-zoom view that reads only the visible part of a tiled image.
+
+    Each repaint asks :class:`TiledImage` for the on-screen region at the
+    current zoom, so memory use follows the widget size rather than the
+    image size. Scroll to zoom around the cursor and drag to pan.
+    """
+
+    MAX_ZOOM = 8.0
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.image = None
+        self.zoom = 1.0
+        # Image coordinate shown at the widget's top-left corner
+        self.offset = QPointF(0, 0)
+        self._drag_start = None
+        self.setMinimumHeight(300)
+
+    def open_image(self, path: str) -> None:
+        """Show the ``.npy`` image at ``path``, scaled to fit."""
+        self.image = TiledImage(path)
+        self.fit()
+
+    def fit(self) -> None:
+        """Zoom out until the whole image is visible."""
+        if self.image is None:
+            return
+        self.zoom = min(
+            self.MAX_ZOOM,
+            max(1, self.width()) / self.image.width,
+            max(1, self.height()) / self.image.height,
+        )
+        self.offset = QPointF(0, 0)
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(32, 32, 32))
+        if self.image is None:
+            return
+        box, step = visible_region(
+            (self.image.width, self.image.height),
+            (self.width(), self.height()),
+            self.zoom,
+            (self.offset.x(), self.offset.y()),
+        )
+        left, top, right, bottom = box
+        if right <= left or bottom <= top:
+            return
+        pixels = np.ascontiguousarray(self.image.read(box, step))
+        height, width = pixels.shape[:2]
+        qimg = QImage(pixels.data, width, height, width * 3, QImage.Format_RGB888)
+        target = QRectF(
+            (left - self.offset.x()) * self.zoom,
+            (top - self.offset.y()) * self.zoom,
+            (right - left) * self.zoom,
+            (bottom - top) * self.zoom,
+        )
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, self.zoom < 1)
+        painter.drawImage(target, qimg)
+
+    def wheelEvent(self, event) -> None:
+        if self.image is None:
+            return
+        cursor = event.pos()
+        anchor = self.offset + QPointF(cursor) / self.zoom
+        factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+        fit = min(self.width() / self.image.width, self.height() / self.image.height)
+        self.zoom = max(min(fit, 1.0), min(self.MAX_ZOOM, self.zoom * factor))
+        # Keep the image point under the cursor in place
+        self.offset = anchor - QPointF(cursor) / self.zoom
+        self.update()
+
+    def mousePressEvent(self, event) -> None:
+        if event.button() == Qt.LeftButton:
+            self._drag_start = (event.pos(), QPointF(self.offset))
+
+    def mouseMoveEvent(self, event) -> None:
+        if self._drag_start is None:
+            return
+        start, offset = self._drag_start
+        self.offset = offset - QPointF(event.pos() - start) / self.zoom
+        self.update()
+
+    def mouseReleaseEvent(self, event) -> None:
+        self._drag_start = None
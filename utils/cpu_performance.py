@@ -0,0 +1,224 @@
+"""CPU execution profile: ISA detection, precision, threading and layout.
+
+On machines without a GPU the pipeline runs through oneDNN. bf16 weights
+halve memory traffic and use the AVX-512 BF16 / AMX tile units when the CPU
+has them, so they are picked automatically there. Intra-op threads default
+to the physical cores minus a reserve, and the generating thread is pinned
+away from the reserved cores so the Qt event loop stays responsive.
+
+Tunables live in settings under ``cpu/``: ``precision`` (``auto``, ``bf16``
+or ``fp32``), ``threads`` (0 = auto), ``interop_threads``, ``reserve_cores``
+and ``channels_last``.
+"""
+
+import functools
+import logging
+import os
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_threads_applied: Optional[Tuple[int, int]] = None
+
+
+@dataclass(frozen=True)
+class CpuFeatures:
+    """Instruction set extensions and core counts of the host CPU."""
+
+    flags: FrozenSet[str]
+    physical_cores: int
+    logical_cores: int
+
+    @property
+    def avx2(self) -> bool:
+        return "avx2" in self.flags
+
+    @property
+    def avx512(self) -> bool:
+        return "avx512f" in self.flags
+
+    @property
+    def avx512_bf16(self) -> bool:
+        return "avx512_bf16" in self.flags
+
+    @property
+    def amx_bf16(self) -> bool:
+        return "amx_bf16" in self.flags
+
+    @property
+    def fast_bf16(self) -> bool:
+        """Whether bf16 matrix math runs natively rather than emulated."""
+        return self.avx512_bf16 or self.amx_bf16
+
+    def summary(self) -> str:
+        """Return a one-line description for logs and reports."""
+        isa = [
+            name
+            for name, present in (
+                ("AVX2", self.avx2),
+                ("AVX-512", self.avx512),
+                ("AVX-512 BF16", self.avx512_bf16),
+                ("AMX-BF16", self.amx_bf16),
+            )
+            if present
+        ]
+        return (
+            f"{self.physical_cores} cores / {self.logical_cores} threads, "
+            f"ISA: {', '.join(isa) or 'baseline'}"
+        )
+
+
+def parse_cpuinfo(text: str, logical_cores: int) -> CpuFeatures:
+    """Build :class:`CpuFeatures` from the contents of ``/proc/cpuinfo``."""
+    flags: FrozenSet[str] = frozenset()
+    cores = set()
+    physical_id = core_id = None
+    for line in text.splitlines():
+        key, _, value = line.partition(":")
+        key = key.strip()
+        if key == "flags" and not flags:
+            flags = frozenset(value.split())
+        elif key == "physical id":
+            physical_id = value.strip()
+        elif key == "core id":
+            core_id = value.strip()
+        elif not line.strip():
+            if core_id is not None:
+                cores.add((physical_id, core_id))
+            physical_id = core_id = None
+    if core_id is not None:
+        cores.add((physical_id, core_id))
+    return CpuFeatures(flags, len(cores) or logical_cores, logical_cores)
+
+
+@functools.lru_cache(maxsize=None)
+def detect_cpu_features() -> CpuFeatures:
+    """Return the features of this machine's CPU."""
+    logical = len(_available_cpus()) or os.cpu_count() or 1
+    try:
+        with open("/proc/cpuinfo") as fh:
+            return parse_cpuinfo(fh.read(), logical)
+    except OSError:
+        pass
+    # Non-Linux: ask torch which kernels it dispatches to
+    flags = set()
+    try:
+        import torch
+
+        capability = torch.backends.cpu.get_cpu_capability()
+        if capability.startswith("AVX512"):
+            flags.update(("avx2", "avx512f"))
+        elif capability == "AVX2":
+            flags.add("avx2")
+    except (ImportError, AttributeError):
+        pass
+    return CpuFeatures(frozenset(flags), logical, logical)
+
+
+@functools.lru_cache(maxsize=None)
+def _available_cpus() -> Tuple[int, ...]:
+    """Return the CPUs this process may use, before any thread is pinned."""
+    if hasattr(os, "sched_getaffinity"):
+        return tuple(sorted(os.sched_getaffinity(0)))
+    return tuple(range(os.cpu_count() or 1))
+
+
+@dataclass(frozen=True)
+class CpuSettings:
+    """Resolved CPU execution settings."""
+
+    precision: str  # "bfloat16" or "float32"
+    threads: int
+    interop_threads: int
+    reserve_cores: int
+    channels_last: bool
+
+
+def _as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def cpu_settings(
+    settings_manager, features: Optional[CpuFeatures] = None
+) -> CpuSettings:
+    """Resolve the ``cpu/*`` settings against the detected hardware."""
+    features = features or detect_cpu_features()
+    precision = str(settings_manager.get("cpu/precision", "auto")).lower()
+    if precision == "auto":
+        precision = "bf16" if features.fast_bf16 else "fp32"
+    reserve = max(0, int(settings_manager.get("cpu/reserve_cores", 1)))
+    threads = int(settings_manager.get("cpu/threads", 0))
+    if threads <= 0:
+        # SMT siblings compete for the same matrix units; use physical cores
+        threads = max(1, features.physical_cores - reserve)
+    return CpuSettings(
+        precision="bfloat16" if precision in ("bf16", "bfloat16") else "float32",
+        threads=threads,
+        interop_threads=max(1, int(settings_manager.get("cpu/interop_threads", 1))),
+        reserve_cores=reserve,
+        channels_last=_as_bool(settings_manager.get("cpu/channels_last", True)),
+    )
+
+
+def configure_torch_threads(settings: CpuSettings) -> None:
+    """Apply the thread counts to torch, once per distinct setting."""
+    global _threads_applied
+    wanted = (settings.threads, settings.interop_threads)
+    if _threads_applied == wanted:
+        return
+    import torch
+
+    torch.set_num_threads(settings.threads)
+    try:
+        torch.set_num_interop_threads(settings.interop_threads)
+    except RuntimeError:
+        # Only allowed before the first inter-op parallel region
+        logger.debug("Inter-op thread count already fixed for this process")
+    _threads_applied = wanted
+    logger.info(
+        f"CPU threads: {settings.threads} intra-op, "
+        f"{settings.interop_threads} inter-op ({detect_cpu_features().summary()})"
+    )
+
+
+def pin_current_thread(reserve_cores: int) -> bool:
+    """Keep the calling thread off the first ``reserve_cores`` CPUs.
+
+    Worker threads call this before running the pipeline, so the compute
+    threads they spawn inherit the mask and the GUI thread keeps a free core.
+
+    Returns:
+        True if the affinity was changed
+    """
+    if reserve_cores <= 0 or not hasattr(os, "sched_setaffinity"):
+        return False
+    cpus = _available_cpus()
+    if len(cpus) <= reserve_cores:
+        return False
+    try:
+        os.sched_setaffinity(0, cpus[reserve_cores:])
+    except OSError as e:
+        logger.warning(f"Could not set CPU affinity: {e}")
+        return False
+    return True
+
+
+def optimize_pipeline(pipe, settings: CpuSettings) -> None:
+    """Prepare a CPU pipeline: channels-last convolutions and SDPA attention."""
+    import torch
+    import torch.nn.functional as F
+
+    if settings.channels_last:
+        # Only convolutional models benefit; Flux's transformer is all linear
+        for name in ("vae", "unet"):
+            module = getattr(pipe, name, None)
+            if module is not None and hasattr(module, "to"):
+                module.to(memory_format=torch.channels_last)
+    if not hasattr(F, "scaled_dot_product_attention"):
+        # Without fused SDPA attention, bound the attention matrix size instead
+        logger.warning("torch lacks scaled_dot_product_attention; slicing attention")
+        if hasattr(pipe, "enable_attention_slicing"):
+            pipe.enable_attention_slicing()
@@ -1,6 +1,13 @@
 import torch
 
 
+def is_out_of_memory(exc: BaseException) -> bool:
+    """Return whether ``exc`` signals that a device ran out of memory."""
+    if isinstance(exc, (MemoryError, torch.cuda.OutOfMemoryError)):
+        return True
+    return "out of memory" in str(exc).lower()
+
+
 def parse_error(exc: Exception) -> str:
     """
     Interpret common exceptions and return user-friendly messages.
@@ -15,7 +22,7 @@ def parse_error(exc: Exception) -> str:
 
     # Torch / CUDA OOM
     msg = str(exc)
-    if "out of memory" in msg.lower() or isinstance(exc, torch.cuda.OutOfMemoryError):
+    if is_out_of_memory(exc):
         return "CUDA out of memory. Try lowering resolution or steps, or switch to CPU."
 
     # Wan CLI failures
@@ -0,0 +1,167 @@
+"""Progressively cheaper execution plans for recovering from out-of-memory errors.
+
+When a job runs out of memory it is retried on the next rung of
+:data:`PLANS`. Each rung keeps the savings of the rungs before it. The plan
+that finally succeeded is remembered per profile, model and resolution, so
+later jobs of the same shape start there instead of failing again. Falling back
+to the CPU is only remembered for the session, so one transient failure does
+not move every later run off the GPU.
+"""
+
+import gc
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional, TypeVar
+
+import torch
+
+from .errors import is_out_of_memory
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """Memory-saving measures applied to a pipeline for one attempt."""
+
+    name: str
+    # Divide the number of images rendered per pipeline call by this much
+    batch_divisor: int = 1
+    vae_tiling: bool = False
+    sequential_offload: bool = False
+    attention_slicing: bool = False
+    # Device to run on instead of the requested one
+    device: Optional[str] = None
+
+
+PLANS = (
+    ExecutionPlan("default"),
+    ExecutionPlan("smaller_batch", batch_divisor=2),
+    ExecutionPlan("vae_tiling", batch_divisor=2, vae_tiling=True),
+    ExecutionPlan(
+        "sequential_offload", batch_divisor=2, vae_tiling=True, sequential_offload=True
+    ),
+    ExecutionPlan(
+        "attention_slicing",
+        batch_divisor=2,
+        vae_tiling=True,
+        sequential_offload=True,
+        attention_slicing=True,
+    ),
+    ExecutionPlan(
+        "cpu", batch_divisor=2, vae_tiling=True, attention_slicing=True, device="cpu"
+    ),
+)
+
+PLANS_BY_NAME = {plan.name: plan for plan in PLANS}
+
+
+def get_plan(name: Optional[str]) -> ExecutionPlan:
+    """Return the plan called ``name``, or the default plan."""
+    return PLANS_BY_NAME.get(name or "default", PLANS[0])
+
+
+def free_memory() -> None:
+    """Release cached allocator blocks and unreachable tensors."""
+    gc.collect()
+    try:
+        torch.cuda.empty_cache()
+    except (AttributeError, RuntimeError) as exc:
+        logger.warning(f"Could not empty CUDA cache: {exc}")
+
+
+class PlanMemory:
+    """Remembers which plan last succeeded for a profile, model and resolution."""
+
+    _plans = {}
+    _settings_manager = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def key(profile: str, model: Optional[str], width: int, height: int) -> str:
+        """Return the memory key for ``model`` of ``profile`` at ``width``x``height``.
+
+        ``model`` is the weights path, or None for the profile's default weights.
+        """
+        model_id = hashlib.sha1((model or "").encode("utf-8")).hexdigest()[:12]
+        return f"{profile}_{model_id}_{width}x{height}"
+
+    @classmethod
+    def _get_settings_manager(cls):
+        if cls._settings_manager is None:
+            from .settings_manager import SettingsManager
+
+            cls._settings_manager = SettingsManager()
+        return cls._settings_manager
+
+    @classmethod
+    def get(cls, key: str) -> ExecutionPlan:
+        """Return the remembered plan for ``key``, or the default plan."""
+        with cls._lock:
+            if key not in cls._plans:
+                stored = cls._get_settings_manager().get(f"execution_plans/{key}")
+                cls._plans[key] = get_plan(stored)
+            return cls._plans[key]
+
+    @classmethod
+    def remember(cls, key: str, plan: ExecutionPlan) -> None:
+        """Record that ``plan`` succeeded for ``key``."""
+        with cls._lock:
+            previous = cls._plans.get(key)
+            cls._plans[key] = plan
+        # The CPU rung is often reached through a transient shortage, so it is
+        # kept for this session only
+        if previous is not plan and plan.device != "cpu":
+            value = None if plan is PLANS[0] else plan.name
+            cls._get_settings_manager().set(f"execution_plans/{key}", value)
+
+
+def run_with_oom_recovery(
+    run: Callable[[ExecutionPlan], T],
+    key: str,
+    skip: Optional[Callable[[ExecutionPlan], bool]] = None,
+    on_retry: Optional[Callable[[ExecutionPlan], None]] = None,
+) -> T:
+    """Call ``run`` with progressively cheaper plans until one fits in memory.
+
+    Args:
+        run: Performs the job using the given plan
+        key: :meth:`PlanMemory.key` of the job; picks the starting plan
+        skip: Returns True for plans that would not change anything for this job
+        on_retry: Called with the next plan before each retry
+
+    Returns:
+        Whatever ``run`` returned for the first plan that succeeded
+
+    Raises:
+        The last out-of-memory error if even the cheapest plan failed, or any
+        other error immediately
+    """
+    start = PLANS.index(PlanMemory.get(key))
+    candidates = [
+        plan
+        for plan in PLANS[start:]
+        if plan is PLANS[start] or not (skip and skip(plan))
+    ]
+    last = len(candidates) - 1
+    for attempt, plan in enumerate(candidates):
+        if attempt and on_retry:
+            on_retry(plan)
+        try:
+            result = run(plan)
+        except Exception as exc:
+            if not is_out_of_memory(exc) or attempt == last:
+                raise
+            logger.warning(f"Out of memory with plan '{plan.name}', retrying: {exc}")
+        else:
+            if plan.name != "default":
+                logger.info(f"Job succeeded with execution plan '{plan.name}'")
+            PlanMemory.remember(key, plan)
+            return result
+        # Outside the except block the failed attempt's frames are released
+        free_memory()
+    raise RuntimeError("No execution plan available")  # pragma: no cover
@@ -0,0 +1,201 @@
+"""Detect sustained memory growth across many repeated jobs.
+
+:class:`LeakDetector` samples process RSS, traced Python allocations, the
+number of live objects and CUDA memory between jobs. A metric counts as
+leaking when its least-squares slope after warm-up exceeds a per-job limit
+*and* the median of the last third of the samples sits clearly above the
+median of the first third, so a single spike or a one-off cache fill does
+not fail a run.
+"""
+
+import gc
+import logging
+import os
+import statistics
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss() -> int:
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+def current_vram() -> int:
+    """Return CUDA memory allocated by this process in bytes, or 0."""
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            return torch.cuda.memory_allocated()
+    except (ImportError, AttributeError, RuntimeError):
+        pass
+    return 0
+
+
+@dataclass
+class MemorySample:
+    """Memory usage measured after one job."""
+
+    iteration: int
+    rss: int
+    traced: int
+    objects: int
+    vram: int = 0
+
+
+@dataclass
+class LeakReport:
+    """Outcome of a leak analysis."""
+
+    # Per-job growth for each metric, in bytes (or objects for ``objects``)
+    slopes: Dict[str, float]
+    leaking: List[str]
+    top_allocations: List[str] = field(default_factory=list)
+    top_object_types: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        """Return a human-readable multi-line summary."""
+        lines = [f"{name}: {slope:+.1f}/job" for name, slope in self.slopes.items()]
+        if self.leaking:
+            lines.insert(0, f"Sustained growth in: {', '.join(self.leaking)}")
+        else:
+            lines.insert(0, "No sustained memory growth")
+        if self.top_allocations:
+            lines.append("Top allocation growth:")
+            lines.extend(f"  {line}" for line in self.top_allocations)
+        if self.top_object_types:
+            lines.append("Top object type growth:")
+            lines.extend(f"  {line}" for line in self.top_object_types)
+        return "\n".join(lines)
+
+
+def _slope(xs: Sequence[float], ys: Sequence[float]) -> float:
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if var == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+
+
+class LeakDetector:
+    """Collects memory samples between jobs and flags sustained growth."""
+
+    # Allowed growth per job before a metric counts as leaking
+    DEFAULT_LIMITS = {
+        "rss": 64 * 1024,
+        "traced": 16 * 1024,
+        "objects": 5.0,
+        "vram": 1024 * 1024,
+    }
+
+    def __init__(
+        self,
+        warmup: int = 20,
+        limits: Optional[Dict[str, float]] = None,
+        trace: bool = True,
+    ) -> None:
+        """Initialize the detector.
+
+        Args:
+            warmup: Iterations ignored while caches and pools fill up
+            limits: Per-job growth limits overriding :attr:`DEFAULT_LIMITS`
+            trace: Whether to run :mod:`tracemalloc` for allocation details
+        """
+        self.warmup = warmup
+        self.limits = {**self.DEFAULT_LIMITS, **(limits or {})}
+        self.trace = trace
+        self.samples: List[MemorySample] = []
+        self._baseline_snapshot = None
+        self._baseline_types: Optional[Counter] = None
+
+    def start(self) -> None:
+        """Start allocation tracing."""
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+
+    def stop(self) -> None:
+        """Stop allocation tracing if this detector started it."""
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def sample(self, iteration: int) -> MemorySample:
+        """Collect garbage and record the current memory usage."""
+        gc.collect()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        objects = gc.get_objects()
+        sample = self.record(
+            iteration, current_rss(), traced, len(objects), current_vram()
+        )
+        if iteration >= self.warmup and self._baseline_types is None:
+            # First sample after warm-up is the reference for the detail reports
+            self._baseline_types = Counter(type(o).__name__ for o in objects)
+            if tracemalloc.is_tracing():
+                self._baseline_snapshot = tracemalloc.take_snapshot()
+        del objects
+        return sample
+
+    def record(
+        self, iteration: int, rss: int, traced: int, objects: int, vram: int = 0
+    ) -> MemorySample:
+        """Record an externally measured sample."""
+        sample = MemorySample(iteration, rss, traced, objects, vram)
+        self.samples.append(sample)
+        return sample
+
+    def analyze(self) -> LeakReport:
+        """Compute growth rates and decide which metrics are leaking."""
+        steady = [s for s in self.samples if s.iteration >= self.warmup]
+        slopes: Dict[str, float] = {}
+        leaking: List[str] = []
+        if len(steady) >= 3:
+            xs = [s.iteration for s in steady]
+            third = max(1, len(steady) // 3)
+            # Medians, so one outlier at either end cannot fake a trend
+            for name, limit in self.limits.items():
+                ys = [getattr(s, name) for s in steady]
+                slopes[name] = _slope(xs, ys)
+                head = statistics.median(ys[:third])
+                tail = statistics.median(ys[-third:])
+                span = xs[-1] - xs[0]
+                # Growth must persist to the end of the run, not just spike
+                if slopes[name] > limit and tail - head > limit * span / 2:
+                    leaking.append(name)
+
+        report = LeakReport(slopes, leaking)
+        if self._baseline_types is not None:
+            now = Counter(type(o).__name__ for o in gc.get_objects())
+            growth = now - self._baseline_types
+            report.top_object_types = [
+                f"{name}: +{count}" for name, count in growth.most_common(10)
+            ]
+        if self._baseline_snapshot is not None and tracemalloc.is_tracing():
+            stats = tracemalloc.take_snapshot().compare_to(
+                self._baseline_snapshot, "lineno"
+            )
+            report.top_allocations = [str(stat) for stat in stats[:10]]
+        return report
+
+    def assert_no_leaks(self) -> LeakReport:
+        """Raise :class:`AssertionError` if any metric grows steadily."""
+        report = self.analyze()
+        logger.info(report.summary())
+        if report.leaking:
+            raise AssertionError(report.summary())
+        return report
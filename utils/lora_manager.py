@@ -0,0 +1,190 @@
+"""LoRA adapters switched on a cached pipeline without reloading base weights.
+
+Parsed adapter files are kept in a host-memory LRU shared by every pipeline,
+so returning to a recently used style costs no disk read or parse. Each
+pipeline keeps a bounded set of adapters injected and only changes which
+ones are active and how strongly. Fusing folds the active adapters into the
+base weights, which removes the per-step adapter overhead for long runs of
+jobs with the same combination.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+LORA_SUFFIX = ".safetensors"
+
+
+def parse_lora_spec(text: str) -> List[Tuple[str, float]]:
+    """Parse ``"name[:weight], ..."`` into ``(name, weight)`` pairs.
+
+    The weight defaults to 1.0. Raises :class:`ValueError` for bad weights.
+    """
+    loras = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, weight = part.rpartition(":")
+        if not sep:
+            name, weight = part, "1"
+        try:
+            loras.append((name.strip(), float(weight)))
+        except ValueError:
+            raise ValueError(f"Invalid LoRA weight in {part!r}") from None
+    return loras
+
+
+def resolve_lora_path(name: str, lora_dir: str) -> Path:
+    """Return the adapter file for ``name``, a file stem or a path."""
+    path = Path(name)
+    if path.suffix != LORA_SUFFIX:
+        path = Path(lora_dir) / f"{name}{LORA_SUFFIX}"
+    if not path.is_file():
+        raise FileNotFoundError(2, "LoRA adapter not found", str(path))
+    return path
+
+
+def list_loras(lora_dir: str) -> List[str]:
+    """Return the adapter names available in ``lora_dir``."""
+    directory = Path(lora_dir)
+    if not directory.is_dir():
+        return []
+    return sorted(p.stem for p in directory.glob(f"*{LORA_SUFFIX}"))
+
+
+def _load_safetensors(path: str) -> Dict[str, Any]:
+    from safetensors.torch import load_file
+
+    return load_file(path, device="cpu")
+
+
+class LoraWeightsCache:
+    """LRU of parsed adapter state dicts in host memory, bounded by size."""
+
+    def __init__(
+        self,
+        max_bytes: int = 2 << 30,
+        loader: Callable[[str], Dict[str, Any]] = _load_safetensors,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_bytes: Total tensor bytes to keep; the newest entry is always kept
+            loader: Reads an adapter file into a state dict
+        """
+        self.max_bytes = max_bytes
+        self._loader = loader
+        # Resolved path -> (mtime_ns, state dict, size in bytes)
+        self._entries: "OrderedDict[str, Tuple[int, Dict[str, Any], int]]" = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> Dict[str, Any]:
+        """Return the parsed weights of ``path``, reading it if not cached."""
+        key = str(path.resolve())
+        mtime = path.stat().st_mtime_ns
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and entry[0] == mtime
+            if hit:
+                self._entries.move_to_end(key)
+        metrics.cache_lookup("lora", hit)
+        if hit:
+            return entry[1]
+
+        logger.info(f"Reading LoRA weights from {path}")
+        state = self._loader(str(path))
+        size = sum(getattr(t, "nbytes", 0) for t in state.values())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[2]
+            self._entries[key] = (mtime, state, size)
+            self._size += size
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+        return state
+
+    def clear(self) -> None:
+        """Drop every cached adapter."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class LoraAdapters:
+    """Adapters injected into one pipeline and the combination in use."""
+
+    # Adapters kept injected at once; older unused ones are deleted
+    MAX_LOADED = 8
+
+    def __init__(self, pipe, cache: LoraWeightsCache) -> None:
+        self.pipe = pipe
+        self.cache = cache
+        self._loaded: "OrderedDict[str, Path]" = OrderedDict()
+        self._active: Tuple[Tuple[str, float], ...] = ()
+        self._fused: Optional[Tuple[Tuple[str, float], ...]] = None
+
+    def apply(
+        self, loras: Sequence[Tuple[str, float]], lora_dir: str, fuse: bool = False
+    ) -> None:
+        """Activate ``loras`` with their weights, loading adapters as needed.
+
+        Args:
+            loras: ``(name, weight)`` pairs; empty disables all adapters
+            lora_dir: Directory holding ``<name>.safetensors`` files
+            fuse: Fold the adapters into the base weights until they change
+        """
+        wanted = tuple((name, float(weight)) for name, weight in loras)
+        if self._fused is not None and (self._fused != wanted or not fuse):
+            self.pipe.unfuse_lora()
+            self._fused = None
+        if wanted == self._active and (self._fused is not None or not fuse):
+            return
+
+        if not wanted:
+            self.pipe.disable_lora()
+            self._active = ()
+            logger.info("LoRA adapters disabled")
+            return
+
+        names = [name for name, _ in wanted]
+        for name in names:
+            self._ensure_loaded(name, lora_dir, keep=names)
+        if not self._active:
+            self.pipe.enable_lora()
+        self.pipe.set_adapters(names, adapter_weights=[w for _, w in wanted])
+        self._active = wanted
+        if fuse:
+            self.pipe.fuse_lora(adapter_names=names)
+            self._fused = wanted
+        logger.info(
+            f"Active LoRA adapters: "
+            f"{', '.join(f'{n}={w:g}' for n, w in wanted)}{' (fused)' if fuse else ''}"
+        )
+
+    def _ensure_loaded(self, name: str, lora_dir: str, keep: Sequence[str]) -> None:
+        if name in self._loaded:
+            self._loaded.move_to_end(name)
+            return
+        path = resolve_lora_path(name, lora_dir)
+        # diffusers may rename keys in place; the cached dict must stay intact
+        state = dict(self.cache.get(path))
+        self.pipe.load_lora_weights(state, adapter_name=name)
+        self._loaded[name] = path
+        for old in list(self._loaded):
+            if len(self._loaded) <= self.MAX_LOADED:
+                break
+            if old not in keep:
+                self.pipe.delete_adapters(old)
+                del self._loaded[old]
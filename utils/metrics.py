@@ -0,0 +1,720 @@
+"""Aggregated performance metrics: counters, gauges and latency histograms.
+
+The module-level :data:`registry` collects job latency, per-step time, queue
+wait, model load time, cache hits and peak memory from the workers, the API
+job queue and :class:`~utils.model_manager.ModelManager`. Histograms use the
+HdrHistogram bucket layout: linear sub-buckets within each power of two, so
+every recorded value keeps a bounded relative error (1/64 with the default
+32 sub-buckets) from microseconds to hours in a few hundred sparse buckets.
+
+Counters and histograms are saved to a JSON file after every job once
+:func:`configure` names one, and loaded from it on start-up, so percentiles
+cover days of use rather than one session. Gauges describe the running
+process and start from zero. :meth:`MetricsRegistry.to_prometheus` renders
+the text exposition format served by :func:`serve` and the API's
+``/metrics`` route.
+"""
+
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Port of the local Prometheus endpoint; the GUI only starts it when the
+# ``metrics/port`` setting is set
+DEFAULT_PORT = 9464
+# Linear sub-buckets per power of two; must be a power of two
+SUB_BUCKETS = 32
+# Upper bounds of the exported ``_bucket`` series
+LATENCY_BOUNDS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+    600,
+    1800,
+)
+MEMORY_BOUNDS = tuple(float(1 << bits) for bits in range(28, 38))
+# Quantiles exported next to each histogram
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+_FORMAT_VERSION = 1
+
+LabelKey = Tuple[str, ...]
+
+
+class HdrHistogram:
+    """Counts of non-negative values in log-linear buckets.
+
+    Values are stored as multiples of ``unit``. Below ``2 * sub_buckets``
+    units every integer has its own bucket; above, each power of two is
+    split into ``sub_buckets`` equal buckets, so a reported quantile (the
+    bucket midpoint) is within ``1 / (2 * sub_buckets)`` of a recorded value.
+    """
+
+    def __init__(self, unit: float = 1e-6, sub_buckets: int = SUB_BUCKETS) -> None:
+        if sub_buckets < 2 or sub_buckets & (sub_buckets - 1):
+            raise ValueError("sub_buckets must be a power of two")
+        self.unit = unit
+        self.sub_buckets = sub_buckets
+        self._bits = sub_buckets.bit_length() - 1
+        # Bucket index -> number of values
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, units: int) -> int:
+        shift = units.bit_length() - 1 - self._bits
+        if shift <= 0:
+            return units
+        return (shift << self._bits) + (units >> shift)
+
+    def _bounds(self, index: int) -> Tuple[int, int]:
+        """Return the ``[low, high)`` range of bucket ``index`` in units."""
+        if index < 2 * self.sub_buckets:
+            return index, index + 1
+        shift = (index >> self._bits) - 1
+        sub = index - (shift << self._bits)
+        return sub << shift, (sub + 1) << shift
+
+    def record(self, value: float, count: int = 1) -> None:
+        """Add ``count`` occurrences of ``value``; negatives count as zero."""
+        value = max(0.0, float(value))
+        index = self._index(int(value / self.unit))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _midpoint(self, index: int) -> float:
+        low, high = self._bounds(index)
+        value = (low + high) / 2 * self.unit
+        return min(max(value, self.min), self.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the value below which a fraction ``q`` of values fall."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return self._midpoint(index)
+        return self.max
+
+    def count_at_most(self, bound: float) -> int:
+        """Return how many values were at most ``bound`` (to bucket precision)."""
+        return sum(
+            count
+            for index, count in self.counts.items()
+            if self._midpoint(index) <= bound
+        )
+
+    def copy(self) -> "HdrHistogram":
+        """Return an independent copy."""
+        hist = HdrHistogram(self.unit, self.sub_buckets)
+        hist.counts = dict(self.counts)
+        hist.count, hist.sum, hist.min, hist.max = (
+            self.count,
+            self.sum,
+            self.min,
+            self.max,
+        )
+        return hist
+
+    def mean(self) -> Optional[float]:
+        """Return the mean of the recorded values."""
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable copy for persistence."""
+        return {
+            "unit": self.unit,
+            "sub_buckets": self.sub_buckets,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max,
+            "counts": {str(index): count for index, count in self.counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HdrHistogram":
+        """Rebuild a histogram saved with :meth:`to_dict`."""
+        hist = cls(data["unit"], data["sub_buckets"])
+        hist.counts = {int(index): int(n) for index, n in data["counts"].items()}
+        hist.count = int(data["count"])
+        hist.sum = float(data["sum"])
+        hist.min = math.inf if data["min"] is None else float(data["min"])
+        hist.max = float(data["max"])
+        return hist
+
+
+class _Metric:
+    """A named metric with one series per combination of label values."""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[LabelKey, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {list(self.labelnames)}, "
+                f"got {sorted(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def series(self) -> List[Tuple[Dict[str, str], Any]]:
+        """Return ``(labels, value)`` of every series, sorted by labels."""
+        with self._lock:
+            items = sorted(self._series.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+    def clear(self) -> None:
+        """Drop every series."""
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return the series in the persisted form."""
+        return [{"labels": labels, "value": value} for labels, value in self.series()]
+
+    def restore(self, series: List[Dict[str, Any]]) -> None:
+        """Replace the series with a :meth:`snapshot`."""
+        with self._lock:
+            self._series = {
+                self._key(item["labels"]): float(item["value"]) for item in series
+            }
+
+
+class Counter(_Metric):
+    """A value that only goes up, such as the number of finished jobs."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """Add ``amount`` to the series selected by ``labels``."""
+        if amount < 0:
+            raise ValueError("Counters cannot decrease")
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """Return the current count."""
+        with self._lock:
+            return self._series.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, such as the queue length."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        """Set the series selected by ``labels`` to ``value``."""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = float(value)
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """Add ``amount`` (which may be negative)."""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """Return the current value."""
+        with self._lock:
+            return self._series.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, such as job durations."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        unit: float = 1e-6,
+        bounds: Sequence[float] = LATENCY_BOUNDS,
+    ) -> None:
+        """Create the metric.
+
+        Parameters:
+            name: Metric name.
+            help: One-line description.
+            labelnames: Names of the labels every observation carries.
+            unit: Smallest distinguishable value.
+            bounds: Upper bounds of the exported ``_bucket`` series.
+        """
+        super().__init__(name, help, labelnames)
+        self.unit = unit
+        self.bounds = tuple(bounds)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Record ``value`` in the series selected by ``labels``."""
+        key = self._key(labels)
+        with self._lock:
+            hist = self._series.get(key)
+            if hist is None:
+                hist = self._series[key] = HdrHistogram(self.unit)
+            hist.record(value)
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the wall time of the ``with`` block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get(self, **labels: Any) -> Optional[HdrHistogram]:
+        """Return a copy of one series, if anything was observed."""
+        with self._lock:
+            hist = self._series.get(self._key(labels))
+            return None if hist is None else hist.copy()
+
+    def series(self) -> List[Tuple[Dict[str, str], HdrHistogram]]:
+        with self._lock:
+            items = sorted(self._series.items())
+            return [
+                (dict(zip(self.labelnames, key)), hist.copy()) for key, hist in items
+            ]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {"labels": labels, "value": hist.to_dict()}
+            for labels, hist in self.series()
+        ]
+
+    def restore(self, series: List[Dict[str, Any]]) -> None:
+        restored = {}
+        for item in series:
+            hist = HdrHistogram.from_dict(item["value"])
+            if hist.unit != self.unit:
+                raise ValueError(f"{self.name} was saved with another unit")
+            restored[self._key(item["labels"])] = hist
+        with self._lock:
+            self._series = restored
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class MetricsRegistry:
+    """Named metrics with Prometheus text output and JSON persistence."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(
+                        f"{metric.name} is already registered as a {existing.type}"
+                    )
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Return the counter called ``name``, creating it if needed."""
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Return the gauge called ``name``, creating it if needed."""
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        unit: float = 1e-6,
+        bounds: Sequence[float] = LATENCY_BOUNDS,
+    ) -> Histogram:
+        """Return the histogram called ``name``, creating it if needed."""
+        return self._register(Histogram(name, help, labelnames, unit, bounds))
+
+    def metrics(self) -> List[_Metric]:
+        """Return all metrics, sorted by name."""
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def reset(self) -> None:
+        """Clear counters and histograms; gauges keep tracking live state."""
+        for metric in self.metrics():
+            if not isinstance(metric, Gauge):
+                metric.clear()
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format.
+
+        Each histogram is followed by a ``<name>_quantiles`` gauge with the
+        percentiles in :data:`QUANTILES`, computed from the full-resolution
+        buckets rather than interpolated from the exported ones.
+        """
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            series = metric.series()
+            if not isinstance(metric, Histogram):
+                for labels, value in series:
+                    lines.append(
+                        f"{metric.name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+                continue
+            quantiles = []
+            for labels, hist in series:
+                for bound in metric.bounds + (math.inf,):
+                    count = (
+                        hist.count if math.isinf(bound) else hist.count_at_most(bound)
+                    )
+                    bucket_labels = {**labels, "le": _format_value(bound)}
+                    lines.append(
+                        f"{metric.name}_bucket{_format_labels(bucket_labels)} {count}"
+                    )
+                lines.append(
+                    f"{metric.name}_sum{_format_labels(labels)} "
+                    f"{_format_value(hist.sum)}"
+                )
+                lines.append(
+                    f"{metric.name}_count{_format_labels(labels)} {hist.count}"
+                )
+                for q in QUANTILES if hist.count else ():
+                    quantile_labels = {**labels, "quantile": str(q)}
+                    quantiles.append(
+                        f"{metric.name}_quantiles{_format_labels(quantile_labels)} "
+                        f"{_format_value(hist.quantile(q))}"
+                    )
+            if quantiles:
+                lines.append(
+                    f"# HELP {metric.name}_quantiles Percentiles of {metric.name}"
+                )
+                lines.append(f"# TYPE {metric.name}_quantiles gauge")
+                lines.extend(quantiles)
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return counters and histograms as a JSON-serialisable object."""
+        return {
+            "version": _FORMAT_VERSION,
+            "metrics": {
+                metric.name: {"type": metric.type, "series": metric.snapshot()}
+                for metric in self.metrics()
+                if not isinstance(metric, Gauge)
+            },
+        }
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        """Load a :meth:`snapshot` into the registered metrics.
+
+        Saved metrics that are no longer registered, or whose type or labels
+        changed, are skipped with a warning.
+        """
+        if data.get("version") != _FORMAT_VERSION:
+            logger.warning(f"Ignoring metrics saved in format {data.get('version')}")
+            return
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, saved in data.get("metrics", {}).items():
+            metric = metrics.get(name)
+            if metric is None or metric.type != saved.get("type"):
+                continue
+            try:
+                metric.restore(saved.get("series", []))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Could not restore metric {name}: {e}")
+
+    def save(self, path: str) -> None:
+        """Write :meth:`snapshot` to ``path`` atomically."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> bool:
+        """Restore metrics saved at ``path``; returns whether a file was read."""
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read metrics from {path}: {e}")
+            return False
+        self.restore(data)
+        return True
+
+
+registry = MetricsRegistry()
+
+JOBS = registry.counter(
+    "fluxwan_jobs_total", "Generation jobs by outcome", ("kind", "status")
+)
+JOBS_IN_PROGRESS = registry.gauge(
+    "fluxwan_jobs_in_progress", "Generation jobs running now", ("kind",)
+)
+JOB_SECONDS = registry.histogram(
+    "fluxwan_job_duration_seconds",
+    "Wall time of completed generation jobs",
+    ("kind",),
+)
+STEP_SECONDS = registry.histogram(
+    "fluxwan_step_duration_seconds", "Time per denoising step", ("kind",)
+)
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "fluxwan_queue_wait_seconds",
+    "Time jobs waited in the queue before starting",
+    ("kind",),
+)
+QUEUE_DEPTH = registry.gauge("fluxwan_queue_depth", "Jobs waiting in the queue")
+MODEL_LOAD_SECONDS = registry.histogram(
+    "fluxwan_model_load_seconds", "Time to load a pipeline", ("model",)
+)
+CACHE_REQUESTS = registry.counter(
+    "fluxwan_cache_requests_total",
+    "Lookups in the model, component and LoRA caches",
+    ("cache", "result"),
+)
+GUIDANCE_JOBS = registry.counter(
+    "fluxwan_guidance_jobs_total", "Image jobs by guidance mode", ("mode",)
+)
+PEAK_MEMORY_BYTES = registry.histogram(
+    "fluxwan_job_peak_memory_bytes",
+    "Peak memory of a job: allocated CUDA memory, or the process's peak RSS",
+    ("kind", "device"),
+    unit=1 << 20,
+    bounds=MEMORY_BOUNDS,
+)
+
+_path: Optional[str] = None
+_save_lock = threading.Lock()
+
+
+def default_path() -> Path:
+    """Return the metrics file, next to the settings file."""
+    from .settings_backends import default_settings_path
+
+    return default_settings_path().parent / "metrics.json"
+
+
+def configure(path: Optional[str]) -> None:
+    """Persist metrics to ``path``, loading what an earlier run saved there."""
+    global _path
+    _path = None if path is None else str(path)
+    if _path is not None:
+        registry.load(_path)
+
+
+def save() -> None:
+    """Write the metrics to the configured file, if any."""
+    if _path is None:
+        return
+    with _save_lock:
+        try:
+            registry.save(_path)
+        except OSError as e:
+            logger.warning(f"Could not save metrics to {_path}: {e}")
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """Count a hit or miss of ``cache``."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def hit_rate(cache: str) -> Optional[float]:
+    """Return the fraction of ``cache`` lookups that hit, if any were made."""
+    hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+    total = hits + CACHE_REQUESTS.value(cache=cache, result="miss")
+    return hits / total if total else None
+
+
+def _cuda():
+    """Return ``torch.cuda`` if torch is loaded and a GPU is present."""
+    # Jobs that touch the GPU have imported torch already
+    torch = sys.modules.get("torch")
+    cuda = getattr(torch, "cuda", None)
+    try:
+        return cuda if cuda is not None and cuda.is_available() else None
+    except (AttributeError, RuntimeError):
+        return None
+
+
+def _reset_peak_memory() -> None:
+    cuda = _cuda()
+    if cuda is not None:
+        try:
+            cuda.reset_peak_memory_stats()
+        except (AttributeError, RuntimeError):
+            pass
+
+
+def _peak_memory() -> Optional[Tuple[str, int]]:
+    """Return ``(device, bytes)`` of the peak memory since the last reset."""
+    cuda = _cuda()
+    if cuda is not None:
+        try:
+            return "cuda", int(cuda.max_memory_allocated())
+        except (AttributeError, RuntimeError):
+            return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return "host", peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class JobRecord:
+    """Outcome of a job tracked by :func:`track_job`."""
+
+    kind: str
+    # "done", "failed" or "cancelled"
+    status: str = "done"
+
+
+@contextmanager
+def track_job(kind: str, memory: bool = True) -> Iterator[JobRecord]:
+    """Record the duration, outcome and peak memory of the job in the block.
+
+    Set ``status`` of the yielded record to ``"cancelled"`` when the job is
+    stopped; an exception marks it ``"failed"``. Only completed jobs add to
+    the latency histogram. The metrics are saved when the block ends.
+
+    Parameters:
+        kind: Job kind label, ``"image"`` or ``"video"``.
+        memory: Record peak memory; off for jobs running in another process.
+    """
+    record = JobRecord(kind)
+    if memory:
+        _reset_peak_memory()
+    JOBS_IN_PROGRESS.inc(kind=kind)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record.status = "failed"
+        raise
+    finally:
+        JOBS_IN_PROGRESS.inc(-1, kind=kind)
+        JOBS.inc(kind=kind, status=record.status)
+        if record.status == "done":
+            JOB_SECONDS.observe(time.perf_counter() - start, kind=kind)
+        peak = _peak_memory() if memory else None
+        if peak is not None:
+            PEAK_MEMORY_BYTES.observe(peak[1], kind=kind, device=peak[0])
+        save()
+
+
+class StepTimer:
+    """Observe the time between denoising step callbacks.
+
+    Without :meth:`restart` the first callback only starts the clock, since
+    the time before it also covers prompt encoding.
+    """
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self._last: Optional[float] = None
+
+    def restart(self) -> None:
+        """Time the next step from now."""
+        self._last = time.perf_counter()
+
+    def step(self) -> None:
+        """Record the step that just finished."""
+        now = time.perf_counter()
+        if self._last is not None:
+            STEP_SECONDS.observe(now - self._last, kind=self.kind)
+        self._last = now
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = registry
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("metrics: " + format, *args)
+
+
+def serve(port: int = DEFAULT_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``GET /metrics`` on a background thread.
+
+    Call ``shutdown()`` and ``server_close()`` on the returned server to stop.
+
+    Raises:
+        OSError: If the port cannot be bound
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    ).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -1,35 +1,48 @@
 """Automatic model downloader for Flux and Wan2.2 models from Hugging Face."""
 
+import hashlib
+import json
 import logging
+import threading
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from huggingface_hub import hf_hub_download, login, snapshot_download
 from huggingface_hub.utils import HfHubHTTPError
 
+from .model_profiles import PROFILES
+from .model_store import ModelStore
+
 logger = logging.getLogger(__name__)
 
 
+MANIFEST_NAME = ".manifest.json"
+
+
+def _sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Return the hex SHA-256 digest of ``path`` read in ``chunk_size`` blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 class ModelDownloader:
     """Handles automatic downloading of AI models from Hugging Face."""
 
-    # Model configurations
+    # Presence results keyed by model directory. Each entry stores the mtimes
+    # of the directories the manifest covers, so a cached answer is reused
+    # until a file is added, removed or renamed in one of them.
+    _presence_cache: Dict[str, Tuple[Tuple[int, ...], bool]] = {}
+    # Parsed manifests keyed by path, with the (mtime, size) they were read at
+    _manifest_cache: Dict[str, Tuple[Tuple[int, int], dict]] = {}
+    _presence_lock = threading.Lock()
+
+    # Model configurations; image models come from their profiles
     MODELS_CONFIG = {
-        "flux": {
-            "repo_id": "black-forest-labs/FLUX.1-dev",
-            "files": [
-                "flux1-dev.safetensors",
-                "ae.safetensors",
-                "text_encoder/model.safetensors",
-                "text_encoder_2/model.safetensors",
-                "tokenizer/tokenizer.json",
-                "tokenizer_2/tokenizer.json",
-                "scheduler/scheduler_config.json",
-            ],
-            "local_dir": "Models/Flux",
-            "requires_auth": True,
-        },
+        **{profile.name: profile.download_config() for profile in PROFILES},
         "wan2.2": {
-            "repo_id": "Wan-AI/Wan2.2-TI2V-5B",
+            "repo_id": "Wan-AI/Wan2.2-TI2V-5B-Diffusers",
             "files": "all",  # Download entire repository
             "local_dir": "Models/Wan2.2",
             "requires_auth": False,
@@ -45,6 +58,7 @@ class ModelDownloader:
         self.base_path = Path(base_path)
         self.models_dir = self.base_path / "Models"
         self.models_dir.mkdir(exist_ok=True)
+        self.store = ModelStore(self.models_dir)
 
     def authenticate_huggingface(self, token: str) -> bool:
         """Authenticate with Hugging Face using token.
@@ -63,9 +77,194 @@ class ModelDownloader:
             logger.error(f"Failed to authenticate with Hugging Face: {e}")
             return False
 
+    def get_model_dir(self, model_name: str) -> Path:
+        """Return the local directory for ``model_name``."""
+        config = self.MODELS_CONFIG[model_name]
+        return self.models_dir / config["local_dir"].split("/")[-1]
+
+    def write_manifest(self, model_name: str, with_hashes: bool = False) -> Path:
+        """Record the files currently installed for ``model_name``.
+
+        The manifest lists every file below the model directory with its size,
+        modification time and, optionally, its SHA-256 digest. Later presence
+        checks compare against it instead of scanning the whole tree. Digests
+        of the previous manifest are reused for files whose size and mtime
+        are unchanged; anything re-downloaded is hashed again.
+
+        Args:
+            model_name: Name of the model to describe
+            with_hashes: Whether to hash every file (slow for large weights)
+
+        Returns:
+            Path to the written manifest file
+        """
+        config = self.MODELS_CONFIG[model_name]
+        local_dir = self.get_model_dir(model_name)
+        previous = (self.load_manifest(model_name) or {}).get("files", {})
+        files = {}
+        for path in sorted(local_dir.rglob("*")):
+            rel = path.relative_to(local_dir)
+            # Skip the huggingface_hub download cache and the manifest itself
+            if not path.is_file() or rel.parts[0] in (".cache", MANIFEST_NAME):
+                continue
+            st = path.stat()
+            entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            if with_hashes:
+                old = previous.get(rel.as_posix(), {})
+                unchanged = (
+                    old.get("size") == st.st_size
+                    and old.get("mtime_ns") == st.st_mtime_ns
+                )
+                entry["sha256"] = (
+                    old["sha256"] if unchanged and "sha256" in old else _sha256(path)
+                )
+            files[rel.as_posix()] = entry
+
+        manifest_path = local_dir / MANIFEST_NAME
+        manifest = {
+            "model": model_name,
+            "repo_id": config["repo_id"],
+            "files": files,
+        }
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+        st = manifest_path.stat()
+        with self._presence_lock:
+            # Also covers rewrites within the filesystem's mtime granularity
+            self._manifest_cache[str(manifest_path)] = (
+                (st.st_mtime_ns, st.st_size),
+                manifest,
+            )
+        self._invalidate(local_dir)
+        logger.info(f"Wrote manifest for {model_name} ({len(files)} files)")
+        return manifest_path
+
+    def load_manifest(self, model_name: str) -> Optional[dict]:
+        """Return the parsed manifest for ``model_name`` or ``None``.
+
+        The file is parsed again only when its mtime or size changes; the
+        returned dict is shared and must not be modified.
+        """
+        manifest_path = self.get_model_dir(model_name) / MANIFEST_NAME
+        key = str(manifest_path)
+        try:
+            st = manifest_path.stat()
+            signature = (st.st_mtime_ns, st.st_size)
+            with self._presence_lock:
+                cached = self._manifest_cache.get(key)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            manifest = json.loads(manifest_path.read_text())
+        except FileNotFoundError:
+            with self._presence_lock:
+                self._manifest_cache.pop(key, None)
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+            return None
+        with self._presence_lock:
+            self._manifest_cache[key] = (signature, manifest)
+        return manifest
+
+    def verify_model(self, model_name: str, check_hashes: bool = False) -> List[str]:
+        """List problems with the installed files of ``model_name``.
+
+        Args:
+            model_name: Name of the model to verify
+            check_hashes: Whether to re-hash files that have a recorded digest
+
+        Returns:
+            Human-readable problems; empty if the install matches its manifest
+        """
+        manifest = self.load_manifest(model_name)
+        if manifest is None:
+            return [f"No manifest for {model_name}"]
+
+        local_dir = self.get_model_dir(model_name)
+        problems = []
+        for rel, entry in manifest["files"].items():
+            path = local_dir / rel
+            try:
+                size = path.stat().st_size
+            except OSError:
+                problems.append(f"Missing file: {rel}")
+                continue
+            if size != entry["size"]:
+                problems.append(
+                    f"Size mismatch for {rel}: expected {entry['size']}, got {size}"
+                )
+            elif check_hashes and "sha256" in entry:
+                if _sha256(path) != entry["sha256"]:
+                    problems.append(f"Checksum mismatch for {rel}")
+        return problems
+
+    def dedupe_model(self, model_name: str) -> int:
+        """Move the files of ``model_name`` into the shared blob store.
+
+        Args:
+            model_name: Name of the model to deduplicate
+
+        Returns:
+            Number of bytes saved
+        """
+        # Describe the files on disk now: a re-download since the last
+        # manifest must not be swapped for the blob of the old contents
+        self.write_manifest(model_name, with_hashes=True)
+        manifest = self.load_manifest(model_name)
+        local_dir = self.get_model_dir(model_name)
+        saved = self.store.ingest(local_dir, manifest["files"])
+        self._invalidate(local_dir)
+        return saved
+
+    def collect_garbage(self, dry_run: bool = False) -> List[str]:
+        """Remove blobs not referenced by any model manifest.
+
+        Args:
+            dry_run: Only report which blobs would be removed
+
+        Returns:
+            Digests of the removed (or removable) blobs
+        """
+        referenced = set()
+        for manifest_path in self.models_dir.glob(f"*/{MANIFEST_NAME}"):
+            try:
+                manifest = json.loads(manifest_path.read_text())
+            except (OSError, ValueError) as e:
+                # Without the manifest we cannot tell what is still in use
+                logger.error(f"Aborting garbage collection, bad {manifest_path}: {e}")
+                return []
+            referenced.update(
+                entry["sha256"]
+                for entry in manifest["files"].values()
+                if "sha256" in entry
+            )
+        return self.store.collect_garbage(referenced, dry_run=dry_run)
+
+    @classmethod
+    def _invalidate(cls, local_dir: Path) -> None:
+        with cls._presence_lock:
+            cls._presence_cache.pop(str(local_dir), None)
+
+    @staticmethod
+    def _dir_signature(local_dir: Path, manifest: Optional[dict]) -> Tuple[int, ...]:
+        """Return mtimes of the directories that hold the manifest's files."""
+        dirs = {local_dir}
+        if manifest is not None:
+            dirs.update((local_dir / rel).parent for rel in manifest["files"])
+        signature = []
+        for directory in sorted(dirs):
+            try:
+                signature.append(directory.stat().st_mtime_ns)
+            except OSError:
+                signature.append(-1)
+        return tuple(signature)
+
     def check_model_exists(self, model_name: str) -> bool:
         """Check if model files already exist locally.
 
+        Models with a manifest are checked file by file against it, and the
+        answer is cached until one of the covered directories changes.
+        Older installs without a manifest fall back to a directory scan.
+
         Args:
             model_name: Name of the model to check
 
@@ -75,18 +274,40 @@ class ModelDownloader:
         if model_name not in self.MODELS_CONFIG:
             return False
 
-        config = self.MODELS_CONFIG[model_name]
-        local_dir = self.models_dir / config["local_dir"].split("/")[-1]
+        local_dir = self.get_model_dir(model_name)
 
         if not local_dir.exists():
+            self._invalidate(local_dir)
             return False
 
+        manifest = self.load_manifest(model_name)
+        signature = self._dir_signature(local_dir, manifest)
+        key = str(local_dir)
+        with self._presence_lock:
+            cached = self._presence_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        if manifest is not None:
+            problems = self.verify_model(model_name)
+            for problem in problems:
+                logger.warning(f"Model {model_name}: {problem}")
+            exists = not problems
+        else:
+            exists = self._scan_model_dir(model_name, local_dir)
+
+        with self._presence_lock:
+            self._presence_cache[key] = (signature, exists)
+        return exists
+
+    def _scan_model_dir(self, model_name: str, local_dir: Path) -> bool:
+        """Fallback presence check for installs that predate manifests."""
         # Check if directory has files
         files = list(local_dir.rglob("*"))
         if files:
             # Special handling for Flux - if we only have a single .safetensors file,
             # we can consider it "exists" but incomplete
-            if model_name == "flux":
+            if model_name.startswith("flux"):
                 safetensors_files = list(local_dir.glob("*.safetensors"))
                 if len(safetensors_files) == 1 and len(files) == 1:
                     logger.info(
@@ -107,12 +328,15 @@ class ModelDownloader:
 
         return False
 
-    def download_model(self, model_name: str, force_download: bool = False) -> bool:
+    def download_model(
+        self, model_name: str, force_download: bool = False, dedupe: bool = True
+    ) -> bool:
         """Download a specific model from Hugging Face.
 
         Args:
             model_name: Name of the model to download
             force_download: Whether to re-download even if model exists
+            dedupe: Whether to move the files into the shared blob store
 
         Returns:
             True if download successful, False otherwise
@@ -122,7 +346,7 @@ class ModelDownloader:
             return False
 
         config = self.MODELS_CONFIG[model_name]
-        local_dir = self.models_dir / config["local_dir"].split("/")[-1]
+        local_dir = self.get_model_dir(model_name)
 
         # Check if already exists
         if not force_download and self.check_model_exists(model_name):
@@ -159,6 +383,10 @@ class ModelDownloader:
                         else:
                             raise
 
+            if dedupe:
+                self.dedupe_model(model_name)
+            else:
+                self.write_manifest(model_name)
             logger.info(f"Successfully downloaded {model_name} to {local_dir}")
             return True
 
@@ -167,7 +395,7 @@ class ModelDownloader:
             return False
 
     def download_all_models(self, force_download: bool = False) -> Dict[str, bool]:
-        """Download all configured models.
+        """Download all required models and update installed optional ones.
 
         Args:
             force_download: Whether to re-download existing models
@@ -177,7 +405,10 @@ class ModelDownloader:
         """
         results = {}
 
-        for model_name in self.MODELS_CONFIG.keys():
+        for model_name, config in self.MODELS_CONFIG.items():
+            # Optional profiles are only fetched on request (--model)
+            if config.get("optional") and not self.check_model_exists(model_name):
+                continue
             logger.info(f"Processing {model_name}...")
             results[model_name] = self.download_model(model_name, force_download)
 
@@ -234,14 +465,19 @@ def main():
 
     parser = argparse.ArgumentParser(description="Download AI models from Hugging Face")
     parser.add_argument(
-        "--token", required=True, help="Hugging Face authentication token"
+        "--token", help="Hugging Face authentication token (required to download)"
     )
     parser.add_argument(
         "--force", action="store_true", help="Force re-download existing models"
     )
     parser.add_argument("--model", help="Download specific model only")
+    parser.add_argument(
+        "--gc", action="store_true", help="Remove unreferenced blobs and exit"
+    )
 
     args = parser.parse_args()
+    if not args.gc and not args.token:
+        parser.error("--token is required unless --gc is given")
 
     # Setup logging
     logging.basicConfig(
@@ -250,6 +486,11 @@ def main():
 
     downloader = ModelDownloader()
 
+    if args.gc:
+        removed = downloader.collect_garbage()
+        print(f"Removed {len(removed)} unreferenced blobs")
+        return
+
     if args.model:
         success = downloader.setup_models_with_token(args.token)
         if success:
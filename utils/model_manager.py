@@ -1,10 +1,24 @@
 from diffusers import FluxPipeline, StableDiffusionPipeline
 import logging
 import threading
+import time
 import torch
 from pathlib import Path
 
+from .compilation import DEFAULT_CACHE_DIR, compile_pipeline
+from .cpu_performance import (
+    configure_torch_threads,
+    cpu_settings,
+    optimize_pipeline,
+    pin_current_thread,
+)
+from . import metrics
+from .execution_plans import ExecutionPlan, get_plan
+from .lora_manager import LoraAdapters, LoraWeightsCache
+from .model_profiles import SD_PIPELINE, get_profile
+from .schedulers import apply_scheduler, get_scheduler
 from .settings_manager import SettingsManager
+from .tracing import traced
 from .model_downloader import ModelDownloader
 
 
@@ -16,9 +30,30 @@ class ModelManager:
 
     _flux_pipe = None
     _flux_device = None
+    _flux_plan = None
+    # (profile name, model path) the cached pipeline was loaded from
+    _flux_source = None
+    # Active scheduler name and the scheduler the pipeline was loaded with
+    _flux_scheduler = None
+    _flux_base_scheduler = None
+    # LoRA adapters injected into the cached pipeline, and parsed adapter
+    # weights in host memory that outlive pipeline reloads
+    _flux_lora = None
+    # Whether the cached pipeline's denoiser and decoder were compiled
+    _flux_compiled = False
+    _lora_cache = LoraWeightsCache()
     _settings_manager = None
     _model_downloader = None
     _flux_lock = threading.Lock()
+    # Wan2.2 video pipeline and the (path, device, dtype, offload, t5_cpu)
+    # it was set up with
+    _wan_pipe = None
+    _wan_source = None
+    _wan_lock = threading.Lock()
+    # Sub-models (text encoders, VAEs) keyed by blob digest or repo id and
+    # dtype, so pipelines referencing the same weights share one instance.
+    _components = {}
+    _components_lock = threading.Lock()
 
     @classmethod
     def _get_settings_manager(cls):
@@ -33,38 +68,71 @@ class ModelManager:
         return cls._model_downloader
 
     @classmethod
-    def _ensure_models_available(cls):
-        """Ensure required models are downloaded."""
-        downloader = cls._get_model_downloader()
-
-        # Check if models exist
-        flux_exists = downloader.check_model_exists("flux")
-        wan_exists = downloader.check_model_exists("wan2.2")
-
-        if not flux_exists or not wan_exists:
-            missing = []
-            if not flux_exists:
-                missing.append("Flux")
-            if not wan_exists:
-                missing.append("Wan2.2")
+    def _ensure_models_available(cls, *model_names: str):
+        """Ensure required models are downloaded.
 
+        Checks ``model_names`` (default: Flux and Wan2.2). Presence results
+        are cached by :class:`ModelDownloader`, so repeated calls are cheap.
+        """
+        downloader = cls._get_model_downloader()
+        labels = {"flux": "Flux", "wan2.2": "Wan2.2"}
+
+        missing = [
+            labels.get(name, name)
+            for name in (model_names or ("flux", "wan2.2"))
+            if not downloader.check_model_exists(name)
+        ]
+        if missing:
             raise RuntimeError(
                 f"Missing models: {', '.join(missing)}. "
                 f"Please run 'python setup_models.py' to download them."
             )
 
     @classmethod
-    def _load_flux_from_single_file(cls, model_path: str, dtype, device: str):
-        """Load Flux pipeline from a single .safetensors file."""
+    def _get_shared_component(cls, loader_cls, repo_id: str, local_dir: Path, dtype):
+        """Load a sub-model once and reuse it across pipelines.
+
+        ``local_dir`` is preferred over ``repo_id`` when it holds weights; in
+        that case the cache key is the digest of the weights blob, so every
+        model directory linking the same blob shares the loaded module.
+        """
+        source = repo_id
+        key = repo_id
+        weights = sorted(local_dir.glob("*.safetensors")) if local_dir.is_dir() else []
+        if weights:
+            source = str(local_dir)
+            store = cls._get_model_downloader().store
+            key = store.digest_for(weights[0]) or str(weights[0].resolve())
+        key = (key, str(dtype))
+
+        with cls._components_lock:
+            component = cls._components.get(key)
+            metrics.cache_lookup("component", component is not None)
+            if component is None:
+                logger.info(f"Loading {loader_cls.__name__} from {source}")
+                component = loader_cls.from_pretrained(source, torch_dtype=dtype)
+                cls._components[key] = component
+            else:
+                logger.info(f"Reusing cached {loader_cls.__name__} for {source}")
+        return component
+
+    @classmethod
+    def _load_flux_from_single_file(
+        cls, model_path: str, dtype, device: str, profile=None
+    ):
+        """Load Flux pipeline from a single .safetensors file.
+
+        The checkpoint is picked by :meth:`ModelProfile.weights_file`, which
+        skips the autoencoder (``ae.safetensors``) downloaded alongside it.
+        """
         from transformers import CLIPTextModel, T5EncoderModel
         from diffusers import AutoencoderKL
 
-        # Check if model_path is a directory with a single .safetensors file
+        # Check if model_path is a directory holding a single-file checkpoint
         model_path_obj = Path(model_path)
         if model_path_obj.is_dir():
-            safetensors_files = list(model_path_obj.glob("*.safetensors"))
-            if len(safetensors_files) == 1:
-                model_file = safetensors_files[0]
+            model_file = (profile or get_profile(None)).weights_file(model_path_obj)
+            if model_file is not None:
                 logger.info(f"Found single model file: {model_file}")
 
                 # For Flux models that are single files, we need to load the components separately
@@ -102,12 +170,17 @@ class ModelManager:
                                 # Load default text encoder for the pipeline
                                 if pipeline_class == FluxPipeline:
                                     # For Flux, we need both CLIP and T5 text encoders
-                                    text_encoder = CLIPTextModel.from_pretrained(
+                                    text_encoder = cls._get_shared_component(
+                                        CLIPTextModel,
                                         "openai/clip-vit-large-patch14",
-                                        torch_dtype=dtype,
+                                        model_path_obj / "text_encoder",
+                                        dtype,
                                     )
-                                    text_encoder_2 = T5EncoderModel.from_pretrained(
-                                        "google/t5-v1_1-xxl", torch_dtype=dtype
+                                    text_encoder_2 = cls._get_shared_component(
+                                        T5EncoderModel,
+                                        "google/t5-v1_1-xxl",
+                                        model_path_obj / "text_encoder_2",
+                                        dtype,
                                     )
                                     pipe = pipeline_class.from_single_file(
                                         str(model_file),
@@ -117,9 +190,11 @@ class ModelManager:
                                     )
                                 else:
                                     # For SD, just CLIP
-                                    text_encoder = CLIPTextModel.from_pretrained(
+                                    text_encoder = cls._get_shared_component(
+                                        CLIPTextModel,
                                         "openai/clip-vit-large-patch14",
-                                        torch_dtype=dtype,
+                                        model_path_obj / "text_encoder",
+                                        dtype,
                                     )
                                     pipe = pipeline_class.from_single_file(
                                         str(model_file),
@@ -145,33 +220,94 @@ class ModelManager:
                     f"Could not load model file {model_file} with any method"
                 )
 
-        raise ValueError(f"Could not find single safetensors file in {model_path}")
+        raise ValueError(f"Could not find a model checkpoint file in {model_path}")
+
+    @classmethod
+    def _resolve_source(cls, params: dict):
+        """Return the model profile and weights location for ``params``."""
+        profile = get_profile(params.get("profile"))
+        # Use downloaded model path or existing custom path
+        default_model_path = str(Path(profile.local_dir).absolute())
+        model_path = (
+            params.get("model_path")
+            or cls._get_settings_manager().get_model_path(profile.name)
+            or default_model_path
+        )
+        return profile, model_path
 
     @classmethod
+    @traced("get_flux_pipeline")
     def get_flux_pipeline(cls, params: dict):
         # Skip model availability check for now since we have a single file
         # cls._ensure_models_available()
 
         settings_manager = cls._get_settings_manager()
-        # Use downloaded model path or existing custom path
-        default_model_path = str(Path("Models/Flux").absolute())
-        model_path = (
-            params.get("model_path")
-            or settings_manager.get_model_path("flux")
-            or default_model_path
+        profile, model_path = cls._resolve_source(params)
+        plan = get_plan(params.get("execution_plan"))
+        requested_device = (
+            plan.device or params.get("device") or settings_manager.get_device()
         )
-        requested_device = params.get("device") or settings_manager.get_device()
-        dtype = torch.bfloat16 if requested_device != "cpu" else torch.float32
+        cpu = None
+        if requested_device == "cpu":
+            cpu = cpu_settings(settings_manager)
+            configure_torch_threads(cpu)
+            # Called from the worker thread, leaving a core for the GUI
+            pin_current_thread(cpu.reserve_cores)
+            dtype = getattr(torch, cpu.precision)
+        else:
+            dtype = torch.bfloat16
 
         with cls._flux_lock:
+            current_plan = cls._flux_plan
+            if cls._flux_pipe is not None and cls._flux_source != (
+                profile.name,
+                model_path,
+            ):
+                logger.info(f"Switching image model to {profile.label}")
+                cls._flux_pipe = None
+                cls._flux_device = None
+                cls._flux_plan = None
+                cls._flux_scheduler = None
+            elif (
+                cls._flux_pipe is not None
+                and current_plan is not None
+                and current_plan.sequential_offload
+                and not plan.sequential_offload
+            ):
+                # Sequential offload hooks cannot be removed; start from scratch
+                logger.info("Reloading Flux pipeline to leave sequential offload")
+                cls._flux_pipe = None
+                cls._flux_device = None
+                cls._flux_plan = None
+                cls._flux_scheduler = None
+            elif cls._flux_pipe is not None and (
+                cls._flux_compiled and not params.get("compile")
+            ):
+                # Compiled modules cannot be reverted in place
+                logger.info("Reloading Flux pipeline to run without compilation")
+                cls._flux_pipe = None
+                cls._flux_device = None
+                cls._flux_plan = None
+                cls._flux_scheduler = None
+
+            metrics.cache_lookup("flux_pipeline", cls._flux_pipe is not None)
             if cls._flux_pipe is None:
+                # Release the previous pipeline's adapters before loading
+                cls._flux_lora = None
+                cls._flux_compiled = False
                 logger.info(f"Loading Flux pipeline from {model_path}")
+                load_start = time.perf_counter()
 
                 # Check if it's a directory with pipeline structure
                 model_path_obj = Path(model_path)
                 has_model_index = (model_path_obj / "model_index.json").exists()
 
-                if has_model_index:
+                if has_model_index and profile.pipeline == SD_PIPELINE:
+                    pipe = StableDiffusionPipeline.from_pretrained(
+                        model_path,
+                        torch_dtype=dtype,
+                    )
+                elif has_model_index:
                     # Standard pipeline loading
                     try:
                         pipe = FluxPipeline.from_pretrained(
@@ -189,7 +325,7 @@ class ModelManager:
                 else:
                     # Single file loading
                     pipe = cls._load_flux_from_single_file(
-                        model_path, dtype, requested_device
+                        model_path, dtype, requested_device, profile
                     )
 
                 # Apply memory optimizations for 16GB VRAM
@@ -201,9 +337,18 @@ class ModelManager:
                         pipe.vae.enable_tiling()
 
                 pipe.to(requested_device)
+                if cpu is not None:
+                    optimize_pipeline(pipe, cpu)
                 cls._flux_pipe = pipe
                 cls._flux_device = requested_device
-                logger.info("Flux pipeline loaded successfully")
+                cls._flux_source = (profile.name, model_path)
+                cls._flux_plan = None
+                cls._flux_scheduler = None
+                cls._flux_base_scheduler = getattr(pipe, "scheduler", None)
+                metrics.MODEL_LOAD_SECONDS.observe(
+                    time.perf_counter() - load_start, model=profile.name
+                )
+                logger.info(f"{profile.label} pipeline loaded successfully")
             elif cls._flux_device != requested_device:
                 pipe = cls._flux_pipe
                 try:
@@ -225,20 +370,152 @@ class ModelManager:
                                 pipe.vae.enable_tiling()
                         pipe.to(requested_device)
                         cls._flux_pipe = pipe
+                        cls._flux_plan = None
+                        cls._flux_scheduler = None
+                        cls._flux_base_scheduler = getattr(pipe, "scheduler", None)
                     except (RuntimeError, OSError) as load_exc:
                         raise RuntimeError(
                             f"Could not load flux pipeline on {requested_device}"
                         ) from load_exc
                 cls._flux_device = requested_device
+                if cpu is not None:
+                    optimize_pipeline(cls._flux_pipe, cpu)
+
+            if plan != cls._flux_plan:
+                cls._apply_execution_plan(cls._flux_pipe, plan, requested_device)
+                cls._flux_plan = plan
+
+            scheduler = get_scheduler(params.get("scheduler"))
+            if scheduler.name != cls._flux_scheduler:
+                # Schedulers hold no weights, so they are swapped in place
+                apply_scheduler(cls._flux_pipe, cls._flux_base_scheduler, scheduler)
+                cls._flux_scheduler = scheduler.name
+
+            loras = params.get("loras") or ()
+            if loras or cls._flux_lora is not None:
+                if cls._flux_lora is None or cls._flux_lora.pipe is not cls._flux_pipe:
+                    cls._flux_lora = LoraAdapters(cls._flux_pipe, cls._lora_cache)
+                cls._flux_lora.apply(
+                    loras,
+                    settings_manager.get_lora_dir(),
+                    fuse=params.get("fuse_lora", False),
+                )
+
+            if params.get("compile") and not cls._flux_compiled:
+                if plan.sequential_offload:
+                    logger.info("Not compiling while sequential offload is active")
+                else:
+                    cls._flux_compiled = compile_pipeline(
+                        cls._flux_pipe,
+                        settings_manager.get("compile/cache_dir", DEFAULT_CACHE_DIR),
+                        settings_manager.get("compile/mode", "default"),
+                    )
 
             return cls._flux_pipe
 
+    @classmethod
+    def _apply_execution_plan(cls, pipe, plan: ExecutionPlan, device: str) -> None:
+        """Switch the memory-saving features of ``pipe`` to match ``plan``."""
+        logger.info(f"Using execution plan '{plan.name}' on {device}")
+        vae = getattr(pipe, "vae", None)
+        # GPU pipelines are always loaded with VAE tiling enabled
+        if vae is not None and hasattr(vae, "enable_tiling"):
+            if plan.vae_tiling or device != "cpu":
+                vae.enable_tiling()
+            else:
+                vae.disable_tiling()
+        if hasattr(pipe, "enable_attention_slicing"):
+            if plan.attention_slicing:
+                pipe.enable_attention_slicing()
+            elif cls._flux_plan is not None and cls._flux_plan.attention_slicing:
+                pipe.disable_attention_slicing()
+        already_offloaded = cls._flux_plan is not None and (
+            cls._flux_plan.sequential_offload
+        )
+        if plan.sequential_offload and device != "cpu" and not already_offloaded:
+            pipe.enable_sequential_cpu_offload()
+
     @classmethod
     def get_wan_model_path(cls):
         """Get the path to the Wan2.2 model."""
-        cls._ensure_models_available()
+        cls._ensure_models_available("wan2.2")
         return str(Path("Models/Wan2.2").absolute())
 
+    @classmethod
+    def _wan_dtype(cls, precision: str, device: str):
+        """Return the transformer dtype for a ``VideoParams.precision`` value."""
+        dtype = {
+            "fp16": torch.float16,
+            "float16": torch.float16,
+            "bf16": torch.bfloat16,
+            "bfloat16": torch.bfloat16,
+            "fp32": torch.float32,
+            "float32": torch.float32,
+        }.get(str(precision).lower(), torch.bfloat16)
+        if device == "cpu" and dtype == torch.float16:
+            # fp16 matmuls are emulated on CPUs; use the CPU profile instead
+            return getattr(torch, cpu_settings(cls._get_settings_manager()).precision)
+        return dtype
+
+    @classmethod
+    @traced("get_wan_pipeline")
+    def get_wan_pipeline(cls, params: dict):
+        """Return the cached Wan2.2 pipeline, loading it on first use.
+
+        ``params`` holds :class:`VideoParams` fields plus optional
+        ``model_path`` and ``device``. The pipeline is reloaded only when the
+        model, device, precision or placement options change.
+        """
+        from diffusers import AutoencoderKLWan, WanPipeline
+
+        settings_manager = cls._get_settings_manager()
+        model_path = params.get("model_path") or cls.get_wan_model_path()
+        device = params.get("device") or settings_manager.get_device()
+        dtype = cls._wan_dtype(params.get("precision", "bf16"), device)
+        # Both options only matter when the transformer runs on an accelerator
+        offload = bool(params.get("offload")) and device != "cpu"
+        t5_cpu = bool(params.get("t5_cpu")) and device != "cpu"
+        source = (model_path, device, str(dtype), offload, t5_cpu)
+
+        if device == "cpu":
+            cpu = cpu_settings(settings_manager)
+            configure_torch_threads(cpu)
+            pin_current_thread(cpu.reserve_cores)
+
+        with cls._wan_lock:
+            cached = cls._wan_pipe is not None and cls._wan_source == source
+            metrics.cache_lookup("wan_pipeline", cached)
+            if cached:
+                return cls._wan_pipe
+            # Drop the old pipeline before loading so both never coexist
+            cls._wan_pipe = None
+            cls._wan_source = None
+            logger.info(f"Loading Wan2.2 pipeline from {model_path} ({dtype})")
+            load_start = time.perf_counter()
+
+            # The Wan VAE loses detail in reduced precision
+            vae = AutoencoderKLWan.from_pretrained(
+                model_path, subfolder="vae", torch_dtype=torch.float32
+            )
+            pipe = WanPipeline.from_pretrained(model_path, vae=vae, torch_dtype=dtype)
+            if offload:
+                if t5_cpu:
+                    # Excluded modules get no offload hook, so T5 stays put
+                    pipe._exclude_from_cpu_offload = ["text_encoder"]
+                pipe.enable_model_cpu_offload()
+            else:
+                pipe.to(device)
+            if t5_cpu:
+                pipe.text_encoder.to("cpu")
+
+            cls._wan_pipe = pipe
+            cls._wan_source = source
+            metrics.MODEL_LOAD_SECONDS.observe(
+                time.perf_counter() - load_start, model="wan2.2"
+            )
+            logger.info("Wan2.2 pipeline loaded successfully")
+            return pipe
+
     @classmethod
     def clear_cache(cls):
         """Clear all cached models and free memory."""
@@ -247,6 +524,17 @@ class ModelManager:
                 del cls._flux_pipe
                 cls._flux_pipe = None
                 cls._flux_device = None
+                cls._flux_source = None
+                cls._flux_plan = None
+                cls._flux_scheduler = None
+                cls._flux_base_scheduler = None
+                cls._flux_lora = None
+                cls._flux_compiled = False
+        with cls._wan_lock:
+            cls._wan_pipe = None
+            cls._wan_source = None
+        with cls._components_lock:
+            cls._components.clear()
 
         # Clear CUDA cache
         if torch.cuda.is_available():
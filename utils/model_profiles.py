@@ -0,0 +1,281 @@
+"""Image model profiles: where each model comes from and how to drive it.
+
+A profile bundles the download source of a model with the generation
+defaults it was trained for. Guidance-distilled Flux dev ignores negative
+prompts, timestep-distilled Flux schnell needs only four steps and no
+guidance at all, and Stable Diffusion runs real classifier-free guidance.
+
+:func:`guidance_plan` turns a profile and the requested guidance into one of
+the guidance modes below, so no job pays for an unconditional pass that has
+no effect:
+
+``none``
+    Timestep-distilled: guidance and negative prompts are ignored.
+``distilled``
+    The guidance value is a model input (guidance embedding); one pass.
+``cfg``
+    Classifier-free guidance; the pipeline batches the conditional and
+    unconditional passes into one call of twice the batch size.
+``partial-cfg``
+    CFG for the first ``cfg_fraction`` of the steps only, where it shapes
+    the composition; the remaining steps run the conditional pass alone.
+``cfg-skipped``
+    A CFG model at guidance 1 or below, where the unconditional pass
+    cancels out; one conditional pass and no negative prompt.
+"""
+
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from .schedulers import EPSILON, FLOW
+
+FLUX_PIPELINE = "flux"
+SD_PIPELINE = "sd"
+
+GUIDANCE_NONE = "none"
+GUIDANCE_DISTILLED = "distilled"
+GUIDANCE_CFG = "cfg"
+GUIDANCE_PARTIAL_CFG = "partial-cfg"
+GUIDANCE_CFG_SKIPPED = "cfg-skipped"
+
+# Top-level weights next to the diffusion model that are not a checkpoint
+_SUPPORT_WEIGHTS = ("ae.safetensors",)
+_FLUX_SUPPORT_FILES = _SUPPORT_WEIGHTS + (
+    "text_encoder/model.safetensors",
+    "text_encoder_2/model.safetensors",
+    "tokenizer/tokenizer.json",
+    "tokenizer_2/tokenizer.json",
+    "scheduler/scheduler_config.json",
+)
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """Download source and generation defaults of one image model."""
+
+    # Key used for downloads and the ``models/<name>`` path setting
+    name: str
+    label: str
+    repo_id: str
+    # Files to fetch from ``repo_id``, or ``"all"`` for the whole repository
+    files: Union[Tuple[str, ...], str]
+    local_dir: str
+    requires_auth: bool
+    # Pipeline family used to load the weights
+    pipeline: str
+    default_steps: int
+    default_guidance: float
+    # Whether the guidance value has any effect
+    uses_guidance: bool = True
+    # Whether guidance is classifier-free (two model passes per step)
+    uses_cfg: bool = False
+    negative_prompt: bool = False
+    # Longest T5 prompt in tokens; ``None`` leaves the pipeline default
+    max_sequence_length: Optional[int] = None
+    # Not fetched by ``setup_models.py``; download with ``--model <name>``
+    optional: bool = False
+    # Single-file checkpoint of the diffusion model, for downloads that are
+    # not a diffusers folder (no ``model_index.json``)
+    weights: Optional[str] = None
+
+    @property
+    def scheduler_family(self) -> str:
+        """Sampler family of :mod:`utils.schedulers` that fits these weights."""
+        return FLOW if self.pipeline == FLUX_PIPELINE else EPSILON
+
+    def download_config(self) -> Dict[str, Any]:
+        """Return the :attr:`ModelDownloader.MODELS_CONFIG` entry."""
+        return {
+            "repo_id": self.repo_id,
+            "files": list(self.files) if self.files != "all" else "all",
+            "local_dir": self.local_dir,
+            "requires_auth": self.requires_auth,
+            "optional": self.optional,
+        }
+
+    def weights_file(self, directory: Path) -> Optional[Path]:
+        """Return the single-file checkpoint in ``directory``, if any.
+
+        That is :attr:`weights` when present, else the only top-level
+        ``.safetensors`` file other than support weights such as the Flux
+        autoencoder, so custom folders with one checkpoint still load.
+        """
+        if self.weights and (directory / self.weights).is_file():
+            return directory / self.weights
+        candidates = [
+            path
+            for path in directory.glob("*.safetensors")
+            if path.name not in _SUPPORT_WEIGHTS
+        ]
+        return candidates[0] if len(candidates) == 1 else None
+
+
+PROFILES = (
+    ModelProfile(
+        name="flux",
+        label="FLUX.1 dev",
+        repo_id="black-forest-labs/FLUX.1-dev",
+        files=("flux1-dev.safetensors",) + _FLUX_SUPPORT_FILES,
+        local_dir="Models/Flux",
+        requires_auth=True,
+        pipeline=FLUX_PIPELINE,
+        default_steps=28,
+        default_guidance=3.5,
+        max_sequence_length=512,
+        weights="flux1-dev.safetensors",
+    ),
+    ModelProfile(
+        name="flux-schnell",
+        label="FLUX.1 schnell (4-step draft)",
+        repo_id="black-forest-labs/FLUX.1-schnell",
+        files=("flux1-schnell.safetensors",) + _FLUX_SUPPORT_FILES,
+        local_dir="Models/FluxSchnell",
+        requires_auth=False,
+        pipeline=FLUX_PIPELINE,
+        default_steps=4,
+        default_guidance=0.0,
+        uses_guidance=False,
+        max_sequence_length=256,
+        optional=True,
+        weights="flux1-schnell.safetensors",
+    ),
+    ModelProfile(
+        name="sd15",
+        label="Stable Diffusion 1.5 (fallback)",
+        repo_id="stable-diffusion-v1-5/stable-diffusion-v1-5",
+        files=(
+            "model_index.json",
+            "scheduler/scheduler_config.json",
+            "text_encoder/config.json",
+            "text_encoder/model.safetensors",
+            "tokenizer/merges.txt",
+            "tokenizer/special_tokens_map.json",
+            "tokenizer/tokenizer_config.json",
+            "tokenizer/vocab.json",
+            "unet/config.json",
+            "unet/diffusion_pytorch_model.safetensors",
+            "vae/config.json",
+            "vae/diffusion_pytorch_model.safetensors",
+        ),
+        local_dir="Models/SD15",
+        requires_auth=False,
+        pipeline=SD_PIPELINE,
+        default_steps=25,
+        default_guidance=7.0,
+        uses_cfg=True,
+        negative_prompt=True,
+        optional=True,
+    ),
+)
+
+PROFILES_BY_NAME = {profile.name: profile for profile in PROFILES}
+
+
+def get_profile(name: Optional[str]) -> ModelProfile:
+    """Return the profile called ``name``, or FLUX.1 dev."""
+    return PROFILES_BY_NAME.get(name or "flux", PROFILES[0])
+
+
+@dataclass(frozen=True)
+class GuidancePlan:
+    """How guidance is applied to one job (see the module docstring)."""
+
+    mode: str
+    steps: int
+    # Steps that also run the unconditional pass
+    cfg_steps: int
+    # Pipeline call arguments: guidance scale, negative prompt, ...
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def guidance_scale(self) -> float:
+        """Guidance scale passed to the pipeline."""
+        return self.kwargs["guidance_scale"]
+
+    @property
+    def tensor_inputs(self) -> Dict[str, Any]:
+        """``callback_on_step_end_tensor_inputs`` needed by :meth:`step_end`."""
+        key = "callback_on_step_end_tensor_inputs"
+        return {key: self.kwargs[key]} if key in self.kwargs else {}
+
+    @property
+    def negative_prompt(self) -> bool:
+        """Whether the negative prompt has any effect."""
+        return self.mode in (GUIDANCE_CFG, GUIDANCE_PARTIAL_CFG)
+
+    def passes(self) -> int:
+        """Denoiser evaluations per image, counting both halves of CFG."""
+        return self.steps + self.cfg_steps
+
+    def describe(self) -> str:
+        """Return the mode, with the CFG steps when only some run it."""
+        if self.mode == GUIDANCE_PARTIAL_CFG:
+            return f"{self.mode} ({self.cfg_steps} of {self.steps} steps)"
+        return self.mode
+
+    def step_end(
+        self, hook: Optional[Callable[..., Dict[str, Any]]] = None
+    ) -> Optional[Callable[..., Dict[str, Any]]]:
+        """Return the ``callback_on_step_end`` of this plan.
+
+        For ``partial-cfg`` it drops the unconditional half of the prompt
+        embeddings and turns guidance off after the last CFG step, then
+        calls ``hook`` (the caller's own progress callback), if any.
+        """
+        if self.mode != GUIDANCE_PARTIAL_CFG:
+            return hook
+        cfg_steps = self.cfg_steps
+
+        def _on_step_end(pipe, step, timestep, callback_kwargs):
+            if step == cfg_steps - 1:
+                embeds = callback_kwargs["prompt_embeds"]
+                callback_kwargs["prompt_embeds"] = embeds.chunk(2)[-1]
+                pipe._guidance_scale = 0.0
+            if hook is not None:
+                return hook(pipe, step, timestep, callback_kwargs)
+            return callback_kwargs
+
+        return _on_step_end
+
+
+def guidance_plan(
+    profile: ModelProfile,
+    neg_prompt: str,
+    guidance: float,
+    steps: int = 0,
+    cfg_fraction: float = 1.0,
+) -> GuidancePlan:
+    """Choose the guidance mode of a job and its pipeline arguments.
+
+    Parameters:
+        profile: Model being run.
+        neg_prompt: Negative prompt; passed only where CFG runs.
+        guidance: Requested guidance scale.
+        steps: Denoising steps of the job.
+        cfg_fraction: Leading fraction of ``steps`` that runs CFG; only
+            Stable Diffusion pipelines support less than the whole run.
+    """
+    kwargs: Dict[str, Any] = {}
+    if profile.max_sequence_length:
+        kwargs["max_sequence_length"] = profile.max_sequence_length
+    if not profile.uses_guidance:
+        return GuidancePlan(GUIDANCE_NONE, steps, 0, {"guidance_scale": 0.0, **kwargs})
+    if not profile.uses_cfg:
+        return GuidancePlan(
+            GUIDANCE_DISTILLED, steps, 0, {"guidance_scale": guidance, **kwargs}
+        )
+    cfg_steps = steps
+    if profile.pipeline == SD_PIPELINE and cfg_fraction < 1:
+        cfg_steps = min(steps, max(0, math.ceil(round(steps * cfg_fraction, 6))))
+    if guidance <= 1 or (steps and not cfg_steps):
+        # diffusers runs the unconditional pass only above 1
+        return GuidancePlan(
+            GUIDANCE_CFG_SKIPPED, steps, 0, {"guidance_scale": 1.0, **kwargs}
+        )
+    kwargs.update(guidance_scale=guidance, negative_prompt=neg_prompt or None)
+    if 0 < cfg_steps < steps:
+        kwargs["callback_on_step_end_tensor_inputs"] = ["prompt_embeds"]
+        return GuidancePlan(GUIDANCE_PARTIAL_CFG, steps, cfg_steps, kwargs)
+    return GuidancePlan(GUIDANCE_CFG, steps, steps, kwargs)
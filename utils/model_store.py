@@ -0,0 +1,152 @@
+"""Content-addressed blob store shared by all downloaded models."""
+
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ModelStore:
+    """Deduplicates model files into ``Models/.blobs`` by SHA-256 digest.
+
+    Each model directory keeps its normal layout, but every file becomes a
+    hardlink (or a symlink where hardlinks are not possible) to a single blob,
+    so components shared between models are stored once.
+    """
+
+    BLOBS_DIRNAME = ".blobs"
+
+    def __init__(self, models_dir: Path) -> None:
+        """Initialize the store.
+
+        Args:
+            models_dir: Directory holding the per-model folders
+        """
+        self.models_dir = Path(models_dir)
+        self.blobs_dir = self.models_dir / self.BLOBS_DIRNAME
+        self._inode_index: Optional[Dict[Tuple[int, int], str]] = None
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> Path:
+        """Return the location of the blob for ``digest``."""
+        return self.blobs_dir / digest
+
+    def add_file(self, path: Path, digest: str) -> int:
+        """Move ``path`` into the store and replace it with a link.
+
+        Args:
+            path: File inside a model directory
+            digest: SHA-256 digest of the file contents
+
+        Returns:
+            Number of bytes saved because an identical blob already existed
+        """
+        blob = self.blob_path(digest)
+        if path.is_symlink() and Path(os.readlink(path)).name == digest:
+            return 0
+        if blob.exists():
+            if os.path.samefile(path, blob):
+                return 0
+            saved = path.stat().st_size
+            path.unlink()
+        else:
+            self.blobs_dir.mkdir(parents=True, exist_ok=True)
+            saved = 0
+            # Hardlink first so the original never disappears mid-way
+            try:
+                os.link(path, blob)
+                self._remember(blob, digest)
+                return 0
+            except OSError:
+                shutil.move(str(path), str(blob))
+        self._link(blob, path)
+        self._remember(blob, digest)
+        return saved
+
+    def ingest(self, model_dir: Path, files: Dict[str, dict]) -> int:
+        """Deduplicate every file listed in a model manifest.
+
+        Args:
+            model_dir: Directory of the model
+            files: Manifest ``files`` mapping; entries need a ``sha256`` digest
+
+        Returns:
+            Total number of bytes saved
+        """
+        saved = 0
+        for rel, entry in files.items():
+            digest = entry.get("sha256")
+            if digest is None:
+                logger.warning(f"Skipping {rel}: no digest in manifest")
+                continue
+            saved += self.add_file(model_dir / rel, digest)
+        if saved:
+            logger.info(f"Deduplicated {model_dir.name}: saved {saved} bytes")
+        return saved
+
+    def digest_for(self, path: Path) -> Optional[str]:
+        """Return the blob digest ``path`` links to, or ``None``."""
+        try:
+            if path.is_symlink():
+                target = Path(os.readlink(path))
+                return target.name if target.parent.name == self.BLOBS_DIRNAME else None
+            st = path.stat()
+        except OSError:
+            return None
+        return self._index().get((st.st_dev, st.st_ino))
+
+    def collect_garbage(
+        self, referenced: Iterable[str], dry_run: bool = False
+    ) -> List[str]:
+        """Delete blobs that no manifest references.
+
+        Args:
+            referenced: Digests that are still in use
+            dry_run: Only report what would be removed
+
+        Returns:
+            Digests of the removed (or removable) blobs
+        """
+        keep = set(referenced)
+        removed = []
+        if not self.blobs_dir.is_dir():
+            return removed
+        for blob in sorted(self.blobs_dir.iterdir()):
+            if blob.name in keep:
+                continue
+            removed.append(blob.name)
+            if not dry_run:
+                blob.unlink()
+        if removed and not dry_run:
+            with self._lock:
+                self._inode_index = None
+            logger.info(f"Removed {len(removed)} unreferenced blobs")
+        return removed
+
+    @staticmethod
+    def _link(blob: Path, path: Path) -> None:
+        try:
+            os.link(blob, path)
+        except OSError:
+            os.symlink(blob.resolve(), path)
+
+    def _remember(self, blob: Path, digest: str) -> None:
+        with self._lock:
+            if self._inode_index is not None:
+                st = blob.stat()
+                self._inode_index[(st.st_dev, st.st_ino)] = digest
+
+    def _index(self) -> Dict[Tuple[int, int], str]:
+        with self._lock:
+            if self._inode_index is None:
+                index = {}
+                if self.blobs_dir.is_dir():
+                    for blob in self.blobs_dir.iterdir():
+                        st = blob.stat()
+                        index[(st.st_dev, st.st_ino)] = blob.name
+                self._inode_index = index
+            return self._inode_index
@@ -0,0 +1,153 @@
+"""On-demand ``torch.profiler`` capture of a window of denoising steps.
+
+Arm a capture with :func:`request_profile`; the next image job takes it
+with :func:`take_request` and runs inside :func:`capture`. The step
+callbacks call :func:`step`, which advances the profiler schedule: the first
+``skip`` steps are left out (they include one-off allocations and kernel
+selection), then ``steps`` steps are recorded. When the window closes the
+operator-level trace and a top-ops table are written next to the output::
+
+    <prefix>.profile.json   Chrome trace (Perfetto, chrome://tracing)
+    <prefix>.ops.txt        operators by self CPU time and by memory
+"""
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Steps recorded by default
+DEFAULT_STEPS = 3
+# Steps left out before recording starts
+DEFAULT_SKIP = 1
+# Rows of each summary table
+TOP_OPS = 30
+
+_local = threading.local()
+_pending: Optional["ProfileRequest"] = None
+_pending_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ProfileRequest:
+    """Where and how much of a job to profile."""
+
+    # Output path without extension
+    out_prefix: str
+    steps: int = DEFAULT_STEPS
+    skip: int = DEFAULT_SKIP
+
+
+def request_profile(request: ProfileRequest) -> None:
+    """Profile the next image job that starts."""
+    global _pending
+    with _pending_lock:
+        _pending = request
+
+
+def take_request() -> Optional[ProfileRequest]:
+    """Return and clear the pending request, if any."""
+    global _pending
+    with _pending_lock:
+        request, _pending = _pending, None
+    return request
+
+
+class StepProfiler:
+    """A ``torch.profiler`` session driven by denoising steps."""
+
+    def __init__(self, request: ProfileRequest) -> None:
+        import torch
+        from torch.profiler import ProfilerActivity, profile, schedule
+
+        self.request = request
+        # Files written once the window closes
+        self.outputs: List[str] = []
+        self.cuda = torch.cuda.is_available()
+        activities = [ProfilerActivity.CPU]
+        if self.cuda:
+            activities.append(ProfilerActivity.CUDA)
+        skip = max(0, request.skip)
+        self._profiler = profile(
+            activities=activities,
+            # The last skipped step warms the profiler up
+            schedule=schedule(
+                wait=max(0, skip - 1),
+                warmup=min(1, skip),
+                active=max(1, request.steps),
+                repeat=1,
+            ),
+            on_trace_ready=self._write,
+            record_shapes=True,
+            profile_memory=True,
+        )
+
+    def __enter__(self) -> "StepProfiler":
+        self._profiler.__enter__()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._profiler.__exit__(*exc)
+
+    def step(self) -> None:
+        """Mark the end of a denoising step."""
+        self._profiler.step()
+
+    def summary(self, prof) -> str:
+        """Return the top-ops tables of a finished profiler."""
+        averages = prof.key_averages()
+        memory_key = "self_cuda_memory_usage" if self.cuda else "self_cpu_memory_usage"
+        return (
+            f"Top {TOP_OPS} operators by self CPU time\n"
+            f"{averages.table(sort_by='self_cpu_time_total', row_limit=TOP_OPS)}\n\n"
+            f"Top {TOP_OPS} operators by self memory\n"
+            f"{averages.table(sort_by=memory_key, row_limit=TOP_OPS)}\n"
+        )
+
+    def _write(self, prof) -> None:
+        prefix = self.request.out_prefix
+        os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+        trace_path = f"{prefix}.profile.json"
+        prof.export_chrome_trace(trace_path)
+        summary_path = f"{prefix}.ops.txt"
+        with open(summary_path, "w", encoding="utf-8") as fh:
+            fh.write(self.summary(prof))
+        self.outputs = [trace_path, summary_path]
+        logger.info(f"Profile written to {trace_path} and {summary_path}")
+
+
+@contextmanager
+def capture(request: Optional[ProfileRequest]) -> Iterator[Optional[StepProfiler]]:
+    """Profile the steps of the block on this thread; no-op for ``None``."""
+    if request is None:
+        yield None
+        return
+    try:
+        profiler = StepProfiler(request)
+    except ImportError:
+        logger.warning("torch.profiler is unavailable; not profiling")
+        yield None
+        return
+    previous = getattr(_local, "profiler", None)
+    _local.profiler = profiler
+    try:
+        with profiler:
+            yield profiler
+    finally:
+        _local.profiler = previous
+        if not profiler.outputs:
+            logger.warning(
+                f"The job ended before the profiling window "
+                f"({request.skip} + {request.steps} steps); nothing was written"
+            )
+
+
+def step() -> None:
+    """Advance the profiler of this thread, if one is capturing."""
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None:
+        profiler.step()
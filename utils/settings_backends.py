@@ -0,0 +1,220 @@
+"""Persistent storage backends used by :class:`utils.settings_manager.SettingsManager`.
+
+Settings are flat ``key -> value`` mappings where ``/`` separates groups, as in
+``"models/flux"``. Backends only load and merge such mappings; caching and
+write coalescing live in the settings manager.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+try:
+    import tomllib
+except ImportError:  # pragma: no cover - Python < 3.11
+    import tomli as tomllib  # type: ignore[no-redef]
+
+logger = logging.getLogger(__name__)
+
+ORGANIZATION = "YourCompany"
+APPLICATION = "FluxWanApp"
+ENV_PREFIX = "FLUXWAN_"
+SETTINGS_FILE_ENV = ENV_PREFIX + "SETTINGS_FILE"
+
+_BARE_KEY = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def default_settings_path() -> Path:
+    """Return the settings file path, honouring ``FLUXWAN_SETTINGS_FILE``."""
+    override = os.environ.get(SETTINGS_FILE_ENV)
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CONFIG_HOME") or str(Path.home() / ".config")
+    return Path(base) / APPLICATION / "settings.toml"
+
+
+def env_overrides(environ: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+    """Return settings overridden through ``FLUXWAN_*`` environment variables.
+
+    ``FLUXWAN_DEVICE`` overrides ``device`` and a double underscore separates
+    groups, so ``FLUXWAN_MODELS__FLUX`` overrides ``models/flux``.
+    """
+    environ = os.environ if environ is None else environ
+    overrides = {}
+    for name, value in environ.items():
+        if not name.startswith(ENV_PREFIX) or name == SETTINGS_FILE_ENV:
+            continue
+        key = name[len(ENV_PREFIX) :].lower().replace("__", "/")
+        overrides[key] = value
+    return overrides
+
+
+class SettingsBackend:
+    """Interface for a persistent settings store."""
+
+    def load(self) -> Dict[str, Any]:
+        """Return all stored values."""
+        raise NotImplementedError
+
+    def save(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge ``changes`` into the store and return the resulting values.
+
+        A value of ``None`` removes the key.
+        """
+        raise NotImplementedError
+
+    def version(self) -> Any:
+        """Return a token that changes whenever the store is written."""
+        return None
+
+
+class TomlFileBackend(SettingsBackend):
+    """Store settings in a TOML file guarded by an advisory file lock.
+
+    Writes are read-modify-write under an exclusive lock and replace the file
+    atomically, so several processes can share one settings file.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        """Initialize the backend.
+
+        Args:
+            path: Settings file; defaults to :func:`default_settings_path`
+        """
+        self.path = Path(path) if path is not None else default_settings_path()
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+
+    def exists(self) -> bool:
+        """Return whether the settings file has been created yet."""
+        return self.path.exists()
+
+    def load(self) -> Dict[str, Any]:
+        with self._locked(exclusive=False):
+            return self._read()
+
+    def save(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        with self._locked(exclusive=True):
+            values = self._read()
+            for key, value in changes.items():
+                if value is None:
+                    values.pop(key, None)
+                else:
+                    values[key] = value
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(dumps(values), encoding="utf-8")
+            os.replace(tmp, self.path)
+            return values
+
+    def version(self) -> Any:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "rb") as fh:
+                data = tomllib.load(fh)
+        except FileNotFoundError:
+            return {}
+        except tomllib.TOMLDecodeError as e:
+            logger.error(f"Ignoring malformed settings file {self.path}: {e}")
+            return {}
+        return _flatten(data)
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class QSettingsBackend(SettingsBackend):
+    """Store settings through Qt's :class:`QSettings`."""
+
+    def __init__(
+        self, organization: str = ORGANIZATION, application: str = APPLICATION
+    ) -> None:
+        """Initialize the underlying :class:`QSettings` store."""
+        from PyQt5.QtCore import QSettings
+
+        self._q = QSettings(organization, application)
+
+    def load(self) -> Dict[str, Any]:
+        return {key: self._q.value(key) for key in self._q.allKeys()}
+
+    def save(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        for key, value in changes.items():
+            if value is None:
+                self._q.remove(key)
+            else:
+                self._q.setValue(key, value)
+        self._q.sync()
+        return self.load()
+
+
+def _flatten(data: Mapping[str, Any], prefix: str = "") -> Dict[str, Any]:
+    values = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{prefix}{key}/"))
+        else:
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def _format_key(key: str) -> str:
+    return key if _BARE_KEY.match(key) else json.dumps(key)
+
+
+def check_value(value: Any) -> None:
+    """Raise TypeError unless ``value`` can be stored; ``None`` removes a key."""
+    if value is not None:
+        _format_value(value)
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        # JSON string escapes are a subset of TOML basic-string escapes
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_format_value(v) for v in value) + "]"
+    raise TypeError(f"Cannot store {type(value).__name__} in settings")
+
+
+def dumps(values: Mapping[str, Any]) -> str:
+    """Serialize flat ``group/key`` settings as a TOML document."""
+    tables: Dict[str, Dict[str, Any]] = {}
+    for key, value in values.items():
+        group, _, name = key.rpartition("/")
+        tables.setdefault(group, {})[name] = value
+
+    lines = []
+    for group in sorted(tables):
+        if group:
+            header = ".".join(_format_key(part) for part in group.split("/"))
+            lines.append(f"\n[{header}]")
+        for name, value in sorted(tables[group].items()):
+            lines.append(f"{_format_key(name)} = {_format_value(value)}")
+    return "\n".join(lines).lstrip("\n") + "\n"
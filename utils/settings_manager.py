@@ -1,23 +1,244 @@
-from typing import Any, Optional
+import atexit
+import dataclasses
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
 
-from PyQt5.QtCore import QSettings
+from .settings_backends import (
+    QSettingsBackend,
+    SettingsBackend,
+    TomlFileBackend,
+    check_value,
+    env_overrides,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Settings:
+    """Typed view of the known application settings."""
+
+    device: str = "cpu"
+    output_dir: str = "."
+    # Folder of LoRA adapter ``.safetensors`` files
+    lora_dir: str = "Models/LoRA"
+    # Model locations keyed by name, stored as ``models/<name>``
+    models: Dict[str, str] = field(default_factory=dict)
+
+
+_FIELD_TYPES = {f.name: f.type for f in dataclasses.fields(Settings)}
+
+
+def _coerce(key: str, value: Any) -> Any:
+    """Convert string values from untyped backends to the schema type."""
+    expected = _FIELD_TYPES.get(key)
+    if not isinstance(value, str) or expected in (None, str, "str"):
+        return value
+    if expected in (bool, "bool"):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if expected in (int, "int"):
+        return int(value)
+    if expected in (float, "float"):
+        return float(value)
+    return value
+
+
+class _SettingsStore:
+    """In-memory snapshot of a backend with coalesced, delayed writes."""
+
+    def __init__(
+        self,
+        backend: SettingsBackend,
+        flush_delay: float,
+        refresh_interval: float,
+        migrate: bool = False,
+    ) -> None:
+        self.backend = backend
+        self._migrate = migrate
+        self.flush_delay = flush_delay
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._values: Dict[str, Any] = {}
+        # Whether ``_values`` holds a snapshot of the backend yet
+        self._loaded = False
+        self._pending: Dict[str, Any] = {}
+        self._overrides = env_overrides()
+        self._timer: Optional[threading.Timer] = None
+        self._version: Any = None
+        self._checked_at = 0.0
+        atexit.register(self.flush)
+
+    def get(self, key: str, default: Any) -> Any:
+        if key in self._overrides:
+            return _coerce(key, self._overrides[key])
+        with self._lock:
+            self._refresh()
+            value = self._values.get(key)
+        return default if value is None else _coerce(key, value)
+
+    def values(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            merged = dict(self._values)
+        merged.update(self._overrides)
+        return merged
+
+    def set(self, key: str, value: Any) -> None:
+        check_value(value)
+        with self._lock:
+            self._refresh()
+            self._values[key] = value
+            self._pending[key] = value
+            if self.flush_delay <= 0:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                try:
+                    stored = self.backend.save(pending)
+                except TypeError:
+                    # One value the backend cannot store must not hold back the rest
+                    stored = self._save_each(pending)
+            except OSError as e:
+                logger.error(f"Failed to save settings: {e}")
+                self._pending = {**pending, **self._pending}
+                return
+            self._values = {**stored, **self._pending}
+            self._version = self.backend.version()
+
+    def _save_each(self, pending: Dict[str, Any]) -> Dict[str, Any]:
+        """Save ``pending`` one key at a time, dropping values that are rejected."""
+        stored = None
+        for key, value in pending.items():
+            try:
+                stored = self.backend.save({key: value})
+            except TypeError as e:
+                logger.error(f"Dropping setting {key}: {e}")
+        return self.backend.load() if stored is None else stored
+
+    def reload(self) -> None:
+        with self._lock:
+            if self._migrate:
+                self._migrate = False
+                _import_qsettings(self.backend)
+            self._values = {**self.backend.load(), **self._pending}
+            self._loaded = True
+            self._version = self.backend.version()
+            self._checked_at = time.monotonic()
+
+    def _refresh(self) -> None:
+        # Pick up writes from other processes at most once per interval
+        if not self._loaded:
+            self.reload()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+        if self.backend.version() != self._version:
+            self.reload()
+
+
+def _import_qsettings(backend: SettingsBackend) -> None:
+    """Copy values from the old QSettings store into a new settings file."""
+    # Only a settings file that does not exist yet is populated
+    if not isinstance(backend, TomlFileBackend) or backend.exists():
+        return
+    try:
+        legacy = QSettingsBackend().load()
+    except ImportError:
+        return
+    if not legacy:
+        return
+    logger.info(f"Migrating {len(legacy)} settings to {backend.path}")
+    try:
+        backend.save(legacy)
+    except (OSError, TypeError) as e:
+        logger.error(f"Failed to migrate settings: {e}")
 
 
 class SettingsManager:
-    """Wrapper around :class:`QSettings` to persist application settings."""
+    """Typed, cached access to persistent application settings.
+
+    Reads are served from an in-memory snapshot, and writes are coalesced and
+    flushed after ``FLUSH_DELAY`` seconds or at exit. ``FLUXWAN_*`` environment
+    variables override stored values without being persisted. All managers
+    created without an explicit backend share one snapshot of the settings
+    file, so values set in one place are visible everywhere in the process.
+    """
+
+    FLUSH_DELAY = 0.5
+    REFRESH_INTERVAL = 1.0
 
-    def __init__(self) -> None:
-        """Initialize the underlying :class:`QSettings` store."""
-        # Organization and Application name determine registry/storage keys
-        self._q = QSettings("YourCompany", "FluxWanApp")
+    _default_store: Optional[_SettingsStore] = None
+    _default_lock = threading.Lock()
+
+    def __init__(
+        self,
+        backend: Optional[SettingsBackend] = None,
+        flush_delay: Optional[float] = None,
+    ) -> None:
+        """Attach to a settings store.
+
+        Args:
+            backend: Storage backend; defaults to the shared TOML settings file
+            flush_delay: Seconds to coalesce writes; ``0`` writes immediately
+        """
+        delay = self.FLUSH_DELAY if flush_delay is None else flush_delay
+        if backend is not None:
+            self._store = _SettingsStore(backend, delay, self.REFRESH_INTERVAL)
+            return
+        with SettingsManager._default_lock:
+            if SettingsManager._default_store is None:
+                SettingsManager._default_store = _SettingsStore(
+                    TomlFileBackend(), delay, self.REFRESH_INTERVAL, migrate=True
+                )
+            self._store = SettingsManager._default_store
 
     def get(self, key: str, default: Optional[Any] = None) -> Any:
         """Return the stored value for ``key`` or ``default`` if missing."""
-        return self._q.value(key, default)
+        return self._store.get(key, default)
 
     def set(self, key: str, value: Any) -> None:
-        """Persist ``value`` under ``key``."""
-        self._q.setValue(key, value)
+        """Persist ``value`` under ``key``; ``None`` removes it.
+
+        Raises:
+            TypeError: If ``value`` is not a string, number, bool or list of them
+        """
+        self._store.set(key, value)
+
+    def flush(self) -> None:
+        """Write pending changes to the backend immediately."""
+        self._store.flush()
+
+    def reload(self) -> None:
+        """Discard the cached snapshot and re-read the backend."""
+        self._store.reload()
+
+    def snapshot(self) -> Settings:
+        """Return the current settings as a :class:`Settings` instance."""
+        values = self._store.values()
+        settings = Settings()
+        for key, value in values.items():
+            if key.startswith("models/"):
+                settings.models[key[len("models/") :]] = value
+            elif key in _FIELD_TYPES and key != "models":
+                setattr(settings, key, _coerce(key, value))
+        return settings
 
     def get_model_path(self, key: str, default: str = "") -> str:
         """Return model path for ``key`` such as ``"flux"`` or ``"wan"``."""
@@ -42,3 +263,7 @@ class SettingsManager:
     def set_output_dir(self, path: str) -> None:
         """Persist the directory for generated output files."""
         self.set("output_dir", path)
+
+    def get_lora_dir(self, default: str = "Models/LoRA") -> str:
+        """Return the folder that holds LoRA adapter files."""
+        return self.get("lora_dir", default)
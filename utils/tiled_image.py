@@ -0,0 +1,190 @@
+"""Images too large for memory, stored as memory-mapped arrays on disk.
+
+Tiled generation writes each decoded tile straight into a ``.npy`` file
+opened with :func:`numpy.lib.format.open_memmap`, so the full image is never
+held in memory. Next to it, :func:`build_overviews` writes a pyramid of
+downsampled copies (``name.x4.npy``, ``name.x16.npy``, ...) one band of rows
+at a time. :class:`TiledImage` reads any region at any zoom level from the
+coarsest level that still has enough detail, so a viewer only touches the
+pixels it shows. :func:`export_tiff` converts the result to a tiled BigTIFF
+for print workflows when ``tifffile`` is installed.
+
+Images are ``(height, width, 3)`` uint8 RGB arrays.
+"""
+
+import logging
+import math
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Each overview level is this many times smaller along both axes
+OVERVIEW_FACTOR = 4
+# Overviews stop once the longest side fits in this many pixels
+OVERVIEW_MIN_SIZE = 1024
+# Rows of the source level read at once when building overviews
+_BAND_ROWS = 256
+
+Box = Tuple[int, int, int, int]
+
+
+def create_image(path: str, width: int, height: int):
+    """Create a black ``width`` x ``height`` RGB image at ``path`` for writing."""
+    from numpy.lib.format import open_memmap
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    return open_memmap(path, mode="w+", dtype="uint8", shape=(height, width, 3))
+
+
+def overview_path(path: str, factor: int) -> Path:
+    """Return where the overview downsampled by ``factor`` is stored."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.x{factor}{path.suffix}")
+
+
+def build_overviews(path: str) -> List[Path]:
+    """Write the downsampled pyramid for the image at ``path``.
+
+    Each level is a box-filtered copy of the previous one, computed band by
+    band so only ``_BAND_ROWS`` rows of the source are in memory at a time.
+    """
+    import numpy as np
+    from numpy.lib.format import open_memmap
+
+    source = np.load(path, mmap_mode="r")
+    factor = 1
+    written = []
+    while max(source.shape[:2]) > OVERVIEW_MIN_SIZE:
+        height = source.shape[0] // OVERVIEW_FACTOR
+        width = source.shape[1] // OVERVIEW_FACTOR
+        if not height or not width:
+            break
+        factor *= OVERVIEW_FACTOR
+        target_path = overview_path(path, factor)
+        target = open_memmap(
+            target_path, mode="w+", dtype="uint8", shape=(height, width, 3)
+        )
+        band = _BAND_ROWS // OVERVIEW_FACTOR
+        area = OVERVIEW_FACTOR * OVERVIEW_FACTOR
+        for row in range(0, height, band):
+            rows = min(band, height - row)
+            block = source[
+                row * OVERVIEW_FACTOR : (row + rows) * OVERVIEW_FACTOR,
+                : width * OVERVIEW_FACTOR,
+            ]
+            block = block.reshape(rows, OVERVIEW_FACTOR, width, OVERVIEW_FACTOR, 3)
+            total = block.sum(axis=(1, 3), dtype=np.uint16)
+            target[row : row + rows] = (total + area // 2) // area
+        target.flush()
+        del target
+        written.append(target_path)
+        source = np.load(target_path, mmap_mode="r")
+    return written
+
+
+class TiledImage:
+    """Read-only access to an image and its overviews without loading them."""
+
+    def __init__(self, path: str) -> None:
+        import numpy as np
+
+        self.path = path
+        # (factor, array) from full resolution to the coarsest overview
+        self.levels = [(1, np.load(path, mmap_mode="r"))]
+        factor = OVERVIEW_FACTOR
+        while overview_path(path, factor).is_file():
+            self.levels.append(
+                (factor, np.load(overview_path(path, factor), mmap_mode="r"))
+            )
+            factor *= OVERVIEW_FACTOR
+
+    @property
+    def width(self) -> int:
+        return self.levels[0][1].shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.levels[0][1].shape[0]
+
+    def read(self, box: Box, step: int = 1):
+        """Return the pixels of ``box`` keeping every ``step``-th row and column.
+
+        ``box`` is ``(left, top, right, bottom)`` in full-resolution pixels.
+        The coarsest level whose factor does not exceed ``step`` is read, so
+        the result has roughly ``box`` size divided by ``step`` pixels.
+        """
+        left, top, right, bottom = box
+        factor, level = max(
+            (entry for entry in self.levels if entry[0] <= max(1, step)),
+            key=lambda entry: entry[0],
+        )
+        stride = max(1, step // factor)
+        return level[
+            top // factor : math.ceil(bottom / factor) : stride,
+            left // factor : math.ceil(right / factor) : stride,
+        ]
+
+
+def visible_region(
+    image_size: Tuple[int, int],
+    view_size: Tuple[int, int],
+    zoom: float,
+    offset: Tuple[float, float],
+) -> Tuple[Box, int]:
+    """Return the image box shown in a view and the read step for ``zoom``.
+
+    Args:
+        image_size: ``(width, height)`` of the full-resolution image
+        view_size: ``(width, height)`` of the view in screen pixels
+        zoom: Screen pixels per image pixel
+        offset: Image coordinate shown at the view's top-left corner
+    """
+    left = max(0, int(offset[0]))
+    top = max(0, int(offset[1]))
+    right = min(image_size[0], math.ceil(offset[0] + view_size[0] / zoom))
+    bottom = min(image_size[1], math.ceil(offset[1] + view_size[1] / zoom))
+    step = max(1, int(1 / zoom))
+    return (left, top, max(left, right), max(top, bottom)), step
+
+
+def _tiff_tiles(image, tile: int) -> Iterator:
+    import numpy as np
+
+    height, width = image.shape[:2]
+    for top in range(0, height, tile):
+        for left in range(0, width, tile):
+            block = image[top : top + tile, left : left + tile]
+            if block.shape[:2] != (tile, tile):
+                # Edge tiles are padded to the full tile size
+                padded = np.zeros((tile, tile, 3), dtype=np.uint8)
+                padded[: block.shape[0], : block.shape[1]] = block
+                block = padded
+            yield np.ascontiguousarray(block)
+
+
+def export_tiff(path: str, tiff_path: str, tile: int = 512) -> str:
+    """Write the image at ``path`` to ``tiff_path`` as a tiled BigTIFF.
+
+    Tiles are streamed from the memory-mapped source, so the export needs
+    about one tile of memory. ``tile`` must be a multiple of 16.
+    """
+    import numpy as np
+
+    try:
+        import tifffile
+    except ImportError:
+        raise RuntimeError("TIFF export needs the tifffile package") from None
+
+    image = np.load(path, mmap_mode="r")
+    tifffile.imwrite(
+        tiff_path,
+        _tiff_tiles(image, tile),
+        shape=image.shape,
+        dtype=np.uint8,
+        tile=(tile, tile),
+        photometric="rgb",
+        bigtiff=True,
+    )
+    logger.info(f"Exported {image.shape[1]}x{image.shape[0]} image to {tiff_path}")
+    return tiff_path
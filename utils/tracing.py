@@ -0,0 +1,337 @@
+"""Per-job stage tracing exported as Chrome trace JSON.
+
+A job calls :func:`start_trace` on its thread. From then on every
+:func:`span` on that thread is recorded, and :func:`stop_trace` writes the
+result as Chrome trace JSON, which opens in https://ui.perfetto.dev or
+``chrome://tracing``. Work that belongs to the job but runs on another
+thread, such as scaling the result for display, joins the trace with
+:func:`bind`.
+
+Tracing is off unless :func:`configure` enables it. With no trace running,
+:func:`span` returns a shared no-op context manager after a single
+thread-local lookup, so spans can stay in hot paths.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_enabled = False
+_directory: Optional[str] = None
+_counter = 0
+_counter_lock = threading.Lock()
+
+
+def _now_us() -> float:
+    return time.perf_counter() * 1e6
+
+
+def _sync_device() -> None:
+    """Wait for queued GPU work so spans measure it rather than its launch."""
+    try:
+        import torch
+    except ImportError:
+        return
+    cuda = getattr(torch, "cuda", None)
+    # Stand-in torch modules may lack parts of torch.cuda
+    if getattr(cuda, "is_available", lambda: False)():
+        cuda.synchronize()
+
+
+class Trace:
+    """Spans of one job, in Chrome trace event format."""
+
+    def __init__(self, name: str, path: Optional[str] = None) -> None:
+        self.name = name
+        self.path = path
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = _now_us()
+
+    def add(
+        self,
+        name: str,
+        start_us: float,
+        end_us: float,
+        cat: str = "stage",
+        args: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Record a complete span given ``perf_counter`` times in microseconds."""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": start_us - self._origin,
+            "dur": max(0.0, end_us - start_us),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            self._threads.setdefault(thread.ident, thread.name)
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Return the recorded spans, oldest first."""
+        with self._lock:
+            return sorted(self._events, key=lambda event: event["ts"])
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Return the trace as a Chrome trace JSON object."""
+        pid = os.getpid()
+        with self._lock:
+            threads = dict(self._threads)
+        meta = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.name}}
+        ]
+        meta += [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in threads.items()
+        ]
+        return {"traceEvents": meta + self.events(), "displayTimeUnit": "ms"}
+
+    def save(self, path: Optional[str] = None) -> Optional[str]:
+        """Write the trace to ``path`` (default: :attr:`path`) and return it."""
+        path = path or self.path
+        if path is None:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_chrome(), fh)
+        self.path = path
+        return path
+
+
+class _Span:
+    __slots__ = ("trace", "name", "cat", "args", "sync", "start")
+
+    def __init__(self, trace, name, cat, args, sync) -> None:
+        self.trace = trace
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.sync = sync
+
+    def __enter__(self) -> "_Span":
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.sync:
+            _sync_device()
+        self.trace.add(self.name, self.start, _now_us(), self.cat, self.args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def configure(enabled: bool, directory: Optional[str] = None) -> None:
+    """Turn per-job tracing on or off.
+
+    Parameters:
+        enabled: Whether :func:`start_trace` starts traces.
+        directory: Where traces without an explicit path are written.
+    """
+    global _enabled, _directory
+    _enabled = enabled
+    _directory = directory
+
+
+def is_enabled() -> bool:
+    """Return whether jobs are traced."""
+    return _enabled
+
+
+def current() -> Optional[Trace]:
+    """Return the trace recording on this thread, if any."""
+    return getattr(_local, "trace", None)
+
+
+def start_trace(name: str, path: Optional[str] = None) -> Optional[Trace]:
+    """Start tracing a job on this thread; ``None`` when tracing is off.
+
+    Parameters:
+        name: Job label, also used in the default file name.
+        path: Trace file; by default a new file in the configured directory.
+    """
+    global _counter
+    if not _enabled:
+        return None
+    if path is None and _directory is not None:
+        with _counter_lock:
+            _counter += 1
+            count = _counter
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(_directory, f"{name}_{stamp}_{count}.trace.json")
+    trace = Trace(name, path)
+    _local.trace = trace
+    return trace
+
+
+def stop_trace(trace: Optional[Trace]) -> Optional[str]:
+    """Stop recording ``trace`` on this thread and write it; returns the path."""
+    if trace is None:
+        return None
+    if current() is trace:
+        _local.trace = None
+    try:
+        return trace.save()
+    except OSError as e:
+        logger.warning(f"Could not write trace {trace.path}: {e}")
+        return None
+
+
+@contextmanager
+def bind(trace: Optional[Trace]) -> Iterator[None]:
+    """Record spans on this thread into ``trace`` for the ``with`` block."""
+    previous = current()
+    if trace is not None:
+        _local.trace = trace
+    try:
+        yield
+    finally:
+        _local.trace = previous
+
+
+def span(name: str, cat: str = "stage", sync: bool = False, **args: Any):
+    """Time a block into the current thread's trace.
+
+    Parameters:
+        name: Span name shown in the trace viewer.
+        cat: Span category.
+        sync: Wait for queued GPU work before closing the span.
+        **args: Values attached to the span.
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name, cat, args, sync)
+
+
+def clock() -> float:
+    """Return the trace clock in microseconds, for :func:`record`."""
+    return _now_us()
+
+
+def record(name: str, start_us: float, end_us: float, cat: str = "stage", **args):
+    """Add a span timed with :func:`clock` to the current thread's trace.
+
+    For phases that do not fit a ``with`` block, such as the stages of a
+    subprocess observed through its output.
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.add(name, start_us, end_us, cat, args)
+
+
+def traced(name: str, cat: str = "stage"):
+    """Decorator recording each call of the function as a span."""
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, cat):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class StepSpans:
+    """Record the time between denoising step callbacks as spans.
+
+    Call :meth:`restart` when the first step begins and :meth:`step` from
+    the step callback; each call closes the span of the step that just ran.
+    Does nothing when no trace is running.
+    """
+
+    def __init__(self, name: str = "denoise_step") -> None:
+        self.name = name
+        self.trace = current()
+        self._last = _now_us()
+
+    def restart(self) -> None:
+        """Start timing the next step from now."""
+        self._last = _now_us()
+
+    def step(self, index: int) -> None:
+        """Close the span of step ``index``."""
+        if self.trace is None:
+            return
+        _sync_device()
+        now = _now_us()
+        self.trace.add(self.name, self._last, now, "step", {"step": index})
+        self._last = now
+
+
+@contextmanager
+def instrument_pipeline(pipe) -> Iterator[StepSpans]:
+    """Trace text encoding and VAE decoding of ``pipe`` inside the block.
+
+    The methods are wrapped on the instance and restored afterwards. Yields
+    the :class:`StepSpans` to call from the step callback; step timing starts
+    once the prompt is encoded.
+    """
+    steps = StepSpans()
+    if steps.trace is None:
+        yield steps
+        return
+    patched = []
+
+    def wrap(owner, attr, name, after=None):
+        original = getattr(owner, attr, None)
+        if original is None:
+            return
+        own = vars(owner).get(attr) if hasattr(owner, "__dict__") else None
+
+        def traced(*a, **kw):
+            with span(name, sync=True):
+                result = original(*a, **kw)
+            if after is not None:
+                after()
+            return result
+
+        setattr(owner, attr, traced)
+        patched.append((owner, attr, own))
+
+    wrap(pipe, "encode_prompt", "text_encode", after=steps.restart)
+    vae = getattr(pipe, "vae", None)
+    if vae is not None:
+        wrap(vae, "decode", "vae_decode")
+    try:
+        yield steps
+    finally:
+        for owner, attr, own in patched:
+            if own is None:
+                # Expose the class attribute again
+                delattr(owner, attr)
+            else:
+                setattr(owner, attr, own)
@@ -0,0 +1,180 @@
+"""Streaming video encoder that pipes raw frames into ``ffmpeg``.
+
+Frames are written to ffmpeg's stdin as soon as they are produced, so only
+the frame being written is held in memory no matter how long the video is.
+Frames are ``(height, width, 3)`` uint8 RGB arrays or equivalent raw bytes.
+"""
+
+import logging
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    """ffmpeg output options."""
+
+    codec: str = "libx264"
+    # Constant rate factor: lower is better quality and larger files
+    crf: int = 18
+    pix_fmt: str = "yuv420p"
+    preset: str = "medium"
+
+
+def find_ffmpeg() -> str:
+    """Return the ffmpeg executable, preferring the one on ``PATH``."""
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        raise RuntimeError(
+            "ffmpeg was not found; install it or the imageio-ffmpeg package"
+        ) from None
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def ffmpeg_command(
+    ffmpeg: str,
+    path: str,
+    width: int,
+    height: int,
+    fps: int,
+    settings: EncoderSettings,
+) -> List[str]:
+    """Build the command line that encodes raw RGB frames from stdin."""
+    cmd = [
+        ffmpeg,
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "-s",
+        f"{width}x{height}",
+        "-r",
+        str(fps),
+        "-i",
+        "-",
+        "-an",
+        "-c:v",
+        settings.codec,
+        "-pix_fmt",
+        settings.pix_fmt,
+    ]
+    if settings.codec in ("libx264", "libx265", "libvpx-vp9", "libaom-av1"):
+        cmd += ["-crf", str(settings.crf)]
+    if settings.codec in ("libx264", "libx265"):
+        cmd += ["-preset", settings.preset]
+    if width % 2 or height % 2:
+        # Chroma-subsampled formats need even dimensions
+        cmd += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+    return cmd + [path]
+
+
+class FFmpegWriter:
+    """Write frames of one video to an ffmpeg subprocess.
+
+    Use as a context manager; leaving the block normally finishes the file,
+    and leaving it through an exception stops ffmpeg and discards the output.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        width: int,
+        height: int,
+        fps: int,
+        settings: Optional[EncoderSettings] = None,
+    ) -> None:
+        self.path = path
+        self.width = width
+        self.height = height
+        self.frames = 0
+        self._frame_bytes = width * height * 3
+        # A file rather than a pipe, so a chatty ffmpeg cannot block on stderr
+        self._stderr = tempfile.TemporaryFile()
+        cmd = ffmpeg_command(
+            find_ffmpeg(), path, width, height, fps, settings or EncoderSettings()
+        )
+        logger.debug(f"Starting encoder: {' '.join(cmd)}")
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr
+        )
+
+    def write(self, frame) -> None:
+        """Append one frame."""
+        data = frame.tobytes() if hasattr(frame, "tobytes") else bytes(frame)
+        if len(data) != self._frame_bytes:
+            raise ValueError(
+                f"Frame has {len(data)} bytes; expected {self.width}x{self.height} RGB"
+            )
+        try:
+            self._proc.stdin.write(data)
+        except BrokenPipeError:
+            self._proc.wait()
+            raise RuntimeError(f"ffmpeg exited early: {self._error_text()}") from None
+        self.frames += 1
+
+    def close(self) -> None:
+        """Flush the remaining frames and wait for ffmpeg to finish the file."""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        code = self._proc.wait()
+        error = self._error_text()
+        self._stderr.close()
+        if code != 0:
+            raise RuntimeError(f"ffmpeg failed with code {code}: {error}")
+
+    def abort(self) -> None:
+        """Stop ffmpeg without finishing the file."""
+        self._proc.kill()
+        self._proc.wait()
+        self._stderr.close()
+
+    def _error_text(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()[-2000:]
+
+    def __enter__(self) -> "FFmpegWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def encode_frames(
+    frames: Iterable,
+    path: str,
+    fps: int,
+    settings: Optional[EncoderSettings] = None,
+) -> int:
+    """Encode ``frames`` to ``path`` as they are produced.
+
+    The output size is taken from the first frame. Returns the frame count;
+    no file is written when ``frames`` is empty.
+    """
+    iterator = iter(frames)
+    first = next(iterator, None)
+    if first is None:
+        return 0
+    height, width = first.shape[:2]
+    with FFmpegWriter(path, width, height, fps, settings) as writer:
+        writer.write(first)
+        del first
+        for frame in iterator:
+            writer.write(frame)
+    return writer.frames
@@ -0,0 +1,236 @@
+"""Run image generation in a persistent child process.
+
+The child keeps its own :class:`~utils.model_manager.ModelManager` cache, so
+loaded pipelines survive between jobs, while a native crash or OOM kill only
+takes down the child. Pixels come back through a shared-memory buffer owned by
+the parent; only small control messages go through the queues.
+"""
+
+import importlib
+import itertools
+import logging
+import multiprocessing as mp
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .hires import hires_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PIPELINE_FACTORY = "utils.model_manager:ModelManager.get_flux_pipeline"
+
+
+class GenerationCrashed(RuntimeError):
+    """Raised when the generation process dies while running a job."""
+
+
+def _resolve(path: str) -> Callable:
+    """Import ``"package.module:attr.attr"`` and return the attribute."""
+    module_name, _, attr_path = path.partition(":")
+    obj: Any = importlib.import_module(module_name)
+    for attr in attr_path.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _serve(requests, responses, cancel, pipeline_factory: str) -> None:
+    """Child process loop: render jobs until told to stop."""
+    from .image import generate_image
+    from .params import ImageParams
+
+    get_pipeline = _resolve(pipeline_factory)
+    shm: Optional[shared_memory.SharedMemory] = None
+
+    while True:
+        msg = requests.get()
+        if msg[0] == "stop":
+            break
+        _, job_id, prompt, neg_prompt, params, shm_name = msg
+        try:
+            if shm is None or shm.name != shm_name:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=shm_name)
+
+            image = generate_image(
+                prompt,
+                neg_prompt,
+                ImageParams(**params),
+                progress=lambda pct: responses.put(("progress", job_id, pct)),
+                should_stop=cancel.is_set,
+                get_pipeline=get_pipeline,
+            )
+            if image is None:
+                responses.put(("cancelled", job_id))
+                continue
+
+            if image.mode != "RGBA":
+                image = image.convert("RGBA")
+            data = image.tobytes("raw", "RGBA")
+            if len(data) > shm.size:
+                raise RuntimeError(
+                    f"Result {image.width}x{image.height} exceeds the result buffer"
+                )
+            shm.buf[: len(data)] = data
+            responses.put(("result", job_id, image.width, image.height))
+        except Exception as e:
+            responses.put(("error", job_id, f"{type(e).__name__}: {e}"))
+
+    if shm is not None:
+        shm.close()
+
+
+class GenerationProcess:
+    """Client for a persistent, automatically restarted generation process."""
+
+    POLL_INTERVAL = 0.1
+
+    _instance: Optional["GenerationProcess"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, pipeline_factory: str = DEFAULT_PIPELINE_FACTORY) -> None:
+        """Prepare the client; the child starts with the first job.
+
+        Args:
+            pipeline_factory: ``"module:attr"`` path of a callable that takes
+                the params dict and returns a pipeline inside the child
+        """
+        self.pipeline_factory = pipeline_factory
+        self._ctx = mp.get_context("spawn")
+        self._proc = None
+        self._requests = None
+        self._responses = None
+        self._cancel = None
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "GenerationProcess":
+        """Return the shared process client, creating it on first use."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @classmethod
+    def shutdown_instance(cls) -> None:
+        """Stop the shared process, if one was started."""
+        with cls._instance_lock:
+            if cls._instance is not None:
+                cls._instance.shutdown()
+                cls._instance = None
+
+    def is_alive(self) -> bool:
+        """Return whether the child process is running."""
+        return self._proc is not None and self._proc.is_alive()
+
+    def start(self) -> None:
+        """Start the child process if it is not already running."""
+        if self.is_alive():
+            return
+        self._requests = self._ctx.Queue()
+        self._responses = self._ctx.Queue()
+        self._cancel = self._ctx.Event()
+        self._proc = self._ctx.Process(
+            target=_serve,
+            args=(self._requests, self._responses, self._cancel, self.pipeline_factory),
+            name="generation-process",
+            daemon=True,
+        )
+        self._proc.start()
+        logger.info(f"Started generation process (pid {self._proc.pid})")
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Ask the child to exit, kill it if it does not, and free the buffer."""
+        with self._lock:
+            if self._proc is not None:
+                if self._proc.is_alive():
+                    self._requests.put(("stop",))
+                    self._proc.join(timeout)
+                    if self._proc.is_alive():
+                        self._proc.kill()
+                        self._proc.join()
+                self._proc = None
+            self._release_buffer()
+
+    def generate(
+        self,
+        prompt: str,
+        neg_prompt: str,
+        params: Dict[str, Any],
+        progress: Optional[Callable[[int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> Optional[Tuple[bytes, int, int]]:
+        """Render one image in the child process.
+
+        Args:
+            prompt: Text prompt for the model
+            neg_prompt: Negative prompt
+            params: :class:`~workers.params.ImageParams` as a dict
+            progress: Called with percentage progress
+            should_stop: Polled while waiting; returning True cancels the job
+
+        Returns:
+            ``(rgba_bytes, width, height)``, or ``None`` if cancelled
+
+        Raises:
+            GenerationCrashed: If the child died; it is restarted for the next job
+            RuntimeError: If generation failed inside the child
+        """
+        with self._lock:
+            self.start()
+            width, height = params["width"], params["height"]
+            if params.get("hires_scale", 1.0) > 1:
+                width, height = hires_size(width, height, params["hires_scale"])
+            shm = self._result_buffer(width * height * 4)
+            job_id = next(self._job_ids)
+            self._cancel.clear()
+            self._requests.put(
+                ("generate", job_id, prompt, neg_prompt, params, shm.name)
+            )
+
+            while True:
+                if should_stop and should_stop():
+                    self._cancel.set()
+                try:
+                    msg = self._responses.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    if not self._proc.is_alive():
+                        code = self._proc.exitcode
+                        logger.error(f"Generation process died (exit code {code})")
+                        self._proc = None
+                        self.start()
+                        raise GenerationCrashed(
+                            f"Generation process exited with code {code}"
+                        )
+                    continue
+
+                kind, msg_job = msg[0], msg[1]
+                if msg_job != job_id:
+                    continue  # late message from a cancelled job
+                if kind == "progress":
+                    if progress:
+                        progress(msg[2])
+                elif kind == "result":
+                    width, height = msg[2], msg[3]
+                    return bytes(shm.buf[: width * height * 4]), width, height
+                elif kind == "cancelled":
+                    return None
+                elif kind == "error":
+                    raise RuntimeError(msg[2])
+
+    def _result_buffer(self, size: int) -> shared_memory.SharedMemory:
+        """Return a shared buffer of at least ``size`` bytes, growing it if needed."""
+        if self._shm is None or self._shm.size < size:
+            self._release_buffer()
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        return self._shm
+
+    def _release_buffer(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
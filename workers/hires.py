@@ -0,0 +1,212 @@
+"""Two-pass "hires fix": render small, upscale, then refine in tiles.
+
+Attention cost grows with the square of the token count, so rendering
+directly at 2048x2048 is slow and does not fit in 16 GB. Instead the image is
+composed at the requested base size, upscaled in pixel space, and refined by
+a short low-strength img2img pass over overlapping tiles. Each tile is
+encoded, denoised and decoded on its own, so peak memory is set by the tile
+size rather than the output size, and the overlaps are feathered together.
+"""
+
+import logging
+import math
+from typing import Any, Callable, List, Optional, Tuple
+
+from utils import profiling
+from utils.model_profiles import get_profile, guidance_plan
+
+from .image import image_guidance, report_guidance
+from .params import ImageParams
+from .sweep import _prompt_kwargs
+
+logger = logging.getLogger(__name__)
+
+# Flux and SD latents cover 8x8 pixels and Flux packs them 2x2
+SIZE_MULTIPLE = 16
+
+Box = Tuple[int, int, int, int]
+
+
+def hires_size(width: int, height: int, scale: float) -> Tuple[int, int]:
+    """Return the output size for a base size upscaled by ``scale``."""
+
+    def snap(value: int) -> int:
+        size = int(round(value * scale / SIZE_MULTIPLE)) * SIZE_MULTIPLE
+        return max(SIZE_MULTIPLE, size)
+
+    return snap(width), snap(height)
+
+
+def _axis_starts(size: int, tile: int, overlap: int) -> List[int]:
+    if size <= tile:
+        return [0]
+    count = math.ceil((size - overlap) / (tile - overlap))
+    span = size - tile
+    # Spread the tiles evenly so the overlaps are about ``overlap`` wide or
+    # more; snapping the starts changes each one by up to SIZE_MULTIPLE - 1
+    # pixels, so blending uses the overlaps of the plan (tile_overlaps)
+    return [
+        int(round(i * span / (count - 1))) // SIZE_MULTIPLE * SIZE_MULTIPLE
+        for i in range(count - 1)
+    ] + [span]
+
+
+def plan_tiles(width: int, height: int, tile: int, overlap: int) -> List[Box]:
+    """Return ``(left, top, right, bottom)`` tiles covering the image row by row."""
+    if overlap >= tile:
+        raise ValueError("Tile overlap must be smaller than the tile size")
+    tile_w, tile_h = min(tile, width), min(tile, height)
+    return [
+        (x, y, x + tile_w, y + tile_h)
+        for y in _axis_starts(height, tile, overlap)
+        for x in _axis_starts(width, tile, overlap)
+    ]
+
+
+def tile_overlaps(tiles: List[Box]) -> List[Tuple[int, int]]:
+    """Return how far each tile overlaps the tiles before it, left and above.
+
+    ``tiles`` are in :func:`plan_tiles` order; the first tile of each row has
+    no overlap on the left and tiles of the first row none above.
+    """
+    overlaps = []
+    for i, (left, top, _, _) in enumerate(tiles):
+        placed = tiles[:i]
+        x = max(
+            (
+                edge - left
+                for start, row, edge, _ in placed
+                if row == top and start < left
+            ),
+            default=0,
+        )
+        y = max((edge - top for _, row, _, edge in placed if row < top), default=0)
+        overlaps.append((max(0, x), max(0, y)))
+    return overlaps
+
+
+def feather_mask(box: Box, overlaps: Tuple[int, int]):
+    """Return an ``L`` mask fading in over the left and top overlaps of ``box``.
+
+    Tiles are pasted row by row, so only the edges facing tiles that are
+    already on the canvas are feathered, each across the full width of its
+    overlap as given by :func:`tile_overlaps`.
+    """
+    from PIL import Image, ImageChops, ImageDraw
+
+    left, top, right, bottom = box
+    width, height = right - left, bottom - top
+    overlap_x, overlap_y = overlaps
+    horizontal = Image.new("L", (width, height), 255)
+    vertical = Image.new("L", (width, height), 255)
+    if overlap_x > 0:
+        draw = ImageDraw.Draw(horizontal)
+        for x in range(min(overlap_x, width)):
+            draw.line([(x, 0), (x, height)], fill=int(255 * (x + 0.5) / overlap_x))
+    if overlap_y > 0:
+        draw = ImageDraw.Draw(vertical)
+        for y in range(min(overlap_y, height)):
+            draw.line([(0, y), (width, y)], fill=int(255 * (y + 0.5) / overlap_y))
+    return ImageChops.multiply(horizontal, vertical)
+
+
+def refine_pipeline(pipe):
+    """Return an img2img pipeline sharing the modules of ``pipe``."""
+    from diffusers import AutoPipelineForImage2Image
+
+    return AutoPipelineForImage2Image.from_pipe(pipe)
+
+
+def hires_fix(
+    pipe,
+    prompt: str,
+    neg_prompt: str,
+    params: ImageParams,
+    progress: Optional[Callable[[int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Optional[Any]:
+    """Render ``params`` at its base size and refine it at ``hires_scale``.
+
+    Returns:
+        The final PIL image, or ``None`` if ``should_stop`` cancelled the run
+    """
+    from PIL import Image
+
+    profile = get_profile(params.profile)
+    width, height = hires_size(params.width, params.height, params.hires_scale)
+    tiles = plan_tiles(width, height, params.hires_tile, params.hires_overlap)
+    # img2img skips the first (1 - strength) of the schedule
+    refine_steps = max(1, int(params.steps * params.hires_strength))
+    total = params.steps + refine_steps * len(tiles)
+    done = 0
+
+    def _on_step_end(_pipe, step, timestep, callback_kwargs):
+        profiling.step()
+        if should_stop is not None and should_stop():
+            _pipe._interrupt = True
+        elif progress is not None:
+            progress(min(100, int((done + step + 1) / total * 100)))
+        return callback_kwargs
+
+    def _generator():
+        if params.seed is None:
+            return None
+        import torch
+
+        return torch.Generator(device="cpu").manual_seed(params.seed)
+
+    plan = image_guidance(params, neg_prompt)
+    report_guidance(plan)
+    # img2img runs the tail of the schedule: CFG only where the window reaches
+    skipped = params.steps - refine_steps
+    refine_plan = guidance_plan(
+        profile,
+        neg_prompt,
+        params.guidance,
+        refine_steps,
+        (plan.cfg_steps - skipped) / refine_steps if plan.cfg_steps else 0.0,
+    )
+    prompt_kwargs = _prompt_kwargs(
+        pipe, prompt, neg_prompt if plan.negative_prompt else "", 1, profile
+    )
+
+    base = pipe(
+        width=params.width,
+        height=params.height,
+        num_inference_steps=params.steps,
+        guidance_scale=plan.guidance_scale,
+        generator=_generator(),
+        callback_on_step_end=plan.step_end(_on_step_end),
+        **plan.tensor_inputs,
+        **prompt_kwargs,
+    ).images[0]
+    if should_stop is not None and should_stop():
+        return None
+    done += params.steps
+
+    logger.info(
+        f"Hires fix: {params.width}x{params.height} -> {width}x{height} "
+        f"in {len(tiles)} tiles, {refine_steps} refine steps each"
+    )
+    canvas = base.convert("RGB").resize((width, height), Image.LANCZOS)
+    del base
+    refiner = refine_pipeline(pipe)
+    for box, overlaps in zip(tiles, tile_overlaps(tiles)):
+        tile = canvas.crop(box)
+        refined = refiner(
+            image=tile,
+            width=tile.width,
+            height=tile.height,
+            strength=params.hires_strength,
+            num_inference_steps=params.steps,
+            guidance_scale=refine_plan.guidance_scale,
+            generator=_generator(),
+            callback_on_step_end=refine_plan.step_end(_on_step_end),
+            **refine_plan.tensor_inputs,
+            **prompt_kwargs,
+        ).images[0]
+        if should_stop is not None and should_stop():
+            return None
+        canvas.paste(refined, box[:2], feather_mask(box, overlaps))
+        done += refine_steps
+    return canvas
@@ -0,0 +1,152 @@
+"""In-process image generation shared by the Qt worker and the API server.
+
+:func:`generate_image` loads the cached pipeline through
+:class:`~utils.model_manager.ModelManager`, retries out-of-memory failures on
+cheaper execution plans and renders one image, reporting progress through
+plain callbacks so it can run on any thread.
+"""
+
+import logging
+from dataclasses import asdict
+from typing import Any, Callable, Optional
+
+from .params import ImageParams
+
+logger = logging.getLogger(__name__)
+
+
+def image_guidance(params: ImageParams, neg_prompt: str):
+    """Return the :class:`~utils.model_profiles.GuidancePlan` of a job."""
+    from utils.model_profiles import get_profile, guidance_plan
+
+    return guidance_plan(
+        get_profile(params.profile),
+        neg_prompt,
+        params.guidance,
+        params.steps,
+        params.cfg_fraction,
+    )
+
+
+def report_guidance(plan) -> None:
+    """Log and count the guidance mode a job runs with."""
+    from utils import metrics
+
+    metrics.GUIDANCE_JOBS.inc(mode=plan.mode)
+    logger.info(
+        f"Guidance: {plan.describe()}, {plan.passes()} denoiser passes per image"
+    )
+
+
+def render_image(
+    pipe,
+    prompt: str,
+    neg_prompt: str,
+    params: ImageParams,
+    progress: Optional[Callable[[int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Optional[Any]:
+    """Render one image with a loaded ``pipe`` and return the PIL image."""
+    from utils import metrics, profiling, tracing
+
+    if progress is not None:
+        progress(0)
+    if params.hires_scale > 1:
+        from .hires import hires_fix
+
+        with tracing.span("hires_fix", scale=params.hires_scale):
+            return hires_fix(
+                pipe,
+                prompt,
+                neg_prompt,
+                params,
+                progress=progress,
+                should_stop=should_stop,
+            )
+
+    plan = image_guidance(params, neg_prompt)
+    report_guidance(plan)
+    total_steps = params.steps
+    steps = None
+    step_timer = metrics.StepTimer("image")
+
+    def _on_step_end(_pipe, step, timestep, callback_kwargs):
+        steps.step(step)
+        step_timer.step()
+        profiling.step()
+        if should_stop is not None and should_stop():
+            _pipe._interrupt = True
+            return callback_kwargs
+        if total_steps > 0:
+            pct = min(100, int((step + 1) / total_steps * 100))
+        else:
+            pct = 0  # Default to 0% if total_steps is invalid
+        if progress is not None:
+            progress(pct)
+        return callback_kwargs
+
+    extra = {}
+    if params.seed is not None:
+        import torch
+
+        extra["generator"] = torch.Generator(device="cpu").manual_seed(params.seed)
+
+    with tracing.instrument_pipeline(pipe) as steps:
+        return pipe(
+            prompt=prompt,
+            width=params.width,
+            height=params.height,
+            num_inference_steps=total_steps,
+            callback_on_step_end=plan.step_end(_on_step_end),
+            **plan.kwargs,
+            **extra,
+        ).images[0]
+
+
+def generate_image(
+    prompt: str,
+    neg_prompt: str,
+    params: ImageParams,
+    progress: Optional[Callable[[int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    get_pipeline: Optional[Callable[[dict], Any]] = None,
+) -> Optional[Any]:
+    """Load the pipeline for ``params`` and render one image.
+
+    Out-of-memory failures are retried on cheaper execution plans (see
+    :mod:`utils.execution_plans`).
+
+    Args:
+        get_pipeline: Returns the pipeline for a params dict that includes the
+            ``execution_plan``; defaults to ``ModelManager.get_flux_pipeline``
+
+    Returns:
+        The PIL image, or ``None`` if ``should_stop`` cancelled the run
+    """
+    from utils.execution_plans import PlanMemory, run_with_oom_recovery
+    from utils.model_manager import ModelManager
+    from utils.model_profiles import get_profile
+
+    if get_pipeline is None:
+        get_pipeline = ModelManager.get_flux_pipeline
+
+    def _run(plan):
+        pipe = get_pipeline({**asdict(params), "execution_plan": plan.name})
+        if params.quantized:
+            logger.info("Using quantized weights for image generation")
+        return render_image(pipe, prompt, neg_prompt, params, progress, should_stop)
+
+    image = run_with_oom_recovery(
+        _run,
+        PlanMemory.key(
+            get_profile(params.profile).name,
+            params.model_path,
+            params.width,
+            params.height,
+        ),
+        # A single image cannot be split into smaller batches
+        skip=lambda plan: plan.name == "smaller_batch",
+    )
+    if should_stop is not None and should_stop():
+        return None
+    return image
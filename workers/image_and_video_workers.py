@@ -2,7 +2,8 @@ import logging
 import os
 import subprocess
 from dataclasses import asdict
-from typing import Optional
+from pathlib import Path
+from typing import List, Optional
 
 from PyQt5.QtCore import QThread, pyqtSignal, QObject
 from PyQt5.QtGui import QImage
@@ -10,7 +11,10 @@ import torch
 
 from PIL import Image
 
+from utils import metrics, profiling, tracing
+
 from .params import ImageParams, VideoParams
+from .sweep import SweepCell
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +46,7 @@ class ImageWorker(QThread):
         neg_prompt: str,
         params: ImageParams,
         parent: Optional[QObject] = None,
+        output_path: Optional[str] = None,
     ) -> None:
         """Initialize the worker.
 
@@ -50,52 +55,45 @@ class ImageWorker(QThread):
             neg_prompt: Negative prompt used to avoid undesired content.
             params: Image generation parameters.
             parent: Optional QObject to set as the thread parent.
+            output_path: PNG file the result is saved to before it is emitted.
         """
         super().__init__(parent)
         self.prompt = prompt
         self.neg_prompt = neg_prompt
         self.params = params
+        self.output_path = output_path
+        # ``output_path`` once the result was written there
+        self.saved_path: Optional[str] = None
         self._running = True
+        # Stage timings of this job when tracing is enabled
+        self.trace: Optional[tracing.Trace] = None
+        # Profiler files written for this job, if it was profiled
+        self.profile_outputs: List[str] = []
+        # Guidance mode of this job (see utils.model_profiles)
+        self.guidance: Optional[str] = None
 
     def run(self) -> None:
         """Execute image generation and emit progress and result signals."""
-        try:
-            # Load or reuse cached pipeline
-            from utils.model_manager import (
-                ModelManager,
-            )  # Ensure ModelManager exists in this module
+        from .image import image_guidance
 
-            pipe = ModelManager.get_flux_pipeline(asdict(self.params))
-            if self.params.quantized:
-                logger.info("Using quantized weights for image generation")
-
-            # Generate image with progress callback
-            total_steps = self.params.steps
-            self.progress.emit(0)
-
-            def _callback(step, timestep, latents):
-                if not self._running:
-                    return
-                if total_steps > 0:
-                    pct = min(100, int((step + 1) / total_steps * 100))
+        self.trace = tracing.start_trace("image")
+        self.guidance = image_guidance(self.params, self.neg_prompt).describe()
+        request = profiling.take_request()
+        out_of_process = self.params.out_of_process
+        try:
+            # The child process's memory is not visible from here
+            with metrics.track_job("image", memory=not out_of_process) as job:
+                if out_of_process:
+                    if request is not None:
+                        logger.warning("Profiling needs in-process generation; skipped")
+                    qimg = self._run_out_of_process()
                 else:
-                    pct = 0  # Default to 0% if total_steps is invalid
-                self.progress.emit(pct)
-
-            out = pipe(
-                prompt=self.prompt,
-                negative_prompt=self.neg_prompt or None,
-                width=self.params.width,
-                height=self.params.height,
-                num_inference_steps=total_steps,
-                guidance_scale=self.params.guidance,
-                callback=_callback,
-                callback_steps=1,
-            )
-            if not self._running:
-                return
-            pil_img = out.images[0]
-            qimg = pil_to_qimage(pil_img)
+                    qimg = self._run_in_process(request)
+                if qimg is None or not self._running:
+                    job.status = "cancelled"
+                    return
+            if self.output_path:
+                self._save(qimg)
             self.result.emit(qimg)
         except Exception as e:
             # Parse and emit user-friendly error
@@ -105,6 +103,7 @@ class ImageWorker(QThread):
             logger.exception("Image generation failed: %s", msg)
             self.error.emit(msg)
         finally:
+            tracing.stop_trace(self.trace)
             # Ensure GPU memory is freed
             try:
                 torch.cuda.empty_cache()
@@ -114,13 +113,226 @@ class ImageWorker(QThread):
                 msg = parse_error(exc)
                 logger.warning(msg)
 
+    def _save(self, qimg: QImage) -> None:
+        """Write the result here rather than on the GUI thread."""
+        with tracing.span("save_image"):
+            os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+            if qimg.save(self.output_path):
+                self.saved_path = self.output_path
+            else:
+                logger.warning(f"Could not save the image to {self.output_path}")
+
+    def _run_in_process(
+        self, request: Optional[profiling.ProfileRequest]
+    ) -> Optional[QImage]:
+        """Generate with the cached pipeline; ``None`` if stopped."""
+        from .image import generate_image
+
+        with tracing.span("generate_image"), profiling.capture(request) as profiler:
+            out = generate_image(
+                self.prompt,
+                self.neg_prompt,
+                self.params,
+                progress=self.progress.emit,
+                should_stop=lambda: not self._running,
+            )
+        if profiler is not None:
+            self.profile_outputs = profiler.outputs
+        if out is None or not self._running:
+            return None
+        with tracing.span("pil_to_qimage"):
+            return pil_to_qimage(out)
+
+    def _run_out_of_process(self) -> Optional[QImage]:
+        """Generate in the shared child process; ``None`` if stopped."""
+        from .generation_process import GenerationProcess
+
+        self.progress.emit(0)
+        with tracing.span("generation_process"):
+            result = GenerationProcess.instance().generate(
+                self.prompt,
+                self.neg_prompt,
+                asdict(self.params),
+                progress=self.progress.emit,
+                should_stop=lambda: not self._running,
+            )
+        if result is None or not self._running:
+            return None
+        data, width, height = result
+        # copy() detaches the image from ``data``, which Python may free
+        with tracing.span("bytes_to_qimage"):
+            return QImage(data, width, height, QImage.Format_RGBA8888).copy()
+
     def stop(self) -> None:
         """Signal the thread to stop early."""
         self._running = False
 
 
+class SweepWorker(QThread):
+    """Render a parameter sweep with one cached pipeline in a background thread."""
+
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str)  # emits contact sheet path
+    error = pyqtSignal(str)
+
+    def __init__(
+        self,
+        prompt: str,
+        neg_prompt: str,
+        cells: List[SweepCell],
+        out_dir: str,
+        max_batch: int = 4,
+        parent: Optional[QObject] = None,
+    ) -> None:
+        """Initialize the worker.
+
+        Parameters:
+            prompt: Text prompt for the model.
+            neg_prompt: Negative prompt used to avoid undesired content.
+            cells: Expanded sweep from :func:`workers.sweep.expand_sweep`.
+            out_dir: Directory for images, timings and the contact sheet.
+            max_batch: Largest number of seeds rendered in one pipeline call.
+            parent: Optional QObject to set as the thread parent.
+        """
+        super().__init__(parent)
+        self.prompt = prompt
+        self.neg_prompt = neg_prompt
+        self.cells = cells
+        self.out_dir = out_dir
+        self.max_batch = max_batch
+        self._running = True
+
+    def run(self) -> None:
+        """Render the sweep and write its outputs."""
+        try:
+            from utils.model_manager import ModelManager
+
+            from .sweep import (
+                run_sweep,
+                save_images,
+                write_contact_sheet,
+                write_timings_csv,
+            )
+
+            base = asdict(self.cells[0].params)
+            self.progress.emit(0)
+            cells = run_sweep(
+                None,
+                self.prompt,
+                self.neg_prompt,
+                self.cells,
+                self.max_batch,
+                progress=self.progress.emit,
+                should_stop=lambda: not self._running,
+                # Out-of-memory batches are retried on cheaper plans
+                pipeline_for=lambda plan: ModelManager.get_flux_pipeline(
+                    {**base, "execution_plan": plan.name}
+                ),
+            )
+            if not self._running:
+                return
+            out_dir = Path(self.out_dir)
+            save_images(cells, out_dir)
+            write_timings_csv(cells, out_dir / "timings.csv")
+            sheet = out_dir / "contact_sheet.png"
+            write_contact_sheet(cells, sheet)
+            self.finished.emit(str(sheet))
+        except Exception as e:
+            from utils.errors import parse_error
+
+            msg = parse_error(e)
+            logger.exception("Sweep failed: %s", msg)
+            self.error.emit(msg)
+        finally:
+            try:
+                torch.cuda.empty_cache()
+            except (AttributeError, RuntimeError) as exc:
+                from utils.errors import parse_error
+
+                logger.warning(parse_error(exc))
+
+    def stop(self) -> None:
+        """Signal the thread to stop after the current batch."""
+        self._running = False
+
+
+class TiledImageWorker(QThread):
+    """Render an image larger than memory in tiles, streamed to disk."""
+
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str)  # emits the .npy image path
+    error = pyqtSignal(str)
+
+    def __init__(
+        self,
+        prompt: str,
+        neg_prompt: str,
+        params: ImageParams,
+        out_path: str,
+        parent: Optional[QObject] = None,
+    ) -> None:
+        """Initialize the worker.
+
+        Parameters:
+            prompt: Text prompt for the model.
+            neg_prompt: Negative prompt used to avoid undesired content.
+            params: Image parameters; ``width`` and ``height`` give the canvas.
+            out_path: ``.npy`` file the image and its overviews are written to.
+            parent: Optional QObject to set as the thread parent.
+        """
+        super().__init__(parent)
+        self.prompt = prompt
+        self.neg_prompt = neg_prompt
+        self.params = params
+        self.out_path = out_path
+        self._running = True
+
+    def run(self) -> None:
+        """Generate the canvas tile by tile and emit its path."""
+        try:
+            from utils.model_manager import ModelManager
+
+            from .tiled import generate_tiled
+
+            pipe = ModelManager.get_flux_pipeline(asdict(self.params))
+            self.progress.emit(0)
+            path = generate_tiled(
+                pipe,
+                self.prompt,
+                self.neg_prompt,
+                self.params,
+                self.out_path,
+                progress=self.progress.emit,
+                should_stop=lambda: not self._running,
+            )
+            if path is None or not self._running:
+                return
+            self.finished.emit(path)
+        except Exception as e:
+            from utils.errors import parse_error
+
+            msg = parse_error(e)
+            logger.exception("Tiled generation failed: %s", msg)
+            self.error.emit(msg)
+        finally:
+            try:
+                torch.cuda.empty_cache()
+            except (AttributeError, RuntimeError) as exc:
+                from utils.errors import parse_error
+
+                logger.warning(parse_error(exc))
+
+    def stop(self) -> None:
+        """Signal the thread to stop after the current tile."""
+        self._running = False
+
+
 class VideoWorker(QThread):
-    """Run Wan2.2 video generation via CLI in a background thread."""
+    """Run Wan2.2 video generation in a background thread.
+
+    Diffusers-format models run in-process on the cached pipeline; other
+    checkouts fall back to the inference script shipped with the model.
+    """
 
     progress = pyqtSignal(int)
     finished = pyqtSignal(str)  # emits output file path
@@ -146,93 +358,31 @@ class VideoWorker(QThread):
         self.neg_prompt = neg_prompt
         self.params = params
         self._running = True
+        # Stage timings of this job when tracing is enabled
+        self.trace: Optional[tracing.Trace] = None
 
     def run(self) -> None:
         """Execute video generation using Wan2.2 and emit signals."""
+        self.trace = tracing.start_trace("video")
         try:
             from utils.model_manager import ModelManager
 
+            from .video import is_diffusers_layout
+
             # Check if Wan2.2 model exists
             wan_model_path = ModelManager.get_wan_model_path()
             if not os.path.exists(wan_model_path):
                 raise FileNotFoundError(f"Wan2.2 model not found at {wan_model_path}")
 
-            # Look for inference script in the model directory
-            inference_script = None
-            possible_scripts = [
-                os.path.join(wan_model_path, "inference.py"),
-                os.path.join(wan_model_path, "sample.py"),
-                os.path.join(wan_model_path, "generate.py"),
-                os.path.join(wan_model_path, "run_inference.py"),
-            ]
-
-            for script in possible_scripts:
-                if os.path.exists(script):
-                    inference_script = script
-                    break
-
-            if not inference_script:
-                raise FileNotFoundError(
-                    f"No inference script found in {wan_model_path}"
-                )
-
-            # Build command to run the Python script
-            cmd = [
-                "python",
-                inference_script,
-                "--prompt",
-                self.prompt,
-                "--width",
-                str(self.params.width),
-                "--height",
-                str(self.params.height),
-                "--frames",
-                str(self.params.frames),
-                "--steps",
-                str(self.params.steps),
-            ]
-
-            if self.neg_prompt:
-                cmd += ["--neg_prompt", self.neg_prompt]
-            if self.params.offload:
-                cmd.append("--offload_model")  # Common flag name
-            if self.params.t5_cpu:
-                cmd.append("--t5_cpu")
-            cmd += ["--convert_model_dtype", self.params.precision]
-
-            logger.info(f"Running Wan2.2 inference: {' '.join(cmd)}")
-
-            # Launch process and ensure it closes properly
-            with subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                cwd=wan_model_path,  # Run from model directory
-            ) as proc:
-                # Parse stdout for progress updates
-                for line in proc.stdout:
-                    if not self._running:
-                        proc.kill()
-                        return
-                    # expect lines like "Progress: 42%"
-                    if "Progress:" in line:
-                        try:
-                            progress_part = line.split("Progress:")[1]
-                            pct = int(progress_part.strip().rstrip("%"))
-                            self.progress.emit(pct)
-                        except ValueError:
-                            logger.warning(
-                                "Unexpected progress line: %s",
-                                line.strip(),
-                            )
-            if proc.returncode != 0:
-                raise RuntimeError(
-                    f"Wan2.2 failed with code {proc.returncode}",
-                )
-
-            # Assuming output.mp4 in working dir
-            out_file = os.path.abspath("output.mp4")
+            native = is_diffusers_layout(wan_model_path)
+            with metrics.track_job("video", memory=native) as job:
+                if native:
+                    out_file = self._run_native(wan_model_path)
+                else:
+                    out_file = self._run_script(wan_model_path)
+                if out_file is None or not self._running:
+                    job.status = "cancelled"
+                    return
             self.finished.emit(out_file)
         except Exception as e:
             from utils.errors import parse_error
@@ -240,6 +390,126 @@ class VideoWorker(QThread):
             msg = parse_error(e)
             logger.exception("Video generation failed: %s", msg)
             self.error.emit(msg)
+        finally:
+            tracing.stop_trace(self.trace)
+            try:
+                torch.cuda.empty_cache()
+            except (AttributeError, RuntimeError) as exc:
+                from utils.errors import parse_error
+
+                logger.warning(parse_error(exc))
+
+    def _run_native(self, wan_model_path: str) -> Optional[str]:
+        """Generate with the cached diffusers pipeline and return the video path."""
+        from .video import generate_video
+
+        return generate_video(
+            self.prompt,
+            self.neg_prompt,
+            self.params,
+            wan_model_path,
+            progress=self.progress.emit,
+            should_stop=lambda: not self._running,
+        )
+
+    def _run_script(self, wan_model_path: str) -> Optional[str]:
+        """Run the inference script of an original-format Wan2.2 checkout.
+
+        Returns:
+            The output path, or ``None`` if the run was stopped
+        """
+        # Look for inference script in the model directory
+        inference_script = None
+        possible_scripts = [
+            os.path.join(wan_model_path, "inference.py"),
+            os.path.join(wan_model_path, "sample.py"),
+            os.path.join(wan_model_path, "generate.py"),
+            os.path.join(wan_model_path, "run_inference.py"),
+        ]
+
+        for script in possible_scripts:
+            if os.path.exists(script):
+                inference_script = script
+                break
+
+        if not inference_script:
+            raise FileNotFoundError(
+                f"No diffusers model_index.json or inference script found in "
+                f"{wan_model_path}; run 'python setup_models.py'"
+            )
+
+        # Build command to run the Python script
+        cmd = [
+            "python",
+            inference_script,
+            "--prompt",
+            self.prompt,
+            "--width",
+            str(self.params.width),
+            "--height",
+            str(self.params.height),
+            "--frames",
+            str(self.params.frames),
+            "--steps",
+            str(self.params.steps),
+        ]
+
+        if self.neg_prompt:
+            cmd += ["--neg_prompt", self.neg_prompt]
+        if self.params.offload:
+            cmd.append("--offload_model")  # Common flag name
+        if self.params.t5_cpu:
+            cmd.append("--t5_cpu")
+        cmd += ["--convert_model_dtype", self.params.precision]
+
+        logger.info(f"Running Wan2.2 inference: {' '.join(cmd)}")
+
+        launched = tracing.clock()
+        first_output = None
+        # Launch process and ensure it closes properly
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            cwd=wan_model_path,  # Run from model directory
+        ) as proc:
+            # Parse stdout for progress updates
+            for line in proc.stdout:
+                if first_output is None:
+                    # Interpreter start-up and model loading are over
+                    first_output = tracing.clock()
+                    tracing.record(
+                        "script_startup", launched, first_output, cat="subprocess"
+                    )
+                if not self._running:
+                    proc.kill()
+                    return None
+                # expect lines like "Progress: 42%"
+                if "Progress:" in line:
+                    try:
+                        progress_part = line.split("Progress:")[1]
+                        pct = int(progress_part.strip().rstrip("%"))
+                        self.progress.emit(pct)
+                    except ValueError:
+                        logger.warning(
+                            "Unexpected progress line: %s",
+                            line.strip(),
+                        )
+        tracing.record(
+            "script_inference",
+            first_output or launched,
+            tracing.clock(),
+            cat="subprocess",
+            returncode=proc.returncode,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(
+                f"Wan2.2 failed with code {proc.returncode}",
+            )
+
+        # Assuming output.mp4 in working dir
+        return os.path.abspath("output.mp4")
 
     def stop(self) -> None:
         """Signal the thread to stop early."""
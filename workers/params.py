@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
 
 
 @dataclass
@@ -12,8 +12,37 @@ class ImageParams:
     guidance: float
     # Path to the model file or directory used for image generation.
     model_path: Optional[str] = None
+    # Model profile from utils.model_profiles (download source and defaults).
+    profile: str = "flux"
     device: str = "cpu"
     quantized: bool = False
+    # Random seed for reproducible results; ``None`` picks a random one.
+    seed: Optional[int] = None
+    # Run generation in a separate, persistent process (see generation_process).
+    out_of_process: bool = False
+    # Sampler from utils.schedulers; ``None`` uses the model's own scheduler.
+    scheduler: Optional[str] = None
+    # LoRA adapters as (name, weight) pairs, applied to the cached pipeline.
+    loras: List[Tuple[str, float]] = field(default_factory=list)
+    # Fold the adapters into the base weights while they stay the same.
+    fuse_lora: bool = False
+    # Compile the denoiser and decoder with torch.compile (see utils.compilation).
+    compile: bool = False
+    # Leading fraction of the steps that run classifier-free guidance on CFG
+    # models; the rest skip the unconditional pass (see
+    # utils.model_profiles.guidance_plan).
+    cfg_fraction: float = 1.0
+    # Hires fix (see workers.hires): upscale factor of the output over
+    # ``width``/``height`` (1 disables), img2img strength of the tiled
+    # refinement, and its tile size and overlap in pixels.
+    hires_scale: float = 1.0
+    hires_strength: float = 0.35
+    hires_tile: int = 1024
+    hires_overlap: int = 128
+    # Tiled canvas (see workers.tiled): denoising tile size and overlap in
+    # pixels when ``width``/``height`` exceed what fits in one pass.
+    tile_size: int = 1024
+    tile_overlap: int = 256
 
 
 @dataclass
@@ -33,3 +62,15 @@ class VideoParams:
     precision: str = (
         "fp16"  # Numerical precision to use for computations. Valid values are "fp16" (half-precision) and "fp32" (full-precision).
     )
+    # Frame rate of the encoded video; Wan2.2 TI2V-5B is trained at 24 fps.
+    fps: int = 24
+    # Where to write the video; ``None`` writes ``output.mp4`` in the cwd.
+    output_path: Optional[str] = None
+    # ffmpeg encoder options (see utils.video_encoder).
+    codec: str = "libx264"
+    crf: int = 18
+    pix_fmt: str = "yuv420p"
+    # Generate 1/``interpolation`` of the frames and synthesise the rest
+    # (see utils.frame_interpolation); 1 disables interpolation.
+    interpolation: int = 1
+    interpolation_method: str = "flow"
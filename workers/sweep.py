@@ -0,0 +1,380 @@
+"""Parameter sweeps over :class:`ImageParams` fields and seeds.
+
+A sweep expands value lists for a few parameters into a grid of cells and
+renders them with a single loaded pipeline. Cells that differ only by seed are
+batched into one pipeline call, and the prompt is encoded once per batch size
+instead of once per image.
+"""
+
+import csv
+import inspect
+import itertools
+import logging
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.model_profiles import ModelProfile, get_profile, guidance_plan
+
+from .params import ImageParams
+
+logger = logging.getLogger(__name__)
+
+# Fields that may be swept, in the order they vary across the grid
+SWEEPABLE = ("width", "height", "steps", "guidance")
+
+
+@dataclass
+class SweepCell:
+    """One image of a sweep and how long it took."""
+
+    index: int
+    params: ImageParams
+    seed: int
+    seconds: float = 0.0
+    batch_size: int = 1
+    image: Optional[Any] = None
+    path: Optional[str] = None
+
+
+def _parse_values(text: str, cast: Callable[[str], Any]) -> List[Any]:
+    values = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            bounds = [cast(b) for b in part.split(":")]
+            if len(bounds) not in (2, 3):
+                raise ValueError(f"Invalid range {part!r}; use start:stop[:step]")
+            start, stop = bounds[0], bounds[1]
+            step = bounds[2] if len(bounds) == 3 else cast("1")
+            if step <= 0:
+                raise ValueError(f"Range step must be positive in {part!r}")
+            value = start
+            while value <= stop + step * 1e-9:
+                values.append(value)
+                value += step
+        else:
+            values.append(cast(part))
+    return values
+
+
+def parse_sweep_spec(text: str) -> Dict[str, List[Any]]:
+    """Parse a sweep description such as ``"steps=10:50:10; seed=0:3"``.
+
+    Each ``name=values`` entry is separated by ``;``. Values are comma
+    separated and ``start:stop[:step]`` ranges include ``stop``. ``name`` is one
+    of :data:`SWEEPABLE` or ``seed``.
+    """
+    axes: Dict[str, List[Any]] = {}
+    for entry in text.split(";"):
+        if not entry.strip():
+            continue
+        name, sep, values = entry.partition("=")
+        name = name.strip()
+        if not sep or name not in SWEEPABLE + ("seed",):
+            raise ValueError(f"Cannot sweep {name!r}")
+        cast = float if name == "guidance" else int
+        axes[name] = _parse_values(values, cast)
+        if not axes[name]:
+            raise ValueError(f"No values given for {name!r}")
+    return axes
+
+
+def expand_sweep(base: ImageParams, axes: Dict[str, Sequence[Any]]) -> List[SweepCell]:
+    """Expand ``axes`` into cells, ordered row by row with seeds as columns."""
+    unknown = set(axes) - set(SWEEPABLE) - {"seed"}
+    if unknown:
+        raise ValueError(f"Cannot sweep {', '.join(sorted(unknown))}")
+    names = [name for name in SWEEPABLE if name in axes]
+    seeds = list(axes.get("seed") or [base.seed if base.seed is not None else 0])
+
+    cells = []
+    for combo in itertools.product(*(axes[name] for name in names)):
+        params = replace(base, **dict(zip(names, combo)))
+        for seed in seeds:
+            cells.append(SweepCell(len(cells), replace(params, seed=seed), seed))
+    return cells
+
+
+def plan_batches(cells: Sequence[SweepCell], max_batch: int) -> List[List[SweepCell]]:
+    """Group cells that share every parameter but the seed into batches."""
+
+    def key(cell):
+        p = cell.params
+        return (p.width, p.height, p.steps, p.guidance)
+
+    batches = []
+    for _, group in itertools.groupby(sorted(cells, key=key), key=key):
+        group = list(group)
+        for i in range(0, len(group), max(1, max_batch)):
+            batches.append(group[i : i + max_batch])
+    return batches
+
+
+def _prompt_kwargs(
+    pipe, prompt: str, neg_prompt: str, batch: int, profile: ModelProfile
+) -> Dict[str, Any]:
+    """Return pipeline arguments for the prompt, pre-encoded where supported."""
+    params = inspect.signature(pipe.__call__).parameters
+    if "pooled_prompt_embeds" in params and hasattr(pipe, "encode_prompt"):
+        extra = {}
+        if profile.max_sequence_length:
+            extra["max_sequence_length"] = profile.max_sequence_length
+        prompt_embeds, pooled_prompt_embeds, _ = pipe.encode_prompt(
+            prompt=prompt, prompt_2=None, num_images_per_prompt=batch, **extra
+        )
+        return {
+            "prompt_embeds": prompt_embeds,
+            "pooled_prompt_embeds": pooled_prompt_embeds,
+        }
+    kwargs = {"prompt": prompt, "num_images_per_prompt": batch}
+    if profile.negative_prompt:
+        kwargs["negative_prompt"] = neg_prompt or None
+    return kwargs
+
+
+def run_sweep(
+    pipe,
+    prompt: str,
+    neg_prompt: str,
+    cells: Sequence[SweepCell],
+    max_batch: int = 4,
+    progress: Optional[Callable[[int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    pipeline_for: Optional[Callable[[Any], Any]] = None,
+) -> List[SweepCell]:
+    """Render every cell with ``pipe`` and record per-cell timings.
+
+    Parameters:
+        pipe: Loaded pipeline; unused when ``pipeline_for`` is given.
+        pipeline_for: Returns the pipeline prepared for an
+            :class:`~utils.execution_plans.ExecutionPlan`. When given, a batch
+            that runs out of memory is retried on cheaper plans, starting
+            with ``smaller_batch``, which splits it into calls of half the
+            size.
+
+    Returns:
+        The cells that were rendered; fewer than given if stopped early
+    """
+    import torch
+
+    batches = plan_batches(cells, max_batch)
+    total_steps = sum(batch[0].params.steps for batch in batches) or 1
+    done_steps = 0
+    # Prompt arguments by (execution plan, batch size, negative prompt used)
+    embeds: Dict[Tuple[Optional[str], int, bool], Dict[str, Any]] = {}
+    rendered: List[SweepCell] = []
+
+    for batch in batches:
+        if should_stop and should_stop():
+            break
+        params = batch[0].params
+        profile = get_profile(params.profile)
+        plan = guidance_plan(
+            profile, neg_prompt, params.guidance, params.steps, params.cfg_fraction
+        )
+        start = time.perf_counter()
+        base_steps = done_steps
+
+        def _render(execution=None) -> Tuple[List[Any], int]:
+            """Render ``batch`` in calls of at most its size / batch_divisor."""
+            current = pipe if execution is None else pipeline_for(execution)
+            divisor = 1 if execution is None else execution.batch_divisor
+            size = -(-len(batch) // divisor)
+            chunks = [batch[i : i + size] for i in range(0, len(batch), size)]
+            images: List[Any] = []
+            for n, chunk in enumerate(chunks):
+                # Without CFG the negative prompt is neither encoded nor passed
+                key = (
+                    execution and execution.name,
+                    len(chunk),
+                    plan.negative_prompt,
+                )
+                if key not in embeds:
+                    embeds[key] = _prompt_kwargs(
+                        current,
+                        prompt,
+                        neg_prompt if plan.negative_prompt else "",
+                        len(chunk),
+                        profile,
+                    )
+
+                def _on_step_end(_pipe, step, timestep, callback_kwargs, n=n):
+                    if progress:
+                        done = base_steps + (n * params.steps + step + 1) / len(chunks)
+                        progress(min(100, int(done / total_steps * 100)))
+                    return callback_kwargs
+
+                out = current(
+                    width=params.width,
+                    height=params.height,
+                    num_inference_steps=params.steps,
+                    guidance_scale=plan.guidance_scale,
+                    generator=[
+                        torch.Generator(device="cpu").manual_seed(cell.seed)
+                        for cell in chunk
+                    ],
+                    callback_on_step_end=plan.step_end(_on_step_end),
+                    **plan.tensor_inputs,
+                    **embeds[key],
+                )
+                images.extend(out.images)
+            return images, size
+
+        if pipeline_for is None:
+            images, size = _render()
+        else:
+            from utils.execution_plans import PlanMemory, run_with_oom_recovery
+
+            images, size = run_with_oom_recovery(
+                _render,
+                PlanMemory.key(
+                    profile.name, params.model_path, params.width, params.height
+                ),
+                # A single image cannot be split into smaller batches
+                skip=lambda execution: len(batch) == 1
+                and execution.name == "smaller_batch",
+            )
+        elapsed = time.perf_counter() - start
+        for cell, image in zip(batch, images):
+            cell.image = image
+            cell.seconds = elapsed / len(batch)
+            cell.batch_size = size
+            rendered.append(cell)
+        done_steps += params.steps
+        logger.info(
+            f"Sweep batch {params.width}x{params.height} steps={params.steps} "
+            f"guidance={params.guidance} ({plan.describe()}) x{len(batch)}: "
+            f"{elapsed:.2f}s"
+        )
+
+    rendered.sort(key=lambda cell: cell.index)
+    return rendered
+
+
+def save_images(cells: Sequence[SweepCell], out_dir: Path) -> None:
+    """Save each rendered image as ``cell_<index>.png`` in ``out_dir``."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for cell in cells:
+        path = out_dir / f"cell_{cell.index:04d}.png"
+        cell.image.save(path)
+        cell.path = str(path)
+
+
+def write_timings_csv(cells: Sequence[SweepCell], path: Path) -> None:
+    """Write one CSV row per cell with its parameters and timing."""
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["index", *SWEEPABLE, "seed", "batch_size", "seconds", "file"])
+        for cell in cells:
+            p = cell.params
+            writer.writerow(
+                [
+                    cell.index,
+                    *(getattr(p, name) for name in SWEEPABLE),
+                    cell.seed,
+                    cell.batch_size,
+                    f"{cell.seconds:.4f}",
+                    cell.path or "",
+                ]
+            )
+
+
+def write_contact_sheet(
+    cells: Sequence[SweepCell], path: Path, cell_size: int = 256
+) -> None:
+    """Lay cells out in a labelled grid: one row per setting, one column per seed."""
+    from PIL import Image, ImageDraw
+
+    rows: Dict[tuple, Dict[int, SweepCell]] = {}
+    for cell in cells:
+        p = cell.params
+        rows.setdefault((p.width, p.height, p.steps, p.guidance), {})[cell.seed] = cell
+    seeds = sorted({cell.seed for cell in cells})
+    label_w, label_h = 180, 20
+
+    sheet = Image.new(
+        "RGB",
+        (label_w + cell_size * len(seeds), label_h + cell_size * len(rows)),
+        "white",
+    )
+    draw = ImageDraw.Draw(sheet)
+    for col, seed in enumerate(seeds):
+        draw.text((label_w + col * cell_size + 4, 4), f"seed {seed}", fill="black")
+    for row, ((width, height, steps, guidance), by_seed) in enumerate(rows.items()):
+        y = label_h + row * cell_size
+        label = f"{width}x{height}\nsteps {steps}\nguidance {guidance:g}"
+        draw.multiline_text((4, y + 4), label, fill="black")
+        for col, seed in enumerate(seeds):
+            cell = by_seed.get(seed)
+            if cell is None or cell.image is None:
+                continue
+            thumb = cell.image.copy()
+            thumb.thumbnail((cell_size, cell_size))
+            sheet.paste(thumb, (label_w + col * cell_size, y))
+    sheet.save(path)
+
+
+def main():
+    """Run a sweep without the GUI."""
+    import argparse
+    from dataclasses import asdict
+
+    from utils.logging_config import setup_logging
+    from utils.model_manager import ModelManager
+    from utils.settings_manager import SettingsManager
+
+    parser = argparse.ArgumentParser(description="Render a parameter sweep")
+    parser.add_argument("--prompt", required=True, help="Text prompt")
+    parser.add_argument("--neg-prompt", default="", help="Negative prompt")
+    parser.add_argument(
+        "--sweep",
+        required=True,
+        help='Sweep spec, e.g. "steps=10:50:10; guidance=3,5,7; seed=0:3"',
+    )
+    parser.add_argument("--width", type=int, default=512)
+    parser.add_argument("--height", type=int, default=512)
+    parser.add_argument("--profile", default="flux", help="Model profile name")
+    parser.add_argument("--steps", type=int, help="Default: the profile's")
+    parser.add_argument("--guidance", type=float, help="Default: the profile's")
+    parser.add_argument("--device", help="Compute device (default: last used)")
+    parser.add_argument("--max-batch", type=int, default=4)
+    parser.add_argument("--out", default="sweep", help="Output directory")
+    args = parser.parse_args()
+
+    setup_logging()
+    profile = get_profile(args.profile)
+    base = ImageParams(
+        width=args.width,
+        height=args.height,
+        steps=args.steps if args.steps is not None else profile.default_steps,
+        guidance=(
+            args.guidance if args.guidance is not None else profile.default_guidance
+        ),
+        profile=profile.name,
+        device=args.device or SettingsManager().get_device(),
+    )
+    cells = expand_sweep(base, parse_sweep_spec(args.sweep))
+    cells = run_sweep(
+        None,
+        args.prompt,
+        args.neg_prompt,
+        cells,
+        args.max_batch,
+        pipeline_for=lambda plan: ModelManager.get_flux_pipeline(
+            {**asdict(base), "execution_plan": plan.name}
+        ),
+    )
+
+    out_dir = Path(args.out)
+    save_images(cells, out_dir)
+    write_timings_csv(cells, out_dir / "timings.csv")
+    write_contact_sheet(cells, out_dir / "contact_sheet.png")
+    print(f"Sweep of {len(cells)} images written to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
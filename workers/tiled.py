@@ -0,0 +1,372 @@
+"""Tiled generation of images far larger than the model's native size.
+
+Follows MultiDiffusion (Bar-Tal et al., 2023) and the diffusers panorama
+pipeline: the latent canvas is covered by overlapping tiles, each tile is
+denoised as an image of its own at every step, and the predictions are
+averaged where tiles overlap before the scheduler steps the whole canvas. The
+tiles therefore agree on shared content instead of being stitched afterwards.
+Averaging predictions rather than each tile's stepped latents gives the same
+update for deterministic samplers and needs only one scheduler state.
+
+The denoiser and the VAE only ever see one tile, so accelerator memory is set
+by ``tile_size``. The latent canvas stays in host memory (1/12 of the RGB size
+for Stable Diffusion and 1/3 for Flux, in float32), and decoded tiles are
+written straight into a memory-mapped image (see :mod:`utils.tiled_image`).
+"""
+
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from utils.model_profiles import FLUX_PIPELINE, ModelProfile, get_profile
+
+from .hires import SIZE_MULTIPLE, Box, plan_tiles
+from .params import ImageParams
+
+logger = logging.getLogger(__name__)
+
+# Pixels per latent along each axis for Flux and Stable Diffusion
+LATENT_FACTOR = 8
+# Latent context decoded around each output tile and then cropped away, so
+# the VAE sees across tile borders and the seams do not show
+DECODE_MARGIN = 8
+
+
+def canvas_size(width: int, height: int) -> Tuple[int, int]:
+    """Round ``width`` and ``height`` down to sizes the models accept."""
+
+    def snap(value: int) -> int:
+        return max(SIZE_MULTIPLE, value // SIZE_MULTIPLE * SIZE_MULTIPLE)
+
+    return snap(width), snap(height)
+
+
+def latent_tiles(width: int, height: int, tile: int, overlap: int) -> List[Box]:
+    """Return the overlapping denoising tiles in latent coordinates."""
+    if tile % SIZE_MULTIPLE or overlap % SIZE_MULTIPLE:
+        raise ValueError(f"Tile size and overlap must be multiples of {SIZE_MULTIPLE}")
+    return [
+        tuple(value // LATENT_FACTOR for value in box)
+        for box in plan_tiles(width, height, tile, overlap)
+    ]
+
+
+def decode_tiles(width: int, height: int, tile: int) -> List[Tuple[Box, Box]]:
+    """Return ``(box, context)`` pairs in latent coordinates, row by row.
+
+    The boxes cover the canvas without overlap; each context adds
+    :data:`DECODE_MARGIN` latents on every side that has a neighbour.
+    """
+    latent_w, latent_h = width // LATENT_FACTOR, height // LATENT_FACTOR
+    size = tile // LATENT_FACTOR
+    pairs = []
+    for top in range(0, latent_h, size):
+        for left in range(0, latent_w, size):
+            right, bottom = min(left + size, latent_w), min(top + size, latent_h)
+            context = (
+                max(0, left - DECODE_MARGIN),
+                max(0, top - DECODE_MARGIN),
+                min(latent_w, right + DECODE_MARGIN),
+                min(latent_h, bottom + DECODE_MARGIN),
+            )
+            pairs.append(((left, top, right, bottom), context))
+    return pairs
+
+
+class _FluxTiles:
+    """Flux transformer predictions for one packed latent tile at a time."""
+
+    def __init__(
+        self, pipe, prompt: str, params: ImageParams, profile: ModelProfile
+    ) -> None:
+        import torch
+
+        self.pipe = pipe
+        self.device = pipe._execution_device
+        self.dtype = pipe.transformer.dtype
+        self.channels = pipe.transformer.config.in_channels // 4
+        extra = {}
+        if profile.max_sequence_length:
+            extra["max_sequence_length"] = profile.max_sequence_length
+        self.embeds, self.pooled, self.text_ids = pipe.encode_prompt(
+            prompt=prompt,
+            prompt_2=None,
+            device=self.device,
+            num_images_per_prompt=1,
+            **extra,
+        )
+        self.guidance = None
+        if pipe.transformer.config.guidance_embeds:
+            self.guidance = torch.full(
+                [1],
+                params.guidance if profile.uses_guidance else 0.0,
+                device=self.device,
+                dtype=torch.float32,
+            )
+
+    def timesteps(self, steps: int, tile_w: int, tile_h: int):
+        import numpy as np
+        from diffusers.pipelines.flux.pipeline_flux import (
+            calculate_shift,
+            retrieve_timesteps,
+        )
+
+        config = self.pipe.scheduler.config
+        # The schedule is shifted for the sequence length the model sees
+        mu = calculate_shift(
+            (tile_w // 2) * (tile_h // 2),
+            config.get("base_image_seq_len", 256),
+            config.get("max_image_seq_len", 4096),
+            config.get("base_shift", 0.5),
+            config.get("max_shift", 1.15),
+        )
+        sigmas = None
+        if not config.get("use_flow_sigmas"):
+            sigmas = np.linspace(1.0, 1 / steps, steps)
+        timesteps, _ = retrieve_timesteps(
+            self.pipe.scheduler, steps, "cpu", sigmas=sigmas, mu=mu
+        )
+        return timesteps
+
+    def predict(self, latents, t):
+        pipe = self.pipe
+        _, channels, height, width = latents.shape
+        packed = pipe._pack_latents(
+            latents.to(self.device, self.dtype), 1, channels, height, width
+        )
+        # Every tile is positioned as an image of its own
+        image_ids = pipe._prepare_latent_image_ids(
+            1, height // 2, width // 2, self.device, self.dtype
+        )
+        out = pipe.transformer(
+            hidden_states=packed,
+            timestep=t.expand(1).to(self.device, self.dtype) / 1000,
+            guidance=self.guidance,
+            pooled_projections=self.pooled,
+            encoder_hidden_states=self.embeds,
+            txt_ids=self.text_ids,
+            img_ids=image_ids,
+            return_dict=False,
+        )[0]
+        return (
+            pipe._unpack_latents(
+                out,
+                height * pipe.vae_scale_factor,
+                width * pipe.vae_scale_factor,
+                pipe.vae_scale_factor,
+            )
+            .float()
+            .cpu()
+        )
+
+
+class _UNetTiles:
+    """Stable Diffusion UNet predictions with classifier-free guidance."""
+
+    def __init__(
+        self,
+        pipe,
+        prompt: str,
+        neg_prompt: str,
+        params: ImageParams,
+        profile: ModelProfile,
+    ) -> None:
+        import torch
+
+        self.pipe = pipe
+        self.device = pipe._execution_device
+        self.dtype = pipe.unet.dtype
+        self.channels = pipe.unet.config.in_channels
+        self.guidance = params.guidance
+        self.cfg = profile.uses_cfg and params.guidance > 1.0
+        cond, uncond = pipe.encode_prompt(
+            prompt,
+            self.device,
+            1,
+            self.cfg,
+            negative_prompt=(neg_prompt or None) if profile.negative_prompt else None,
+        )
+        self.embeds = torch.cat([uncond, cond]) if self.cfg else cond
+
+    def timesteps(self, steps: int, tile_w: int, tile_h: int):
+        self.pipe.scheduler.set_timesteps(steps, device="cpu")
+        return self.pipe.scheduler.timesteps
+
+    def predict(self, latents, t):
+        import torch
+
+        model_input = torch.cat([latents] * 2) if self.cfg else latents
+        model_input = self.pipe.scheduler.scale_model_input(model_input, t)
+        out = self.pipe.unet(
+            model_input.to(self.device, self.dtype),
+            t.to(self.device),
+            encoder_hidden_states=self.embeds,
+            return_dict=False,
+        )[0]
+        if self.cfg:
+            uncond, cond = out.chunk(2)
+            out = uncond + self.guidance * (cond - uncond)
+        return out.float().cpu()
+
+
+def _decode_tile(pipe, latents, box: Box, context: Box):
+    """Decode ``context`` and return the uint8 pixels of ``box``."""
+    import torch
+
+    vae = pipe.vae
+    left, top, right, bottom = context
+    z = latents[..., top:bottom, left:right] / vae.config.scaling_factor
+    shift = getattr(vae.config, "shift_factor", None)
+    if shift:
+        z = z + shift
+    pixels = vae.decode(z.to(pipe._execution_device, vae.dtype), return_dict=False)[0]
+    pixels = ((pixels[0].float().clamp(-1, 1) + 1) * 127.5).round().to(torch.uint8)
+    pixels = pixels.permute(1, 2, 0).cpu().numpy()
+    x0 = (box[0] - left) * LATENT_FACTOR
+    y0 = (box[1] - top) * LATENT_FACTOR
+    x1 = (box[2] - left) * LATENT_FACTOR
+    y1 = (box[3] - top) * LATENT_FACTOR
+    return pixels[y0:y1, x0:x1]
+
+
+def generate_tiled(
+    pipe,
+    prompt: str,
+    neg_prompt: str,
+    params: ImageParams,
+    path: str,
+    progress=None,
+    should_stop=None,
+) -> Optional[str]:
+    """Render ``params.width`` x ``params.height`` in tiles and write ``path``.
+
+    ``path`` is a ``.npy`` image readable with :class:`utils.tiled_image.TiledImage`;
+    its overviews are written next to it.
+
+    Returns:
+        ``path``, or ``None`` if ``should_stop`` cancelled the run
+    """
+    import torch
+
+    from utils.tiled_image import build_overviews, create_image
+
+    profile = get_profile(params.profile)
+    width, height = canvas_size(params.width, params.height)
+    tiles = latent_tiles(width, height, params.tile_size, params.tile_overlap)
+    decodes = decode_tiles(width, height, params.tile_size)
+    scheduler = pipe.scheduler
+
+    with torch.no_grad():
+        if profile.pipeline == FLUX_PIPELINE:
+            denoiser = _FluxTiles(pipe, prompt, params, profile)
+        else:
+            denoiser = _UNetTiles(pipe, prompt, neg_prompt, params, profile)
+        first = tiles[0]
+        timesteps = denoiser.timesteps(
+            params.steps, first[2] - first[0], first[3] - first[1]
+        )
+        total = len(timesteps) * len(tiles) + len(decodes)
+        done = 0
+        logger.info(
+            f"Tiled generation: {width}x{height} in {len(tiles)} tiles "
+            f"of {params.tile_size}px, {len(decodes)} decode tiles"
+        )
+
+        def _advance():
+            nonlocal done
+            done += 1
+            if progress is not None:
+                progress(min(100, int(done / total * 100)))
+
+        shape = (1, denoiser.channels, height // LATENT_FACTOR, width // LATENT_FACTOR)
+        generator = None
+        if params.seed is not None:
+            generator = torch.Generator(device="cpu").manual_seed(params.seed)
+        latents = torch.randn(shape, generator=generator, dtype=torch.float32)
+        latents = latents * getattr(scheduler, "init_noise_sigma", 1.0)
+        # How many tiles cover each latent, for averaging the predictions
+        weight = torch.zeros((1, 1) + shape[2:])
+        for left, top, right, bottom in tiles:
+            weight[..., top:bottom, left:right] += 1
+
+        for t in timesteps:
+            prediction = torch.zeros_like(latents)
+            for left, top, right, bottom in tiles:
+                if should_stop is not None and should_stop():
+                    return None
+                prediction[..., top:bottom, left:right] += denoiser.predict(
+                    latents[..., top:bottom, left:right], t
+                )
+                _advance()
+            latents = scheduler.step(
+                prediction / weight, t, latents, return_dict=False
+            )[0]
+            del prediction
+
+        image = create_image(path, width, height)
+        for box, context in decodes:
+            if should_stop is not None and should_stop():
+                del image
+                Path(path).unlink()
+                return None
+            left, top, right, bottom = (value * LATENT_FACTOR for value in box)
+            image[top:bottom, left:right] = _decode_tile(pipe, latents, box, context)
+            _advance()
+        image.flush()
+        del image
+
+    build_overviews(path)
+    logger.info(f"Wrote {width}x{height} image to {path}")
+    return path
+
+
+def main():
+    """Render a tiled image without the GUI."""
+    import argparse
+    from dataclasses import asdict
+
+    from utils.logging_config import setup_logging
+    from utils.model_manager import ModelManager
+    from utils.settings_manager import SettingsManager
+    from utils.tiled_image import export_tiff
+
+    parser = argparse.ArgumentParser(description="Render a large image in tiles")
+    parser.add_argument("--prompt", required=True, help="Text prompt")
+    parser.add_argument("--neg-prompt", default="", help="Negative prompt")
+    parser.add_argument("--width", type=int, default=8192)
+    parser.add_argument("--height", type=int, default=8192)
+    parser.add_argument("--tile", type=int, default=1024, help="Tile size in pixels")
+    parser.add_argument("--overlap", type=int, default=256, help="Tile overlap")
+    parser.add_argument("--profile", default="flux", help="Model profile name")
+    parser.add_argument("--steps", type=int, help="Default: the profile's")
+    parser.add_argument("--guidance", type=float, help="Default: the profile's")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--device", help="Compute device (default: last used)")
+    parser.add_argument("--out", default="tiled.npy", help="Output .npy image")
+    parser.add_argument("--tiff", help="Also export a tiled BigTIFF to this path")
+    args = parser.parse_args()
+
+    setup_logging()
+    profile = get_profile(args.profile)
+    params = ImageParams(
+        width=args.width,
+        height=args.height,
+        steps=args.steps if args.steps is not None else profile.default_steps,
+        guidance=(
+            args.guidance if args.guidance is not None else profile.default_guidance
+        ),
+        profile=profile.name,
+        device=args.device or SettingsManager().get_device(),
+        seed=args.seed,
+        tile_size=args.tile,
+        tile_overlap=args.overlap,
+    )
+    pipe = ModelManager.get_flux_pipeline(asdict(params))
+    generate_tiled(pipe, args.prompt, args.neg_prompt, params, args.out)
+    if args.tiff:
+        export_tiff(args.out, args.tiff)
+    print(f"Tiled image written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
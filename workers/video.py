@@ -0,0 +1,290 @@
+"""In-process Wan2.2 video generation through diffusers.
+
+The model is loaded once by :meth:`ModelManager.get_wan_pipeline` and reused
+across jobs. Progress comes from the pipeline's own step callback, and a stop
+request interrupts the denoising loop instead of killing a subprocess.
+
+The pipeline stops at the latents; :func:`decode_frames` runs the causal VAE
+one latent frame at a time and :func:`save_video` streams the decoded frames
+into ffmpeg, so the full-resolution video never exists in memory at once.
+"""
+
+import itertools
+import logging
+import os
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from utils import metrics, tracing
+from utils.video_encoder import EncoderSettings, encode_frames
+
+from .params import VideoParams
+
+logger = logging.getLogger(__name__)
+
+# Classifier-free guidance scale recommended for Wan2.2 TI2V-5B
+WAN_GUIDANCE = 5.0
+# Longest UMT5 prompt in tokens
+WAN_MAX_SEQUENCE_LENGTH = 512
+# The TI2V VAE compresses 4 frames and 16x16 pixels per latent, which the
+# transformer patchifies 2x2; sizes and frame counts must fit that grid
+WAN_TEMPORAL_FACTOR = 4
+WAN_SPATIAL_MULTIPLE = 32
+
+
+def is_diffusers_layout(model_path: str) -> bool:
+    """Whether ``model_path`` holds a diffusers pipeline (``model_index.json``)."""
+    return (Path(model_path) / "model_index.json").is_file()
+
+
+def wan_dimensions(params: VideoParams) -> Tuple[int, int, int]:
+    """Return ``(width, height, frames)`` rounded to sizes Wan accepts."""
+
+    def snap(value: int) -> int:
+        return max(
+            WAN_SPATIAL_MULTIPLE, value // WAN_SPATIAL_MULTIPLE * WAN_SPATIAL_MULTIPLE
+        )
+
+    frames = max(0, params.frames - 1) // WAN_TEMPORAL_FACTOR * WAN_TEMPORAL_FACTOR + 1
+    return snap(params.width), snap(params.height), frames
+
+
+def wan_keyframes(frames: int, factor: int) -> int:
+    """Return the fewest keyframes Wan accepts that interpolate to ``frames``.
+
+    Wan renders ``4n + 1`` frames, and :func:`wan_dimensions` rounds other
+    counts down, so the keyframe count is rounded up to the next such value
+    instead; the surplus interpolated frames are dropped.
+    """
+    from utils.frame_interpolation import keyframe_count
+
+    keyframes = keyframe_count(frames, factor)
+    steps = -(-max(0, keyframes - 1) // WAN_TEMPORAL_FACTOR)
+    return steps * WAN_TEMPORAL_FACTOR + 1
+
+
+def _prompt_embeds(pipe, prompt: str, neg_prompt: str) -> dict:
+    """Encode the prompts where the text encoder lives.
+
+    With ``t5_cpu`` the encoder stays on the CPU while the transformer runs
+    elsewhere, so the pipeline is handed the embeddings instead of the text.
+    """
+    import torch
+
+    encoder_device = next(pipe.text_encoder.parameters()).device
+    target = pipe._execution_device
+    if encoder_device == torch.device(target):
+        return {"prompt": prompt, "negative_prompt": neg_prompt or None}
+    with torch.no_grad():
+        embeds, negative = pipe.encode_prompt(
+            prompt=prompt,
+            negative_prompt=neg_prompt or None,
+            do_classifier_free_guidance=WAN_GUIDANCE > 1.0,
+            max_sequence_length=WAN_MAX_SEQUENCE_LENGTH,
+            device=encoder_device,
+        )
+    return {
+        "prompt_embeds": embeds.to(target),
+        "negative_prompt_embeds": negative.to(target) if negative is not None else None,
+    }
+
+
+def render_video(
+    pipe,
+    prompt: str,
+    neg_prompt: str,
+    params: VideoParams,
+    progress: Optional[Callable[[int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    seed: Optional[int] = None,
+) -> Optional[Any]:
+    """Denoise one video.
+
+    Returns:
+        Normalised latents for :func:`decode_frames`, or ``None`` if
+        ``should_stop`` interrupted the run
+    """
+    import torch
+
+    width, height, frames = wan_dimensions(params)
+    if (width, height, frames) != (params.width, params.height, params.frames):
+        logger.info(f"Rendering {frames} frames at {width}x{height} to fit Wan's grid")
+    stopped = False
+    with tracing.span("text_encode", sync=True):
+        embeds = _prompt_embeds(pipe, prompt, neg_prompt)
+    steps = tracing.StepSpans()
+    step_timer = metrics.StepTimer("video")
+
+    def _on_step_end(pipeline, step, timestep, callback_kwargs):
+        nonlocal stopped
+        steps.step(step)
+        step_timer.step()
+        if should_stop is not None and should_stop():
+            # Skips the remaining steps
+            pipeline._interrupt = True
+            stopped = True
+        elif progress is not None:
+            progress(min(100, int((step + 1) / params.steps * 100)))
+        return callback_kwargs
+
+    extra = {}
+    if seed is not None:
+        extra["generator"] = torch.Generator(device="cpu").manual_seed(seed)
+
+    steps.restart()
+    step_timer.restart()
+    out = pipe(
+        width=width,
+        height=height,
+        num_frames=frames,
+        num_inference_steps=params.steps,
+        guidance_scale=WAN_GUIDANCE,
+        max_sequence_length=WAN_MAX_SEQUENCE_LENGTH,
+        callback_on_step_end=_on_step_end,
+        output_type="latent",
+        **embeds,
+        **extra,
+    )
+    if stopped:
+        return None
+    return out.frames
+
+
+def decode_frames(pipe, latents) -> Iterator[Any]:
+    """Decode ``latents`` into ``(height, width, 3)`` uint8 frames lazily.
+
+    Wan's VAE is causal in time and carries its state between latent frames
+    in a feature cache, so decoding one latent frame at a time gives the same
+    frames as a full decode while holding only four output frames at once.
+    """
+    import torch
+
+    vae = pipe.vae
+    hook = getattr(vae, "_hf_hook", None)
+    if hook is not None and hasattr(hook, "pre_forward"):
+        # Under model offload, bring the VAE onto the accelerator as decode() would
+        hook.pre_forward(vae)
+    device = next(vae.parameters()).device
+    latents = latents.to(device, dtype=vae.dtype)
+    shape = (1, vae.config.z_dim, 1, 1, 1)
+    mean = torch.tensor(vae.config.latents_mean).view(shape).to(latents)
+    std = torch.tensor(vae.config.latents_std).view(shape).to(latents)
+    latents = latents * std + mean
+
+    with torch.no_grad():
+        for chunk in _decode_chunks(vae, latents):
+            # (1, 3, frames, height, width) in [-1, 1] -> uint8 frames
+            chunk = ((chunk[0].clamp(-1, 1) + 1) * 127.5).round().to(torch.uint8)
+            for frame in chunk.permute(1, 2, 3, 0).cpu().numpy():
+                yield frame
+
+
+def _decode_chunks(vae, latents) -> Iterator[Any]:
+    """Yield pixel chunks of ``latents``, one latent frame per chunk."""
+    num_frames, height, width = latents.shape[2:]
+    tiled = getattr(vae, "use_tiling", False) and (
+        width > vae.tile_sample_min_width // vae.spatial_compression_ratio
+        or height > vae.tile_sample_min_height // vae.spatial_compression_ratio
+    )
+    if tiled or not hasattr(vae, "clear_cache"):
+        # Tiled decoding keeps its own caches per tile; decode in one go
+        yield vae.decode(latents, return_dict=False)[0]
+        return
+
+    from diffusers.models.autoencoders.autoencoder_kl_wan import unpatchify
+
+    vae.clear_cache()
+    try:
+        x = vae.post_quant_conv(latents)
+        for i in range(num_frames):
+            vae._conv_idx = [0]
+            extra = {"first_chunk": True} if i == 0 else {}
+            out = vae.decoder(
+                x[:, :, i : i + 1],
+                feat_cache=vae._feat_map,
+                feat_idx=vae._conv_idx,
+                **extra,
+            )
+            if vae.config.patch_size is not None:
+                out = unpatchify(out, patch_size=vae.config.patch_size)
+            yield out
+    finally:
+        vae.clear_cache()
+
+
+def save_video(
+    frames: Iterable,
+    path: str,
+    fps: int,
+    settings: Optional[EncoderSettings] = None,
+) -> str:
+    """Stream ``frames`` into an ffmpeg encoder writing ``path``."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    count = encode_frames(frames, path, fps, settings)
+    logger.info(f"Wrote {count} frames to {path}")
+    return path
+
+
+def generate_video(
+    prompt: str,
+    neg_prompt: str,
+    params: VideoParams,
+    model_path: str,
+    progress: Optional[Callable[[int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Optional[str]:
+    """Render ``params`` with the cached pipeline for ``model_path`` to a file.
+
+    Only ``1/params.interpolation`` of the frames go through diffusion; the
+    rest are synthesised by :mod:`utils.frame_interpolation`.
+
+    Returns:
+        The absolute path of the video, or ``None`` if ``should_stop``
+        cancelled the run
+    """
+    from utils.frame_interpolation import (
+        get_interpolator,
+        interpolate_frames,
+        interpolated_count,
+    )
+    from utils.model_manager import ModelManager
+
+    factor = max(1, params.interpolation)
+    render_params = params
+    if factor > 1:
+        # Fail on a bad method before spending minutes on diffusion
+        get_interpolator(params.interpolation_method)
+        keyframes = wan_keyframes(params.frames, factor)
+        logger.info(
+            f"Rendering {keyframes} keyframes, interpolated x{factor} to "
+            f"{interpolated_count(keyframes, factor)} frames and cut to "
+            f"{params.frames}"
+        )
+        render_params = replace(params, frames=keyframes)
+    pipe = ModelManager.get_wan_pipeline({**asdict(params), "model_path": model_path})
+    if progress is not None:
+        progress(0)
+    latents = render_video(
+        pipe,
+        prompt,
+        neg_prompt,
+        render_params,
+        progress=progress,
+        should_stop=should_stop,
+    )
+    if latents is None or (should_stop is not None and should_stop()):
+        return None
+    out_file = os.path.abspath(params.output_path or "output.mp4")
+    # Frames are decoded, interpolated and encoded as one stream
+    with tracing.span("decode_and_encode", frames=params.frames):
+        frames = interpolate_frames(
+            decode_frames(pipe, latents), factor, params.interpolation_method
+        )
+        save_video(
+            itertools.islice(frames, params.frames) if factor > 1 else frames,
+            out_file,
+            params.fps,
+            EncoderSettings(codec=params.codec, crf=params.crf, pix_fmt=params.pix_fmt),
+        )
+    return out_file